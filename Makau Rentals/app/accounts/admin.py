@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import CustomUser, UnitType, Property, Unit, Subscription, TenantProfile, TenantApplication
+from .models import CustomUser, UnitType, Property, Unit, Subscription, TenantProfile, TenantApplication, LandlordStats, RentRevision, RentRevisionItem, ArchivedTenant
 
 @admin.register(CustomUser)
 class CustomUserAdmin(admin.ModelAdmin):
@@ -84,4 +84,40 @@ class TenantApplicationAdmin(admin.ModelAdmin):
         ('Review Info', {
             'fields': ('reviewed_at', 'reviewed_by')
         }),
-    )
\ No newline at end of file
+    )
+
+@admin.register(LandlordStats)
+class LandlordStatsAdmin(admin.ModelAdmin):
+    list_display = ['landlord', 'total_units', 'occupied_units', 'vacant_units', 'active_tenants', 'month_revenue', 'updated_at']
+    search_fields = ['landlord__email', 'landlord__full_name']
+    raw_id_fields = ['landlord']
+    readonly_fields = ['updated_at', 'reconciled_at']
+
+class RentRevisionItemInline(admin.TabularInline):
+    model = RentRevisionItem
+    extra = 0
+    raw_id_fields = ['unit']
+    readonly_fields = ['old_rent', 'new_rent', 'old_rent_remaining', 'new_rent_remaining', 'created_at']
+
+@admin.register(RentRevision)
+class RentRevisionAdmin(admin.ModelAdmin):
+    list_display = ['landlord', 'adjustment_type', 'value', 'scope', 'effective_date', 'status', 'units_updated']
+    list_filter = ['status', 'adjustment_type', 'scope']
+    search_fields = ['landlord__email', 'landlord__full_name']
+    raw_id_fields = ['landlord', 'unit_type', 'property']
+    readonly_fields = ['units_updated', 'attempts', 'error', 'created_at', 'applied_at', 'rolled_back_at']
+    inlines = [RentRevisionItemInline]
+
+
+@admin.register(ArchivedTenant)
+class ArchivedTenantAdmin(admin.ModelAdmin):
+    """Read-only: written by the tenant retention engine"""
+    list_display = ['archived_at', 'email', 'full_name', 'reason', 'landlord_id', 'unit_code']
+    list_filter = ['reason']
+    search_fields = ['email', 'full_name', 'unit_code']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -7,6 +7,9 @@ class AccountsConfig(AppConfig):
     name = 'accounts'
 
     def ready(self):
+        # Cache invalidation receivers
+        from . import signals  # noqa: F401
+
         # Ensure default auth Groups exist at startup
         try:
             from django.contrib.auth.models import Group
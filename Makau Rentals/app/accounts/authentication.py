@@ -0,0 +1,25 @@
+# accounts/authentication.py
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+# Claims added by MyTokenObtainPairSerializer.get_token
+ROLES_CLAIM = 'roles'
+ROLES_VERSION_CLAIM = 'roles_version'
+
+
+class RoleClaimJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that primes the user's role memo from the token's
+    role claim, so IsLandlord/IsTenant/HasActiveSubscription can decide
+    without querying auth_group.
+
+    The claim is only trusted while its roles_version matches the user row
+    (which is loaded anyway). A group change bumps roles_version, and the
+    user's roles are then resolved from the database again.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        roles = validated_token.get(ROLES_CLAIM)
+        if roles is not None and validated_token.get(ROLES_VERSION_CLAIM) == getattr(user, 'roles_version', None):
+            user.set_cached_roles(roles)
+        return user
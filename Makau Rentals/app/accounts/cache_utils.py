@@ -0,0 +1,76 @@
+# accounts/cache_utils.py
+"""
+Landlord-scoped and per-user cache keys.
+
+Every cached value derived from a landlord's data embeds the landlord's
+current generation number in its key. The signals in accounts/signals.py
+bump the generation whenever one of the landlord's properties, units, unit
+types, payments or tenant profiles changes, which retires all of that
+landlord's cached entries at once - no key scans or explicit deletes needed.
+Retired entries simply age out with their TTL.
+
+Generation counters are per account, so per-user entries (permission
+checks, user details) use the same scheme through user_cache_key(). A
+user's counter is also bumped when their account or subscription changes
+and, for tenants, when their profile or unit assignment changes.
+"""
+import time
+
+from django.core.cache import cache
+
+GENERATION_KEY = "landlord-gen:{landlord_id}"
+
+
+def _fresh_generation():
+    # Start from a clock value rather than 1 so a generation counter that was
+    # evicted can never resurrect keys from an earlier generation.
+    return int(time.time() * 1000)
+
+
+def get_landlord_generation(landlord_id):
+    """Return the current cache generation for a landlord"""
+    key = GENERATION_KEY.format(landlord_id=landlord_id)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _fresh_generation(), timeout=None)
+        generation = cache.get(key) or _fresh_generation()
+    return generation
+
+
+def bump_landlord_generation(landlord_id):
+    """Invalidate every cached view of a landlord's data"""
+    if not landlord_id:
+        return None
+    key = GENERATION_KEY.format(landlord_id=landlord_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        generation = _fresh_generation()
+        cache.set(key, generation, timeout=None)
+        return generation
+
+
+def bump_user_generation(*user_ids):
+    """Invalidate the per-user entries (and a landlord's landlord-scoped ones) of each user"""
+    for user_id in set(user_ids):
+        bump_landlord_generation(user_id)
+
+
+def landlord_cache_key(landlord_id, *parts):
+    """
+    Build a versioned cache key, e.g.
+    landlord_cache_key(5, "property", 12, "units") -> "landlord:5:g42:property:12:units"
+    """
+    generation = get_landlord_generation(landlord_id)
+    suffix = ":".join(str(part) for part in parts)
+    return f"landlord:{landlord_id}:g{generation}:{suffix}"
+
+
+def user_cache_key(user_id, *parts):
+    """
+    Build a versioned per-user cache key, e.g.
+    user_cache_key(7, "subscription_status") -> "user:7:g42:subscription_status"
+    """
+    generation = get_landlord_generation(user_id)
+    suffix = ":".join(str(part) for part in parts)
+    return f"user:{user_id}:g{generation}:{suffix}"
@@ -3,15 +3,19 @@ Health Check View - Check database connectivity
 """
 from django.http import JsonResponse
 from django.db import connection
+from django.core.cache import cache
 from django.contrib.auth import get_user_model
 import os
 
+from app import metrics
+
 def health_check(request):
     """
     Health check endpoint that verifies:
     - Django is running
     - Database connection works
     - Tables exist
+    It also reports the cache hit/miss/eviction counters when available.
     """
     response_data = {
         'django': 'running',
@@ -20,6 +24,13 @@ def health_check(request):
             'SECRET_KEY_configured': bool(os.environ.get('SECRET_KEY')),
         }
     }
+
+    # Cache counters (TieredCache exposes stats(); other backends don't)
+    if callable(getattr(cache, 'stats', None)):
+        response_data['cache'] = cache.stats()
+
+    # Latency histograms and queue gauges (see app/metrics.py)
+    response_data['metrics'] = metrics.snapshot()
     
     try:
         # Test database connection
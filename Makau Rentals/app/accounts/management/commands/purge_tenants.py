@@ -0,0 +1,31 @@
+"""
+Management command to archive and purge tenants under the retention policies
+"""
+from django.core.management.base import BaseCommand
+from accounts.retention import POLICIES, purge
+
+
+class Command(BaseCommand):
+    help = 'Archive and delete tenants with an unpaid deposit or who left their unit (see accounts/retention.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policy', action='append', choices=sorted(POLICIES), help='Only run this policy (repeatable)')
+        parser.add_argument('--dry-run', action='store_true', help='Report candidates without archiving or deleting')
+        parser.add_argument('--chunk-size', type=int, help='Tenants archived and deleted per transaction')
+        parser.add_argument('--show-ids', type=int, default=50, help='Candidate ids listed per policy (0 = all)')
+
+    def handle(self, *args, **options):
+        report = purge(policies=options['policy'], dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+        for name, result in report['policies'].items():
+            ids = result['tenant_ids']
+            shown = ids if not options['show_ids'] else ids[:options['show_ids']]
+            more = f" (+{len(ids) - len(shown)} more)" if len(shown) < len(ids) else ''
+            self.stdout.write(
+                f"{name}: {result['count']} candidates, {result['purged']} purged; "
+                f"ids: {', '.join(map(str, shown)) or '-'}{more}"
+            )
+        verb = 'Would purge' if report['dry_run'] else 'Purged'
+        count = sum(r['count'] for r in report['policies'].values()) if report['dry_run'] else report['purged']
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {count} tenants in {report['seconds']}s ({report['per_second']}/s)"
+        ))
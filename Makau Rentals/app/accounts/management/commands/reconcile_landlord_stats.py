@@ -0,0 +1,52 @@
+"""
+Management command to rebuild LandlordStats rows from scratch
+"""
+from django.core.management.base import BaseCommand
+from accounts.models import CustomUser, LandlordStats
+from accounts.stats import compute_landlord_stats, rebuild_landlord_stats
+
+COMPARED_FIELDS = (
+    'total_properties', 'total_units', 'occupied_units', 'vacant_units',
+    'active_tenants', 'rent_collected', 'rent_outstanding',
+)
+
+
+class Command(BaseCommand):
+    help = 'Recompute the dashboard stats row of every landlord and report any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--landlord', type=int, help='Only reconcile this landlord id')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without saving')
+
+    def handle(self, *args, **options):
+        landlords = CustomUser.objects.filter(groups__name='landlord')
+        if options['landlord']:
+            landlords = landlords.filter(id=options['landlord'])
+
+        existing = {s.landlord_id: s for s in LandlordStats.objects.filter(landlord__in=landlords)}
+        drifted = 0
+        total = 0
+
+        for landlord_id in landlords.values_list('id', flat=True).iterator():
+            total += 1
+            current = existing.get(landlord_id)
+            fresh = compute_landlord_stats(landlord_id)
+            if current is not None:
+                diffs = {
+                    field: (getattr(current, field), fresh[field])
+                    for field in COMPARED_FIELDS
+                    if getattr(current, field) != fresh[field]
+                }
+                if current.month_to_date_revenue(fresh['revenue_month']) != fresh['month_revenue']:
+                    diffs['month_revenue'] = (current.month_revenue, fresh['month_revenue'])
+                if diffs:
+                    drifted += 1
+                    self.stdout.write(self.style.WARNING(f'Landlord {landlord_id} drifted: {diffs}'))
+
+            if not options['dry_run']:
+                rebuild_landlord_stats(landlord_id)
+
+        verb = 'Checked' if options['dry_run'] else 'Reconciled'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} stats for {total} landlords ({drifted} had drifted)'
+        ))
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-17 21:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_add_property_unit_tracker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='roles_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AlterField(
+            model_name='subscription',
+            name='plan',
+            field=models.CharField(choices=[('free', 'Free (30-day trial)'), ('starter', 'Tier 1 (1-10 units)'), ('basic', 'Tier 2 (11-20 units)'), ('premium', 'Tier 3 (21-50 units)'), ('professional', 'Tier 4 (51-100 units)'), ('onetime', 'One-time (Lifetime, up to 50 units)')], default='free', max_length=20),
+        ),
+    ]
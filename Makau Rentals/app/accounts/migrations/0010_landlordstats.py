@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_customuser_roles_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LandlordStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_properties', models.IntegerField(default=0)),
+                ('total_units', models.IntegerField(default=0)),
+                ('occupied_units', models.IntegerField(default=0)),
+                ('vacant_units', models.IntegerField(default=0)),
+                ('active_tenants', models.IntegerField(default=0)),
+                ('revenue_month', models.DateField(blank=True, help_text='First day of the month month_revenue covers', null=True)),
+                ('month_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rent_collected', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('rent_outstanding', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+                ('landlord', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dashboard_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Landlord stats',
+            },
+        ),
+    ]
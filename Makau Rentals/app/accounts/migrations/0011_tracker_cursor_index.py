@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_landlordstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='propertyunittracker',
+            index=models.Index(fields=['landlord', '-created_at', '-id'], name='tracker_landlord_cursor_idx'),
+        ),
+    ]
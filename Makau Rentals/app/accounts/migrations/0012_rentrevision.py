@@ -0,0 +1,62 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_tracker_cursor_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RentRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('adjustment_type', models.CharField(choices=[('percentage', 'Percentage'), ('fixed', 'Fixed Amount'), ('absolute', 'Absolute Rent')], max_length=20)),
+                ('value', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('scope', models.CharField(choices=[('all', 'All Units'), ('unit_type', 'Unit Type'), ('property', 'Property')], default='all', max_length=20)),
+                ('effective_date', models.DateField()),
+                ('status', models.CharField(choices=[('scheduled', 'Scheduled'), ('applying', 'Applying'), ('applied', 'Applied'), ('cancelled', 'Cancelled'), ('rolled_back', 'Rolled Back'), ('failed', 'Failed')], default='scheduled', max_length=20)),
+                ('units_updated', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('applied_at', models.DateTimeField(blank=True, null=True)),
+                ('rolled_back_at', models.DateTimeField(blank=True, null=True)),
+                ('landlord', models.ForeignKey(limit_choices_to={'user_type': 'landlord'}, on_delete=django.db.models.deletion.CASCADE, related_name='rent_revisions', to=settings.AUTH_USER_MODEL)),
+                ('property', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rent_revisions', to='accounts.property')),
+                ('unit_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rent_revisions', to='accounts.unittype')),
+            ],
+            options={
+                'ordering': ['-effective_date', '-id'],
+            },
+        ),
+        migrations.CreateModel(
+            name='RentRevisionItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_rent', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_rent', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('old_rent_remaining', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_rent_remaining', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('revision', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='accounts.rentrevision')),
+                ('unit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rent_revision_items', to='accounts.unit')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='rentrevisionitem',
+            constraint=models.UniqueConstraint(fields=('revision', 'unit'), name='unique_revision_unit'),
+        ),
+        migrations.AddIndex(
+            model_name='rentrevision',
+            index=models.Index(fields=['status', 'effective_date'], name='accounts_re_status_a252a0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rentrevision',
+            index=models.Index(fields=['landlord', '-effective_date'], name='accounts_re_landlor_c5a8c9_idx'),
+        ),
+    ]
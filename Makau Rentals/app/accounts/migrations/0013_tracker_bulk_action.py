@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0012_rentrevision'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='propertyunittracker',
+            name='action',
+            field=models.CharField(choices=[('property_created', 'Property Created'), ('property_deleted', 'Property Deleted'), ('unit_created', 'Unit Created'), ('unit_deleted', 'Unit Deleted'), ('units_bulk_created', 'Units Bulk Created')], max_length=30),
+        ),
+    ]
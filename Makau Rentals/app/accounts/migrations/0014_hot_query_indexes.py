@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0013_tracker_bulk_action'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['property_obj', 'is_available'], name='unit_property_available_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unit',
+            index=models.Index(fields=['rent_due_date'], name='unit_rent_due_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:31
+
+import calendar
+from datetime import date, timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def _on_day(year, month, day):
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def backfill_due_dates(apps, schema_editor):
+    """Fill the new columns for existing profiles. Mirrors accounts.reminders.compute."""
+    TenantProfile = apps.get_model('accounts', 'TenantProfile')
+    today = timezone.now().date()
+    pending = []
+    profiles = TenantProfile.objects.select_related('tenant', 'current_unit').order_by('id')
+    for profile in profiles.iterator(chunk_size=2000):
+        unit = profile.current_unit
+        due = None
+        if unit and unit.rent_due_date:
+            due = unit.rent_due_date
+        elif unit and profile.move_in_date:
+            due = _on_day(today.year, today.month, profile.move_in_date.day)
+            if today > due:
+                year, month = (today.year, today.month + 1) if today.month < 12 else (today.year + 1, 1)
+                due = _on_day(year, month, profile.move_in_date.day)
+        if due is None:
+            continue
+        profile.next_due_date = due
+        if profile.tenant.reminder_mode == 'days_before':
+            profile.next_reminder_date = due - timedelta(days=profile.tenant.reminder_value)
+        pending.append(profile)
+        if len(pending) >= 2000:
+            TenantProfile.objects.bulk_update(pending, ['next_due_date', 'next_reminder_date'])
+            pending = []
+    if pending:
+        TenantProfile.objects.bulk_update(pending, ['next_due_date', 'next_reminder_date'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0014_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tenantprofile',
+            name='next_due_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tenantprofile',
+            name='next_reminder_date',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tenantprofile',
+            index=models.Index(fields=['next_reminder_date'], name='profile_next_reminder_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenantprofile',
+            index=models.Index(fields=['next_due_date'], name='profile_next_due_idx'),
+        ),
+        migrations.RunPython(backfill_due_dates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_tenant_next_due_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedTenant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tenant_id', models.IntegerField(db_index=True)),
+                ('email', models.EmailField(max_length=254)),
+                ('full_name', models.CharField(max_length=255)),
+                ('phone_number', models.CharField(blank=True, max_length=30, null=True)),
+                ('reason', models.CharField(choices=[('unpaid_deposit', 'Deposit not paid in time'), ('left', 'Left the unit')], max_length=20)),
+                ('landlord_id', models.IntegerField(blank=True, null=True)),
+                ('unit_id', models.IntegerField(blank=True, null=True)),
+                ('unit_code', models.CharField(blank=True, max_length=50)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['landlord_id', '-archived_at'], name='archived_tenant_landlord_idx')],
+            },
+        ),
+    ]
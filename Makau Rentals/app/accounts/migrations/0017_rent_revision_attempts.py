@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 00:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0016_archived_tenants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rentrevision',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+    ]
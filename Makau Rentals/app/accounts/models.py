@@ -4,9 +4,13 @@ from django.utils import timezone
 from datetime import timedelta
 from django.core.exceptions import ValidationError
 import uuid
+from decimal import Decimal
+from django.db.models import F
 from django.db.models.signals import post_save, m2m_changed
 from django.dispatch import receiver
 
+from app.dirty_fields import DirtyFieldsMixin
+
 
 class CustomUserManager(BaseUserManager):
     # ensure the email is normalized and user_type (legacy) or group is provided
@@ -103,6 +107,9 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         default='days_before'
     )
     reminder_value = models.IntegerField(default=10)
+    # Bumped whenever the user's Groups change; JWT role claims carry the
+    # version they were issued for so stale claims are ignored.
+    roles_version = models.PositiveIntegerField(default=0)
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['full_name']
@@ -118,24 +125,50 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         return f"{self.full_name} ({self.email})"
     
     # ===== Role helpers (Groups-first, legacy field as fallback) =====
+    @property
+    def role_names(self) -> frozenset:
+        """
+        Names of the user's Groups, loaded once per instance.
+        Uses prefetched groups or a JWT role claim when available.
+        """
+        roles = getattr(self, '_role_names', None)
+        if roles is None:
+            prefetched = getattr(self, '_prefetched_objects_cache', {}).get('groups')
+            if prefetched is not None:
+                roles = frozenset(group.name for group in prefetched)
+            elif self.pk is None:
+                roles = frozenset()
+            else:
+                roles = frozenset(self.groups.values_list('name', flat=True))
+            self._role_names = roles
+        return roles
+
+    def set_cached_roles(self, roles):
+        """Prime the role memo (e.g. from a verified JWT claim)."""
+        self._role_names = frozenset(roles)
+
+    def invalidate_role_cache(self):
+        self._role_names = None
+
     @property
     def is_landlord(self) -> bool:
         try:
-            return self.groups.filter(name='landlord').exists()
+            return 'landlord' in self.role_names
         except Exception:
             return getattr(self, 'user_type', None) == 'landlord'
 
     @property
     def is_tenant(self) -> bool:
         try:
-            return self.groups.filter(name='tenant').exists()
+            return 'tenant' in self.role_names
         except Exception:
             return getattr(self, 'user_type', None) == 'tenant'
 
     def sync_user_type_from_groups(self, save: bool = True):
         """Keep legacy user_type in sync with current Groups for compatibility."""
-        new_type = 'landlord' if self.groups.filter(name='landlord').exists() else (
-            'tenant' if self.groups.filter(name='tenant').exists() else None
+        roles = self.role_names
+        new_type = 'landlord' if 'landlord' in roles else (
+            'tenant' if 'tenant' in roles else None
         )
         if new_type and self.user_type != new_type:
             self.user_type = new_type
@@ -144,14 +177,17 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
     def sync_groups_from_user_type(self):
         """Ensure Groups reflect the legacy user_type value."""
-        landlord_group, _ = Group.objects.get_or_create(name='landlord')
-        tenant_group, _ = Group.objects.get_or_create(name='tenant')
-        if self.user_type == 'landlord':
-            self.groups.add(landlord_group)
-            self.groups.remove(tenant_group)
-        elif self.user_type == 'tenant':
-            self.groups.add(tenant_group)
-            self.groups.remove(landlord_group)
+        if self.user_type not in ('landlord', 'tenant'):
+            return
+        other_type = 'tenant' if self.user_type == 'landlord' else 'landlord'
+        roles = self.role_names
+        # Only touch the m2m table when something actually changes
+        if self.user_type not in roles:
+            group, _ = Group.objects.get_or_create(name=self.user_type)
+            self.groups.add(group)
+        if other_type in roles:
+            group, _ = Group.objects.get_or_create(name=other_type)
+            self.groups.remove(group)
 
     @property
     def my_tenants(self):
@@ -189,7 +225,7 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         return None
 
 
-class Subscription(models.Model):
+class Subscription(DirtyFieldsMixin, models.Model):
     PLAN_CHOICES = [
         ("free", "Free (30-day trial)"),
         ("starter", "Tier 1 (1-10 units)"),
@@ -254,7 +290,7 @@ class UnitType(models.Model):
         ordering = ['-created_at']  # Newest first
 
 
-class Unit(models.Model):
+class Unit(DirtyFieldsMixin, models.Model):
     property_obj = models.ForeignKey(
         Property,
         on_delete=models.CASCADE,
@@ -283,6 +319,17 @@ class Unit(models.Model):
     assigned_date = models.DateTimeField(null=True, blank=True)
     left_date = models.DateTimeField(null=True, blank=True)
 
+    # Fields the dashboard stats are derived from (see accounts/stats.py)
+    STATS_FIELDS = ('is_available', 'tenant_id', 'rent_paid', 'rent_remaining')
+
+    class Meta:
+        # Vacancy listings per property and the daily due-rent scans
+        # (plans checked by payments/tests_query_plans.py)
+        indexes = [
+            models.Index(fields=['property_obj', 'is_available'], name='unit_property_available_idx'),
+            models.Index(fields=['rent_due_date'], name='unit_rent_due_idx'),
+        ]
+
     @property
     def balance(self):
         return self.rent_remaining - self.rent_paid
@@ -295,15 +342,28 @@ class Unit(models.Model):
                 raise ValidationError("The number of units for this property has reached the limit.")
 
     def save(self, *args, **kwargs):
-        # Calculate rent_remaining as rent - rent_paid
-        self.rent_remaining = self.rent - self.rent_paid
+        if all(self.is_loaded(f) for f in ('rent', 'rent_paid', 'rent_remaining')):
+            # rent_remaining also carries billed arrears (payments/billing.py),
+            # so move it by the change in rent and rent_paid
+            self.rent_remaining = (
+                self.loaded_value('rent_remaining')
+                + (self.rent - self.loaded_value('rent'))
+                - (self.rent_paid - self.loaded_value('rent_paid'))
+            )
+        else:
+            # Calculate rent_remaining as rent - rent_paid
+            self.rent_remaining = self.rent - self.rent_paid
 
         if self.pk:  # existing unit
-            old_unit = Unit.objects.get(pk=self.pk)
-            if old_unit.tenant != self.tenant:
-                if self.tenant and not self.assigned_date:
+            if self.is_loaded('tenant_id'):
+                old_tenant_id = self.loaded_value('tenant_id')
+            else:
+                # Built by hand rather than loaded: ask the database
+                old_tenant_id = Unit.objects.filter(pk=self.pk).values_list('tenant_id', flat=True).first()
+            if old_tenant_id != self.tenant_id:
+                if self.tenant_id and not self.assigned_date:
                     self.assigned_date = timezone.now()
-                elif not self.tenant and old_unit.tenant:
+                elif not self.tenant_id and old_tenant_id:
                     self.left_date = timezone.now()
         else:  # new unit
             if self.tenant:
@@ -315,7 +375,7 @@ class Unit(models.Model):
 
 
 # In models.py - Update the TenantProfile model
-class TenantProfile(models.Model):
+class TenantProfile(DirtyFieldsMixin, models.Model):
     """ENHANCED: Separate profile for tenant-specific data"""
     tenant = models.OneToOneField(
         CustomUser,
@@ -343,9 +403,16 @@ class TenantProfile(models.Model):
     lease_end_date = models.DateTimeField(null=True, blank=True)
     emergency_contact_name = models.CharField(max_length=255, blank=True, null=True)
     emergency_contact_phone = models.CharField(max_length=15, blank=True, null=True)
+    # Maintained by accounts/reminders.py so reminder targeting is a query
+    next_due_date = models.DateField(null=True, blank=True, editable=False)
+    next_reminder_date = models.DateField(null=True, blank=True, editable=False)
     
     class Meta:
         unique_together = ['tenant', 'landlord']  # Prevent duplicate relationships
+        indexes = [
+            models.Index(fields=['next_reminder_date'], name='profile_next_reminder_idx'),
+            models.Index(fields=['next_due_date'], name='profile_next_due_idx'),
+        ]
     
     def __str__(self):
         return f"Profile - {self.tenant.full_name} (Landlord: {self.landlord.full_name})"
@@ -380,10 +447,25 @@ def sync_groups_after_user_save(sender, instance: CustomUser, created, **kwargs)
             pass
 
 @receiver(m2m_changed, sender=CustomUser.groups.through)
-def sync_user_type_after_group_change(sender, instance: CustomUser, action, **kwargs):
-    if action in {'post_add', 'post_remove', 'post_clear'}:
+def sync_user_type_after_group_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in {'post_add', 'post_remove', 'post_clear'}:
+        return
+    if reverse:
+        # group.user_set.add(...) etc. - instance is the Group
+        user_ids = pk_set or []
+        users = []
+    else:
+        user_ids = [instance.pk]
+        users = [instance]
+    if action != 'post_clear' and not pk_set:
+        return
+    # Retire memoized roles and any JWT role claims issued before this change
+    CustomUser.objects.filter(pk__in=user_ids).update(roles_version=F('roles_version') + 1)
+    for user in users:
+        user.roles_version += 1
+        user.invalidate_role_cache()
         try:
-            instance.sync_user_type_from_groups(save=True)
+            user.sync_user_type_from_groups(save=True)
         except Exception:
             pass
 
@@ -518,6 +600,7 @@ class PropertyUnitTracker(models.Model):
         ('property_deleted', 'Property Deleted'),
         ('unit_created', 'Unit Created'),
         ('unit_deleted', 'Unit Deleted'),
+        ('units_bulk_created', 'Units Bulk Created'),
     ]
     
     landlord = models.ForeignKey(
@@ -573,6 +656,7 @@ class PropertyUnitTracker(models.Model):
             models.Index(fields=['landlord', 'action']),
             models.Index(fields=['landlord', 'created_at']),
             models.Index(fields=['limit_reached']),
+            models.Index(fields=['landlord', '-created_at', '-id'], name='tracker_landlord_cursor_idx'),
         ]
     
     def __str__(self):
@@ -613,4 +697,168 @@ class PropertyUnitTracker(models.Model):
             subscription_plan=plan,
             total_properties_after=total_properties,
             total_units_after=total_units
-        )
\ No newline at end of file
+        )
+
+# ===== Landlord Dashboard Stats =====
+class LandlordStats(models.Model):
+    """
+    Per-landlord dashboard counters. Kept up to date incrementally from
+    Property/Unit/Payment changes (see accounts/stats.py) and rebuilt from
+    scratch by `python manage.py reconcile_landlord_stats`.
+    """
+    landlord = models.OneToOneField(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='dashboard_stats'
+    )
+    total_properties = models.IntegerField(default=0)
+    total_units = models.IntegerField(default=0)
+    occupied_units = models.IntegerField(default=0)
+    vacant_units = models.IntegerField(default=0)
+    active_tenants = models.IntegerField(default=0)
+
+    # Completed rent payments created in `revenue_month`
+    revenue_month = models.DateField(null=True, blank=True, help_text="First day of the month month_revenue covers")
+    month_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    # Sums of Unit.rent_paid / Unit.rent_remaining
+    rent_collected = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    rent_outstanding = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+    reconciled_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Landlord stats"
+
+    def __str__(self):
+        return f"Stats for {self.landlord.email}"
+
+    def month_to_date_revenue(self, month_start):
+        """Revenue for the month starting at `month_start` (0 once the month rolls over)"""
+        if self.revenue_month != month_start:
+            return Decimal('0')
+        return self.month_revenue
+
+
+# ===== Scheduled Rent Revisions =====
+class RentRevision(models.Model):
+    """
+    A rent change queued by a landlord for a future effective date. Due
+    revisions are applied off-peak in chunked, set-based batches by
+    app.tasks.apply_due_rent_revisions_task (see accounts/rent_engine.py);
+    every unit changed is recorded as a RentRevisionItem for audit/rollback.
+    """
+    ADJUSTMENT_CHOICES = [
+        ('percentage', 'Percentage'),
+        ('fixed', 'Fixed Amount'),
+        ('absolute', 'Absolute Rent'),
+    ]
+    SCOPE_CHOICES = [
+        ('all', 'All Units'),
+        ('unit_type', 'Unit Type'),
+        ('property', 'Property'),
+    ]
+    STATUS_CHOICES = [
+        ('scheduled', 'Scheduled'),
+        ('applying', 'Applying'),
+        ('applied', 'Applied'),
+        ('cancelled', 'Cancelled'),
+        ('rolled_back', 'Rolled Back'),
+        ('failed', 'Failed'),
+    ]
+
+    landlord = models.ForeignKey(
+        CustomUser,
+        on_delete=models.CASCADE,
+        related_name='rent_revisions',
+        limit_choices_to={'user_type': 'landlord'}
+    )
+    adjustment_type = models.CharField(max_length=20, choices=ADJUSTMENT_CHOICES)
+    # Percent or amount (may be negative) for percentage/fixed; the new rent for absolute
+    value = models.DecimalField(max_digits=10, decimal_places=2)
+
+    scope = models.CharField(max_length=20, choices=SCOPE_CHOICES, default='all')
+    unit_type = models.ForeignKey(UnitType, on_delete=models.CASCADE, null=True, blank=True, related_name='rent_revisions')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, null=True, blank=True, related_name='rent_revisions')
+
+    effective_date = models.DateField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
+
+    units_updated = models.IntegerField(default=0)
+    # Failed runs; the revision stays 'applying' until RENT_REVISION_MAX_ATTEMPTS
+    attempts = models.IntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    applied_at = models.DateTimeField(null=True, blank=True)
+    rolled_back_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-effective_date', '-id']
+        indexes = [
+            models.Index(fields=['status', 'effective_date']),
+            models.Index(fields=['landlord', '-effective_date']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_adjustment_type_display()} {self.value} for {self.landlord.email} on {self.effective_date}"
+
+    def units_in_scope(self):
+        units = Unit.objects.filter(property_obj__landlord_id=self.landlord_id)
+        if self.scope == 'unit_type':
+            units = units.filter(unit_type_id=self.unit_type_id)
+        elif self.scope == 'property':
+            units = units.filter(property_obj_id=self.property_id)
+        return units
+
+
+class RentRevisionItem(models.Model):
+    """Audit row for one unit changed by a RentRevision"""
+    revision = models.ForeignKey(RentRevision, on_delete=models.CASCADE, related_name='items')
+    unit = models.ForeignKey(Unit, on_delete=models.SET_NULL, null=True, blank=True, related_name='rent_revision_items')
+    old_rent = models.DecimalField(max_digits=10, decimal_places=2)
+    new_rent = models.DecimalField(max_digits=10, decimal_places=2)
+    old_rent_remaining = models.DecimalField(max_digits=10, decimal_places=2)
+    new_rent_remaining = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['revision', 'unit'], name='unique_revision_unit'),
+        ]
+
+    def __str__(self):
+        return f"Revision {self.revision_id}: unit {self.unit_id} {self.old_rent} -> {self.new_rent}"
+
+
+class ArchivedTenant(models.Model):
+    """
+    Copy of a tenant account taken by the retention engine just before it
+    purged the account (see accounts/retention.py). Plain ids rather than
+    foreign keys, so the archive outlives the rows it describes.
+    """
+    REASON_CHOICES = [
+        ('unpaid_deposit', 'Deposit not paid in time'),
+        ('left', 'Left the unit'),
+    ]
+
+    tenant_id = models.IntegerField(db_index=True)
+    email = models.EmailField()
+    full_name = models.CharField(max_length=255)
+    phone_number = models.CharField(max_length=30, blank=True, null=True)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    landlord_id = models.IntegerField(null=True, blank=True)
+    unit_id = models.IntegerField(null=True, blank=True)
+    unit_code = models.CharField(max_length=50, blank=True)
+    # Account and tenancy dates at the time of the purge
+    data = models.JSONField(default=dict, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['landlord_id', '-archived_at'], name='archived_tenant_landlord_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.full_name} <{self.email}> ({self.reason})"
@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from django.core.cache import cache
+from .cache_utils import user_cache_key
 from .models import CustomUser, Subscription
 # REMOVE the problematic Payment import - it causes circular dependency
 
@@ -26,7 +27,7 @@ class HasActiveSubscription(permissions.BasePermission):
         
         # For landlords, check their own subscription
         if getattr(request.user, 'is_landlord', False):
-            cache_key = f"subscription_status:{request.user.id}"
+            cache_key = user_cache_key(request.user.id, "subscription_status")
             has_active_sub = cache.get(cache_key)
             
             if has_active_sub is None:
@@ -46,7 +47,7 @@ class HasActiveSubscription(permissions.BasePermission):
                 tenant_profile = request.user.tenant_profile
                 if tenant_profile and tenant_profile.landlord:
                     landlord = tenant_profile.landlord
-                    cache_key = f"subscription_status:{landlord.id}"
+                    cache_key = user_cache_key(landlord.id, "subscription_status")
                     has_active_sub = cache.get(cache_key)
                     
                     if has_active_sub is None:
@@ -0,0 +1,287 @@
+# accounts/provisioning.py
+"""
+Bulk unit provisioning.
+
+A whole building is described as number ranges, a floor layout or an
+uploaded CSV and expanded into unit specs in memory. The batch is then
+validated once (duplicates, unit types, plan limit) and written with a
+single bulk_create plus one summarizing PropertyUnitTracker event, so the
+number of queries does not depend on the number of units.
+
+bulk_create() skips Unit.save() and the model signals, so rent_remaining is
+filled in here and the landlord's stats/cache generation are maintained
+explicitly, as in accounts/rent_engine.py.
+"""
+import csv
+import io
+import json
+import uuid
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Q
+
+from .cache_utils import bump_landlord_generation
+from .models import Property, PropertyUnitTracker, Unit, UnitType
+from .stats import apply_delta
+
+MAX_BATCH_SIZE = 1000
+UNIT_NUMBER_MAX_LENGTH = Unit._meta.get_field('unit_number').max_length
+SPEC_FIELDS = ('unit_type', 'rent', 'deposit', 'floor', 'bedrooms', 'bathrooms')
+CSV_COLUMNS = ('unit_number',) + SPEC_FIELDS
+
+
+class ProvisioningError(ValueError):
+    """The batch was rejected; `errors` lists every problem found"""
+
+    def __init__(self, errors, limit=None):
+        self.errors = errors if isinstance(errors, list) else [errors]
+        self.limit = limit
+        super().__init__('; '.join(self.errors))
+
+
+# ---------------------------------------------------------------------------
+# Input formats -> unit specs
+# ---------------------------------------------------------------------------
+def _common(source, defaults):
+    spec = {field: defaults.get(field) for field in SPEC_FIELDS}
+    spec.update({field: source[field] for field in SPEC_FIELDS if source.get(field) not in (None, '')})
+    return spec
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ProvisioningError(f"{name} must be a whole number")
+
+
+def decode_structured(value, name):
+    """
+    `ranges`/`layout` as sent: already parsed from a JSON body, or a JSON
+    string from a multipart/form field.
+    """
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            raise ProvisioningError(f"{name} must be valid JSON")
+    return value
+
+
+def expand_ranges(ranges, defaults=None):
+    """
+    [{"start": 1, "end": 20, "prefix": "A", "padding": 2, ...}] -> A01..A20.
+    Any of SPEC_FIELDS on a range applies to every unit in it.
+    """
+    defaults = defaults or {}
+    if not isinstance(ranges, list) or not all(isinstance(item, dict) for item in ranges):
+        raise ProvisioningError("ranges must be a list of objects")
+    specs = []
+    for item in ranges:
+        start = _int(item.get('start'), 'start')
+        end = _int(item.get('end'), 'end')
+        if end < start:
+            raise ProvisioningError(f"Range {start}-{end} is empty")
+        if end - start + 1 > MAX_BATCH_SIZE:
+            raise ProvisioningError(f"At most {MAX_BATCH_SIZE} units can be created at once")
+        prefix = str(item.get('prefix') or '')
+        padding = _int(item.get('padding') or 0, 'padding')
+        common = _common(item, defaults)
+        for number in range(start, end + 1):
+            specs.append({**common, 'unit_number': f"{prefix}{str(number).zfill(padding)}"})
+    return specs
+
+
+def expand_floor_layout(layout, defaults=None):
+    """
+    {"floor_from": 1, "floor_to": 10, "units_per_floor": 30, "prefix": "B"}
+    -> B101..B130, B201..B230, ... with each unit's floor set.
+    """
+    defaults = defaults or {}
+    if not isinstance(layout, dict):
+        raise ProvisioningError("layout must be an object")
+    floor_from = _int(layout.get('floor_from', 1), 'floor_from')
+    floor_to = _int(layout.get('floor_to', floor_from), 'floor_to')
+    per_floor = _int(layout.get('units_per_floor'), 'units_per_floor')
+    if floor_to < floor_from or per_floor <= 0:
+        raise ProvisioningError("The floor layout does not describe any units")
+    if (floor_to - floor_from + 1) * per_floor > MAX_BATCH_SIZE:
+        raise ProvisioningError(f"At most {MAX_BATCH_SIZE} units can be created at once")
+    prefix = str(layout.get('prefix') or '')
+    width = max(2, len(str(per_floor)))
+    common = _common(layout, defaults)
+    return [
+        {**common, 'floor': floor, 'unit_number': f"{prefix}{floor}{str(index).zfill(width)}"}
+        for floor in range(floor_from, floor_to + 1)
+        for index in range(1, per_floor + 1)
+    ]
+
+
+def read_csv(upload, defaults=None):
+    """One unit per row; columns are CSV_COLUMNS (only unit_number is required)"""
+    defaults = defaults or {}
+    raw = upload.read()
+    text = raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw
+    reader = csv.DictReader(io.StringIO(text))
+    if not reader.fieldnames or 'unit_number' not in [name.strip() for name in reader.fieldnames]:
+        raise ProvisioningError("The CSV needs a unit_number column")
+    specs = []
+    for row in reader:
+        row = {(key or '').strip(): (value or '').strip() for key, value in row.items()}
+        if not any(row.values()):
+            continue
+        specs.append({**_common(row, defaults), 'unit_number': row.get('unit_number', '')})
+        if len(specs) > MAX_BATCH_SIZE:
+            raise ProvisioningError(f"At most {MAX_BATCH_SIZE} units can be created at once")
+    return specs
+
+
+# ---------------------------------------------------------------------------
+# Validation / creation
+# ---------------------------------------------------------------------------
+def _decimal(value, name, unit_number):
+    try:
+        value = Decimal(str(value))
+    except InvalidOperation:
+        raise ProvisioningError(f"Unit {unit_number}: {name} must be a number")
+    if value < 0:
+        raise ProvisioningError(f"Unit {unit_number}: {name} cannot be negative")
+    return value
+
+
+def _resolve_unit_types(landlord, specs):
+    """Map every unit_type reference (id or name) to the landlord's UnitType, in one query"""
+    refs = {str(spec['unit_type']) for spec in specs if spec.get('unit_type') not in (None, '')}
+    if not refs:
+        return {}
+    ids = [int(ref) for ref in refs if ref.isdigit()]
+    unit_types = UnitType.objects.filter(landlord=landlord).filter(Q(id__in=ids) | Q(name__in=refs))
+    by_ref = {}
+    for unit_type in unit_types:
+        by_ref[str(unit_type.id)] = unit_type
+        by_ref[unit_type.name] = unit_type
+    missing = sorted(refs - set(by_ref))
+    if missing:
+        raise ProvisioningError([f"Unit type {ref} not found or not owned by you" for ref in missing])
+    return by_ref
+
+
+def build_units(landlord, property_obj, specs):
+    """Validate the batch and return unsaved Unit objects"""
+    if not specs:
+        raise ProvisioningError("No units to create")
+    if len(specs) > MAX_BATCH_SIZE:
+        raise ProvisioningError(f"At most {MAX_BATCH_SIZE} units can be created at once")
+
+    errors = []
+    seen = set()
+    for spec in specs:
+        number = str(spec.get('unit_number') or '').strip()
+        spec['unit_number'] = number
+        if not number:
+            errors.append("Every unit needs a unit number")
+        elif len(number) > UNIT_NUMBER_MAX_LENGTH:
+            errors.append(f"Unit number {number} is longer than {UNIT_NUMBER_MAX_LENGTH} characters")
+        elif number in seen:
+            errors.append(f"Unit number {number} appears more than once")
+        seen.add(number)
+
+    existing = set(Unit.objects.filter(property_obj=property_obj).values_list('unit_number', flat=True))
+    errors.extend(
+        f"Unit number {number} already exists in this property" for number in sorted(seen & existing)
+    )
+    if errors:
+        raise ProvisioningError(errors)
+
+    unit_types = _resolve_unit_types(landlord, specs)
+    units = []
+    for spec in specs:
+        number = spec['unit_number']
+        unit_type = unit_types.get(str(spec['unit_type'])) if spec.get('unit_type') not in (None, '') else None
+        rent = spec.get('rent')
+        rent = _decimal(rent, 'rent', number) if rent not in (None, '') else (unit_type.rent if unit_type else Decimal('0'))
+        deposit = spec.get('deposit')
+        deposit = _decimal(deposit, 'deposit', number) if deposit not in (None, '') else Decimal('0')
+        if not deposit:
+            # Deposit defaults to the unit type's deposit, then to one month's rent
+            deposit = unit_type.deposit if unit_type and unit_type.deposit else rent
+        units.append(Unit(
+            property_obj=property_obj,
+            unit_code=f"U-{property_obj.id}-{number}-{uuid.uuid4().hex[:8]}",
+            unit_number=number,
+            unit_type=unit_type,
+            floor=_int(spec['floor'], 'floor') if spec.get('floor') not in (None, '') else 0,
+            bedrooms=_int(spec['bedrooms'], 'bedrooms') if spec.get('bedrooms') not in (None, '') else 0,
+            bathrooms=_int(spec['bathrooms'], 'bathrooms') if spec.get('bathrooms') not in (None, '') else 1,
+            rent=rent,
+            rent_remaining=rent,
+            deposit=deposit,
+            is_available=True,
+        ))
+    return units
+
+
+def check_batch_limit(landlord, count):
+    """
+    Plan-limit check for `count` new units at once. Free trials may go over
+    (their tier changes when the trial ends), like single-unit creation.
+    """
+    from accounts.subscription_utils import check_subscription_limits
+
+    limit_check = check_subscription_limits(landlord, action_type='unit')
+    subscription = getattr(landlord, 'subscription', None)
+    is_free_trial = bool(subscription and subscription.plan == 'free')
+    limit = limit_check['limit']
+    total_after = limit_check['current_count'] + count
+
+    if not limit_check['can_create']:
+        raise ProvisioningError(limit_check['message'], limit=limit_check)
+    if limit and total_after > limit:
+        if not is_free_trial:
+            limit_check['message'] = (
+                f"Creating {count} units would take you to {total_after}, over your plan limit of {limit} units. "
+                f"Please upgrade your subscription."
+            )
+            raise ProvisioningError(limit_check['message'], limit=limit_check)
+        limit_check['tier_change_warning'] = True
+    limit_check['total_after'] = total_after
+    return limit_check
+
+
+def provision_units(landlord, property_obj, specs, apply=True):
+    """
+    Validate and create a batch of units. Returns a dict with the units,
+    the limit check and (when applied) the tracker event.
+    """
+    units = build_units(landlord, property_obj, specs)
+    limit_check = check_batch_limit(landlord, len(units))
+    result = {'units': units, 'limit_check': limit_check, 'tracker': None}
+    if not apply:
+        return result
+
+    limit = limit_check['limit']
+    total_after = limit_check['total_after']
+    subscription = getattr(landlord, 'subscription', None)
+    with transaction.atomic():
+        units = Unit.objects.bulk_create(units)
+        result['units'] = units
+        result['tracker'] = PropertyUnitTracker.objects.create(
+            landlord=landlord,
+            action='units_bulk_created',
+            property=property_obj,
+            subscription_plan=subscription.plan if subscription else 'unknown',
+            total_properties_after=Property.objects.filter(landlord=landlord).count(),
+            total_units_after=total_after,
+            limit_reached=bool(limit and total_after >= limit),
+            notes=f"Provisioned {len(units)} units in {property_obj.name}: "
+                  f"{units[0].unit_number} to {units[-1].unit_number}",
+        )
+        rent_total = sum((unit.rent for unit in units), Decimal('0'))
+        apply_delta(landlord.id, {
+            'total_units': len(units),
+            'vacant_units': len(units),
+            'rent_outstanding': rent_total,
+        })
+        transaction.on_commit(lambda: bump_landlord_generation(landlord.id))
+    return result
@@ -0,0 +1,134 @@
+# accounts/reminders.py
+"""
+Materialized rent due dates for deadline reminders.
+
+Each TenantProfile carries
+
+  - next_due_date: the unit's rent_due_date when the landlord set one,
+    otherwise the next monthly anniversary of the move-in date (clamped to
+    the month's last day, e.g. the 31st falls on Feb 28/29);
+  - next_reminder_date: next_due_date minus the tenant's reminder_value,
+    for tenants whose reminder_mode is 'days_before'.
+
+They are refreshed by signals when the profile, its unit's rent_due_date or
+the tenant's reminder preferences change (see accounts/signals.py), and
+roll_due_dates() moves move-in based dates that have passed on to the next
+month every night. Rent payments only change the unit's balance, which the
+reminder queries read live.
+
+With the dates stored, picking who to remind today is one indexed query per
+reminder mode (reminder_recipients()) instead of a pass over every tenant.
+"""
+import calendar
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import TenantProfile
+
+DUE_DATE_FIELDS = ['next_due_date', 'next_reminder_date']
+
+# fixed_day reminders only go out for rent due within this many days
+FIXED_DAY_WINDOW_DAYS = 30
+
+
+def _on_day(year, month, day):
+    return date(year, month, min(day, calendar.monthrange(year, month)[1]))
+
+
+def due_date_for(rent_due_date, move_in_date, today):
+    """The rent due date reminders are based on, or None when there is none"""
+    if rent_due_date:
+        return rent_due_date
+    if not move_in_date:
+        return None
+    due = _on_day(today.year, today.month, move_in_date.day)
+    if today > due:
+        year, month = (today.year, today.month + 1) if today.month < 12 else (today.year + 1, 1)
+        due = _on_day(year, month, move_in_date.day)
+    return due
+
+
+def reminder_date_for(due_date, tenant):
+    if due_date is None or tenant.reminder_mode != 'days_before':
+        return None
+    return due_date - timedelta(days=tenant.reminder_value)
+
+
+def compute(profile, today=None):
+    """Set the profile's materialized dates in memory. Returns True if they changed."""
+    today = today or timezone.now().date()
+    unit = profile.current_unit
+    due = due_date_for(unit.rent_due_date, profile.move_in_date, today) if unit else None
+    reminder = reminder_date_for(due, profile.tenant)
+    changed = (profile.next_due_date, profile.next_reminder_date) != (due, reminder)
+    profile.next_due_date, profile.next_reminder_date = due, reminder
+    return changed
+
+
+def refresh(profiles, today=None, chunk_size=None):
+    """
+    Recompute the dates of `profiles` (a TenantProfile queryset) and write the
+    ones that changed with bulk_update, a chunk at a time. Returns the number
+    of profiles updated.
+    """
+    today = today or timezone.now().date()
+    chunk_size = chunk_size or getattr(settings, 'DUE_DATE_CHUNK_SIZE', 2000)
+    profiles = profiles.select_related('tenant', 'current_unit').only(
+        'id', 'move_in_date', 'next_due_date', 'next_reminder_date',
+        'tenant__reminder_mode', 'tenant__reminder_value', 'current_unit__rent_due_date',
+    ).order_by('id')
+    updated = 0
+    pending = []
+    for profile in profiles.iterator(chunk_size=chunk_size):
+        if compute(profile, today):
+            pending.append(profile)
+        if len(pending) >= chunk_size:
+            updated += TenantProfile.objects.bulk_update(pending, DUE_DATE_FIELDS)
+            pending = []
+    if pending:
+        updated += TenantProfile.objects.bulk_update(pending, DUE_DATE_FIELDS)
+    return updated
+
+
+def roll_due_dates(today=None):
+    """
+    Nightly: move move-in based due dates that have passed on to the next
+    month. Dates set by the landlord stay as they are.
+    """
+    today = today or timezone.now().date()
+    return refresh(
+        TenantProfile.objects.filter(
+            next_due_date__lt=today,
+            move_in_date__isnull=False,
+            current_unit__rent_due_date__isnull=True,
+        ),
+        today,
+    )
+
+
+def reminder_recipients(mode, today=None):
+    """
+    Profiles (with tenant and unit loaded) of active tenants with rent
+    outstanding who should get their `mode` deadline reminder today.
+    """
+    today = today or timezone.now().date()
+    if mode == 'days_before':
+        due = Q(next_reminder_date=today)
+    elif mode == 'fixed_day':
+        due = Q(
+            tenant__reminder_value=today.day,
+            next_due_date__gte=today,
+            next_due_date__lte=today + timedelta(days=FIXED_DAY_WINDOW_DAYS),
+        )
+    else:
+        raise ValueError(f"Unknown reminder mode {mode!r}")
+    return TenantProfile.objects.filter(
+        due,
+        tenant__reminder_mode=mode,
+        tenant__user_type='tenant',
+        tenant__is_active=True,
+        current_unit__rent_remaining__gt=0,
+    ).select_related('tenant', 'current_unit')
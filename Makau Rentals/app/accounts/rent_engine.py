@@ -0,0 +1,259 @@
+# accounts/rent_engine.py
+"""
+Set-based rent repricing.
+
+A repricing is computed and applied with a constant number of statements no
+matter how many units are in scope:
+
+  1. one SELECT returning every unit's current rent, its paid total (read
+     from the unit's rent ledger snapshot, see payments/ledger.py) and the
+     new rent;
+  2. one UPDATE that writes rent, rent_paid and rent_remaining as SQL
+     expressions for the units whose rent actually changes;
+  3. one UPDATE applying the summed change to the landlord's stats row.
+
+Everything runs in a single transaction. QuerySet.update() bypasses the
+model signals, so the landlord's stats and cache generation are maintained
+here rather than by accounts/signals.py.
+
+Scheduled RentRevisions are applied through the same engine in chunks of
+RENT_REVISION_CHUNK_SIZE units, one transaction per chunk, with a
+RentRevisionItem written for every changed unit. A run that dies part way
+resumes where it stopped: units already recorded for the revision are
+skipped. A run that raises leaves the revision 'applying' with the error
+recorded, so the next scheduled run retries it; after
+RENT_REVISION_MAX_ATTEMPTS failures it is marked 'failed'.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DecimalField, Exists, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Round
+
+from django.utils import timezone
+
+from .cache_utils import bump_landlord_generation
+from .models import RentRevision, RentRevisionItem, Unit
+from .stats import apply_delta, rebuild_landlord_stats
+
+UPDATE_TYPES = ('percentage', 'fixed', 'absolute')
+
+MONEY = DecimalField(max_digits=10, decimal_places=2)
+# Percentage factors need more precision than money (12.5% -> 1.125)
+FACTOR = DecimalField(max_digits=12, decimal_places=6)
+
+
+def new_rent_expression(update_type, amount, precision=0):
+    """
+    SQL expression for a unit's new rent, rounded to `precision` decimal
+    places (whole shillings by default) and never below zero.
+    `percentage` changes rent by `amount` percent, `fixed` adds `amount` and
+    `absolute` sets every rent to `amount`.
+    """
+    if update_type not in UPDATE_TYPES:
+        raise ValueError(f"Unknown update type: {update_type}")
+    try:
+        amount = Decimal(str(amount))
+    except InvalidOperation:
+        raise ValueError("Amount must be a valid number")
+
+    if update_type == 'percentage':
+        factor = Decimal('1') + amount / Decimal('100')
+        expression = F('rent') * Value(factor, output_field=FACTOR)
+    elif update_type == 'fixed':
+        expression = F('rent') + Value(amount, output_field=MONEY)
+    else:
+        expression = Value(amount, output_field=MONEY)
+    zero = Value(Decimal('0'), output_field=MONEY)
+    return Greatest(Round(expression, precision, output_field=MONEY), zero, output_field=MONEY)
+
+
+def paid_total_subquery():
+    """Completed rent payments per unit, read from its rent ledger snapshot"""
+    from payments.models import UnitBalance
+
+    paid = UnitBalance.objects.filter(unit=OuterRef('pk')).values('total_paid')[:1]
+    return Coalesce(Subquery(paid, output_field=MONEY), Value(Decimal('0'), output_field=MONEY))
+
+
+def reprice_units(units, update_type, amount, landlord_id=None, apply=True,
+                  precision=0, recompute_paid=True):
+    """
+    Reprice every unit in the `units` queryset.
+
+    Returns a dict with a row per unit in scope (old/new rent and the
+    change) and a summary. With apply=False nothing is written, which is
+    what the preview uses. Changed rows also carry the new
+    rent_paid/rent_remaining. rent_remaining moves by the rent change (and
+    by any ledger payments not yet on the unit) rather than being recomputed
+    as rent - rent_paid, so billed arrears are kept. With
+    recompute_paid=False rent_paid is kept as stored instead of being read
+    from the ledger.
+    """
+    new_rent = new_rent_expression(update_type, amount, precision)
+    paid = paid_total_subquery() if recompute_paid else F('rent_paid')
+    scoped = units.order_by().alias(repriced=new_rent)
+
+    with transaction.atomic():
+        # Hold the rows until the UPDATE so the changes returned are the ones written
+        locked = scoped.select_for_update(of=('self',)) if apply else scoped
+        rows = locked.annotate(
+            new_rent=new_rent,
+            paid_total=paid,
+            unit_type_name=F('unit_type__name'),
+        ).order_by('id').values(
+            'id', 'unit_number', 'unit_type_name', 'rent', 'rent_paid',
+            'rent_remaining', 'new_rent', 'paid_total',
+        )
+
+        units_data = []
+        changed = []
+        for row in rows:
+            change = {
+                'unit_id': row['id'],
+                'unit_number': row['unit_number'],
+                'unit_type': row['unit_type_name'] or 'N/A',
+                'old_rent': row['rent'],
+                'new_rent': row['new_rent'],
+                'increase': row['new_rent'] - row['rent'],
+            }
+            if change['increase']:
+                change['old_rent_remaining'] = row['rent_remaining']
+                change['rent_paid'] = row['paid_total']
+                change['rent_paid_delta'] = row['paid_total'] - row['rent_paid']
+                change['rent_remaining'] = (
+                    row['rent_remaining'] + change['increase'] - change['rent_paid_delta']
+                )
+                change['rent_remaining_delta'] = change['rent_remaining'] - row['rent_remaining']
+                changed.append(change)
+            units_data.append(change)
+
+        updated = 0
+        if apply and changed:
+            # rent_remaining first: MySQL evaluates SET left to right
+            updated = scoped.exclude(repriced=F('rent')).update(
+                rent_remaining=F('rent_remaining') + (new_rent - F('rent')) - (paid - F('rent_paid')),
+                rent=new_rent,
+                rent_paid=paid,
+            )
+            if landlord_id:
+                apply_delta(landlord_id, {
+                    'rent_collected': sum(c['rent_paid_delta'] for c in changed),
+                    'rent_outstanding': sum(c['rent_remaining_delta'] for c in changed),
+                })
+                transaction.on_commit(lambda: bump_landlord_generation(landlord_id))
+
+    return {
+        'units': units_data,
+        'changes': changed,
+        'summary': {
+            'units_affected': len(units_data),
+            'units_updated': updated,
+            'total_increase': sum((u['increase'] for u in units_data), Decimal('0')),
+            'total_new_revenue': sum((u['new_rent'] for u in units_data), Decimal('0')),
+        },
+    }
+
+
+# ---------------------------------------------------------------------------
+# Scheduled revisions
+# ---------------------------------------------------------------------------
+def apply_revision(revision, chunk_size=None):
+    """
+    Apply one revision in chunked batches. Returns the number of units
+    changed by this call (0 if another worker already finished it).
+    """
+    chunk_size = chunk_size or getattr(settings, 'RENT_REVISION_CHUNK_SIZE', 1000)
+    claimed = RentRevision.objects.filter(
+        pk=revision.pk, status__in=('scheduled', 'applying')
+    ).update(status='applying')
+    if not claimed:
+        return 0
+
+    pending = revision.units_in_scope().exclude(
+        Exists(RentRevisionItem.objects.filter(revision=revision, unit=OuterRef('pk')))
+    )
+    updated = 0
+    last_id = 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                pending.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+            )
+            if not ids:
+                break
+            last_id = ids[-1]
+            # Revisions keep rent_paid as stored, like the immediate adjustment
+            result = reprice_units(
+                Unit.objects.filter(id__in=ids), revision.adjustment_type, revision.value,
+                landlord_id=revision.landlord_id, precision=2, recompute_paid=False,
+            )
+            RentRevisionItem.objects.bulk_create([
+                RentRevisionItem(
+                    revision=revision,
+                    unit_id=change['unit_id'],
+                    old_rent=change['old_rent'],
+                    new_rent=change['new_rent'],
+                    old_rent_remaining=change['old_rent_remaining'],
+                    new_rent_remaining=change['rent_remaining'],
+                )
+                for change in result['changes']
+            ])
+            # Counted with the chunk, so a failed run keeps its tally
+            RentRevision.objects.filter(pk=revision.pk).update(
+                units_updated=F('units_updated') + result['summary']['units_updated']
+            )
+            updated += result['summary']['units_updated']
+
+    RentRevision.objects.filter(pk=revision.pk).update(status='applied', applied_at=timezone.now())
+    return updated
+
+
+def apply_due_revisions(today=None, chunk_size=None):
+    """Apply every scheduled revision whose effective date has arrived"""
+    today = today or timezone.localdate()
+    due = RentRevision.objects.filter(
+        status__in=('scheduled', 'applying'), effective_date__lte=today
+    ).order_by('effective_date', 'id')
+    max_attempts = getattr(settings, 'RENT_REVISION_MAX_ATTEMPTS', 5)
+    applied = 0
+    for revision in due:
+        try:
+            apply_revision(revision, chunk_size=chunk_size)
+            applied += 1
+        except Exception as e:
+            # Committed chunks stay applied; the next run picks up the rest
+            attempts = revision.attempts + 1
+            RentRevision.objects.filter(pk=revision.pk).update(
+                status='failed' if attempts >= max_attempts else 'applying',
+                attempts=attempts,
+                error=str(e),
+            )
+    return applied
+
+
+def rollback_revision(revision):
+    """
+    Restore the rents recorded for an applied revision. Units whose rent has
+    changed again since are left alone. Returns the number of units restored.
+    """
+    with transaction.atomic():
+        revision = RentRevision.objects.select_for_update().get(pk=revision.pk)
+        if revision.status != 'applied':
+            raise ValueError("Only applied revisions can be rolled back")
+
+        items = RentRevisionItem.objects.filter(revision=revision, unit=OuterRef('pk'))
+        old_rent = Subquery(items.values('old_rent')[:1], output_field=MONEY)
+        restorable = Unit.objects.filter(
+            Exists(items.filter(new_rent=OuterRef('rent')))
+        )
+        restored = restorable.update(rent_remaining=F('rent_remaining') + old_rent - F('rent'), rent=old_rent)
+        # Rollbacks are rare; recount rather than tracking per-unit deltas
+        rebuild_landlord_stats(revision.landlord_id)
+
+        revision.status = 'rolled_back'
+        revision.rolled_back_at = timezone.now()
+        revision.save(update_fields=['status', 'rolled_back_at'])
+        transaction.on_commit(lambda: bump_landlord_generation(revision.landlord_id))
+    return restored
@@ -0,0 +1,188 @@
+# accounts/retention.py
+"""
+Set-based tenant retention: find tenants due for purging, archive them and
+delete them in chunks.
+
+Policies (days from TENANT_RETENTION_* settings):
+
+  - unpaid_deposit: assigned to a unit at least 14 days ago with no completed
+    deposit payment made within 14 days of the assignment. Found with one
+    anti-join (NOT EXISTS on payments) over assigned units.
+  - left: still linked to a unit whose left_date is at least 7 days old.
+
+purge() collects each policy's candidates in one query. A dry run stops
+there and reports counts and ids. Otherwise the ids are processed
+TENANT_PURGE_CHUNK_SIZE at a time, each chunk in its own transaction:
+
+  1. the chunk is re-checked against the policy and the survivors' account
+     and tenancy are copied to ArchivedTenant (one SELECT, one INSERT);
+  2. their payments are kept for the landlord's books and detached, their
+     units released and their profiles removed, each with one statement;
+     the landlords' active_tenants counters are adjusted and their caches
+     invalidated once per landlord rather than per row;
+  3. the accounts are deleted with one QuerySet.delete(), whose remaining
+     cascades (reports, applications, tokens, ...) run as bulk statements.
+
+A crash loses at most the chunk in flight, which rolls back whole; running
+purge() again picks up the rest.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DateTimeField, Exists, ExpressionWrapper, OuterRef
+from django.utils import timezone
+
+from payments.models import Payment
+from .cache_utils import bump_landlord_generation
+from .models import ArchivedTenant, CustomUser, TenantProfile, Unit
+from .stats import apply_delta
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FIELDS = (
+    'tenant_id', 'tenant__email', 'tenant__full_name', 'tenant__phone_number', 'tenant__date_joined',
+    'tenant__last_login', 'id', 'unit_code', 'property_obj__landlord_id', 'assigned_date', 'left_date',
+)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def unpaid_deposit_units(now):
+    days = _setting('TENANT_RETENTION_UNPAID_DEPOSIT_DAYS', 14)
+    deposit_paid = Payment.objects.filter(
+        tenant_id=OuterRef('tenant_id'),
+        payment_type='deposit',
+        status='completed',
+        created_at__lte=ExpressionWrapper(
+            OuterRef('assigned_date') + timedelta(days=days), output_field=DateTimeField()
+        ),
+    )
+    return Unit.objects.filter(
+        tenant__isnull=False,
+        tenant__user_type='tenant',
+        assigned_date__lte=now - timedelta(days=days),
+    ).filter(~Exists(deposit_paid))
+
+
+def left_units(now):
+    days = _setting('TENANT_RETENTION_LEFT_DAYS', 7)
+    return Unit.objects.filter(
+        tenant__isnull=False,
+        tenant__user_type='tenant',
+        left_date__lte=now - timedelta(days=days),
+    )
+
+
+# policy -> units whose tenant is due for purging
+POLICIES = {
+    'unpaid_deposit': unpaid_deposit_units,
+    'left': left_units,
+}
+
+
+def candidates(policy, now=None):
+    """Ids of the tenants `policy` would purge, in id order"""
+    units = POLICIES[policy](now or timezone.now())
+    return list(units.order_by('tenant_id').values_list('tenant_id', flat=True))
+
+
+def _archive(snapshots, reason):
+    ArchivedTenant.objects.bulk_create([
+        ArchivedTenant(
+            tenant_id=row['tenant_id'],
+            email=row['tenant__email'],
+            full_name=row['tenant__full_name'],
+            phone_number=row['tenant__phone_number'],
+            reason=reason,
+            landlord_id=row['property_obj__landlord_id'],
+            unit_id=row['id'],
+            unit_code=row['unit_code'],
+            data={
+                name: value.isoformat() if value else None
+                for name, value in (
+                    ('date_joined', row['tenant__date_joined']),
+                    ('last_login', row['tenant__last_login']),
+                    ('assigned_date', row['assigned_date']),
+                    ('left_date', row['left_date']),
+                )
+            },
+        )
+        for row in snapshots
+    ])
+
+
+def purge_chunk(policy, tenant_ids, now):
+    """Archive and delete one chunk of candidates. Returns the number purged."""
+    with transaction.atomic():
+        # Re-check the policy: a deposit may have been paid since the scan
+        snapshots = list(
+            POLICIES[policy](now).filter(tenant_id__in=tenant_ids)
+            .select_for_update(of=('self',)).values(*SNAPSHOT_FIELDS)
+        )
+        if not snapshots:
+            return 0
+        ids = [row['tenant_id'] for row in snapshots]
+        _archive(snapshots, policy)
+
+        Payment.objects.filter(tenant_id__in=ids).update(tenant=None)
+        released = dict(
+            Unit.objects.filter(tenant_id__in=ids).values('property_obj__landlord_id')
+            .annotate(count=Count('id')).values_list('property_obj__landlord_id', 'count')
+        )
+        Unit.objects.filter(tenant_id__in=ids).update(tenant=None)
+        profile_landlords = set(
+            TenantProfile.objects.filter(tenant_id__in=ids).values_list('landlord_id', flat=True).distinct()
+        )
+        # Profiles have no dependents; skip the per-row delete signals
+        # (their only effect, the cache bump, is done per landlord below)
+        TenantProfile.objects.filter(tenant_id__in=ids)._raw_delete(TenantProfile.objects.db)
+        CustomUser.objects.filter(id__in=ids).delete()
+
+        for landlord_id, count in released.items():
+            apply_delta(landlord_id, {'active_tenants': -count})
+        landlords = set(released) | profile_landlords
+
+        def bump():
+            for landlord_id in landlords:
+                bump_landlord_generation(landlord_id)
+
+        transaction.on_commit(bump)
+    return len(ids)
+
+
+def purge(policies=None, dry_run=False, chunk_size=None, now=None):
+    """
+    Run the retention policies (all by default). Returns a report:
+    {'dry_run', 'seconds', 'per_second', 'purged',
+     'policies': {name: {'count', 'tenant_ids', 'purged'}}}.
+    """
+    now = now or timezone.now()
+    chunk_size = chunk_size or _setting('TENANT_PURGE_CHUNK_SIZE', 500)
+    started = time.perf_counter()
+    report = {'dry_run': dry_run, 'purged': 0, 'policies': {}}
+
+    seen = set()
+    for policy in policies or POLICIES:
+        # A tenant matching several policies is handled by the first
+        tenant_ids = [tenant_id for tenant_id in candidates(policy, now) if tenant_id not in seen]
+        seen.update(tenant_ids)
+        purged = 0
+        if not dry_run:
+            for start in range(0, len(tenant_ids), chunk_size):
+                purged += purge_chunk(policy, tenant_ids[start:start + chunk_size], now)
+        report['policies'][policy] = {'count': len(tenant_ids), 'tenant_ids': tenant_ids, 'purged': purged}
+        report['purged'] += purged
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['per_second'] = round(report['purged'] / report['seconds'], 1) if report['seconds'] else 0
+    logger.info(
+        f"Tenant retention{' (dry run)' if dry_run else ''}: "
+        + ', '.join(f"{name} {p['count']} candidates/{p['purged']} purged" for name, p in report['policies'].items())
+        + f" in {report['seconds']}s"
+    )
+    return report
@@ -1,6 +1,8 @@
-from .models import CustomUser, Property, Unit, UnitType, TenantProfile, TenantApplication
+from .models import CustomUser, Property, Unit, UnitType, TenantProfile, TenantApplication, RentRevision
 from rest_framework import serializers
 from django.db import transaction
+from django.utils import timezone
+from django.db.models import Case, CharField, Exists, F, OuterRef, Value, When
 
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
@@ -20,6 +22,16 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
     username_field = "email"
     user_type = serializers.CharField(required=False, allow_blank=True)
 
+    @classmethod
+    def get_token(cls, user):
+        """Carry the user's roles in the token (see accounts/authentication.py)"""
+        from .authentication import ROLES_CLAIM, ROLES_VERSION_CLAIM
+
+        token = super().get_token(user)
+        token[ROLES_CLAIM] = sorted(user.role_names)
+        token[ROLES_VERSION_CLAIM] = user.roles_version
+        return token
+
     def validate(self, attrs):
         import logging
         logger = logging.getLogger(__name__)
@@ -46,7 +58,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         # If user exists and is inactive tenant, return pending approval message
         # even if password is incorrect, to satisfy UX requirement
         if email_ci_user and not email_ci_user.is_active:
-            if email_ci_user.groups.filter(name='tenant').exists() or getattr(email_ci_user, 'user_type', None) == 'tenant':
+            if email_ci_user.is_tenant or getattr(email_ci_user, 'user_type', None) == 'tenant':
                 error_msg = "Your account is pending approval. Please await approval from your landlord or contact us for support."
                 raise_string_error(error_msg)
 
@@ -60,7 +72,7 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         if not user.is_active:
             logger.warning(f"Inactive user login attempt: {email}")
             # Check if user is a tenant (likely pending landlord approval)
-            if user.groups.filter(name='tenant').exists() or getattr(user, 'user_type', None) == 'tenant':
+            if user.is_tenant or getattr(user, 'user_type', None) == 'tenant':
                 error_msg = "Your account is pending approval. Please await approval from your landlord or contact us for support."
                 logger.info(f"Tenant {email} pending approval - blocking login")
                 raise_string_error(error_msg)
@@ -68,9 +80,9 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
                 raise_string_error("User account is disabled")
 
         # Determine the actual user type from Groups (fallback to legacy field)
-        if user.groups.filter(name='landlord').exists():
+        if user.is_landlord:
             actual_user_type = 'landlord'
-        elif user.groups.filter(name='tenant').exists():
+        elif user.is_tenant:
             actual_user_type = 'tenant'
         else:
             actual_user_type = getattr(user, 'user_type', None)
@@ -463,7 +475,13 @@ class AvailableUnitsSerializer(serializers.ModelSerializer):
         fields = ['landlord_id', 'property_id', 'property_name', 'unit_number']
 
 class TenantWithUnitSerializer(serializers.ModelSerializer):
-    """ENHANCED: Special serializer for tenant management with unit data"""
+    """
+    ENHANCED: Special serializer for tenant management with unit data.
+
+    Pass a queryset prepared with setup_eager_loading() to serialize any
+    number of tenants in a single query; plain querysets still work but cost
+    a few queries per tenant.
+    """
     current_unit = serializers.SerializerMethodField()
     unit_data = serializers.SerializerMethodField()
     rent_status = serializers.SerializerMethodField()
@@ -477,32 +495,62 @@ class TenantWithUnitSerializer(serializers.ModelSerializer):
             'rent_status', 'deposit_paid'
         ]
         read_only_fields = ['is_active']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Join unit/property and compute deposit_paid and rent_status in SQL"""
+        from payments.models import Payment
+
+        completed_deposits = Payment.objects.filter(
+            tenant=OuterRef('pk'),
+            payment_type='deposit',
+            status='completed'
+        )
+        return queryset.select_related('unit__property_obj').annotate(
+            has_paid_deposit=Exists(completed_deposits),
+            annotated_rent_status=Case(
+                When(unit__isnull=True, then=Value('no_unit')),
+                When(unit__rent_remaining=0, then=Value('paid')),
+                When(unit__rent_remaining=F('unit__rent'), then=Value('due')),
+                When(unit__rent_remaining__gt=0, then=Value('overdue')),
+                default=Value('unknown'),
+                output_field=CharField(),
+            ),
+        )
+
+    def _get_unit(self, obj):
+        # Reverse one-to-one; free when loaded via setup_eager_loading()
+        try:
+            return obj.unit
+        except Unit.DoesNotExist:
+            return None
     
     def get_current_unit(self, obj):
         """Get the unit currently assigned to this tenant"""
-        try:
-            unit = Unit.objects.get(tenant=obj)
-            return {
-                'id': unit.id,
-                'unit_number': unit.unit_number,
-                'property_name': unit.property_obj.name,
-                'rent': unit.rent,
-                'rent_paid': unit.rent_paid,
-                'rent_remaining': unit.rent_remaining,
-                'assigned_date': unit.assigned_date
-            }
-        except Unit.DoesNotExist:
+        unit = self._get_unit(obj)
+        if unit is None:
             return None
+        return {
+            'id': unit.id,
+            'unit_number': unit.unit_number,
+            'property_name': unit.property_obj.name,
+            'rent': unit.rent,
+            'rent_paid': unit.rent_paid,
+            'rent_remaining': unit.rent_remaining,
+            'assigned_date': unit.assigned_date
+        }
     
     def get_unit_data(self, obj):
         """Alternative method to get unit data"""
-        unit = Unit.objects.filter(tenant=obj).first()
+        unit = self._get_unit(obj)
         if unit:
             return UnitSerializer(unit).data
         return None
     
     def get_deposit_paid(self, obj):
         """Check if tenant has paid deposit"""
+        if hasattr(obj, 'has_paid_deposit'):
+            return obj.has_paid_deposit
         from payments.models import Payment
         deposit_payments = Payment.objects.filter(
             tenant=obj,
@@ -513,18 +561,20 @@ class TenantWithUnitSerializer(serializers.ModelSerializer):
     
     def get_rent_status(self, obj):
         """Calculate rent status for the tenant"""
-        try:
-            unit = Unit.objects.get(tenant=obj)
-            if unit.rent_remaining == 0:
-                return 'paid'
-            elif unit.rent_remaining == unit.rent:
-                return 'due'
-            elif unit.rent_remaining > 0:
-                return 'overdue'
-            else:
-                return 'unknown'
-        except Unit.DoesNotExist:
+        if hasattr(obj, 'annotated_rent_status'):
+            return obj.annotated_rent_status
+        unit = self._get_unit(obj)
+        if unit is None:
             return 'no_unit'
+        if unit.rent_remaining == 0:
+            return 'paid'
+        elif unit.rent_remaining == unit.rent:
+            return 'due'
+        elif unit.rent_remaining > 0:
+            return 'overdue'
+        else:
+            return 'unknown'
+
 class LandlordDashboardSerializer(serializers.Serializer):
     """Serializer for landlord dashboard data"""
     total_properties = serializers.IntegerField()
@@ -602,4 +652,38 @@ class TenantApplicationSerializer(serializers.ModelSerializer):
         if data.get('already_living_in_property', False):
             data['deposit_required'] = False
         
-        return data
\ No newline at end of file
+        return data
+
+
+class RentRevisionSerializer(serializers.ModelSerializer):
+    unit_type = serializers.PrimaryKeyRelatedField(queryset=UnitType.objects.all(), required=False, allow_null=True)
+    property = serializers.PrimaryKeyRelatedField(queryset=Property.objects.all(), required=False, allow_null=True)
+
+    class Meta:
+        model = RentRevision
+        fields = [
+            'id', 'adjustment_type', 'value', 'scope', 'unit_type', 'property',
+            'effective_date', 'status', 'units_updated', 'attempts', 'error',
+            'created_at', 'applied_at', 'rolled_back_at'
+        ]
+        read_only_fields = [
+            'id', 'status', 'units_updated', 'attempts', 'error', 'created_at', 'applied_at', 'rolled_back_at'
+        ]
+
+    def validate_effective_date(self, value):
+        if value < timezone.localdate():
+            raise serializers.ValidationError("Effective date cannot be in the past")
+        return value
+
+    def validate(self, data):
+        landlord = self.context['request'].user
+        scope = data.get('scope', 'all')
+        if scope == 'unit_type':
+            if not data.get('unit_type') or data['unit_type'].landlord != landlord:
+                raise serializers.ValidationError("A unit type you own is required for this scope")
+        elif scope == 'property':
+            if not data.get('property') or data['property'].landlord != landlord:
+                raise serializers.ValidationError("A property you own is required for this scope")
+        if data.get('adjustment_type') == 'absolute' and data.get('value') is not None and data['value'] < 0:
+            raise serializers.ValidationError("Rent cannot be negative")
+        return data
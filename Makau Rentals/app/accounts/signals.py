@@ -0,0 +1,157 @@
+# accounts/signals.py
+"""
+Cache invalidation and dashboard stats signals.
+
+Any change to a landlord's properties, units, unit types, payments or tenant
+profiles bumps the landlord's cache generation (see accounts/cache_utils.py).
+Changes to an account, its subscription, a tenant's profile or a unit's
+tenant also bump the affected users' generations, retiring their per-user
+entries (permission checks, user details).
+Property, Unit and Payment changes are also applied to the landlord's
+LandlordStats row (see accounts/stats.py). Changes that move a tenant's rent
+due date or reminder preferences refresh the materialized reminder dates on
+their TenantProfile (see accounts/reminders.py).
+Connected from AccountsConfig.ready().
+
+Note: QuerySet.update()/bulk_update() do not send these signals - callers
+doing bulk writes must call bump_landlord_generation() themselves.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from payments.models import Payment
+from . import reminders, stats
+from .cache_utils import bump_landlord_generation, bump_user_generation
+from .models import CustomUser, Property, Subscription, Unit, UnitType, TenantProfile
+
+REMINDER_FIELDS = ('reminder_mode', 'reminder_value')
+
+
+def _landlord_id_for_property(instance):
+    # Use the already-loaded property when there is one to save a query
+    if Unit._meta.get_field("property_obj").is_cached(instance):
+        return instance.property_obj.landlord_id
+    return (
+        Property.objects.filter(pk=instance.property_obj_id)
+        .values_list("landlord_id", flat=True)
+        .first()
+    )
+
+
+def _landlord_id_for_unit(instance):
+    if not instance.unit_id:
+        return None
+    if Payment._meta.get_field("unit").is_cached(instance):
+        return _landlord_id_for_property(instance.unit)
+    return (
+        Unit.objects.filter(pk=instance.unit_id)
+        .values_list("property_obj__landlord_id", flat=True)
+        .first()
+    )
+
+
+def _has_changed(instance, created, update_fields, attnames):
+    """Whether this save may have changed any of `attnames` (dirty-tracked models)"""
+    if created:
+        return True
+    if update_fields is not None and not set(attnames) & set(update_fields):
+        return False
+    return any(
+        not instance.is_loaded(attname) or instance.loaded_value(attname) != getattr(instance, attname)
+        for attname in attnames
+    )
+
+
+@receiver([post_save, post_delete], sender=UnitType)
+@receiver([post_save, post_delete], sender=TenantProfile)
+def invalidate_landlord_cache(sender, instance, **kwargs):
+    bump_landlord_generation(instance.landlord_id)
+
+
+@receiver([post_save, post_delete], sender=TenantProfile)
+def invalidate_tenant_cache(sender, instance, **kwargs):
+    bump_user_generation(instance.tenant_id)
+
+
+@receiver([post_save, post_delete], sender=Subscription)
+def invalidate_subscriber_cache(sender, instance, **kwargs):
+    bump_user_generation(instance.user_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def user_saved(sender, instance, created, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    # Logins only touch last_login, which nothing cached depends on
+    if not created and not (update_fields and set(update_fields) <= {'last_login'}):
+        bump_user_generation(instance.id)
+
+
+@receiver(post_delete, sender=CustomUser)
+def user_deleted(sender, instance, **kwargs):
+    bump_user_generation(instance.id)
+
+
+@receiver(post_save, sender=TenantProfile)
+def tenant_profile_saved(sender, instance, created, **kwargs):
+    if _has_changed(instance, created, kwargs.get('update_fields'), ('move_in_date', 'current_unit_id')):
+        reminders.refresh(TenantProfile.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=CustomUser)
+def tenant_preferences_saved(sender, instance, created, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if created or instance.user_type != 'tenant':
+        return
+    if update_fields is None or set(REMINDER_FIELDS) & set(update_fields):
+        reminders.refresh(TenantProfile.objects.filter(tenant=instance))
+
+
+@receiver(post_save, sender=Property)
+def property_saved(sender, instance, created, **kwargs):
+    if created:
+        stats.record_property_change(instance.landlord_id, 1)
+    bump_landlord_generation(instance.landlord_id)
+
+
+@receiver(post_delete, sender=Property)
+def property_deleted(sender, instance, **kwargs):
+    stats.record_property_change(instance.landlord_id, -1)
+    bump_landlord_generation(instance.landlord_id)
+
+
+@receiver(post_save, sender=Unit)
+def unit_saved(sender, instance, created, **kwargs):
+    landlord_id = _landlord_id_for_property(instance)
+    new = stats.current_values(instance, kwargs.get('update_fields'))
+    stats.record_unit_change(landlord_id, stats.loaded_values(instance, created), new)
+    bump_landlord_generation(landlord_id)
+    if _has_changed(instance, created, kwargs.get('update_fields'), ('tenant_id',)):
+        # Both the tenant moving out and the one moving in
+        bump_user_generation(*filter(None, (instance.loaded_value('tenant_id', None), instance.tenant_id)))
+    if not created and _has_changed(instance, created, kwargs.get('update_fields'), ('rent_due_date',)):
+        reminders.refresh(TenantProfile.objects.filter(current_unit=instance))
+
+
+@receiver(post_delete, sender=Unit)
+def unit_deleted(sender, instance, **kwargs):
+    landlord_id = _landlord_id_for_property(instance)
+    old = stats.loaded_values(instance) or stats.current_values(instance)
+    stats.record_unit_change(landlord_id, old, None)
+    bump_landlord_generation(landlord_id)
+    bump_user_generation(*filter(None, (instance.tenant_id,)))
+
+
+@receiver(post_save, sender=Payment)
+def payment_saved(sender, instance, created, **kwargs):
+    landlord_id = _landlord_id_for_unit(instance)
+    new = stats.current_values(instance, kwargs.get('update_fields'))
+    stats.record_payment_change(landlord_id, stats.loaded_values(instance, created), new)
+    bump_landlord_generation(landlord_id)
+
+
+@receiver(post_delete, sender=Payment)
+def payment_deleted(sender, instance, **kwargs):
+    landlord_id = _landlord_id_for_unit(instance)
+    old = stats.loaded_values(instance) or stats.current_values(instance)
+    stats.record_payment_change(landlord_id, old, None)
+    bump_landlord_generation(landlord_id)
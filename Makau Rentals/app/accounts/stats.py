@@ -0,0 +1,188 @@
+# accounts/stats.py
+"""
+Incrementally maintained landlord dashboard stats.
+
+Each Unit contributes to its landlord's counters (units, occupied/vacant,
+active tenants, rent collected/outstanding) and each completed rent Payment
+contributes to month-to-date revenue. The signals in accounts/signals.py
+apply the difference between an object's loaded state and its saved state
+with a single UPDATE ... SET x = x + delta, so the dashboard can read one row
+no matter how large the portfolio is.
+
+Bulk writes (QuerySet.update/bulk_update/bulk_create) bypass the signals;
+callers doing those should call rebuild_landlord_stats() afterwards. The
+`reconcile_landlord_stats` management command rebuilds every row.
+"""
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import LandlordStats, Property, Unit
+
+UNIT_COUNTERS = (
+    'total_units', 'occupied_units', 'vacant_units',
+    'active_tenants', 'rent_collected', 'rent_outstanding',
+)
+
+
+def current_month_start(now=None):
+    now = timezone.localtime(now or timezone.now())
+    return now.date().replace(day=1)
+
+
+# ---------------------------------------------------------------------------
+# Contributions
+# ---------------------------------------------------------------------------
+def unit_contribution(values):
+    """Counters contributed by one unit, from a dict of Unit.STATS_FIELDS"""
+    if not values:
+        return {}
+    return {
+        'total_units': 1,
+        'occupied_units': 0 if values['is_available'] else 1,
+        'vacant_units': 1 if values['is_available'] else 0,
+        'active_tenants': 1 if values['tenant_id'] else 0,
+        'rent_collected': values['rent_paid'] or Decimal('0'),
+        'rent_outstanding': values['rent_remaining'] or Decimal('0'),
+    }
+
+
+def payment_revenue(values, month_start):
+    """Amount a payment contributes to `month_start`'s revenue"""
+    if not values or values['status'] != 'completed' or values['payment_type'] != 'rent':
+        return Decimal('0')
+    created_at = values['created_at']
+    if created_at is None or current_month_start(created_at) != month_start:
+        return Decimal('0')
+    return values['amount'] or Decimal('0')
+
+
+def current_values(instance, update_fields=None):
+    """
+    State the database holds after a save. Fields left out of an explicit
+    update_fields were not written, so their loaded value still stands.
+    """
+    values = {field: getattr(instance, field) for field in instance.STATS_FIELDS}
+    if update_fields is not None:
+        written = {instance._meta.get_field(name).attname for name in update_fields}
+        for field in instance.STATS_FIELDS:
+            if field not in written and instance.is_loaded(field):
+                values[field] = instance.loaded_value(field)
+    return values
+
+
+def loaded_values(instance, created=False):
+    """
+    State the instance had in the database before this save, or None for a
+    new object. Returns False when it is unknown (e.g. an instance built by
+    hand or loaded with .only()).
+    """
+    if created:
+        return None
+    if not all(instance.is_loaded(field) for field in instance.STATS_FIELDS):
+        return False
+    return {field: instance.loaded_value(field) for field in instance.STATS_FIELDS}
+
+
+# ---------------------------------------------------------------------------
+# Incremental updates
+# ---------------------------------------------------------------------------
+def apply_delta(landlord_id, deltas):
+    """Add `deltas` to the landlord's row. Missing rows are built on first read."""
+    changes = {name: F(name) + value for name, value in deltas.items() if value}
+    if not landlord_id or not changes:
+        return
+    LandlordStats.objects.filter(landlord_id=landlord_id).update(updated_at=timezone.now(), **changes)
+
+
+def record_property_change(landlord_id, delta):
+    apply_delta(landlord_id, {'total_properties': delta})
+
+
+def record_unit_change(landlord_id, old, new):
+    """Apply the difference between two unit states (either may be None)"""
+    if old is False:
+        rebuild_landlord_stats(landlord_id)
+        return
+    old_counts = unit_contribution(old)
+    new_counts = unit_contribution(new)
+    apply_delta(landlord_id, {
+        name: new_counts.get(name, 0) - old_counts.get(name, 0) for name in UNIT_COUNTERS
+    })
+
+
+def record_payment_change(landlord_id, old, new):
+    """Apply the revenue difference between two payment states"""
+    if not landlord_id:
+        return
+    if old is False:
+        rebuild_landlord_stats(landlord_id)
+        return
+    month_start = current_month_start()
+    delta = payment_revenue(new, month_start) - payment_revenue(old, month_start)
+    if not delta:
+        return
+    updated = LandlordStats.objects.filter(
+        landlord_id=landlord_id, revenue_month=month_start
+    ).update(month_revenue=F('month_revenue') + delta, updated_at=timezone.now())
+    if not updated:
+        # First revenue of a new month: nothing from this month is recorded yet
+        LandlordStats.objects.filter(landlord_id=landlord_id).exclude(
+            revenue_month=month_start
+        ).update(revenue_month=month_start, month_revenue=delta, updated_at=timezone.now())
+
+
+# ---------------------------------------------------------------------------
+# Full rebuild / reads
+# ---------------------------------------------------------------------------
+def compute_landlord_stats(landlord_id):
+    """Compute every counter from scratch (a handful of aggregate queries)"""
+    from payments.models import Payment
+
+    month_start = current_month_start()
+    zero = Decimal('0')
+    unit_totals = Unit.objects.filter(property_obj__landlord_id=landlord_id).aggregate(
+        total_units=Count('id'),
+        occupied_units=Count('id', filter=Q(is_available=False)),
+        vacant_units=Count('id', filter=Q(is_available=True)),
+        active_tenants=Count('id', filter=Q(tenant__isnull=False)),
+        rent_collected=Coalesce(Sum('rent_paid'), zero),
+        rent_outstanding=Coalesce(Sum('rent_remaining'), zero),
+    )
+    start = timezone.make_aware(datetime.combine(month_start, time.min))
+    month_revenue = Payment.objects.filter(
+        unit__property_obj__landlord_id=landlord_id,
+        payment_type='rent',
+        status='completed',
+        created_at__gte=start,
+    ).aggregate(total=Coalesce(Sum('amount'), zero))['total']
+
+    return {
+        'total_properties': Property.objects.filter(landlord_id=landlord_id).count(),
+        **unit_totals,
+        'revenue_month': month_start,
+        'month_revenue': month_revenue,
+    }
+
+
+def rebuild_landlord_stats(landlord_id):
+    """Recompute and store the landlord's stats row"""
+    if not landlord_id:
+        return None
+    values = compute_landlord_stats(landlord_id)
+    stats, _ = LandlordStats.objects.update_or_create(
+        landlord_id=landlord_id,
+        defaults={**values, 'reconciled_at': timezone.now()},
+    )
+    return stats
+
+
+def get_landlord_stats(landlord):
+    """Single-row read; builds the row the first time a landlord asks for it"""
+    stats = LandlordStats.objects.filter(landlord=landlord).first()
+    if stats is None:
+        stats = rebuild_landlord_stats(landlord.id)
+    return stats
@@ -91,11 +91,11 @@ def suggest_plan_upgrade(current_properties, current_units):
                 'limits': limits,
                 'can_accommodate': True
             }
-    # If no plan fits, suggest lifetime
+    # If no plan fits, suggest the one-time (lifetime) plan
     return {
-        'suggested_plan': 'lifetime',
+        'suggested_plan': 'onetime',
         'reason': f'You have {current_properties} properties and {current_units} units, which exceeds all monthly plans',
-        'limits': PLAN_LIMITS['lifetime'],
+        'limits': PLAN_LIMITS['onetime'],
         'can_accommodate': True
     }
 
@@ -0,0 +1,261 @@
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from app.cache import LocalLRUTier, TieredCache
+from communication.permissions import IsLandlordWithActiveSubscription, IsTenantWithUnit
+from .cache_utils import bump_landlord_generation, get_landlord_generation, landlord_cache_key, user_cache_key
+from .models import Property, TenantProfile, Unit
+from .permissions import HasActiveSubscription
+
+CustomUser = get_user_model()
+
+
+def make_cache(**options):
+    params = {
+        "TIMEOUT": 300,
+        "OPTIONS": {
+            "REMOTE_BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCAL_MAX_ENTRIES": 3,
+            "LOCAL_TIMEOUT": 30,
+            "RETRY_INTERVAL": 30,
+            **options,
+        },
+    }
+    return TieredCache(f"tiered-test-{time.monotonic_ns()}", params)
+
+
+class LocalLRUTierTests(SimpleTestCase):
+    def test_evicts_least_recently_used(self):
+        tier = LocalLRUTier(max_entries=2, max_bytes=0)
+        tier.set("a", 1, None)
+        tier.set("b", 2, None)
+        tier.get("a")  # "b" is now the least recently used
+        tier.set("c", 3, None)
+        self.assertEqual(tier.get("a"), (1, True))
+        self.assertEqual(tier.get("b"), (None, False))
+        self.assertEqual(tier.evictions, 1)
+
+    def test_bounded_by_bytes(self):
+        tier = LocalLRUTier(max_entries=100, max_bytes=200)
+        for i in range(10):
+            tier.set(f"k{i}", "x" * 50, None)
+        self.assertLessEqual(tier.size, 200)
+        self.assertGreater(tier.evictions, 0)
+
+    def test_expired_entries_are_misses(self):
+        tier = LocalLRUTier()
+        tier.set("a", 1, 0.01)
+        time.sleep(0.02)
+        self.assertEqual(tier.get("a"), (None, False))
+        self.assertEqual(len(tier), 0)
+
+
+class TieredCacheTests(SimpleTestCase):
+    def test_local_then_remote_hits(self):
+        cache = make_cache()
+        cache.set("user:1", {"id": 1})
+        self.assertEqual(cache.get("user:1"), {"id": 1})
+
+        # Drop the local copy; the next read back-fills from the remote tier
+        cache._local.clear()
+        self.assertEqual(cache.get("user:1"), {"id": 1})
+        self.assertEqual(cache.get("user:1"), {"id": 1})
+        self.assertIsNone(cache.get("missing"))
+
+        stats = cache.stats()
+        self.assertEqual(stats["local_hits"], 2)
+        self.assertEqual(stats["remote_hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["hit_rate"], 0.75)
+
+    def test_delete_clears_both_tiers(self):
+        cache = make_cache()
+        cache.set("k", "v")
+        cache.delete("k")
+        self.assertIsNone(cache.get("k"))
+        self.assertIsNone(cache._remote.get("k"))
+
+    def test_eviction_counter(self):
+        cache = make_cache(LOCAL_MAX_ENTRIES=2)
+        for i in range(5):
+            cache.set(f"k{i}", i)
+        self.assertEqual(cache.stats()["evictions"], 3)
+        # Evicted locally but still served by the remote tier
+        self.assertEqual(cache.get("k0"), 0)
+
+    def test_falls_back_to_local_when_remote_unreachable(self):
+        cache = make_cache()
+        cache.set("warm", 1)
+        remote = cache._remote
+        with mock.patch.object(remote, "get", side_effect=ConnectionError("down")), \
+                mock.patch.object(remote, "set", side_effect=ConnectionError("down")):
+            cache._local.clear()
+            self.assertIsNone(cache.get("warm"))
+            cache.set("k", "v")
+            self.assertEqual(cache.get("k"), "v")
+            stats = cache.stats()
+            self.assertFalse(stats["remote_available"])
+            self.assertEqual(stats["remote_errors"], 1)
+
+    def test_unimportable_remote_backend_runs_local_only(self):
+        cache = make_cache(REMOTE_BACKEND="does.not.Exist")
+        cache.set("k", "v")
+        self.assertEqual(cache.get("k"), "v")
+        self.assertFalse(cache.remote_available)
+
+    def test_local_only_mode(self):
+        cache = make_cache(REMOTE_BACKEND=None)
+        self.assertTrue(cache.add("k", 1))
+        self.assertFalse(cache.add("k", 2))
+        self.assertEqual(cache.incr("k"), 2)
+        self.assertTrue(cache.has_key("k"))
+        self.assertEqual(cache.stats()["remote_errors"], 0)
+
+    def test_incr_uses_remote_counter(self):
+        cache = make_cache()
+        cache.set("gen", 1)
+        self.assertEqual(cache.incr("gen"), 2)
+        self.assertEqual(cache.get("gen"), 2)
+
+    def test_shared_prefixes_skip_local_tier(self):
+        cache = make_cache(LOCAL_EXCLUDE_PREFIXES=["landlord-gen:"])
+        cache.set("landlord-gen:1", 5, timeout=None)
+        self.assertEqual(len(cache._local), 0)
+        # Another worker bumps the counter; we must see it immediately
+        cache._remote.incr("landlord-gen:1")
+        self.assertEqual(cache.get("landlord-gen:1"), 6)
+
+    def test_zero_timeout_is_not_cached(self):
+        cache = make_cache()
+        cache.set("k", "v", timeout=0)
+        self.assertIsNone(cache.get("k"))
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class LandlordGenerationTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.landlord = CustomUser.objects.create_user(
+            email='gen-landlord@test.com',
+            full_name='Gen Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+        self.client.force_authenticate(user=self.landlord)
+
+    def test_property_and_unit_changes_bump_generation(self):
+        start = get_landlord_generation(self.landlord.id)
+        prop = Property.objects.create(
+            landlord=self.landlord, name='Gen Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        after_property = get_landlord_generation(self.landlord.id)
+        self.assertGreater(after_property, start)
+
+        Unit.objects.create(property_obj=prop, unit_code='GEN-1', unit_number='1', rent=1000)
+        self.assertGreater(get_landlord_generation(self.landlord.id), after_property)
+
+    def test_cached_properties_are_retired_on_write(self):
+        url = reverse('property-list')
+        self.assertEqual(self.client.get(url).data, [])
+        Property.objects.create(
+            landlord=self.landlord, name='Fresh Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        response = self.client.get(url)
+        self.assertEqual([p['name'] for p in response.data], ['Fresh Court'])
+
+    def test_versioned_key_embeds_generation(self):
+        key = landlord_cache_key(self.landlord.id, "property", 7, "units")
+        generation = get_landlord_generation(self.landlord.id)
+        self.assertEqual(key, f"landlord:{self.landlord.id}:g{generation}:property:7:units")
+        bump_landlord_generation(self.landlord.id)
+        self.assertNotEqual(landlord_cache_key(self.landlord.id, "property", 7, "units"), key)
+
+    def test_user_detail_is_retired_when_the_user_changes(self):
+        url = reverse('user-detail', args=[self.landlord.id])
+        self.assertEqual(self.client.get(url).data['full_name'], 'Gen Landlord')
+        self.landlord.full_name = 'Renamed Landlord'
+        self.landlord.save()
+        self.assertEqual(self.client.get(url).data['full_name'], 'Renamed Landlord')
+
+    def test_unit_assignment_retires_both_tenants_entries(self):
+        prop = Property.objects.create(
+            landlord=self.landlord, name='Move Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        leaving, arriving = (
+            CustomUser.objects.create_user(
+                email=f'gen-{name}@test.com', full_name=name.title(), user_type='tenant', password='x'
+            )
+            for name in ('leaving', 'arriving')
+        )
+        unit = Unit.objects.create(property_obj=prop, unit_code='MOVE-1', unit_number='1', rent=1000, tenant=leaving)
+        profile = TenantProfile.objects.create(tenant=arriving, landlord=self.landlord)
+        keys = {user.id: user_cache_key(user.id, "has_unit") for user in (leaving, arriving)}
+
+        unit = Unit.objects.get(pk=unit.pk)
+        unit.tenant = arriving
+        unit.save()
+        for user_id, key in keys.items():
+            self.assertNotEqual(user_cache_key(user_id, "has_unit"), key)
+
+        key = user_cache_key(arriving.id, "has_unit")
+        profile.current_unit = unit
+        profile.save()
+        self.assertNotEqual(user_cache_key(arriving.id, "has_unit"), key)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class PermissionCacheTests(APITestCase):
+    """Cached permission checks follow subscription and unit changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.landlord = CustomUser.objects.create_user(
+            email='perm-landlord@test.com', full_name='Perm Landlord', user_type='landlord', password='x'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='perm-tenant@test.com', full_name='Perm Tenant', user_type='tenant', password='x'
+        )
+
+    def check(self, permission, user):
+        return permission().has_permission(SimpleNamespace(user=CustomUser.objects.get(pk=user.pk)), None)
+
+    def test_renewed_subscription_is_seen_at_once(self):
+        subscription = self.landlord.subscription
+        subscription.expiry_date = timezone.now() - timedelta(days=1)
+        subscription.save()
+        for permission in (HasActiveSubscription, IsLandlordWithActiveSubscription):
+            self.assertFalse(self.check(permission, self.landlord))
+
+        # As handle_successful_subscription_payment does
+        subscription.plan = 'basic'
+        subscription.expiry_date = timezone.now() + timedelta(days=30)
+        subscription.save()
+        for permission in (HasActiveSubscription, IsLandlordWithActiveSubscription):
+            self.assertTrue(self.check(permission, self.landlord))
+
+    def test_assigned_tenant_is_seen_at_once(self):
+        prop = Property.objects.create(
+            landlord=self.landlord, name='Perm Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        unit = Unit.objects.create(property_obj=prop, unit_code='PERM-1', unit_number='1', rent=1000)
+        profile = TenantProfile.objects.create(tenant=self.tenant, landlord=self.landlord)
+        self.assertFalse(self.check(IsTenantWithUnit, self.tenant))
+
+        unit.tenant = self.tenant
+        unit.save()
+        profile.current_unit = unit
+        profile.save()
+        self.assertTrue(self.check(IsTenantWithUnit, self.tenant))
+
+        profile.current_unit = None
+        profile.save()
+        self.assertFalse(self.check(IsTenantWithUnit, self.tenant))
@@ -0,0 +1,142 @@
+"""
+Tests for dirty-field tracking and minimal UPDATEs (app/dirty_fields.py)
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import CustomUser, Property, Subscription, Unit
+from communication.models import Report
+from payments.models import Payment
+from payments.views_pesapal import handle_successful_rent_payment
+
+
+def updates_of(captured, table):
+    return [q['sql'] for q in captured.captured_queries if q['sql'].startswith(f'UPDATE "{table}"')]
+
+
+def selects_of(captured, table):
+    return [q['sql'] for q in captured.captured_queries if q['sql'].startswith('SELECT') and f'FROM "{table}"' in q['sql']]
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class DirtyFieldsTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='dirty-landlord@test.com',
+            full_name='Dirty Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='dirty-tenant@test.com',
+            full_name='Dirty Tenant',
+            user_type='tenant',
+            password='testpass123'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Dirty Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        self.unit = Unit.objects.create(
+            property_obj=self.property, unit_code='DIRTY-1', unit_number='1', rent=Decimal('10000')
+        )
+
+    def test_changed_fields(self):
+        unit = Unit.objects.get(pk=self.unit.pk)
+        self.assertEqual(unit.changed_fields, [])
+        unit.rent = Decimal('12000')
+        unit.tenant = self.tenant
+        self.assertEqual(unit.changed_fields, ['rent', 'tenant_id'])
+        self.assertEqual(unit.loaded_value('rent'), Decimal('10000'))
+        # Assigning an equal value is not a change
+        unit.rent = 10000
+        self.assertFalse(unit.has_changed('rent'))
+
+    def test_unchanged_save_is_skipped(self):
+        unit = Unit.objects.get(pk=self.unit.pk)
+        with self.assertNumQueries(0):
+            unit.save()
+
+    def test_save_writes_only_changed_columns(self):
+        unit = Unit.objects.get(pk=self.unit.pk)
+        unit.rent = Decimal('11000')
+        with CaptureQueriesContext(connection) as captured:
+            unit.save()
+        [update] = updates_of(captured, 'accounts_unit')
+        self.assertIn('"rent" =', update)
+        self.assertIn('"rent_remaining" =', update)
+        self.assertNotIn('"unit_code"', update)
+        self.assertEqual(Unit.objects.get(pk=unit.pk).rent_remaining, Decimal('11000'))
+        # The snapshot follows the save, so saving again is a no-op
+        with self.assertNumQueries(0):
+            unit.save()
+
+    def test_tenant_change_needs_no_select(self):
+        unit = Unit.objects.get(pk=self.unit.pk)
+        unit.tenant = self.tenant
+        unit.is_available = False
+        with CaptureQueriesContext(connection) as captured:
+            unit.save()
+        self.assertEqual(selects_of(captured, 'accounts_unit'), [])
+        self.assertIsNotNone(unit.assigned_date)
+
+        unit.tenant = None
+        unit.save()
+        self.assertIsNotNone(Unit.objects.get(pk=unit.pk).left_date)
+
+    def test_hand_built_instance_still_detects_tenant_change(self):
+        unit = Unit(
+            pk=self.unit.pk, property_obj=self.property, unit_code='DIRTY-1', unit_number='1',
+            rent=Decimal('10000'), tenant=self.tenant
+        )
+        unit.save()
+        self.assertIsNotNone(Unit.objects.get(pk=unit.pk).assigned_date)
+
+    def test_refresh_from_db_resets_snapshot(self):
+        unit = Unit.objects.get(pk=self.unit.pk)
+        Unit.objects.filter(pk=unit.pk).update(rent=Decimal('9000'))
+        unit.refresh_from_db()
+        self.assertEqual(unit.changed_fields, [])
+
+    def test_report_and_subscription_minimal_updates(self):
+        report = Report.objects.create(
+            tenant=self.tenant, unit=self.unit, issue_category='plumbing',
+            issue_title='Leak', description='Kitchen sink'
+        )
+        report = Report.objects.get(pk=report.pk)
+        report.status = 'resolved'
+        with CaptureQueriesContext(connection) as captured:
+            report.save()
+        [update] = updates_of(captured, 'communication_report')
+        self.assertIn('"status"', update)
+        self.assertIn('"resolved_date"', update)
+        self.assertNotIn('"description"', update)
+
+        subscription = Subscription.objects.get(user=self.landlord)
+        subscription.plan = 'basic'
+        with CaptureQueriesContext(connection) as captured:
+            subscription.save()
+        [update] = updates_of(captured, 'accounts_subscription')
+        self.assertNotIn('"start_date"', update)
+
+    def test_ipn_rent_completion_benchmark(self):
+        """
+        The IPN rent completion path saves a Payment and its Unit. Before dirty
+        tracking, Unit.save re-read the unit (one extra SELECT per save) and
+        both saves wrote every column.
+        """
+        payment = Payment.objects.create(tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('1000'))
+        with CaptureQueriesContext(connection) as captured:
+            handle_successful_rent_payment({'payment_id': payment.id}, 'CONF', '1000')
+
+        # Only the lazy payment.unit load reads the unit; Unit.save no longer does
+        self.assertEqual(len(selects_of(captured, 'accounts_unit')), 1)
+        [unit_update] = updates_of(captured, 'accounts_unit')
+        [payment_update] = updates_of(captured, 'payments_payment')
+        unit_columns = unit_update.split(' WHERE ')[0].count(' = ')
+        payment_columns = payment_update.split(' WHERE ')[0].count(' = ')
+        self.assertLessEqual(unit_columns, 2)
+        self.assertLessEqual(payment_columns, 4)
+        self.assertEqual(Unit.objects.get(pk=self.unit.pk).rent_paid, Decimal('1000'))
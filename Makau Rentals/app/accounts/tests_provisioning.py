@@ -0,0 +1,161 @@
+"""
+Tests for bulk unit provisioning
+"""
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, LandlordStats, Property, PropertyUnitTracker, Unit, UnitType
+from accounts.stats import compute_landlord_stats
+
+
+def statement_count(captured):
+    """Queries other than the unit INSERTs (SQLite splits those into parameter-limited batches)"""
+    return len([
+        q for q in captured.captured_queries
+        if not q['sql'].startswith('INSERT INTO "accounts_unit"') and 'SAVEPOINT' not in q['sql']
+    ])
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class BulkProvisioningTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='provision-landlord@test.com',
+            full_name='Provision Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Provision Towers', city='Nairobi', state='Nairobi', unit_count=300
+        )
+        self.studio = UnitType.objects.create(
+            landlord=self.landlord, name='Studio', rent=Decimal('8000'), deposit=Decimal('8000')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.landlord)
+        self.url = reverse('unit-bulk-create')
+        self.client.get(reverse('dashboard-stats'))  # warm the subscription cache, build the stats row
+
+    def provision(self, **data):
+        return self.client.post(self.url, {'property_obj': self.property.id, **data}, format='json')
+
+    def test_three_hundred_units_in_one_request(self):
+        cottage = Property.objects.create(
+            landlord=self.landlord, name='Provision Cottage', city='Nairobi', state='Nairobi', unit_count=20
+        )
+        # Take the free trial past its 10 unit limit so both measured batches follow the same path
+        self.client.post(self.url, {
+            'property_obj': cottage.id, 'rent': '5000', 'ranges': [{'start': 1, 'end': 10}]
+        }, format='json')
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.post(self.url, {
+                'property_obj': cottage.id, 'unit_type': self.studio.id,
+                'layout': {'floor_from': 1, 'floor_to': 1, 'units_per_floor': 10},
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        with CaptureQueriesContext(connection) as many:
+            response = self.provision(
+                unit_type='Studio', layout={'floor_from': 1, 'floor_to': 10, 'units_per_floor': 30, 'prefix': 'T'}
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['units_created'], 300)
+        # Free trial: allowed past the plan limit, with a tier change warning
+        self.assertTrue(response.data['tracking']['tier_change_warning'])
+        self.assertEqual(statement_count(many), statement_count(few))
+        self.assertLess(statement_count(many), 15)
+
+        units = Unit.objects.filter(property_obj=self.property)
+        self.assertEqual(units.count(), 300)
+        unit = units.get(unit_number='T1030')
+        self.assertEqual((unit.floor, unit.rent, unit.rent_remaining), (10, Decimal('8000'), Decimal('8000')))
+        self.assertEqual(
+            PropertyUnitTracker.objects.filter(property=self.property, action='units_bulk_created').count(), 1
+        )
+
+        stats = LandlordStats.objects.get(landlord=self.landlord)
+        self.assertEqual(stats.total_units, 320)
+        fresh = compute_landlord_stats(self.landlord.id)
+        for field in ('total_units', 'vacant_units', 'rent_outstanding'):
+            self.assertEqual(getattr(stats, field), fresh[field], field)
+
+    def test_duplicates_rejected_as_a_batch(self):
+        Unit.objects.create(property_obj=self.property, unit_code='PROV-5', unit_number='5', rent=Decimal('100'))
+        response = self.provision(rent='5000', ranges=[{'start': 1, 'end': 6}, {'start': 6, 'end': 7}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(sorted(response.data['errors']), [
+            'Unit number 5 already exists in this property',
+            'Unit number 6 appears more than once',
+        ])
+        self.assertEqual(Unit.objects.filter(property_obj=self.property).count(), 1)
+
+    def test_csv_upload(self):
+        upload = SimpleUploadedFile('units.csv', (
+            b"unit_number,unit_type,rent,deposit,bedrooms\n"
+            b"G1,Studio,,,0\n"
+            b"G2,,15000,,2\n"
+            b"\n"
+        ), content_type='text/csv')
+        response = self.client.post(self.url, {'property_obj': self.property.id, 'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        g1 = Unit.objects.get(unit_number='G1')
+        g2 = Unit.objects.get(unit_number='G2')
+        self.assertEqual((g1.unit_type, g1.rent), (self.studio, Decimal('8000')))
+        # Deposit defaults to one month's rent
+        self.assertEqual((g2.rent, g2.deposit, g2.bedrooms), (Decimal('15000'), Decimal('15000'), 2))
+
+    def test_multipart_form_fields(self):
+        upload = SimpleUploadedFile('units.csv', b"unit_number,rent\nM1,9000\n", content_type='text/csv')
+        response = self.client.post(self.url, {
+            'property_obj': self.property.id, 'file': upload, 'preview_only': 'false',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(Unit.objects.filter(unit_number='M1').exists())
+
+        response = self.client.post(self.url, {
+            'property_obj': self.property.id, 'rent': '7000', 'preview_only': 'true',
+            'ranges': '[{"start": 1, "end": 2, "prefix": "F"}]',
+        }, format='multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([u['unit_number'] for u in response.data['units']], ['F1', 'F2'])
+
+        for field, value in (('ranges', 'A1-A20'), ('ranges', '{"start": 1}'), ('layout', '[1, 2]')):
+            response = self.client.post(
+                self.url, {'property_obj': self.property.id, 'rent': '7000', field: value}, format='multipart'
+            )
+            self.assertEqual(response.status_code, 400, (field, value))
+        self.assertEqual(Unit.objects.filter(property_obj=self.property).count(), 1)
+
+    def test_preview_writes_nothing(self):
+        response = self.provision(rent='5000', ranges=[{'start': 1, 'end': 4, 'prefix': 'P'}], preview_only=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['preview'])
+        self.assertEqual([u['unit_number'] for u in response.data['units']], ['P1', 'P2', 'P3', 'P4'])
+        self.assertFalse(Unit.objects.filter(property_obj=self.property).exists())
+
+    def test_plan_limit_checked_once_for_batch(self):
+        subscription = self.landlord.subscription
+        subscription.plan = 'starter'
+        subscription.save()
+        response = self.provision(rent='5000', ranges=[{'start': 1, 'end': 11}])
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.data['limit'], 10)
+        self.assertFalse(Unit.objects.filter(property_obj=self.property).exists())
+
+        response = self.provision(rent='5000', ranges=[{'start': 1, 'end': 10}])
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(response.data['tracking']['limit_reached'])
+
+    def test_foreign_unit_type_rejected(self):
+        stranger = CustomUser.objects.create_user(
+            email='provision-stranger@test.com', full_name='Stranger', user_type='landlord', password='testpass123'
+        )
+        foreign = UnitType.objects.create(landlord=stranger, name='Loft', rent=Decimal('1000'))
+        response = self.provision(unit_type=foreign.id, ranges=[{'start': 1, 'end': 2}])
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,147 @@
+"""
+Tests for the materialized rent due dates behind deadline reminders
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser, Property, TenantProfile, Unit
+from accounts.reminders import due_date_for, reminder_recipients, roll_due_dates
+from communication.messaging import send_deadline_reminders
+
+
+def moved_in(day):
+    return timezone.make_aware(datetime(2025, 1, day, 12))
+
+
+class DueDateTests(TestCase):
+    def test_landlord_deadline_wins(self):
+        self.assertEqual(due_date_for(date(2026, 3, 5), moved_in(20), date(2026, 3, 10)), date(2026, 3, 5))
+        self.assertIsNone(due_date_for(None, None, date(2026, 3, 10)))
+
+    def test_move_in_anniversary(self):
+        self.assertEqual(due_date_for(None, moved_in(20), date(2026, 3, 10)), date(2026, 3, 20))
+        self.assertEqual(due_date_for(None, moved_in(20), date(2026, 3, 20)), date(2026, 3, 20))
+        self.assertEqual(due_date_for(None, moved_in(20), date(2026, 3, 21)), date(2026, 4, 20))
+        self.assertEqual(due_date_for(None, moved_in(20), date(2026, 12, 21)), date(2027, 1, 20))
+
+    def test_short_months_clamp_to_their_last_day(self):
+        self.assertEqual(due_date_for(None, moved_in(31), date(2026, 2, 10)), date(2026, 2, 28))
+        self.assertEqual(due_date_for(None, moved_in(31), date(2028, 2, 10)), date(2028, 2, 29))
+        self.assertEqual(due_date_for(None, moved_in(31), date(2026, 1, 31)), date(2026, 1, 31))
+        self.assertEqual(due_date_for(None, moved_in(30), date(2026, 1, 31)), date(2026, 2, 28))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_RATE_LIMITS={'*': 0},
+)
+class MaterializedDueDateTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.landlord = CustomUser.objects.create_user(
+            email='remind-landlord@test.com', full_name='Remind Landlord', user_type='landlord', password='x'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Remind Court', city='Nairobi', state='Nairobi', unit_count=100
+        )
+        self.count = 0
+
+    def make_tenant(self, rent_due_date=None, move_in=None, mode='days_before', value=10, rent_paid='0'):
+        self.count += 1
+        tenant = CustomUser.objects.create_user(
+            email=f'remind-tenant{self.count}@test.com', full_name=f'Tenant {self.count}',
+            user_type='tenant', password='x', reminder_mode=mode, reminder_value=value,
+        )
+        unit = Unit.objects.create(
+            property_obj=self.property, unit_code=f'REMIND-{self.count}', unit_number=str(self.count),
+            rent=Decimal('5000'), rent_paid=Decimal(rent_paid), rent_due_date=rent_due_date,
+            tenant=tenant, is_available=False,
+        )
+        return TenantProfile.objects.create(
+            tenant=tenant, landlord=self.landlord, current_unit=unit, move_in_date=move_in
+        )
+
+    def reload(self, profile):
+        return TenantProfile.objects.get(pk=profile.pk)
+
+    def test_dates_follow_profile_unit_and_preference_changes(self):
+        due = self.today + timedelta(days=12)
+        profile = self.reload(self.make_tenant(rent_due_date=due))
+        self.assertEqual((profile.next_due_date, profile.next_reminder_date), (due, due - timedelta(days=10)))
+
+        unit = Unit.objects.get(pk=profile.current_unit_id)
+        unit.rent_due_date = due + timedelta(days=3)
+        unit.save()
+        self.assertEqual(self.reload(profile).next_due_date, due + timedelta(days=3))
+
+        tenant = CustomUser.objects.get(pk=profile.tenant_id)
+        tenant.reminder_value = 2
+        tenant.save()
+        self.assertEqual(self.reload(profile).next_reminder_date, due + timedelta(days=1))
+        tenant.reminder_mode = 'fixed_day'
+        tenant.save(update_fields=['reminder_mode'])
+        self.assertIsNone(self.reload(profile).next_reminder_date)
+
+        profile = self.reload(profile)
+        profile.current_unit = None
+        profile.save()
+        self.assertIsNone(self.reload(profile).next_due_date)
+
+    def test_unrelated_unit_saves_do_not_touch_profiles(self):
+        profile = self.make_tenant(rent_due_date=self.today)
+        unit = Unit.objects.get(pk=profile.current_unit_id)
+        unit.is_available = True
+        with CaptureQueriesContext(connection) as captured:
+            unit.save()
+        self.assertFalse([q for q in captured if 'accounts_tenantprofile' in q['sql']])
+
+    def test_nightly_roll_moves_passed_move_in_dates(self):
+        rolling = self.make_tenant(move_in=moved_in(15))
+        fixed = self.make_tenant(rent_due_date=date(2026, 1, 1), move_in=moved_in(15))
+        TenantProfile.objects.filter(pk=rolling.pk).update(next_due_date=date(2026, 3, 15))
+
+        self.assertEqual(roll_due_dates(date(2026, 3, 16)), 1)
+        self.assertEqual(self.reload(rolling).next_due_date, date(2026, 4, 15))
+        self.assertEqual(self.reload(rolling).next_reminder_date, date(2026, 4, 5))
+        self.assertEqual(self.reload(fixed).next_due_date, date(2026, 1, 1))
+        # Already rolled: nothing to do
+        self.assertEqual(roll_due_dates(date(2026, 3, 16)), 0)
+
+    def test_each_mode_is_one_query(self):
+        remind = self.make_tenant(rent_due_date=self.today + timedelta(days=10))
+        self.make_tenant(rent_due_date=self.today + timedelta(days=11))
+        self.make_tenant(rent_due_date=self.today + timedelta(days=10), rent_paid='5000')
+        fixed = self.make_tenant(rent_due_date=self.today + timedelta(days=5), mode='fixed_day', value=self.today.day)
+        self.make_tenant(rent_due_date=self.today + timedelta(days=45), mode='fixed_day', value=self.today.day)
+        inactive = self.make_tenant(rent_due_date=self.today + timedelta(days=10))
+        CustomUser.objects.filter(pk=inactive.tenant_id).update(is_active=False)
+
+        with self.assertNumQueries(1):
+            self.assertEqual([p.tenant_id for p in reminder_recipients('days_before', self.today)], [remind.tenant_id])
+        with self.assertNumQueries(1):
+            self.assertEqual([p.tenant_id for p in reminder_recipients('fixed_day', self.today)], [fixed.tenant_id])
+
+    def test_reminder_run_cost_does_not_grow_with_the_tenant_base(self):
+        self.make_tenant(rent_due_date=self.today + timedelta(days=10))
+
+        def run():
+            mail.outbox.clear()
+            with CaptureQueriesContext(connection) as captured:
+                send_deadline_reminders()
+            return len(captured)
+
+        small = run()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn((self.today + timedelta(days=10)).strftime('%B %d, %Y'), mail.outbox[0].body)
+
+        for _ in range(40):
+            self.make_tenant(rent_due_date=self.today + timedelta(days=20))
+        self.assertEqual(run(), small)
+        self.assertEqual(len(mail.outbox), 1)
@@ -0,0 +1,292 @@
+"""
+Tests for the set-based rent repricing engine
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import (
+    CustomUser, LandlordStats, Property, RentRevision, RentRevisionItem, Unit, UnitType,
+)
+from accounts.rent_engine import apply_due_revisions, reprice_units
+from accounts.stats import compute_landlord_stats, get_landlord_stats
+from payments.models import Payment
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RentEngineTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='engine-landlord@test.com',
+            full_name='Engine Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='engine-tenant@test.com',
+            full_name='Engine Tenant',
+            user_type='tenant',
+            password='testpass123'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Engine Court', city='Nairobi', state='Nairobi', unit_count=10
+        )
+        self.studio = UnitType.objects.create(landlord=self.landlord, name='Studio', rent=Decimal('8000'))
+
+    def make_units(self, count, rent='10000', prefix='ENG', **kwargs):
+        return Unit.objects.bulk_create([
+            Unit(
+                property_obj=self.property, unit_code=f'{prefix}-{i}',
+                unit_number=str(i), rent=Decimal(rent), rent_remaining=Decimal(rent), **kwargs
+            )
+            for i in range(count)
+        ])
+
+    def units(self):
+        return Unit.objects.filter(property_obj__landlord=self.landlord)
+
+    def test_percentage_update_recomputes_balances(self):
+        occupied, vacant = self.make_units(2)
+        Payment.objects.create(
+            tenant=self.tenant, unit=occupied, payment_type='rent',
+            amount=Decimal('3000'), status='completed'
+        )
+        Payment.objects.create(
+            tenant=self.tenant, unit=occupied, payment_type='rent', amount=Decimal('999')
+        )
+        get_landlord_stats(self.landlord)
+
+        result = reprice_units(self.units(), 'percentage', 12.5, landlord_id=self.landlord.id)
+
+        self.assertEqual(result['summary']['units_updated'], 2)
+        occupied.refresh_from_db()
+        self.assertEqual(occupied.rent, Decimal('11250'))
+        self.assertEqual(occupied.rent_paid, Decimal('3000'))
+        self.assertEqual(occupied.rent_remaining, Decimal('8250'))
+        change = next(c for c in result['changes'] if c['unit_id'] == occupied.id)
+        self.assertEqual(change['increase'], Decimal('1250'))
+        self.assertEqual(change['rent_remaining'], Decimal('8250'))
+
+        stats = LandlordStats.objects.get(landlord=self.landlord)
+        fresh = compute_landlord_stats(self.landlord.id)
+        self.assertEqual(stats.rent_collected, fresh['rent_collected'])
+        self.assertEqual(stats.rent_outstanding, fresh['rent_outstanding'])
+
+    def test_preview_writes_nothing(self):
+        self.make_units(3)
+        result = reprice_units(self.units(), 'fixed', 500, apply=False)
+        self.assertEqual(result['summary']['units_affected'], 3)
+        self.assertEqual(result['summary']['total_increase'], Decimal('1500'))
+        self.assertFalse(self.units().exclude(rent=Decimal('10000')).exists())
+
+    def test_only_changed_units_are_written(self):
+        self.make_units(2, rent='0')
+        self.make_units(2, prefix='STUDIO', unit_type=self.studio)
+        result = reprice_units(self.units(), 'percentage', 10)
+        self.assertEqual(result['summary']['units_affected'], 4)
+        self.assertEqual(result['summary']['units_updated'], 2)
+
+    def test_unknown_update_type(self):
+        with self.assertRaises(ValueError):
+            reprice_units(self.units(), 'double', 2)
+
+    def test_constant_statement_count(self):
+        get_landlord_stats(self.landlord)
+        counts = []
+        for size in (5, 500):
+            self.make_units(size, rent='9000', prefix=f'N{size}')
+            with CaptureQueriesContext(connection) as captured:
+                reprice_units(self.units(), 'fixed', 100, landlord_id=self.landlord.id)
+            statements = [q['sql'] for q in captured.captured_queries if 'SAVEPOINT' not in q['sql']]
+            # SELECT, UPDATE units, UPDATE stats
+            counts.append(len(statements))
+        self.assertEqual(counts, [3, 3])
+
+    def test_twenty_thousand_units(self):
+        self.make_units(20000)
+        started = time.perf_counter()
+        result = reprice_units(self.units(), 'percentage', 5, landlord_id=self.landlord.id)
+        elapsed = time.perf_counter() - started
+        self.assertEqual(result['summary']['units_updated'], 20000)
+        self.assertLess(elapsed, 1.0)
+
+    def test_bulk_rent_update_view(self):
+        self.make_units(2, prefix='STUDIO', unit_type=self.studio)
+        self.make_units(1)
+        client = APIClient()
+        client.force_authenticate(user=self.landlord)
+        url = reverse('bulk-rent-update')
+
+        response = client.post(url, {
+            'update_type': 'fixed', 'amount': 1000, 'unit_type_filter': 'Studio', 'preview_only': True
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary']['units_affected'], 2)
+        self.assertEqual(response.data['preview_data'][0]['new_rent'], 11000.0)
+
+        response = client.post(url, {
+            'update_type': 'fixed', 'amount': 1000, 'unit_type_filter': 'Studio'
+        }, format='json')
+        self.assertEqual(response.data['units_updated'], 2)
+        self.assertEqual(len(response.data['changes']), 2)
+        self.assertEqual(self.units().filter(rent=Decimal('11000')).count(), 2)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RentRevisionTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='revision-landlord@test.com',
+            full_name='Revision Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Revision Court', city='Nairobi', state='Nairobi', unit_count=10
+        )
+        self.studio = UnitType.objects.create(landlord=self.landlord, name='Studio', rent=Decimal('8000'))
+        self.studios = Unit.objects.bulk_create([
+            Unit(
+                property_obj=self.property, unit_code=f'REV-S-{i}', unit_number=f'S{i}', unit_type=self.studio,
+                rent=Decimal('8000'), rent_paid=Decimal('2000'), rent_remaining=Decimal('6000')
+            )
+            for i in range(7)
+        ])
+        self.other = Unit.objects.create(
+            property_obj=self.property, unit_code='REV-O-1', unit_number='O1', rent=Decimal('12000')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.landlord)
+        self.today = timezone.localdate()
+
+    def schedule(self, **kwargs):
+        data = {
+            'adjustment_type': 'percentage', 'value': '10', 'scope': 'unit_type',
+            'unit_type': self.studio.id, 'effective_date': self.today + timedelta(days=7),
+        }
+        data.update(kwargs)
+        response = self.client.post(reverse('rent-revision-list'), data, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return RentRevision.objects.get(pk=response.data['id'])
+
+    def test_revision_waits_for_effective_date(self):
+        revision = self.schedule()
+        self.assertEqual(apply_due_revisions(today=self.today), 0)
+        self.assertEqual(apply_due_revisions(today=revision.effective_date, chunk_size=3), 1)
+
+        revision.refresh_from_db()
+        self.assertEqual(revision.status, 'applied')
+        self.assertEqual(revision.units_updated, 7)
+        self.assertEqual(revision.items.count(), 7)
+        unit = Unit.objects.get(pk=self.studios[0].pk)
+        self.assertEqual(unit.rent, Decimal('8800'))
+        self.assertEqual(unit.rent_paid, Decimal('2000'))
+        self.assertEqual(unit.rent_remaining, Decimal('6800'))
+        self.assertEqual(Unit.objects.get(pk=self.other.pk).rent, Decimal('12000'))
+
+    def test_interrupted_run_resumes_without_reapplying(self):
+        revision = self.schedule(effective_date=self.today)
+        # Simulate a worker that died after writing the first chunk
+        first = Unit.objects.filter(pk__in=[u.pk for u in self.studios[:3]])
+        changes = reprice_units(first, 'percentage', 10, precision=2, recompute_paid=False)['changes']
+        RentRevisionItem.objects.bulk_create([
+            RentRevisionItem(
+                revision=revision, unit_id=c['unit_id'], old_rent=c['old_rent'], new_rent=c['new_rent'],
+                old_rent_remaining=c['old_rent_remaining'], new_rent_remaining=c['rent_remaining']
+            )
+            for c in changes
+        ])
+        RentRevision.objects.filter(pk=revision.pk).update(status='applying', units_updated=3)
+
+        apply_due_revisions(today=self.today, chunk_size=2)
+        revision.refresh_from_db()
+        self.assertEqual(revision.units_updated, 7)
+        self.assertEqual(Unit.objects.filter(unit_type=self.studio, rent=Decimal('8800')).count(), 7)
+
+    @override_settings(RENT_REVISION_MAX_ATTEMPTS=2)
+    def test_failed_run_is_retried_until_the_attempt_cap(self):
+        revision = self.schedule(effective_date=self.today)
+        calls = []
+
+        def fail_after_first_chunk(*args, **kwargs):
+            if calls:
+                raise RuntimeError('database went away')
+            calls.append(1)
+            return reprice_units(*args, **kwargs)
+
+        with patch('accounts.rent_engine.reprice_units', side_effect=fail_after_first_chunk):
+            self.assertEqual(apply_due_revisions(today=self.today, chunk_size=3), 0)
+        revision.refresh_from_db()
+        self.assertEqual((revision.status, revision.attempts, revision.units_updated), ('applying', 1, 3))
+        self.assertEqual(revision.error, 'database went away')
+
+        # The next run resumes after the committed chunk
+        self.assertEqual(apply_due_revisions(today=self.today, chunk_size=3), 1)
+        revision.refresh_from_db()
+        self.assertEqual((revision.status, revision.units_updated), ('applied', 7))
+        self.assertEqual(Unit.objects.filter(unit_type=self.studio, rent=Decimal('8800')).count(), 7)
+
+        stuck = self.schedule(effective_date=self.today)
+        with patch('accounts.rent_engine.reprice_units', side_effect=RuntimeError('bad data')):
+            apply_due_revisions(today=self.today)
+            apply_due_revisions(today=self.today)
+        stuck.refresh_from_db()
+        self.assertEqual((stuck.status, stuck.attempts), ('failed', 2))
+
+    def test_rollback_restores_unchanged_units(self):
+        revision = self.schedule(effective_date=self.today)
+        apply_due_revisions(today=self.today)
+        # A unit repriced again since the revision keeps its newer rent
+        Unit.objects.filter(pk=self.studios[0].pk).update(rent=Decimal('9500'))
+
+        response = self.client.post(reverse('rent-revision-rollback', args=[revision.pk]))
+        self.assertEqual(response.data['units_restored'], 6)
+        self.assertEqual(Unit.objects.get(pk=self.studios[1].pk).rent_remaining, Decimal('6000'))
+        self.assertEqual(Unit.objects.get(pk=self.studios[0].pk).rent, Decimal('9500'))
+        revision.refresh_from_db()
+        self.assertEqual(revision.status, 'rolled_back')
+
+        response = self.client.post(reverse('rent-revision-rollback', args=[revision.pk]))
+        self.assertEqual(response.status_code, 400)
+
+    def test_cancel_only_scheduled(self):
+        revision = self.schedule()
+        url = reverse('rent-revision-detail', args=[revision.pk])
+        self.assertEqual(self.client.delete(url).status_code, 200)
+        self.assertEqual(self.client.delete(url).status_code, 400)
+        self.assertEqual(apply_due_revisions(today=revision.effective_date), 0)
+
+    def test_adjust_rent_with_future_date_is_queued(self):
+        response = self.client.post(reverse('adjust-rent'), {
+            'adjustment_type': 'fixed', 'value': '500',
+            'effective_date': str(self.today + timedelta(days=30)),
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Unit.objects.get(pk=self.other.pk).rent, Decimal('12000'))
+        self.assertEqual(RentRevision.objects.get().scope, 'all')
+
+        response = self.client.post(reverse('adjust-rent'), {
+            'adjustment_type': 'fixed', 'value': '-13000',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        # Rent never goes negative
+        self.assertEqual(Unit.objects.get(pk=self.other.pk).rent, Decimal('0'))
+
+    def test_scope_must_belong_to_landlord(self):
+        stranger = CustomUser.objects.create_user(
+            email='revision-stranger@test.com', full_name='Stranger', user_type='landlord', password='testpass123'
+        )
+        foreign = UnitType.objects.create(landlord=stranger, name='Foreign', rent=Decimal('1000'))
+        response = self.client.post(reverse('rent-revision-list'), {
+            'adjustment_type': 'fixed', 'value': '100', 'scope': 'unit_type',
+            'unit_type': foreign.id, 'effective_date': self.today,
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,195 @@
+"""
+Tests and benchmark for the set-based tenant retention engine
+"""
+import io
+import os
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import ArchivedTenant, CustomUser, LandlordStats, Property, TenantProfile, Unit
+from accounts.retention import candidates, purge, purge_chunk
+from accounts.stats import compute_landlord_stats, rebuild_landlord_stats
+from app.tasks import delete_left_tenants, delete_unpaid_deposit_tenants
+from communication.models import Report
+from payments.models import Payment
+
+STATS_FIELDS = ('total_units', 'occupied_units', 'vacant_units', 'active_tenants', 'month_revenue')
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class TenantRetentionTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+        self.landlord = CustomUser.objects.create_user(
+            email='retention-landlord@test.com', full_name='Retention Landlord', user_type='landlord', password='x'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Retention Court', city='Nairobi', state='Nairobi', unit_count=1000
+        )
+        self.count = 0
+
+    def make_tenant(self, assigned_days_ago=30, left_days_ago=None, deposit_days_after=None, rent_paid_days_after=None):
+        """A tenant on their own unit, optionally with a completed deposit/rent payment"""
+        self.count += 1
+        tenant = CustomUser.objects.create_user(
+            email=f'retention-tenant{self.count}@test.com', full_name=f'Tenant {self.count}',
+            user_type='tenant', password='x'
+        )
+        assigned = self.now - timedelta(days=assigned_days_ago)
+        unit = Unit.objects.create(
+            property_obj=self.property, unit_code=f'RET-{self.count}', unit_number=str(self.count),
+            rent=Decimal('5000'), tenant=tenant, is_available=False,
+        )
+        # save() stamps the assignment with now; backdate it
+        Unit.objects.filter(pk=unit.pk).update(
+            assigned_date=assigned,
+            left_date=self.now - timedelta(days=left_days_ago) if left_days_ago is not None else None,
+        )
+        unit.refresh_from_db()
+        TenantProfile.objects.create(tenant=tenant, landlord=self.landlord, current_unit=unit)
+        for payment_type, days_after in (('deposit', deposit_days_after), ('rent', rent_paid_days_after)):
+            if days_after is not None:
+                payment = Payment.objects.create(
+                    tenant=tenant, unit=unit, payment_type=payment_type, amount=Decimal('5000'),
+                    status='completed', reference_number=f'RET-{payment_type}-{self.count}'
+                )
+                Payment.objects.filter(pk=payment.pk).update(created_at=assigned + timedelta(days=days_after))
+        return tenant
+
+    def test_candidates_are_one_anti_join_per_policy(self):
+        unpaid = self.make_tenant()
+        late = self.make_tenant(deposit_days_after=20)
+        self.make_tenant(deposit_days_after=3)
+        self.make_tenant(assigned_days_ago=5)
+        left = self.make_tenant(deposit_days_after=1, left_days_ago=10)
+        self.make_tenant(deposit_days_after=1, left_days_ago=3)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(candidates('unpaid_deposit', self.now), [unpaid.id, late.id])
+        with self.assertNumQueries(1):
+            self.assertEqual(candidates('left', self.now), [left.id])
+
+    def test_dry_run_reports_without_touching_anything(self):
+        unpaid = self.make_tenant()
+        left = self.make_tenant(deposit_days_after=1, left_days_ago=10)
+        users = CustomUser.objects.count()
+
+        report = purge(dry_run=True, now=self.now)
+        self.assertTrue(report['dry_run'])
+        self.assertEqual(report['policies']['unpaid_deposit'], {'count': 1, 'tenant_ids': [unpaid.id], 'purged': 0})
+        self.assertEqual(report['policies']['left'], {'count': 1, 'tenant_ids': [left.id], 'purged': 0})
+        self.assertEqual(CustomUser.objects.count(), users)
+        self.assertFalse(ArchivedTenant.objects.exists())
+
+        out = io.StringIO()
+        call_command('purge_tenants', '--dry-run', '--policy', 'left', stdout=out)
+        self.assertIn(f'left: 1 candidates, 0 purged; ids: {left.id}', out.getvalue())
+        self.assertIn('Would purge 1 tenants', out.getvalue())
+
+    def test_purge_archives_then_deletes_and_keeps_the_books(self):
+        keep = self.make_tenant(deposit_days_after=2)
+        unpaid = self.make_tenant()
+        left = self.make_tenant(deposit_days_after=1, rent_paid_days_after=5, left_days_ago=10)
+        Report.objects.create(
+            tenant=left, unit=left.unit, issue_category='plumbing', priority_level='low',
+            issue_title='Tap', description='Dripping'
+        )
+        rebuild_landlord_stats(self.landlord.id)
+
+        report = purge(now=self.now, chunk_size=1)
+        self.assertEqual(report['purged'], 2)
+
+        self.assertEqual(set(CustomUser.objects.filter(user_type='tenant').values_list('id', flat=True)), {keep.id})
+        archived = {row.tenant_id: row for row in ArchivedTenant.objects.all()}
+        self.assertEqual(set(archived), {unpaid.id, left.id})
+        self.assertEqual(archived[left.id].reason, 'left')
+        self.assertEqual(archived[left.id].email, left.email)
+        self.assertEqual(archived[left.id].landlord_id, self.landlord.id)
+        self.assertEqual(archived[left.id].unit_code, 'RET-3')
+        self.assertIsNotNone(archived[left.id].data['left_date'])
+
+        # Payments stay on the landlord's books, detached from the account
+        self.assertEqual(Payment.objects.filter(reference_number__startswith='RET-', tenant__isnull=True).count(), 2)
+        self.assertFalse(Unit.objects.filter(tenant_id__in=[unpaid.id, left.id]).exists())
+        self.assertFalse(TenantProfile.objects.filter(tenant_id__in=[unpaid.id, left.id]).exists())
+        self.assertFalse(Report.objects.filter(tenant_id=left.id).exists())
+
+        # The dashboard counters followed the bulk changes
+        stats = LandlordStats.objects.get(landlord=self.landlord)
+        expected = compute_landlord_stats(self.landlord.id)
+        self.assertEqual({f: getattr(stats, f) for f in STATS_FIELDS}, {f: expected[f] for f in STATS_FIELDS})
+        self.assertEqual(stats.active_tenants, 1)
+
+    def test_chunk_rechecks_the_policy(self):
+        tenant = self.make_tenant()
+        [tenant_id] = candidates('unpaid_deposit', self.now)
+        # The deposit lands between the scan and the purge
+        payment = Payment.objects.create(
+            tenant=tenant, unit=tenant.unit, payment_type='deposit', amount=Decimal('5000'), status='completed',
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=tenant.unit.assigned_date + timedelta(days=1))
+        self.assertEqual(purge_chunk('unpaid_deposit', [tenant_id], self.now), 0)
+        self.assertTrue(CustomUser.objects.filter(pk=tenant.pk).exists())
+
+    def test_queries_per_chunk_do_not_grow_with_its_size(self):
+        def purge_queries(count):
+            for _ in range(count):
+                self.make_tenant()
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(purge(['unpaid_deposit'], now=self.now, chunk_size=100)['purged'], count)
+            return len(captured)
+
+        self.assertEqual(purge_queries(2), purge_queries(12))
+
+    def test_tasks_use_the_engine(self):
+        self.make_tenant()
+        self.make_tenant(deposit_days_after=1, left_days_ago=10)
+        self.assertEqual(delete_unpaid_deposit_tenants(), 'Deleted 1 tenants for unpaid deposit')
+        self.assertEqual(delete_left_tenants(), 'Deleted 1 tenants who left units')
+        self.assertEqual(ArchivedTenant.objects.count(), 2)
+
+    @skipUnless(os.environ.get('TENANT_PURGE_BENCHMARK'), 'set TENANT_PURGE_BENCHMARK=<tenants> to run')
+    def test_benchmark_purge_throughput(self):
+        """Seeded with bulk inserts, e.g. TENANT_PURGE_BENCHMARK=100000"""
+        count = int(os.environ['TENANT_PURGE_BENCHMARK'])
+        assigned = self.now - timedelta(days=30)
+        tenants = CustomUser.objects.bulk_create([
+            CustomUser(email=f'bench{i}@test.com', full_name=f'Bench {i}', user_type='tenant', password='!')
+            for i in range(count)
+        ], batch_size=2000)
+        tenants = list(CustomUser.objects.filter(email__startswith='bench').order_by('id'))
+        units = Unit.objects.bulk_create([
+            Unit(
+                property_obj=self.property, unit_code=f'BENCH-{i}', unit_number=str(i), rent=Decimal('5000'),
+                rent_remaining=Decimal('5000'), tenant=tenant, is_available=False, assigned_date=assigned,
+            )
+            for i, tenant in enumerate(tenants)
+        ], batch_size=2000)
+        TenantProfile.objects.bulk_create([
+            TenantProfile(tenant=tenant, landlord=self.landlord, current_unit=unit)
+            for tenant, unit in zip(tenants, units)
+        ], batch_size=2000)
+        # Half of them paid their deposit on time
+        Payment.objects.bulk_create([
+            Payment(
+                tenant=tenant, unit=unit, payment_type='deposit', amount=Decimal('5000'),
+                status='completed', reference_number=f'BENCH-DEP-{i}'
+            )
+            for i, (tenant, unit) in enumerate(zip(tenants, units)) if i % 2 == 0
+        ], batch_size=2000)
+        Payment.objects.filter(reference_number__startswith='BENCH-DEP-').update(created_at=assigned)
+
+        dry = purge(['unpaid_deposit'], dry_run=True, now=self.now)
+        report = purge(['unpaid_deposit'], now=self.now)
+
+        self.assertEqual(dry['policies']['unpaid_deposit']['count'], count // 2)
+        self.assertEqual(report['purged'], count // 2)
+        self.assertEqual(ArchivedTenant.objects.count(), count // 2)
+        self.assertEqual(CustomUser.objects.filter(email__startswith='bench').count(), count - count // 2)
@@ -0,0 +1,116 @@
+"""
+Tests for memoized role resolution and the JWT role claim
+"""
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import CustomUser, Property
+
+LANDLORD_ENDPOINTS = ['property-list', 'dashboard-stats', 'landlord-tenants', 'unit-type-list']
+
+
+def role_queries(captured):
+    """Queries that resolve the requesting user's Groups"""
+    return [q['sql'] for q in captured.captured_queries if q['sql'].startswith('SELECT "auth_group"')]
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RoleMemoizationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.landlord = CustomUser.objects.create_user(
+            email='roles-landlord@test.com',
+            full_name='Roles Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+
+    def test_roles_resolved_with_single_query(self):
+        user = CustomUser.objects.get(pk=self.landlord.pk)
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                self.assertTrue(user.is_landlord)
+                self.assertFalse(user.is_tenant)
+
+    def test_group_change_invalidates_memo_and_bumps_version(self):
+        user = CustomUser.objects.get(pk=self.landlord.pk)
+        version = user.roles_version
+        self.assertTrue(user.is_landlord)
+
+        user.groups.remove(Group.objects.get(name='landlord'))
+        user.groups.add(Group.objects.get(name='tenant'))
+
+        self.assertFalse(user.is_landlord)
+        self.assertTrue(user.is_tenant)
+        user.refresh_from_db()
+        self.assertEqual(user.roles_version, version + 2)
+        self.assertEqual(user.user_type, 'tenant')
+
+    def test_resaving_user_does_not_touch_groups(self):
+        user = CustomUser.objects.get(pk=self.landlord.pk)
+        version = user.roles_version
+        user.full_name = 'Renamed Landlord'
+        user.save()
+        user.refresh_from_db()
+        self.assertEqual(user.roles_version, version)
+
+    def test_token_carries_role_claim(self):
+        client = APIClient()
+        response = client.post(reverse('token_obtain_pair'), {
+            'email': 'roles-landlord@test.com', 'password': 'testpass123'
+        })
+        self.assertEqual(response.status_code, 200)
+        token = RefreshToken(response.data['refresh'])
+        self.assertEqual(token['roles'], ['landlord'])
+        self.assertEqual(token['roles_version'], self.landlord.roles_version)
+
+    def test_stale_claim_is_ignored(self):
+        access = self._login_token()
+        # Demote the landlord after the token was issued
+        self.landlord.groups.remove(Group.objects.get(name='landlord'))
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+        response = client.get(reverse('property-list'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_landlord_endpoint_query_benchmark(self):
+        """
+        Query counts for landlord endpoints: a token without the role claim
+        (old behaviour, roles from the DB) vs one with it (no group queries).
+        """
+        Property.objects.create(
+            landlord=self.landlord, name='Bench Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        tokens = {
+            'before': str(RefreshToken.for_user(self.landlord).access_token),
+            'after': self._login_token(),
+        }
+        results = {}
+        for label, access in tokens.items():
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+            for name in LANDLORD_ENDPOINTS:
+                client.get(reverse(name))  # warm the subscription cache
+                with CaptureQueriesContext(connection) as captured:
+                    response = client.get(reverse(name))
+                self.assertEqual(response.status_code, 200, name)
+                results[(label, name)] = (len(captured), len(role_queries(captured)))
+
+        for name in LANDLORD_ENDPOINTS:
+            before, before_groups = results[('before', name)]
+            after, after_groups = results[('after', name)]
+            self.assertGreater(before_groups, 0, name)
+            self.assertEqual(after_groups, 0, name)
+            self.assertLess(after, before, name)
+
+    def _login_token(self):
+        response = APIClient().post(reverse('token_obtain_pair'), {
+            'email': 'roles-landlord@test.com', 'password': 'testpass123'
+        })
+        return response.data['access']
@@ -0,0 +1,121 @@
+"""
+Tests for the incrementally maintained landlord dashboard stats
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, LandlordStats, Property, Unit
+from accounts.stats import compute_landlord_stats, get_landlord_stats
+from payments.models import Payment
+
+STAT_FIELDS = (
+    'total_properties', 'total_units', 'occupied_units', 'vacant_units',
+    'active_tenants', 'rent_collected', 'rent_outstanding', 'month_revenue',
+)
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class LandlordStatsTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='stats-landlord@test.com',
+            full_name='Stats Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='stats-tenant@test.com',
+            full_name='Stats Tenant',
+            user_type='tenant',
+            password='testpass123'
+        )
+        # Build the row up front so every later change is applied incrementally
+        get_landlord_stats(self.landlord)
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Stats Court', city='Nairobi', state='Nairobi', unit_count=50
+        )
+
+    def make_unit(self, number, rent='10000'):
+        return Unit.objects.create(
+            property_obj=self.property,
+            unit_code=f'STATS-{number}',
+            unit_number=str(number),
+            rent=Decimal(rent),
+        )
+
+    def assertStatsMatchRebuild(self):
+        stats = LandlordStats.objects.get(landlord=self.landlord)
+        fresh = compute_landlord_stats(self.landlord.id)
+        for field in STAT_FIELDS:
+            self.assertEqual(getattr(stats, field), fresh[field], field)
+
+    def test_incremental_updates_match_rebuild(self):
+        unit = self.make_unit(1)
+        self.make_unit(2, rent='8000')
+        self.assertStatsMatchRebuild()
+
+        # Assign a tenant
+        unit = Unit.objects.get(pk=unit.pk)
+        unit.tenant = self.tenant
+        unit.is_available = False
+        unit.save()
+        self.assertStatsMatchRebuild()
+
+        # Pending payment completes
+        payment = Payment.objects.create(
+            tenant=self.tenant, unit=unit, payment_type='rent', amount=Decimal('4000')
+        )
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.status = 'completed'
+        payment.save()
+        # Saving again must not double count
+        payment.save()
+        unit.rent_paid += Decimal('4000')
+        unit.save()
+        self.assertStatsMatchRebuild()
+
+        stats = LandlordStats.objects.get(landlord=self.landlord)
+        self.assertEqual(stats.total_units, 2)
+        self.assertEqual(stats.occupied_units, 1)
+        self.assertEqual(stats.month_revenue, Decimal('4000'))
+        self.assertEqual(stats.rent_outstanding, Decimal('14000'))
+
+        # Deleting the unit removes its contribution and its payments' revenue
+        unit.delete()
+        self.assertStatsMatchRebuild()
+
+    def test_dashboard_is_constant_query(self):
+        client = APIClient()
+        client.force_authenticate(user=self.landlord)
+        url = reverse('dashboard-stats')
+        client.get(url)  # warm the subscription cache
+
+        self.make_unit(1)
+        with CaptureQueriesContext(connection) as small:
+            response = client.get(url)
+        self.assertEqual(response.data['total_units_available'], 1)
+
+        for number in range(2, 30):
+            self.make_unit(number)
+        with CaptureQueriesContext(connection) as large:
+            response = client.get(url)
+        self.assertEqual(response.data['total_units_available'], 29)
+        self.assertEqual(len(small), len(large))
+
+    def test_reconcile_command_repairs_drift(self):
+        self.make_unit(1)
+        # Bulk writes bypass signals and leave the row stale
+        Unit.objects.filter(property_obj=self.property).update(is_available=False)
+        self.assertEqual(LandlordStats.objects.get(landlord=self.landlord).occupied_units, 0)
+
+        out = StringIO()
+        call_command('reconcile_landlord_stats', stdout=out)
+        self.assertIn('1 had drifted', out.getvalue())
+        self.assertStatsMatchRebuild()
@@ -0,0 +1,104 @@
+"""
+Query-count tests for the landlord tenant listing
+"""
+from decimal import Decimal
+
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, TenantProfile, Unit
+from accounts.serializers import TenantWithUnitSerializer
+from payments.models import Payment
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class TenantListingQueryCountTests(TestCase):
+    def make_landlord(self, label):
+        return CustomUser.objects.create_user(
+            email=f'{label}-landlord@test.com',
+            full_name=f'{label} Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+
+    def populate(self, landlord, count):
+        """Bulk-create `count` tenants, each with a unit; every other one paid a deposit"""
+        label = landlord.email.split('@')[0]
+        tenant_group = Group.objects.get(name='tenant')
+        prop = Property.objects.create(
+            landlord=landlord, name=f'{label} Court', city='Nairobi', state='Nairobi', unit_count=count
+        )
+        tenants = CustomUser.objects.bulk_create([
+            CustomUser(email=f'{label}-t{i}@test.com', full_name=f'Tenant {i}', user_type='tenant', password='!')
+            for i in range(count)
+        ])
+        CustomUser.groups.through.objects.bulk_create([
+            CustomUser.groups.through(customuser_id=t.id, group_id=tenant_group.id) for t in tenants
+        ])
+        TenantProfile.objects.bulk_create([
+            TenantProfile(tenant=t, landlord=landlord) for t in tenants
+        ])
+        rents = [Decimal('0'), Decimal('10000'), Decimal('4000')]
+        units = Unit.objects.bulk_create([
+            Unit(
+                property_obj=prop, unit_code=f'{label}-{i}', unit_number=str(i), tenant=t,
+                is_available=False, rent=Decimal('10000'), rent_remaining=rents[i % 3],
+            )
+            for i, t in enumerate(tenants)
+        ])
+        Payment.objects.bulk_create([
+            Payment(
+                tenant=t, unit=u, payment_type='deposit', amount=Decimal('5000'),
+                status='completed', reference_number=f'{label}-dep-{i}'
+            )
+            for i, (t, u) in enumerate(zip(tenants, units)) if i % 2 == 0
+        ])
+
+    def tenants_of(self, landlord):
+        return CustomUser.objects.filter(tenant_profile__landlord=landlord, groups__name='tenant')
+
+    def test_query_count_is_constant(self):
+        for size in (10, 1000, 10000):
+            landlord = self.make_landlord(f'n{size}')
+            self.populate(landlord, size)
+            queryset = TenantWithUnitSerializer.setup_eager_loading(self.tenants_of(landlord))
+            with self.assertNumQueries(1):
+                data = TenantWithUnitSerializer(queryset, many=True).data
+            self.assertEqual(len(data), size)
+
+    def test_annotated_fields_match_per_row_lookups(self):
+        landlord = self.make_landlord('compare')
+        self.populate(landlord, 6)
+        # A tenant without a unit
+        loner = CustomUser.objects.create_user(
+            email='loner@test.com', full_name='Loner', user_type='tenant', password='testpass123'
+        )
+        TenantProfile.objects.create(tenant=loner, landlord=landlord)
+
+        plain = TenantWithUnitSerializer(self.tenants_of(landlord).order_by('id'), many=True).data
+        eager = TenantWithUnitSerializer(
+            TenantWithUnitSerializer.setup_eager_loading(self.tenants_of(landlord)).order_by('id'),
+            many=True
+        ).data
+        self.assertEqual(plain, eager)
+        statuses = {row['rent_status'] for row in eager}
+        self.assertEqual(statuses, {'paid', 'due', 'overdue', 'no_unit'})
+        self.assertEqual(sum(row['deposit_paid'] for row in eager), 3)
+
+    def test_view_query_count_does_not_grow(self):
+        counts = []
+        for size in (5, 50):
+            landlord = self.make_landlord(f'view{size}')
+            self.populate(landlord, size)
+            client = APIClient()
+            client.force_authenticate(user=landlord)
+            client.get(reverse('landlord-tenants'))  # warm the subscription cache
+            with CaptureQueriesContext(connection) as captured:
+                response = client.get(reverse('landlord-tenants'))
+            self.assertEqual(len(response.data), size)
+            counts.append(len(captured))
+        self.assertEqual(counts[0], counts[1])
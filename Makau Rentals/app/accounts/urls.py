@@ -16,12 +16,16 @@ from .views import (
     CreatePropertyView,
     LandlordPropertiesView,
     CreateUnitView,
+    BulkCreateUnitsView,
     PropertyUnitsView,
     AssignTenantView,
     UpdatePropertyView,
     UpdateUnitView,
     TenantUpdateUnitView,
     AdjustRentView,
+    RentRevisionListCreateView,
+    RentRevisionDetailView,
+    RentRevisionRollbackView,
     SubscriptionStatusView,
     UpdateTillNumberView,
     UpdateReminderPreferencesView,
@@ -78,6 +82,7 @@ urlpatterns = [
     # Unit management
     path('units/', UnitListView.as_view(), name='unit-list'),
     path('units/create/', CreateUnitView.as_view(), name='unit-create'),
+    path('units/bulk-create/', BulkCreateUnitsView.as_view(), name='unit-bulk-create'),
     path('units/<int:unit_id>/', UpdateUnitView.as_view(), name='unit-detail'),
     path('units/<int:unit_id>/assign/<int:tenant_id>/', AssignTenantView.as_view(), name='assign-tenant'),
     path('units/<int:unit_id>/remove-tenant/', RemoveTenantFromUnitView.as_view(), name='remove-tenant'),
@@ -90,6 +95,9 @@ urlpatterns = [
     # Dashboard & Stats
     path('dashboard/stats/', LandlordDashboardStatsView.as_view(), name='dashboard-stats'),
     path('rent/adjust/', AdjustRentView.as_view(), name='adjust-rent'),
+    path('rent/revisions/', RentRevisionListCreateView.as_view(), name='rent-revision-list'),
+    path('rent/revisions/<int:pk>/', RentRevisionDetailView.as_view(), name='rent-revision-detail'),
+    path('rent/revisions/<int:pk>/rollback/', RentRevisionRollbackView.as_view(), name='rent-revision-rollback'),
     
     # Subscription
     path('subscription/status/', SubscriptionStatusView.as_view(), name='subscription-status'),
@@ -14,16 +14,28 @@ from accounts.serializers import (
     CustomUserSerializer,
     TenantRegistrationSerializer,
     AvailableUnitsSerializer,
+    RentRevisionSerializer,
 )
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from django.core.cache import cache
 from django.core.mail import send_mail
 from django.conf import settings
-from .models import Property, Unit, CustomUser, Subscription, UnitType,TenantProfile
+from .models import Property, Unit, CustomUser, Subscription, UnitType,TenantProfile, TenantApplication, RentRevision
 from payments.models import Payment
 from django.shortcuts import get_object_or_404
 from .permissions import IsLandlord, IsTenant, IsSuperuser, HasActiveSubscription
+from .cache_utils import landlord_cache_key, user_cache_key
+from .stats import current_month_start, get_landlord_stats
+from .rent_engine import reprice_units, rollback_revision
+from .provisioning import (
+    SPEC_FIELDS, ProvisioningError, decode_structured, expand_floor_layout, expand_ranges, provision_units,
+    read_csv,
+)
+from app.pagination import (
+    CompatCursorPagination, IdCursorPagination, UserCursorPagination, paginate_list
+)
 from communication.models import Report
 from communication.serializers import ReportSerializer
 from django.core.exceptions import ValidationError
@@ -41,7 +53,8 @@ from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Count, Sum, Q
 from django.utils import timezone
 from datetime import timedelta
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
+from django.utils.dateparse import parse_date
 
 # accounts/views.py
 from rest_framework_simplejwt.views import TokenObtainPairView
@@ -79,6 +92,14 @@ class LandlordTenantsView(APIView):
         else:
             return Response({"error": "Permission denied"}, status=403)
         
+        # One query for the whole page: unit, property, deposit and rent status joined in
+        tenants = TenantWithUnitSerializer.setup_eager_loading(tenants)
+        paginated = paginate_list(
+            UserCursorPagination, tenants, request, self,
+            lambda page: TenantWithUnitSerializer(page, many=True).data
+        )
+        if paginated is not None:
+            return paginated
         serializer = TenantWithUnitSerializer(tenants, many=True)
         return Response(serializer.data)
 
@@ -134,71 +155,23 @@ class UnitTypeListCreateView(APIView):
         else:
             start_number = 1
 
-        units_created = []
-        for i in range(unit_count):
-            unit_number = start_number + i
-            unit_code = f"U-{property_obj.id}-{unit_type.name.replace(' ', '-')}-{unit_number}"
-
-            unit = Unit.objects.create(
-                property_obj=property_obj,
-                unit_code=unit_code,
-                unit_number=str(unit_number),
-                unit_type=unit_type,
-                is_available=True,
-                rent=unit_type.rent,
-                deposit=unit_type.deposit,
-            )
-            units_created.append(unit)
-
-        # Invalidate caches after creating units
-        cache.delete(f"landlord:{unit_type.landlord.id}:properties")
-        cache.delete(f"property:{property_obj.id}:units")
-
-        return units_created
+        specs = expand_ranges([{
+            'start': start_number, 'end': start_number + unit_count - 1, 'unit_type': unit_type.id,
+        }])
+        return provision_units(property_obj.landlord, property_obj, specs)['units']
 
 class LandlordDashboardStatsView(APIView):
     permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
 
     def get(self, request):
-        landlord = request.user
-
-        # Total active tenants: tenants assigned to units of this landlord and active
-        total_active_tenants = CustomUser.objects.filter(
-            groups__name='tenant',
-            is_active=True,
-            unit__property_obj__landlord=landlord
-        ).distinct().count()
-
-        # Total units available
-        total_units_available = Unit.objects.filter(
-            property_obj__landlord=landlord,
-            is_available=True
-        ).count()
-
-        # Total units occupied
-        total_units_occupied = Unit.objects.filter(
-            property_obj__landlord=landlord,
-            is_available=False
-        ).count()
-
-        # Monthly revenue: sum of successful rent payments in the current month for this landlord
-        now = timezone.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        # Use created_at field instead of transaction_date
-        monthly_revenue_agg = Payment.objects.filter(
-            unit__property_obj__landlord=landlord,
-            payment_type='rent',
-            status='completed',  # ✅ FIXED: Changed from 'Success' to 'completed'
-            created_at__gte=start_of_month,  # Changed from transaction_date
-            created_at__lte=now  # Changed from transaction_date
-        ).aggregate(total=Sum('amount'))
-        monthly_revenue = monthly_revenue_agg['total'] or 0
+        # Single-row read of the incrementally maintained stats (accounts/stats.py)
+        stats = get_landlord_stats(request.user)
+        monthly_revenue = stats.month_to_date_revenue(current_month_start())
 
         data = {
-            "total_active_tenants": total_active_tenants,
-            "total_units_available": total_units_available,
-            "total_units_occupied": total_units_occupied,
+            "total_active_tenants": stats.active_tenants,
+            "total_units_available": stats.vacant_units,
+            "total_units_occupied": stats.occupied_units,
             "monthly_revenue": float(monthly_revenue),
         }
 
@@ -245,7 +218,8 @@ class UserDetailView(APIView):
     permission_classes = [IsAuthenticated, HasActiveSubscription]
 
     def get(self, request, user_id):
-        cache_key = f"user:{user_id}"
+        # Retired by the user's cache generation (accounts/signals.py)
+        cache_key = user_cache_key(user_id, "detail")
         user_data = cache.get(cache_key)
 
         if not user_data:
@@ -475,12 +449,6 @@ class CreatePropertyView(APIView):
                 tracker.limit_reached = True
                 tracker.save(update_fields=['limit_reached'])
             
-            try:
-                cache.delete(f"landlord:{user.id}:properties")
-                logger.info(f"Cache cleared for user {user.id}")
-            except Exception as e:
-                logger.warning(f"Cache delete failed: {e}")
-            
             logger.info(f"Property created successfully: {property.id}, tracked in {tracker.id}")
             
             response_data = serializer.data
@@ -564,10 +532,11 @@ class LandlordPropertiesView(APIView):
     permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
 
     def get(self, request):
-        cache_key = f"landlord:{request.user.id}:properties"
+        # Versioned key: retired automatically when any property/unit changes
+        cache_key = landlord_cache_key(request.user.id, "properties")
         properties_data = cache.get(cache_key)
 
-        if not properties_data:
+        if properties_data is None:
             properties = Property.objects.filter(landlord=request.user)
             serializer = PropertySerializer(properties, many=True)
             properties_data = serializer.data
@@ -693,10 +662,6 @@ class CreateUnitView(APIView):
                     tracker.limit_reached = True
                     tracker.save(update_fields=['limit_reached'])
                 
-                # Invalidate caches
-                cache.delete(f"landlord:{request.user.id}:properties")
-                cache.delete(f"property:{unit.property_obj.id}:units")
-                
                 print(f"CreateUnitView: Unit created successfully - ID: {unit.id}, tracked in {tracker.id}")
                 
                 response_data = serializer.data
@@ -783,15 +748,96 @@ class CreateUnitView(APIView):
             return Response({"error": "Internal server error while creating unit"}, status=500)
 
 
+class BulkCreateUnitsView(APIView):
+    """
+    Provision many units of one property in a single request. Units are
+    described by `ranges`, a floor `layout` or an uploaded CSV `file`;
+    top-level unit_type/rent/deposit/bedrooms/bathrooms apply to every unit
+    that does not set its own. Send preview_only to validate without saving.
+    """
+    permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
+    parser_classes = [JSONParser, MultiPartParser, FormParser]
+
+    def post(self, request):
+        from accounts.subscription_utils import send_approaching_limit_email
+
+        property_id = request.data.get('property_obj')
+        if not property_id:
+            return Response({"error": "Property is required"}, status=400)
+        try:
+            property_obj = Property.objects.get(id=property_id, landlord=request.user)
+        except (Property.DoesNotExist, ValueError):
+            return Response({"error": "Property not found or you do not have permission"}, status=404)
+
+        defaults = {field: request.data.get(field) for field in SPEC_FIELDS if field != 'floor'}
+        # Multipart/form fields arrive as strings: "false" must not count as true
+        preview_only = str(request.data.get('preview_only', '')).lower() in ('1', 'true')
+        try:
+            if 'file' in request.FILES:
+                specs = read_csv(request.FILES['file'], defaults)
+            elif request.data.get('layout'):
+                specs = expand_floor_layout(decode_structured(request.data['layout'], 'layout'), defaults)
+            elif request.data.get('ranges'):
+                specs = expand_ranges(decode_structured(request.data['ranges'], 'ranges'), defaults)
+            else:
+                return Response({"error": "Provide ranges, a floor layout or a CSV file"}, status=400)
+
+            result = provision_units(request.user, property_obj, specs, apply=not preview_only)
+        except ProvisioningError as e:
+            if e.limit:
+                return Response({
+                    "error": e.errors[0],
+                    "current_count": e.limit['current_count'],
+                    "limit": e.limit['limit'],
+                    "upgrade_needed": True,
+                    "suggested_plan": e.limit.get('suggested_plan'),
+                    "action_required": "upgrade_subscription",
+                    "redirect_to": "/admin/subscription"
+                }, status=403)
+            return Response({"error": "Invalid unit batch", "errors": e.errors}, status=400)
+
+        limit_check = result['limit_check']
+        tracker = result['tracker']
+        response_data = {
+            'units_created': len(result['units']) if tracker else 0,
+            'units': UnitSerializer(result['units'], many=True).data,
+            'tracking': {
+                'total_units': limit_check['total_after'],
+                'limit': limit_check['limit'],
+                'limit_reached': tracker.limit_reached if tracker else False,
+                'tier_change_warning': limit_check.get('tier_change_warning', False),
+            }
+        }
+        if tracker is None:
+            response_data['preview'] = True
+            return Response(response_data)
+
+        limit = limit_check['limit']
+        if limit and limit_check['total_after'] >= limit - 1:
+            subscription = getattr(request.user, 'subscription', None)
+            send_approaching_limit_email(
+                landlord=request.user,
+                limit_type='unit',
+                current_count=limit_check['total_after'],
+                limit=limit,
+                current_plan=subscription.plan if subscription else 'unknown'
+            )
+            tracker.upgrade_notification_sent = True
+            tracker.save(update_fields=['upgrade_notification_sent'])
+
+        logger.info(f"BulkCreateUnitsView: Landlord {request.user.id} provisioned {len(result['units'])} units in property {property_obj.id}")
+        return Response(response_data, status=201)
+
+
 # List units of a property (cached)
 class PropertyUnitsView(APIView):
     permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
 
     def get(self, request, property_id):
-        cache_key = f"property:{property_id}:units"
+        cache_key = landlord_cache_key(request.user.id, "property", property_id, "units")
         units_data = cache.get(cache_key)
 
-        if not units_data:
+        if units_data is None:
             try:
                 property = Property.objects.get(id=property_id, landlord=request.user)
                 units = Unit.objects.filter(property_obj=property)
@@ -868,10 +914,6 @@ class AssignTenantView(APIView):
                 }
             )
 
-            # Invalidate caches
-            cache.delete(f"landlord:{request.user.id}:properties")
-            cache.delete(f"property:{unit.property_obj.id}:units")
-
             logger.info(f"✅ Tenant {tenant.full_name} assigned to unit {unit.unit_number}")
 
             return Response({
@@ -930,10 +972,6 @@ class RemoveTenantFromUnitView(APIView):
             unit.assigned_date = None
             unit.save()
 
-            # Invalidate caches
-            cache.delete(f"landlord:{request.user.id}:properties")
-            cache.delete(f"property:{unit.property_obj.id}:units")
-
             logger.info(f"✅ Tenant {tenant_name} removed from unit {unit.unit_number}")
 
             return Response({
@@ -994,8 +1032,6 @@ class UpdatePropertyView(APIView):
             serializer = PropertySerializer(property, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
-                cache.delete(f"landlord:{request.user.id}:properties")
-                cache.delete(f"property:{property_id}:units")
                 return Response(serializer.data)
             return Response(serializer.errors, status=400)
         except Property.DoesNotExist:
@@ -1005,8 +1041,6 @@ class UpdatePropertyView(APIView):
         try:
             property = Property.objects.get(id=property_id, landlord=request.user)
             property.delete()
-            cache.delete(f"landlord:{request.user.id}:properties")
-            cache.delete(f"property:{property_id}:units")
             return Response({"message": "Property deleted successfully."}, status=200)
         except Property.DoesNotExist:
             return Response({"error": "Property not found or you do not have permission"}, status=404)
@@ -1021,8 +1055,6 @@ class UpdateUnitView(APIView):
             serializer = UnitSerializer(unit, data=request.data, partial=True, context={'request': request})
             if serializer.is_valid():
                 serializer.save()
-                cache.delete(f"landlord:{request.user.id}:properties")
-                cache.delete(f"property:{unit.property_obj.id}:units")
                 return Response(serializer.data)
             return Response(serializer.errors, status=400)
         except Unit.DoesNotExist:
@@ -1031,10 +1063,7 @@ class UpdateUnitView(APIView):
     def delete(self, request, unit_id):
         try:
             unit = Unit.objects.get(id=unit_id, property_obj__landlord=request.user)
-            property_id = unit.property_obj.id
             unit.delete()
-            cache.delete(f"landlord:{request.user.id}:properties")
-            cache.delete(f"property:{property_id}:units")
             return Response({"message": "Unit deleted successfully."}, status=200)
         except Unit.DoesNotExist:
             return Response({"error": "Unit not found or you do not have permission"}, status=404)
@@ -1049,7 +1078,6 @@ class TenantUpdateUnitView(APIView):
             serializer = UnitNumberSerializer(unit, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
-                cache.delete(f"property:{unit.property_obj.id}:units")
                 return Response(serializer.data)
             return Response(serializer.errors, status=400)
         except Unit.DoesNotExist:
@@ -1067,7 +1095,6 @@ class UpdateUserView(APIView):
             serializer = UserSerializer(user, data=request.data, partial=True)
             if serializer.is_valid():
                 serializer.save()
-                cache.delete(f"user:{user_id}")
                 if user.user_type == "tenant":
                     cache.delete("tenants:list")
                 return Response(serializer.data)
@@ -1145,17 +1172,11 @@ class UpdateUserView(APIView):
                     unit.is_available = True
                     unit.assigned_date = None
                     unit.save()
-                
-                # Invalidate caches
-                cache.delete(f"landlord:{request.user.id}:properties")
-                for unit in units:
-                    cache.delete(f"property:{unit.property_obj.id}:units")
             
             tenant_name = user_to_delete.full_name
             user_to_delete.delete()
             
             # Clear caches
-            cache.delete(f"user:{user_id}")
             if getattr(user_to_delete, 'is_tenant', False):
                 cache.delete("tenants:list")
             
@@ -1177,8 +1198,47 @@ class UpdateUserView(APIView):
 
 
 class AdjustRentView(APIView):
+    """
+    Adjust rents for all of a landlord's units (or one unit type). With an
+    `effective_date` after today the change is queued as a RentRevision and
+    applied off-peak; otherwise it is applied now, in one set-based UPDATE.
+    """
     permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
 
+    def _scope(self, landlord, unit_type_id):
+        units = Unit.objects.filter(property_obj__landlord=landlord)
+        unit_type = None
+        if unit_type_id:
+            unit_type = UnitType.objects.get(id=unit_type_id, landlord=landlord)
+            units = units.filter(unit_type=unit_type)
+        return units, unit_type
+
+    def _schedule(self, request, adjustment_type, value, unit_type):
+        """Queue a RentRevision when a future effective_date was given, else None"""
+        raw_date = request.data.get('effective_date')
+        if not raw_date:
+            return None
+        effective_date = parse_date(str(raw_date))
+        if effective_date is None:
+            return Response({"error": "effective_date must be a date (YYYY-MM-DD)"}, status=400)
+        if effective_date < timezone.localdate():
+            return Response({"error": "effective_date cannot be in the past"}, status=400)
+        if effective_date == timezone.localdate():
+            return None
+        revision = RentRevision.objects.create(
+            landlord=request.user,
+            adjustment_type=adjustment_type,
+            value=value,
+            scope='unit_type' if unit_type else 'all',
+            unit_type=unit_type,
+            effective_date=effective_date,
+        )
+        logger.info(f"AdjustRentView: Landlord {request.user.id} scheduled rent revision {revision.id} for {effective_date}")
+        return Response({
+            "message": f"Rent change scheduled for {effective_date}",
+            "revision": RentRevisionSerializer(revision).data
+        }, status=202)
+
     def post(self, request):
         landlord = request.user
         adjustment_type = request.data.get('adjustment_type')  # 'percentage' or 'fixed'
@@ -1191,39 +1251,26 @@ class AdjustRentView(APIView):
             return Response({"error": "adjustment_type must be 'percentage' or 'fixed'"}, status=400)
 
         try:
-            value = Decimal(value)
-        except (ValueError, TypeError):
+            value = Decimal(str(value))
+        except (ValueError, TypeError, InvalidOperation):
             return Response({"error": "value must be a valid number"}, status=400)
 
-        # Filter units
-        units = Unit.objects.filter(property_obj__landlord=landlord)
-        if unit_type_id:
-            try:
-                unit_type = UnitType.objects.get(id=unit_type_id, landlord=landlord)
-                units = units.filter(unit_type=unit_type)
-            except UnitType.DoesNotExist:
-                return Response({"error": "UnitType not found or not owned by you"}, status=404)
-
-        updated_count = 0
-        for unit in units:
-            old_rent = unit.rent
-            if adjustment_type == 'percentage':
-                new_rent = old_rent * (Decimal(1) + value / Decimal(100))
-            else:  # fixed
-                new_rent = old_rent + value
-            # Ensure rent doesn't go negative
-            new_rent = max(Decimal(0), new_rent)
-            unit.rent = new_rent
-            unit.save()  # This will update rent_remaining
-            updated_count += 1
+        try:
+            units, unit_type = self._scope(landlord, unit_type_id)
+        except UnitType.DoesNotExist:
+            return Response({"error": "UnitType not found or not owned by you"}, status=404)
 
-        logger.info(f"AdjustRentView POST: Rent adjusted for {updated_count} units by landlord {landlord.id}")
+        scheduled = self._schedule(request, adjustment_type, value, unit_type)
+        if scheduled is not None:
+            return scheduled
 
-        # Invalidate caches
-        cache.delete(f"landlord:{landlord.id}:properties")
-        # Also invalidate rent_summary cache
-        from payments.views import RentSummaryView
-        cache.delete(f"rent_summary:{landlord.id}")
+        # Rent never goes negative; rent_paid is kept and rent_remaining follows the new rent
+        result = reprice_units(
+            units, adjustment_type, value, landlord_id=landlord.id, precision=2, recompute_paid=False
+        )
+        updated_count = result['summary']['units_affected']
+
+        logger.info(f"AdjustRentView POST: Rent adjusted for {updated_count} units by landlord {landlord.id}")
 
         return Response({"message": f"Rent adjusted for {updated_count} units successfully"})
 
@@ -1238,33 +1285,70 @@ class AdjustRentView(APIView):
             return Response({"error": "new_rent is required"}, status=400)
 
         try:
-            new_rent = Decimal(new_rent)
-        except (ValueError, TypeError):
+            new_rent = Decimal(str(new_rent))
+        except (ValueError, TypeError, InvalidOperation):
             return Response({"error": "new_rent must be a valid number"}, status=400)
 
-        units = Unit.objects.filter(property_obj__landlord=landlord)
-        if unit_type_id:
-            try:
-                unit_type = UnitType.objects.get(id=unit_type_id, landlord=landlord)
-                units = units.filter(unit_type=unit_type)
-            except UnitType.DoesNotExist:
-                return Response({"error": "UnitType not found or not owned by you"}, status=404)
-
-        updated_count = 0
-        for unit in units:
-            unit.rent = new_rent
-            unit.save()
-            updated_count += 1
+        try:
+            units, unit_type = self._scope(landlord, unit_type_id)
+        except UnitType.DoesNotExist:
+            return Response({"error": "UnitType not found or not owned by you"}, status=404)
 
-        logger.info(f"AdjustRentView PUT: Rent set to {new_rent} for {updated_count} units by landlord {landlord.id}")
+        scheduled = self._schedule(request, 'absolute', new_rent, unit_type)
+        if scheduled is not None:
+            return scheduled
 
-        # Invalidate caches
-        cache.delete(f"landlord:{landlord.id}:properties")
-        from payments.views import RentSummaryView
-        cache.delete(f"rent_summary:{landlord.id}")
+        result = reprice_units(
+            units, 'absolute', new_rent, landlord_id=landlord.id, precision=2, recompute_paid=False
+        )
+        updated_count = result['summary']['units_affected']
+
+        logger.info(f"AdjustRentView PUT: Rent set to {new_rent} for {updated_count} units by landlord {landlord.id}")
 
         return Response({"message": f"Rent set to {new_rent} for {updated_count} units successfully"})
 
+
+class RentRevisionListCreateView(generics.ListCreateAPIView):
+    """List and schedule rent revisions"""
+    serializer_class = RentRevisionSerializer
+    permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
+
+    def get_queryset(self):
+        return RentRevision.objects.filter(landlord=self.request.user)
+
+    def perform_create(self, serializer):
+        serializer.save(landlord=self.request.user)
+
+
+class RentRevisionDetailView(generics.RetrieveDestroyAPIView):
+    """Retrieve a rent revision, or cancel it while it is still scheduled"""
+    serializer_class = RentRevisionSerializer
+    permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
+
+    def get_queryset(self):
+        return RentRevision.objects.filter(landlord=self.request.user)
+
+    def destroy(self, request, *args, **kwargs):
+        revision = self.get_object()
+        cancelled = RentRevision.objects.filter(pk=revision.pk, status='scheduled').update(status='cancelled')
+        if not cancelled:
+            return Response({"error": f"A {revision.status} revision cannot be cancelled"}, status=400)
+        return Response({"message": "Rent revision cancelled"})
+
+
+class RentRevisionRollbackView(APIView):
+    """Restore the rents an applied revision changed"""
+    permission_classes = [IsAuthenticated, IsLandlord, HasActiveSubscription]
+
+    def post(self, request, pk):
+        revision = get_object_or_404(RentRevision, pk=pk, landlord=request.user)
+        try:
+            restored = rollback_revision(revision)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=400)
+        logger.info(f"RentRevisionRollbackView: Landlord {request.user.id} rolled back revision {revision.id} ({restored} units)")
+        return Response({"message": f"Rent restored for {restored} units", "units_restored": restored})
+
 # View to check subscription status (landlord only)
 class SubscriptionStatusView(APIView):
     permission_classes = [IsAuthenticated, IsLandlord]
@@ -1313,8 +1397,6 @@ class MeView(APIView):
         serializer = UserSerializer(request.user, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
-            # invalidate cache for this user
-            cache.delete(f"user:{request.user.id}")
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
 
@@ -2152,6 +2234,7 @@ class UnitListView(generics.ListAPIView):
     """
     serializer_class = UnitSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -2253,6 +2336,7 @@ def get_pending_applications(request):
     
     pending_tenants = all_tenants.exclude(id__in=landlord_tenant_ids)
     
+    pending_tenants = TenantWithUnitSerializer.setup_eager_loading(pending_tenants)
     serializer = TenantWithUnitSerializer(pending_tenants, many=True)
     return Response(serializer.data)
 
@@ -2357,10 +2441,10 @@ def get_tenants_with_units(request):
         return Response({"error": "Only landlords can access this endpoint"}, status=status.HTTP_403_FORBIDDEN)
     
     # Get tenants assigned to landlord's properties
-    tenants = CustomUser.objects.filter(
+    tenants = TenantWithUnitSerializer.setup_eager_loading(CustomUser.objects.filter(
         groups__name='tenant',
-        assigned_units__property_obj__landlord=request.user
-    ).distinct()
+        unit__property_obj__landlord=request.user
+    ))
     
     serializer = TenantWithUnitSerializer(tenants, many=True)
     return Response(serializer.data)
@@ -2372,48 +2456,28 @@ def landlord_dashboard(request):
     if not getattr(request.user, 'is_landlord', False):
         return Response({"error": "Only landlords can access this endpoint"}, status=status.HTTP_403_FORBIDDEN)
     
-    # Calculate statistics
-    properties = Property.objects.filter(landlord=request.user)
-    units = Unit.objects.filter(property_obj__landlord=request.user)
-    
-    total_properties = properties.count()
-    total_units = units.count()
-    occupied_units = units.filter(is_available=False).count()
-    vacant_units = units.filter(is_available=True).count()
-    
-    # Get unique tenants
-    unique_tenants = CustomUser.objects.filter(
-        assigned_units__property_obj__landlord=request.user
-    ).distinct().count()
-    
-    # Get pending applications (tenants without units in this landlord's properties)
-    all_tenants = CustomUser.objects.filter(groups__name='tenant')
-    landlord_tenant_ids = units.exclude(tenant__isnull=True).values_list('tenant_id', flat=True)
-    pending_applications = all_tenants.exclude(id__in=landlord_tenant_ids).count()
-    
-    # Rent calculations
-    total_rent_collected = units.aggregate(
-        total=Sum('rent_paid')
-    )['total'] or 0
-    
-    total_rent_due = units.aggregate(
-        total=Sum('rent_remaining')
-    )['total'] or 0
+    # Counters come from the landlord's stats row (accounts/stats.py)
+    stats = get_landlord_stats(request.user)
+
+    # Pending applications for this landlord
+    pending_applications = TenantApplication.objects.filter(
+        landlord=request.user, status='pending'
+    ).count()
     
     # Recent tenants with units
-    recent_tenants = CustomUser.objects.filter(
-        assigned_units__property_obj__landlord=request.user
-    ).distinct()[:5]
+    recent_tenants = TenantWithUnitSerializer.setup_eager_loading(
+        CustomUser.objects.filter(unit__property_obj__landlord=request.user)
+    ).order_by('-unit__assigned_date')[:5]
     
     dashboard_data = {
-        'total_properties': total_properties,
-        'total_units': total_units,
-        'occupied_units': occupied_units,
-        'vacant_units': vacant_units,
-        'total_tenants': unique_tenants,
+        'total_properties': stats.total_properties,
+        'total_units': stats.total_units,
+        'occupied_units': stats.occupied_units,
+        'vacant_units': stats.vacant_units,
+        'total_tenants': stats.active_tenants,
         'pending_applications': pending_applications,
-        'total_rent_collected': total_rent_collected,
-        'total_rent_due': total_rent_due,
+        'total_rent_collected': stats.rent_collected,
+        'total_rent_due': stats.rent_outstanding,
         'recent_tenants': TenantWithUnitSerializer(recent_tenants, many=True).data,
         'recent_payments': []
     }
@@ -2875,13 +2939,10 @@ class SubscriptionTrackingHistoryView(APIView):
         if action_type:
             queryset = queryset.filter(action=action_type)
         
-        # Get tracking records
-        tracking_records = queryset[:limit]
-        
-        # Serialize data
-        data = []
-        for record in tracking_records:
-            data.append({
+        queryset = queryset.select_related('property', 'unit')
+
+        def serialize(records):
+            return [{
                 'id': record.id,
                 'action': record.action,
                 'subscription_plan': record.subscription_plan,
@@ -2893,7 +2954,14 @@ class SubscriptionTrackingHistoryView(APIView):
                 'property_name': record.property.name if record.property else None,
                 'unit_number': record.unit.unit_number if record.unit else None,
                 'notes': record.notes
-            })
+            } for record in records]
+
+        # Cursor pages when requested; otherwise the legacy `limit` slice
+        paginated = paginate_list(CompatCursorPagination, queryset, request, self, serialize)
+        if paginated is not None:
+            return paginated
+
+        data = serialize(queryset[:limit])
         
         return Response({
             'count': len(data),
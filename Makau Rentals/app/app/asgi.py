@@ -3,6 +3,10 @@ ASGI config for app project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the API from this application (e.g. `uvicorn app.asgi:application`)
+so the async payment status stream (payments/status_channel.py) holds its
+long-poll and SSE requests on the event loop instead of a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -0,0 +1,349 @@
+"""
+Tiered cache backend.
+
+A small in-process LRU tier sits in front of a shared remote tier (Redis via
+django-redis in production). Reads are served from the local tier when
+possible, then from the remote tier (which back-fills the local tier). If the
+remote tier is unreachable the backend degrades to local-only and re-probes
+the remote periodically, so a Redis outage never takes the API down.
+
+Configure it through ``CACHES`` in settings::
+
+    CACHES = {
+        "default": {
+            "BACKEND": "app.cache.TieredCache",
+            "LOCATION": REDIS_URL,
+            "TIMEOUT": 300,
+            "OPTIONS": {
+                "REMOTE_BACKEND": "django_redis.cache.RedisCache",
+                "REMOTE_OPTIONS": {...},
+                "LOCAL_MAX_ENTRIES": 1000,
+                "LOCAL_MAX_BYTES": 8 * 1024 * 1024,
+                "LOCAL_TIMEOUT": 30,
+                "RETRY_INTERVAL": 30,
+                "LOCAL_EXCLUDE_PREFIXES": ["landlord-gen:"],
+            },
+        }
+    }
+
+Keys starting with one of ``LOCAL_EXCLUDE_PREFIXES`` (e.g. invalidation
+counters that every worker must agree on) bypass the local tier while the
+remote is reachable.
+
+Set ``REMOTE_BACKEND`` to ``None`` for a purely local cache, or to
+``django.core.cache.backends.locmem.LocMemCache`` in tests.
+"""
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+
+class LocalLRUTier:
+    """
+    Thread-safe LRU store bounded by entry count and (pickled) size in bytes.
+
+    Values are stored pickled, the same way LocMemCache does it, so callers
+    never share mutable objects with the cache and the memory bound is exact.
+    """
+
+    def __init__(self, max_entries=1000, max_bytes=8 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data = OrderedDict()  # key -> (expires_at or None, pickled)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    @property
+    def size(self):
+        return self._size
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return default, False
+            expires_at, pickled = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._pop(key)
+                return default, False
+            self._data.move_to_end(key)
+        return pickle.loads(pickled), True
+
+    def set(self, key, value, timeout):
+        """Store ``value``; ``timeout`` is seconds or ``None`` for no expiry."""
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes and len(pickled) > self.max_bytes:
+            # Too big to ever fit; make sure no stale copy survives.
+            self.delete(key)
+            return
+        expires_at = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            if key in self._data:
+                self._pop(key)
+            self._data[key] = (expires_at, pickled)
+            self._size += len(pickled)
+            self._evict()
+
+    def delete(self, key):
+        with self._lock:
+            return self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._size = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return False
+        self._size -= len(entry[1])
+        return True
+
+    def _evict(self):
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self._size > self.max_bytes)
+        ):
+            _, (_, pickled) = self._data.popitem(last=False)
+            self._size -= len(pickled)
+            self.evictions += 1
+
+
+class TieredCache(BaseCache):
+    """Local LRU tier in front of a remote cache, with local-only fallback."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = dict(params.get("OPTIONS", {}))
+        self._local = LocalLRUTier(
+            max_entries=int(options.get("LOCAL_MAX_ENTRIES", 1000)),
+            max_bytes=int(options.get("LOCAL_MAX_BYTES", 8 * 1024 * 1024)),
+        )
+        # The local tier is per-process, so keep it short-lived to bound the
+        # staleness other workers can observe after a write.
+        self._local_timeout = options.get("LOCAL_TIMEOUT", 30)
+        self._retry_interval = options.get("RETRY_INTERVAL", 30)
+        self._exclude_prefixes = tuple(options.get("LOCAL_EXCLUDE_PREFIXES", ()))
+        self._remote_backend = options.get(
+            "REMOTE_BACKEND", "django_redis.cache.RedisCache"
+        )
+        self._remote_params = {
+            "TIMEOUT": params.get("TIMEOUT", 300),
+            "KEY_PREFIX": params.get("KEY_PREFIX", ""),
+            "VERSION": params.get("VERSION", 1),
+            "OPTIONS": options.get("REMOTE_OPTIONS", {}),
+        }
+        self._location = location
+        self._remote = None
+        self._remote_down_until = 0.0
+        self._remote_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {"local_hits": 0, "remote_hits": 0, "misses": 0, "remote_errors": 0}
+
+    # ------------------------------------------------------------------
+    # Remote tier management
+    # ------------------------------------------------------------------
+    def _get_remote(self):
+        if not self._remote_backend or time.monotonic() < self._remote_down_until:
+            return None
+        if self._remote is None:
+            with self._remote_lock:
+                if self._remote is None:
+                    try:
+                        backend_cls = import_string(self._remote_backend)
+                        self._remote = backend_cls(self._location, self._remote_params)
+                    except Exception as e:
+                        self._mark_remote_down(e)
+                        return None
+        return self._remote
+
+    def _mark_remote_down(self, exc):
+        self._remote_down_until = time.monotonic() + self._retry_interval
+        self._count("remote_errors")
+        logger.warning(
+            f"⚠️ Remote cache unavailable ({exc}); using local-only cache for "
+            f"{self._retry_interval}s"
+        )
+
+    def _call_remote(self, method, *args, **kwargs):
+        """Run ``method`` on the remote tier; returns (result, ok)."""
+        remote = self._get_remote()
+        if remote is None:
+            return None, False
+        try:
+            return getattr(remote, method)(*args, **kwargs), True
+        except Exception as e:
+            self._mark_remote_down(e)
+            return None, False
+
+    @property
+    def remote_available(self):
+        return self._get_remote() is not None
+
+    # ------------------------------------------------------------------
+    # Helpers
+    # ------------------------------------------------------------------
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _is_shared(self, key):
+        """Shared keys are only kept locally while the remote is down."""
+        return bool(self._exclude_prefixes) and key.startswith(self._exclude_prefixes)
+
+    def _local_ttl(self, timeout):
+        """Seconds to keep a value locally (``None`` means no expiry)."""
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is not None and timeout <= 0:
+            return 0
+        if self._local_timeout is None:
+            return timeout
+        if timeout is None:
+            return self._local_timeout
+        return min(timeout, self._local_timeout)
+
+    def _set_local(self, local_key, value, timeout):
+        ttl = self._local_ttl(timeout)
+        if ttl == 0:
+            self._local.delete(local_key)
+        else:
+            self._local.set(local_key, value, ttl)
+
+    # ------------------------------------------------------------------
+    # Cache API
+    # ------------------------------------------------------------------
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added, ok = self._call_remote("add", key, value, timeout=timeout, version=version)
+        if ok:
+            # The remote holds the authoritative value; only mirror on success.
+            if added and not self._is_shared(key):
+                self._set_local(local_key, value, timeout)
+            else:
+                self._local.delete(local_key)
+            return added
+        _, found = self._local.get(local_key)
+        if found:
+            return False
+        self._set_local(local_key, value, timeout)
+        return True
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        shared = self._is_shared(key)
+        if not shared:
+            value, found = self._local.get(local_key)
+            if found:
+                self._count("local_hits")
+                return value
+        sentinel = object()
+        value, ok = self._call_remote("get", key, sentinel, version=version)
+        if ok and value is not sentinel:
+            self._count("remote_hits")
+            if not shared:
+                self._set_local(local_key, value, DEFAULT_TIMEOUT)
+            return value
+        if not ok and shared:
+            value, found = self._local.get(local_key)
+            if found:
+                self._count("local_hits")
+                return value
+        self._count("misses")
+        return default
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        _, ok = self._call_remote("set", key, value, timeout=timeout, version=version)
+        if ok and self._is_shared(key):
+            self._local.delete(local_key)
+        else:
+            self._set_local(local_key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        touched, ok = self._call_remote("touch", key, timeout=timeout, version=version)
+        value, found = self._local.get(local_key)
+        if found:
+            self._set_local(local_key, value, timeout)
+        return bool(touched) if ok else found
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        local_deleted = self._local.delete(local_key)
+        deleted, ok = self._call_remote("delete", key, version=version)
+        return bool(deleted) if ok else local_deleted
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        _, found = self._local.get(local_key)
+        if found:
+            return True
+        exists, ok = self._call_remote("has_key", key, version=version)
+        return bool(exists) if ok else False
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        # Counters must be shared between workers, so never serve them from
+        # the local tier while the remote is up.
+        value, ok = self._call_remote("incr", key, delta, version=version)
+        if ok:
+            self._local.delete(local_key)
+            return value
+        current, found = self._local.get(local_key)
+        if not found:
+            raise ValueError(f"Key '{key}' not found")
+        value = current + delta
+        self._local.set(local_key, value, self._local_timeout)
+        return value
+
+    def clear(self):
+        self._local.clear()
+        self._call_remote("clear")
+
+    def close(self, **kwargs):
+        if self._remote is not None:
+            try:
+                self._remote.close(**kwargs)
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # Instrumentation
+    # ------------------------------------------------------------------
+    def stats(self):
+        """Return hit/miss/eviction counters plus current tier state."""
+        with self._stats_lock:
+            data = dict(self._stats)
+        lookups = data["local_hits"] + data["remote_hits"] + data["misses"]
+        hits = data["local_hits"] + data["remote_hits"]
+        data.update({
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "evictions": self._local.evictions,
+            "local_entries": len(self._local),
+            "local_bytes": self._local.size,
+            "remote_backend": self._remote_backend,
+            "remote_available": (
+                bool(self._remote_backend) and time.monotonic() >= self._remote_down_until
+            ),
+        })
+        return data
+
+    def reset_stats(self):
+        with self._stats_lock:
+            for name in self._stats:
+                self._stats[name] = 0
+        self._local.evictions = 0
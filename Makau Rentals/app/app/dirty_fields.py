@@ -0,0 +1,104 @@
+"""
+Dirty-field tracking for models.
+
+DirtyFieldsMixin remembers the field values an instance was loaded with
+(in from_db) so that
+
+- `changed_fields` / `has_changed()` / `loaded_value()` answer "what changed
+  since this row was read" without another SELECT, and
+- `save()` on a loaded instance only writes the changed columns (plus any
+  auto_now fields). A save with nothing changed issues no query at all and
+  sends no save signals.
+
+The snapshot is refreshed after every save and refresh_from_db(), so
+repeated saves of one instance stay minimal. Instances built by hand (not
+loaded from the database) save normally; they have no snapshot.
+
+Mix it in before models.Model:
+
+    class Unit(DirtyFieldsMixin, models.Model):
+        ...
+"""
+import copy
+
+_MISSING = object()
+
+
+def _snapshot_value(value):
+    # Copy mutable values so in-place changes (e.g. to a JSON dict) are noticed
+    return copy.deepcopy(value) if isinstance(value, (dict, list)) else value
+
+
+class DirtyFieldsMixin:
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = {
+            attname: _snapshot_value(value) for attname, value in zip(field_names, values)
+        }
+        return instance
+
+    def _tracked_fields(self):
+        return [field for field in self._meta.concrete_fields if not field.primary_key]
+
+    def _remember(self, attnames=None):
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            loaded = self._loaded_values = {}
+        for field in self._tracked_fields():
+            if attnames is not None and field.attname not in attnames and field.name not in attnames:
+                continue
+            if field.attname in self.__dict__:
+                loaded[field.attname] = _snapshot_value(self.__dict__[field.attname])
+
+    def loaded_value(self, attname, default=_MISSING):
+        """The value `attname` had when the instance was loaded (or last saved)"""
+        loaded = getattr(self, '_loaded_values', None) or {}
+        if attname in loaded:
+            return loaded[attname]
+        if default is _MISSING:
+            raise KeyError(attname)
+        return default
+
+    def is_loaded(self, attname):
+        return attname in (getattr(self, '_loaded_values', None) or {})
+
+    @property
+    def changed_fields(self):
+        """Attnames whose value differs from the loaded one. Empty for unsaved instances."""
+        loaded = getattr(self, '_loaded_values', None)
+        if self._state.adding or loaded is None:
+            return []
+        changed = []
+        for field in self._tracked_fields():
+            if field.attname not in self.__dict__:
+                continue  # deferred and never touched
+            if field.attname not in loaded or loaded[field.attname] != self.__dict__[field.attname]:
+                changed.append(field.attname)
+        return changed
+
+    def has_changed(self, attname):
+        return attname in self.changed_fields
+
+    def save(self, *args, **kwargs):
+        minimal = (
+            not self._state.adding
+            and getattr(self, '_loaded_values', None) is not None
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+            and not args  # positional force_insert/force_update/using/update_fields
+        )
+        if minimal:
+            changed = self.changed_fields
+            if changed:
+                changed += [
+                    field.attname for field in self._tracked_fields()
+                    if getattr(field, 'auto_now', False) and field.attname not in changed
+                ]
+            kwargs['update_fields'] = changed
+        super().save(*args, **kwargs)
+        self._remember(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self._remember(fields)
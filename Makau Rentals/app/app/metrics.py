@@ -0,0 +1,115 @@
+"""
+Lightweight in-process metrics.
+
+Histograms keep cumulative bucket counts plus a bounded window of recent
+samples for quantiles (p50/p99); gauges are callables evaluated when a
+snapshot is taken. Values are per process, like a Prometheus client
+without a push gateway. The health check endpoint reports snapshot().
+
+    IPN_ACK = histogram('pesapal_ipn_ack_seconds')
+    with IPN_ACK.time():
+        ...
+    gauge('ipn_inbox_depth', lambda: IpnNotification.objects.filter(...).count())
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Seconds; suits both millisecond acks and multi-second HTTP calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+WINDOW = 1024
+
+_histograms = {}
+_gauges = {}
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, name, buckets=DEFAULT_BUCKETS, window=WINDOW):
+        self.name = name
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self.reset(window)
+
+    def reset(self, window=None):
+        with self._lock:
+            self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+            self._recent = deque(maxlen=window or self._recent.maxlen)
+            self.count = 0
+            self.sum = 0.0
+
+    def observe(self, value):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._recent.append(value)
+            self.count += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def quantile(self, q):
+        """q-quantile of the recent window, or None before the first sample"""
+        with self._lock:
+            recent = sorted(self._recent)
+        if not recent:
+            return None
+        return recent[min(len(recent) - 1, int(q * len(recent)))]
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            count, total = self.count, self.sum
+        cumulative = 0
+        buckets = {}
+        for bound, n in zip(list(self.buckets) + ['+Inf'], counts):
+            cumulative += n
+            buckets[str(bound)] = cumulative
+        return {
+            'count': count,
+            'sum': round(total, 6),
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': buckets,
+        }
+
+
+def histogram(name, **kwargs):
+    """The histogram called `name`, created on first use"""
+    with _lock:
+        if name not in _histograms:
+            _histograms[name] = Histogram(name, **kwargs)
+        return _histograms[name]
+
+
+def gauge(name, read):
+    """Register `read()` as the current value of gauge `name`"""
+    with _lock:
+        _gauges[name] = read
+
+
+def snapshot():
+    with _lock:
+        histograms = dict(_histograms)
+        gauges = dict(_gauges)
+    values = {}
+    for name, read in gauges.items():
+        try:
+            values[name] = read()
+        except Exception as e:
+            logger.warning(f"Gauge {name} failed: {e}")
+            values[name] = None
+    return {
+        'histograms': {name: h.snapshot() for name, h in histograms.items()},
+        'gauges': values,
+    }
@@ -0,0 +1,69 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+
+Pages are addressed by an opaque cursor over a stable ordering (a timestamp
+plus the primary key as tie-breaker), so page 500 costs the same index range
+scan as page 1 - no OFFSET.
+
+Compatibility: until the frontend has migrated, list endpoints keep returning
+plain arrays unless the client asks for a page (``?cursor=``, ``?page_size=``
+or ``?paginate=cursor``). Set CURSOR_PAGINATION_DEFAULT=True in the
+environment to paginate every list response by default.
+"""
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+def pagination_requested(request, paginator):
+    params = request.query_params
+    if params.get('paginate') == 'cursor':
+        return True
+    if paginator.cursor_query_param in params or paginator.page_size_query_param in params:
+        return True
+    return getattr(settings, 'CURSOR_PAGINATION_DEFAULT', False)
+
+
+class CompatCursorPagination(CursorPagination):
+    """
+    Cursor pagination on (created_at, id), newest first.
+    Returns None (no pagination) for clients that have not opted in.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not pagination_requested(request, self):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class ReportCursorPagination(CompatCursorPagination):
+    ordering = ('-reported_date', '-id')
+
+
+class SubscriptionPaymentCursorPagination(CompatCursorPagination):
+    ordering = ('-transaction_date', '-id')
+
+
+class UserCursorPagination(CompatCursorPagination):
+    ordering = ('-date_joined', '-id')
+
+
+class IdCursorPagination(CompatCursorPagination):
+    # For models without a creation timestamp; ids only ever grow
+    ordering = ('-id',)
+
+
+def paginate_list(paginator_class, queryset, request, view, serialize):
+    """
+    Paginate inside a plain APIView.
+    `serialize(items)` returns the list data; returns a Response, or None when
+    the client did not ask for a page (the caller then serializes everything).
+    """
+    paginator = paginator_class()
+    page = paginator.paginate_queryset(queryset, request, view=view)
+    if page is None:
+        return None
+    return paginator.get_paginated_response(serialize(page))
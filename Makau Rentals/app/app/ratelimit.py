@@ -0,0 +1,28 @@
+"""
+A blocking rate limiter shared by outbound integrations (PesaPal status
+lookups, bulk email).
+
+    limiter = RateLimiter(10)   # at most 10 calls per second; 0 = unlimited
+    limiter.acquire()
+"""
+import threading
+import time
+
+
+class RateLimiter:
+    """Spaces calls at least 1/rate seconds apart across threads"""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            time.sleep(wait)
@@ -42,6 +42,11 @@ CELERY_BEAT_SCHEDULE = {
         "task": "app.tasks.landlord_summary_task",
         "schedule": crontab(hour=9, minute=30),
     },
+    # Materialized tenant due dates roll over just after midnight, before reminders
+    "roll-tenant-due-dates": {
+        "task": "app.tasks.roll_due_dates_task",
+        "schedule": crontab(hour=0, minute=15),
+    },
     # Deadline reminders at 10 AM
     "daily-deadline-reminders": {
         "task": "app.tasks.deadline_reminder_task",
@@ -52,6 +57,32 @@ CELERY_BEAT_SCHEDULE = {
         "task": "app.tasks.send_monthly_payment_reminders_task",
         "schedule": crontab(hour=8, minute=0),
     },
+    # The month's rent charges are generated off-peak at 1 AM; later nights
+    # resume a run that was interrupted and are no-ops once it completes
+    "generate-monthly-rent-charges": {
+        "task": "app.tasks.generate_monthly_rent_charges_task",
+        "schedule": crontab(hour=1, minute=0),
+    },
+    # Scheduled rent revisions are applied off-peak at 2 AM
+    "apply-due-rent-revisions": {
+        "task": "app.tasks.apply_due_rent_revisions_task",
+        "schedule": crontab(hour=2, minute=0),
+    },
+    # Queued PesaPal IPNs (retries and anything the callback's kick missed)
+    "drain-ipn-inbox": {
+        "task": "app.tasks.drain_ipn_inbox_task",
+        "schedule": crontab(minute="*"),
+    },
+    # Queued notification emails (retries and anything a kick missed)
+    "drain-notification-outbox": {
+        "task": "app.tasks.drain_notification_outbox_task",
+        "schedule": crontab(minute="*"),
+    },
+    # Pending PesaPal orders whose IPN never arrived
+    "reconcile-pending-payments": {
+        "task": "app.tasks.reconcile_pending_payments_task",
+        "schedule": crontab(minute="*/15"),
+    },
 }
 
 
@@ -225,9 +256,72 @@ else:
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication that also trusts the token's role claim
+        'accounts.authentication.RoleClaimJWTAuthentication',
     ),
 }
+
+# List endpoints return plain arrays unless the client asks for a cursor page
+# (see app/pagination.py). Flip this once the frontend handles cursor pages.
+CURSOR_PAGINATION_DEFAULT = config('CURSOR_PAGINATION_DEFAULT', default=False, cast=bool)
+
+# Units written per transaction when applying a scheduled rent revision
+RENT_REVISION_CHUNK_SIZE = config('RENT_REVISION_CHUNK_SIZE', default=1000, cast=int)
+# Failed runs of a revision before it is marked 'failed' instead of being retried
+RENT_REVISION_MAX_ATTEMPTS = config('RENT_REVISION_MAX_ATTEMPTS', default=5, cast=int)
+
+# Units charged per transaction by the monthly billing run (payments/billing.py)
+BILLING_CHUNK_SIZE = config('BILLING_CHUNK_SIZE', default=1000, cast=int)
+
+# Tenant profiles read and written per batch when refreshing the materialized
+# rent due dates used by deadline reminders (accounts/reminders.py)
+DUE_DATE_CHUNK_SIZE = config('DUE_DATE_CHUNK_SIZE', default=2000, cast=int)
+
+# Tenant retention (accounts/retention.py): tenants without a completed
+# deposit this many days after assignment, or this many days after leaving
+# their unit, are archived and purged TENANT_PURGE_CHUNK_SIZE per transaction
+TENANT_RETENTION_UNPAID_DEPOSIT_DAYS = config('TENANT_RETENTION_UNPAID_DEPOSIT_DAYS', default=14, cast=int)
+TENANT_RETENTION_LEFT_DAYS = config('TENANT_RETENTION_LEFT_DAYS', default=7, cast=int)
+TENANT_PURGE_CHUNK_SIZE = config('TENANT_PURGE_CHUNK_SIZE', default=500, cast=int)
+
+# Rows fetched per database round trip by the CSV exports (payments/exports.py)
+EXPORT_CHUNK_SIZE = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+
+# PesaPal IPN inbox (payments/ipn_inbox.py): retry n waits base * 2^(n-1)
+# seconds up to the max; after IPN_INBOX_MAX_ATTEMPTS it is dead-lettered
+IPN_INBOX_BATCH_SIZE = config('IPN_INBOX_BATCH_SIZE', default=50, cast=int)
+# Queue a drain on a Celery worker as each IPN arrives. Publishing blocks
+# while the broker is unreachable, so turn this off where there is no broker
+# (and so no beat either, e.g. the Vercel deployment): the callback then
+# processes the IPN inline, and `manage.py drain_ipn_inbox` run from cron
+# retries failures
+IPN_INBOX_KICK_WORKER = config('IPN_INBOX_KICK_WORKER', default=True, cast=bool)
+# Process the IPN in the callback when no worker could be asked
+IPN_INBOX_PROCESS_INLINE = config('IPN_INBOX_PROCESS_INLINE', default=True, cast=bool)
+IPN_INBOX_MAX_ATTEMPTS = config('IPN_INBOX_MAX_ATTEMPTS', default=8, cast=int)
+IPN_INBOX_LEASE_SECONDS = config('IPN_INBOX_LEASE_SECONDS', default=300, cast=int)
+IPN_RETRY_BASE_SECONDS = config('IPN_RETRY_BASE_SECONDS', default=30, cast=int)
+IPN_RETRY_MAX_SECONDS = config('IPN_RETRY_MAX_SECONDS', default=3600, cast=int)
+
+# Payment status push channel (payments/status_channel.py): 'redis' pub/sub
+# across processes or 'local' (in-process only, e.g. runserver)
+PAYMENT_STATUS_BROKER = config('PAYMENT_STATUS_BROKER', default='redis')
+PAYMENT_STATUS_LONGPOLL_SECONDS = config('PAYMENT_STATUS_LONGPOLL_SECONDS', default=25, cast=float)
+# Under WSGI (e.g. the Vercel deployment) a waiting long-poll holds a worker
+# thread, so it answers at once by default and SSE is refused
+PAYMENT_STATUS_WSGI_LONGPOLL_SECONDS = config('PAYMENT_STATUS_WSGI_LONGPOLL_SECONDS', default=0, cast=float)
+PAYMENT_STATUS_STREAM_SECONDS = config('PAYMENT_STATUS_STREAM_SECONDS', default=120, cast=float)
+PAYMENT_STATUS_HEARTBEAT_SECONDS = config('PAYMENT_STATUS_HEARTBEAT_SECONDS', default=15, cast=float)
+
+# Pending payment reconciliation (payments/reconciliation.py): status lookups
+# run on RECONCILE_WORKERS threads, at most RECONCILE_RATE_PER_SECOND overall
+# (0 = unlimited); orders still unpaid after RECONCILE_EXPIRE_HOURS are failed
+RECONCILE_BATCH_SIZE = config('RECONCILE_BATCH_SIZE', default=200, cast=int)
+RECONCILE_WORKERS = config('RECONCILE_WORKERS', default=8, cast=int)
+RECONCILE_RATE_PER_SECOND = config('RECONCILE_RATE_PER_SECOND', default=10, cast=float)
+RECONCILE_MIN_AGE_MINUTES = config('RECONCILE_MIN_AGE_MINUTES', default=15, cast=int)
+RECONCILE_EXPIRE_HOURS = config('RECONCILE_EXPIRE_HOURS', default=48, cast=int)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -279,10 +373,30 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
 }
 
-# Cache Configuration - Use DummyCache for Render deployment
+# Tiered cache: an in-process LRU tier in front of Redis. If Redis is
+# unreachable (e.g. on Render without a Redis add-on) the backend falls back
+# to the local tier on its own, so no separate settings are needed there.
+# Set CACHE_REMOTE_BACKEND to an empty string to run local-only.
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.dummy.DummyCache",
+        "BACKEND": "app.cache.TieredCache",
+        "LOCATION": config('REDIS_URL', default='redis://redis:6379/0'),
+        "TIMEOUT": 300,
+        "KEY_PREFIX": "makau",
+        "OPTIONS": {
+            "REMOTE_BACKEND": config('CACHE_REMOTE_BACKEND', default='django_redis.cache.RedisCache') or None,
+            "REMOTE_OPTIONS": {
+                "CLIENT_CLASS": "django_redis.client.DefaultClient",
+                "SOCKET_CONNECT_TIMEOUT": 1,
+                "SOCKET_TIMEOUT": 1,
+            },
+            "LOCAL_MAX_ENTRIES": config('CACHE_LOCAL_MAX_ENTRIES', default=2000, cast=int),
+            "LOCAL_MAX_BYTES": config('CACHE_LOCAL_MAX_BYTES', default=16 * 1024 * 1024, cast=int),
+            "LOCAL_TIMEOUT": config('CACHE_LOCAL_TIMEOUT', default=10, cast=int),
+            "RETRY_INTERVAL": 30,
+            # Landlord generation counters must be shared by all workers
+            "LOCAL_EXCLUDE_PREFIXES": ["landlord-gen:"],
+        },
     }
 }
 
@@ -326,6 +440,30 @@ SERVER_EMAIL = config('SERVER_EMAIL', default=DEFAULT_FROM_EMAIL)
 # Reduce email socket timeout so it never blocks requests for long if misconfigured
 EMAIL_TIMEOUT = config('EMAIL_TIMEOUT', default=5, cast=int)
 
+# Bulk email (communication/mailer.py): messages sent per send_messages batch
+# over one connection, and messages per second by SMTP host ('*' = any other
+# host, 0 = unlimited)
+EMAIL_BATCH_SIZE = config('EMAIL_BATCH_SIZE', default=100, cast=int)
+EMAIL_RATE_LIMITS = {
+    'smtp.gmail.com': 5,
+    'smtp.office365.com': 0.5,
+    'smtp.sendgrid.net': 100,
+    '*': config('EMAIL_RATE_PER_SECOND', default=10, cast=float),
+}
+
+# Notification outbox (communication/outbox.py): confirmation and report
+# emails are written with the business change and sent by a worker. Retry n
+# waits base * 2^(n-1) seconds up to the max; after
+# NOTIFICATION_OUTBOX_MAX_ATTEMPTS the email is dead-lettered
+NOTIFICATION_OUTBOX_BATCH_SIZE = config('NOTIFICATION_OUTBOX_BATCH_SIZE', default=100, cast=int)
+# Queue a drain after each commit that writes to the outbox; turn this off
+# where there is no Celery broker and run `manage.py drain_notification_outbox` from cron
+NOTIFICATION_OUTBOX_KICK_WORKER = config('NOTIFICATION_OUTBOX_KICK_WORKER', default=True, cast=bool)
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = config('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', default=6, cast=int)
+NOTIFICATION_OUTBOX_LEASE_SECONDS = config('NOTIFICATION_OUTBOX_LEASE_SECONDS', default=300, cast=int)
+NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS = config('NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS', default=60, cast=int)
+NOTIFICATION_OUTBOX_RETRY_MAX_SECONDS = config('NOTIFICATION_OUTBOX_RETRY_MAX_SECONDS', default=3600, cast=int)
+
 # Control whether emails are sent asynchronously via Celery
 # Default to False to avoid dependency on Celery in development
 EMAIL_ASYNC_ENABLED = config('EMAIL_ASYNC_ENABLED', default=False, cast=bool)
@@ -335,6 +473,14 @@ PESAPAL_CONSUMER_KEY = config('PESAPAL_CONSUMER_KEY')
 PESAPAL_CONSUMER_SECRET = config('PESAPAL_CONSUMER_SECRET')
 PESAPAL_ENV = config('PESAPAL_ENV', default='sandbox')  # 'sandbox' or 'live'
 PESAPAL_IPN_URL = config('PESAPAL_IPN_URL')
+# Optional: a pre-registered IPN id (otherwise it is registered on first use)
+PESAPAL_IPN_ID = config('PESAPAL_IPN_ID', default='')
+# Pooled HTTP client (payments/pesapal_service.py)
+PESAPAL_HTTP_POOL_SIZE = config('PESAPAL_HTTP_POOL_SIZE', default=10, cast=int)
+PESAPAL_HTTP_RETRIES = config('PESAPAL_HTTP_RETRIES', default=3, cast=int)
+PESAPAL_HTTP_BACKOFF = config('PESAPAL_HTTP_BACKOFF', default=0.5, cast=float)
+PESAPAL_CONNECT_TIMEOUT = config('PESAPAL_CONNECT_TIMEOUT', default=5, cast=float)
+PESAPAL_READ_TIMEOUT = config('PESAPAL_READ_TIMEOUT', default=30, cast=float)
 
 # Logging Configuration - Enhanced for payment callbacks
 # Use /tmp for log files on Vercel (serverless environment)
@@ -1,13 +1,14 @@
 # app/tasks.py
 from celery import shared_task
-from communication.messaging import send_report_email
+from communication.messaging import queue_report_email
 
 @shared_task
 def send_report_email_task(report_id):
+    """Report emails now go through the outbox; kept for tasks already queued"""
     from communication.models import Report
     try:
         report = Report.objects.get(id=report_id)
-        send_report_email(report)
+        queue_report_email(report)
     except Report.DoesNotExist:
         print(f"Report with id {report_id} does not exist.")
 from django.utils import timezone
@@ -15,9 +16,7 @@ from datetime import timedelta
 from accounts.models import Unit, CustomUser
 from payments.models import Payment
 from communication.messaging import send_bulk_emails
-from django.core.mail import send_mail
 from django.conf import settings
-from django.core.mail import EmailMessage
 
 
 @shared_task
@@ -30,7 +29,7 @@ def notify_due_rent_task():
         tenant__isnull=False,
         rent_due_date__lte=today,
         rent_remaining__gt=0
-    )
+    ).select_related('tenant')
     tenants = [u.tenant for u in due_units if u.tenant]
 
     if tenants:
@@ -43,99 +42,37 @@ def notify_due_rent_task():
 def landlord_summary_task():
     """
     Celery task to send landlords a summary of tenants with due/overdue rent.
-    Runs daily (or weekly if you prefer).
+    Runs daily (or weekly if you prefer). The summaries are built from one
+    grouped query and sent through the notification outbox, which skips any
+    already queued today (see communication/landlord_summary.py).
     """
-    today = timezone.now().date()
-    landlords = CustomUser.objects.filter(user_type="landlord")
-
-    for landlord in landlords:
-        # Get all units owned by this landlord
-        units = Unit.objects.filter(property_obj__landlord=landlord)
-
-        # Filter tenants who are due/overdue
-        overdue_units = units.filter(
-            tenant__isnull=False,
-            rent_due_date__lte=today,
-            rent_remaining__gt=0
-        )
+    from communication.landlord_summary import queue_landlord_summaries
 
-        if not overdue_units.exists():
-            continue  # Skip landlords with no overdue tenants
-
-        # Build summary message
-        summary_lines = []
-        total_outstanding = 0
-        for unit in overdue_units:
-            tenant = unit.tenant
-            summary_lines.append(
-                f"Unit {unit.unit_number} - Tenant: {tenant.full_name} "
-                f"({tenant.email}) | Due: {unit.rent_due_date} | Outstanding: KES {unit.rent_remaining}"
-            )
-            total_outstanding += float(unit.rent_remaining)
-
-        subject = "Daily Rent Summary - Overdue Tenants"
-        message = (
-            f"Hello {landlord.full_name},\n\n"
-            f"Here is the summary of overdue tenants in your properties:\n\n"
-            + "\n".join(summary_lines)
-            + f"\n\nTotal Outstanding: KES {total_outstanding}\n\n"
-            "Regards,\nYour Rental Management System"
-        )
-
-        try:
-            send_mail(subject, message, settings.EMAIL_HOST_USER, [landlord.email])
-        except Exception as e:
-            print(f"Failed to send summary to {landlord.email}: {e}")
-
-    return "Landlord summaries sent"
+    return f"Landlord summaries queued for {queue_landlord_summaries()} landlords"
 
 
 @shared_task
 def delete_unpaid_deposit_tenants():
     """
     Celery task to delete tenants who haven't paid deposit within 14 days of assignment.
+    Candidates are archived first (see accounts/retention.py).
     """
-    now = timezone.now()
-    cutoff_date = now - timedelta(days=14)
-    units = Unit.objects.filter(
-        tenant__isnull=False,
-        assigned_date__isnull=False,
-        assigned_date__lte=cutoff_date
-    )
-    deleted_count = 0
-    for unit in units:
-        tenant = unit.tenant
-        # Check if there is a successful deposit payment within 14 days
-        deposit_deadline = unit.assigned_date + timedelta(days=14)
-        has_deposit = Payment.objects.filter(
-            tenant=tenant,
-            payment_type='deposit',
-            status='Success',
-            transaction_date__lte=deposit_deadline
-        ).exists()
-        if not has_deposit:
-            tenant.delete()
-            deleted_count += 1
-    return f"Deleted {deleted_count} tenants for unpaid deposit"
+    from accounts.retention import purge
+
+    report = purge(['unpaid_deposit'])
+    return f"Deleted {report['purged']} tenants for unpaid deposit"
 
 
 @shared_task
 def delete_left_tenants():
     """
     Celery task to delete tenants who have been out of a unit for 7 days.
+    Candidates are archived first (see accounts/retention.py).
     """
-    now = timezone.now()
-    cutoff_date = now - timedelta(days=7)
-    units = Unit.objects.filter(
-        left_date__isnull=False,
-        left_date__lte=cutoff_date
-    )
-    deleted_count = 0
-    for unit in units:
-        if unit.tenant:  # Though it should be None, but to be safe
-            unit.tenant.delete()
-            deleted_count += 1
-    return f"Deleted {deleted_count} tenants who left units"
+    from accounts.retention import purge
+
+    report = purge(['left'])
+    return f"Deleted {report['purged']} tenants who left units"
 
 
 @shared_task
@@ -148,13 +85,26 @@ def deadline_reminder_task():
     return "Deadline reminders sent"
 
 
+@shared_task
+def roll_due_dates_task():
+    """
+    Move tenants' materialized rent due dates that have passed (move-in
+    anniversaries) on to next month, ahead of the day's reminders.
+    """
+    from accounts.reminders import roll_due_dates
+
+    return f"Rolled {roll_due_dates()} tenant due dates"
+
+
 @shared_task
 def send_landlord_email_task(subject: str, message: str, tenant_ids: list[int]):
     """
     Asynchronously send a custom email from a landlord to a list of tenants.
-    Uses BCC and chunks recipients to avoid provider limits and PII exposure.
+    One message per tenant (no recipient sees another's address), all over
+    one connection via the bulk mailer.
     """
     from accounts.models import CustomUser
+    from communication.mailer import build_message, dispatch
 
     # Fetch recipient emails
     recipients = list(
@@ -168,25 +118,10 @@ def send_landlord_email_task(subject: str, message: str, tenant_ids: list[int]):
     if not recipients:
         return "No recipients to email"
 
-    # Chunk recipients (e.g., 50 per email to be safe)
-    chunk_size = 50
-    total_sent = 0
-    for i in range(0, len(recipients), chunk_size):
-        chunk = recipients[i:i+chunk_size]
-        try:
-            email = EmailMessage(
-                subject=subject,
-                body=message,
-                from_email=getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER),
-                to=[],  # Empty TO to avoid disclosing recipients
-                bcc=chunk,
-            )
-            email.send(fail_silently=False)
-            total_sent += len(chunk)
-        except Exception as e:
-            print(f"Failed sending chunk {i//chunk_size + 1}: {e}")
-
-    return f"Sent to {total_sent} recipients in {((len(recipients)-1)//chunk_size)+1} batch(es)"
+    from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', settings.EMAIL_HOST_USER)
+    messages = [build_message(subject, message, recipient, from_email=from_email) for recipient in recipients]
+    report = dispatch(messages, campaign='landlord_message')
+    return f"Sent to {report['sent']} recipients in {report['batches']} batch(es), {report['failed']} failed"
 
 
 @shared_task
@@ -359,3 +294,84 @@ def notify_landlords_approaching_limits_task():
             notifications_sent += 1
     
     return f"Sent {notifications_sent} limit approach notifications"
+
+
+@shared_task
+def apply_due_rent_revisions_task():
+    """
+    Apply scheduled rent revisions whose effective date has arrived.
+    Runs off-peak; each revision is written in chunked set-based batches.
+    """
+    from accounts.rent_engine import apply_due_revisions
+
+    applied = apply_due_revisions()
+    return f"Applied {applied} rent revisions"
+
+
+@shared_task
+def generate_monthly_rent_charges_task():
+    """
+    Charge every occupied unit the current month's rent. Runs nightly; a
+    run interrupted part way resumes from its last committed chunk.
+    """
+    from payments.billing import generate_rent_charges
+
+    run = generate_rent_charges()
+    chunks = len(run.chunk_timings)
+    slowest = max((c['seconds'] for c in run.chunk_timings), default=0)
+    return (
+        f"Billing {run.period:%Y-%m} {run.status}: {run.units_charged} units charged "
+        f"KES {run.amount_charged} in {chunks} chunks (slowest {slowest}s)"
+    )
+
+
+@shared_task
+def drain_ipn_inbox_task():
+    """
+    Process queued PesaPal IPNs. Queued by the IPN callback and run every
+    minute by beat so retries with backoff and missed kicks are picked up.
+    """
+    from payments.ipn_inbox import drain_inbox
+
+    counts = drain_inbox()
+    return f"IPN inbox: {counts['done']} done, {counts['retried']} retried, {counts['dead']} dead-lettered"
+
+
+@shared_task
+def drain_notification_outbox_task():
+    """
+    Send queued notification emails. Queued whenever a transaction writes to
+    the outbox and run every minute by beat for retries and missed kicks.
+    """
+    from communication.outbox import drain_outbox
+
+    counts = drain_outbox()
+    return (
+        f"Notification outbox: {counts['sent']} sent, {counts['retried']} retried, "
+        f"{counts['dead']} dead-lettered"
+    )
+
+
+@shared_task
+def reconcile_pending_payments_task():
+    """
+    Ask PesaPal for the status of pending orders that never received an IPN
+    and apply it (runs every 15 minutes via beat).
+    """
+    from payments.reconciliation import reconcile_pending
+
+    report = reconcile_pending()
+    return (
+        f"Reconciled {report['scanned']} pending payments: {report['completed']} completed, "
+        f"{report['failed']} failed, {report['expired']} expired, {report['still_pending']} still pending, "
+        f"{report['lookup_errors'] + report['apply_errors']} errors, {report['backfilled']} intents backfilled"
+    )
+
+
+@shared_task
+def generate_export_task(job_id):
+    """Write a background CSV export (queued by the export endpoints)"""
+    from payments.exports import run_export
+
+    job = run_export(job_id)
+    return f"Export {job.id} {job.status}: {job.row_count} rows"
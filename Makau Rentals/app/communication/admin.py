@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Report
+from .models import EmailDelivery, NotificationOutbox, Report
+from .outbox import requeue
 
 @admin.register(Report)
 class ReportAdmin(admin.ModelAdmin):
@@ -53,4 +54,25 @@ class ReportAdmin(admin.ModelAdmin):
     
     def unit_number(self, obj):
         return obj.unit.unit_number if obj.unit else 'No Unit'
-    unit_number.short_description = 'Unit Number'
\ No newline at end of file
+    unit_number.short_description = 'Unit Number'
+
+
+@admin.register(EmailDelivery)
+class EmailDeliveryAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'campaign', 'recipient', 'subject', 'status']
+    list_filter = ['campaign', 'status']
+    search_fields = ['recipient', 'subject']
+    readonly_fields = ['error']
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'campaign', 'recipient', 'subject', 'state', 'attempts', 'next_attempt_at', 'sent_at']
+    list_filter = ['campaign', 'state']
+    search_fields = ['dedup_key', 'recipient', 'subject']
+    readonly_fields = ['dedup_key', 'body', 'last_error', 'created_at', 'sent_at']
+    actions = ['requeue_dead_letters']
+
+    @admin.action(description="Requeue selected dead letters")
+    def requeue_dead_letters(self, request, queryset):
+        self.message_user(request, f"Requeued {requeue(queryset)} notifications")
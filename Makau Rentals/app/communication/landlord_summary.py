@@ -0,0 +1,91 @@
+# communication/landlord_summary.py
+"""
+Daily landlord summaries of tenants with due or overdue rent.
+
+The whole summary comes from one query: overdue units joined to their
+tenant and landlord, projected to flat tuples and streamed in landlord
+order (`values_list(...).iterator()`), so each landlord's lines are
+consecutive and are grouped as they arrive. No per-landlord or per-unit
+queries are made.
+
+Summaries go out through the notification outbox (communication/outbox.py):
+
+  - its drain sends them over one pooled connection per batch;
+  - each has the dedup key landlord_summary:<date>:<landlord id>, so
+    re-running the day's task after a crash skips summaries that were
+    already queued and never resends ones already sent.
+"""
+from itertools import groupby
+
+from django.conf import settings
+from django.utils import timezone
+
+from accounts.models import Unit
+from .mailer import build_message
+from .outbox import enqueue
+
+SUBJECT = "Daily Rent Summary - Overdue Tenants"
+
+COLUMNS = (
+    'property_obj__landlord_id',
+    'property_obj__landlord__full_name',
+    'property_obj__landlord__email',
+    'unit_number',
+    'tenant__full_name',
+    'tenant__email',
+    'rent_due_date',
+    'rent_remaining',
+)
+
+
+def overdue_rows(today):
+    """One row per overdue unit (COLUMNS), in landlord order"""
+    return Unit.objects.filter(
+        tenant__isnull=False,
+        rent_due_date__lte=today,
+        rent_remaining__gt=0,
+        property_obj__landlord__user_type='landlord',
+    ).order_by('property_obj__landlord_id', 'id').values_list(*COLUMNS).iterator(chunk_size=2000)
+
+
+def summary_message(full_name, email, rows):
+    summary_lines = []
+    total_outstanding = 0
+    for _, _, _, unit_number, tenant_name, tenant_email, rent_due_date, rent_remaining in rows:
+        summary_lines.append(
+            f"Unit {unit_number} - Tenant: {tenant_name} "
+            f"({tenant_email}) | Due: {rent_due_date} | Outstanding: KES {rent_remaining}"
+        )
+        total_outstanding += float(rent_remaining)
+
+    message = (
+        f"Hello {full_name},\n\n"
+        f"Here is the summary of overdue tenants in your properties:\n\n"
+        + "\n".join(summary_lines)
+        + f"\n\nTotal Outstanding: KES {total_outstanding}\n\n"
+        "Regards,\nYour Rental Management System"
+    )
+    return build_message(SUBJECT, message, email)
+
+
+def queue_landlord_summaries(today=None, batch_size=None):
+    """
+    Queue today's summary for every landlord with overdue tenants. Returns
+    the number of landlords summarized.
+    """
+    today = today or timezone.now().date()
+    batch_size = batch_size or getattr(settings, 'NOTIFICATION_OUTBOX_BATCH_SIZE', 100)
+    landlords = 0
+    batch = []
+    for landlord_id, rows in groupby(overdue_rows(today), key=lambda row: row[0]):
+        rows = list(rows)
+        full_name, email = rows[0][1], rows[0][2]
+        batch.append((f"landlord_summary:{today.isoformat()}:{landlord_id}", summary_message(full_name, email, rows)))
+        landlords += 1
+        # Each write kicks a drain of about one outbox batch
+        if len(batch) >= batch_size:
+            enqueue('landlord_summary', batch)
+            batch = []
+    if batch:
+        enqueue('landlord_summary', batch)
+    return landlords
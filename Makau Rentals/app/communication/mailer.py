@@ -0,0 +1,134 @@
+# communication/mailer.py
+"""
+Bulk email dispatch over one connection.
+
+send_mail() opens and closes an SMTP connection (TCP + TLS handshake +
+login) for every call. dispatch() opens one connection with
+get_connection() and sends prebuilt messages over it through
+send_messages(), EMAIL_BATCH_SIZE at a time:
+
+    messages = [build_message(subject, body, tenant.email) for tenant in tenants]
+    report = dispatch(messages, campaign='rent_reminder')
+
+  - Within a batch, each message is its own send_messages() call on the
+    shared connection. A rejected recipient then fails only its own
+    message and is attributed to it.
+  - Sends are paced by the provider's rate limit (EMAIL_RATE_LIMITS,
+    messages per second, keyed by EMAIL_HOST).
+  - The outcome per recipient is saved as an EmailDelivery row per batch.
+  - A dropped connection is reopened once and the message retried.
+
+Non-SMTP backends (locmem in tests, console in development) go through the
+same path.
+"""
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+
+from app.metrics import histogram
+from app.ratelimit import RateLimiter
+from .models import EmailDelivery
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_SECONDS = histogram('email_dispatch_batch_seconds')
+
+
+def build_message(subject, body, recipient, from_email=None):
+    """A single-recipient message (no recipient sees another's address)"""
+    return EmailMessage(
+        subject=subject,
+        body=body,
+        from_email=from_email or settings.EMAIL_HOST_USER or None,
+        to=[recipient],
+    )
+
+
+def provider_rate(connection):
+    """Messages per second allowed for the connection's provider (0 = unlimited)"""
+    limits = getattr(settings, 'EMAIL_RATE_LIMITS', {})
+    host = getattr(connection, 'host', None)
+    if host is None:
+        return 0
+    return limits.get(host, limits.get('*', 0))
+
+
+def _recipient(message):
+    return ', '.join(message.recipients())[:254]
+
+
+def _send_one(connection, message):
+    """Send over the shared connection, reopening it once if it dropped"""
+    try:
+        return connection.send_messages([message])
+    except smtplib.SMTPServerDisconnected:
+        connection.close()
+        connection.open()
+        return connection.send_messages([message])
+
+
+def dispatch(messages, campaign, batch_size=None, connection=None, record=True):
+    """
+    Send `messages` (EmailMessage instances) over one connection. Returns a
+    report: {'sent', 'failed', 'batches', 'seconds', 'errors'}, where
+    `errors` maps the index of each failed message to its error.
+    """
+    batch_size = batch_size or getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+    report = {'sent': 0, 'failed': 0, 'batches': 0, 'seconds': 0.0, 'errors': {}}
+    messages = list(messages)
+    if not messages:
+        return report
+
+    started = time.perf_counter()
+    connection = connection or get_connection(fail_silently=False)
+    limiter = RateLimiter(provider_rate(connection))
+    try:
+        connection.open()
+        for start in range(0, len(messages), batch_size):
+            batch = messages[start:start + batch_size]
+            deliveries = []
+            with DISPATCH_SECONDS.time():
+                for index, message in enumerate(batch, start):
+                    limiter.acquire()
+                    message.connection = connection
+                    try:
+                        _send_one(connection, message)
+                        status, error = 'sent', ''
+                    except Exception as e:
+                        status, error = 'failed', str(e)
+                        report['errors'][index] = error
+                        logger.warning(f"Email '{message.subject}' to {_recipient(message)} failed: {e}")
+                    report[status] += 1
+                    deliveries.append(EmailDelivery(
+                        campaign=campaign, recipient=_recipient(message),
+                        subject=message.subject[:255], status=status, error=error,
+                    ))
+            if record:
+                EmailDelivery.objects.bulk_create(deliveries)
+            report['batches'] += 1
+    except Exception as e:
+        # The connection could not be opened: nothing left was sent
+        unsent = len(messages) - report['sent'] - report['failed']
+        logger.error(f"Email dispatch '{campaign}' aborted with {unsent} messages unsent: {e}")
+        report['failed'] += unsent
+        report['errors'].update((index, str(e)) for index in range(len(messages) - unsent, len(messages)))
+        if record:
+            EmailDelivery.objects.bulk_create([
+                EmailDelivery(
+                    campaign=campaign, recipient=_recipient(message),
+                    subject=message.subject[:255], status='failed', error=str(e),
+                )
+                for message in messages[len(messages) - unsent:]
+            ])
+    finally:
+        connection.close()
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    logger.info(
+        f"Email dispatch '{campaign}': {report['sent']} sent, {report['failed']} failed "
+        f"in {report['batches']} batches ({report['seconds']}s)"
+    )
+    return report
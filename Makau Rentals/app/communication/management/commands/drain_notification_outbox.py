@@ -0,0 +1,26 @@
+"""
+Management command to send queued notification emails (for cron where Celery is not running)
+"""
+from django.core.management.base import BaseCommand
+from communication.outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = 'Send due emails from the notification outbox, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Notifications claimed per batch')
+        parser.add_argument('--all', action='store_true', help='Keep draining until nothing is due')
+
+    def handle(self, *args, **options):
+        totals = {'sent': 0, 'retried': 0, 'dead': 0}
+        while True:
+            counts = drain_outbox(limit=options['batch_size'])
+            for outcome, count in counts.items():
+                totals[outcome] += count
+            if not options['all'] or not sum(counts.values()):
+                break
+        self.stdout.write(self.style.SUCCESS(
+            f"Notification outbox: {totals['sent']} sent, {totals['retried']} retried, "
+            f"{totals['dead']} dead-lettered"
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0002_remindersetting'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['tenant', '-reported_date', '-id'], name='report_tenant_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['unit', '-reported_date', '-id'], name='report_unit_cursor_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0003_report_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='report',
+            index=models.Index(fields=['unit', 'status'], name='report_unit_status_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communication', '0004_report_unit_status_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('campaign', models.CharField(max_length=50)),
+                ('recipient', models.CharField(max_length=254)),
+                ('subject', models.CharField(max_length=255)),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed')], max_length=10)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Email Delivery',
+                'verbose_name_plural': 'Email Deliveries',
+                'indexes': [models.Index(fields=['campaign', '-created_at'], name='email_campaign_created_idx'), models.Index(fields=['recipient', '-created_at'], name='email_recipient_created_idx')],
+            },
+        ),
+    ]
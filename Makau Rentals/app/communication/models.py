@@ -5,8 +5,9 @@ from django.utils import timezone
 from django.db import models
 from accounts.models import CustomUser, Unit
 from django.utils import timezone
+from app.dirty_fields import DirtyFieldsMixin
 
-class Report(models.Model):
+class Report(DirtyFieldsMixin, models.Model):
     ISSUE_CATEGORIES = [
         ('electrical', 'Electrical'),
         ('plumbing', 'Plumbing'),
@@ -72,6 +73,11 @@ class Report(models.Model):
     class Meta:
         ordering = ['-reported_date']
         verbose_name = 'Maintenance Report'
+        indexes = [
+            models.Index(fields=['tenant', '-reported_date', '-id'], name='report_tenant_cursor_idx'),
+            models.Index(fields=['unit', '-reported_date', '-id'], name='report_unit_cursor_idx'),
+            models.Index(fields=['unit', 'status'], name='report_unit_status_idx'),
+        ]
         verbose_name_plural = 'Maintenance Reports'
 
     def save(self, *args, **kwargs):
@@ -139,4 +145,69 @@ class ReminderSetting(models.Model):
         verbose_name_plural = 'Reminder Settings'
 
     def __str__(self):
-        return f"ReminderSetting for {self.landlord.email} (days: {self.days_of_month})"
\ No newline at end of file
+        return f"ReminderSetting for {self.landlord.email} (days: {self.days_of_month})"
+
+class EmailDelivery(models.Model):
+    """Outcome of one message sent by the bulk mailer (communication/mailer.py)"""
+    STATUS_CHOICES = [
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    # What the message was for, e.g. 'rent_reminder'
+    campaign = models.CharField(max_length=50)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Email Delivery'
+        verbose_name_plural = 'Email Deliveries'
+        indexes = [
+            models.Index(fields=['campaign', '-created_at'], name='email_campaign_created_idx'),
+            models.Index(fields=['recipient', '-created_at'], name='email_recipient_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign} to {self.recipient} ({self.status})"
+
+
+class NotificationOutbox(models.Model):
+    """
+    Transactional outbox of rendered emails. Rows are written in the same
+    transaction as the business change and a worker sends them (see
+    communication/outbox.py).
+    """
+    STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('sent', 'Sent'),
+        ('dead', 'Dead letter'),
+    ]
+
+    # One row per logical notification, e.g. 'rent_confirmation:42:tenant'
+    dedup_key = models.CharField(max_length=200, unique=True)
+    campaign = models.CharField(max_length=50)
+    recipient = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # When the row may next be picked up (also the lease expiry while processing)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Notification'
+        verbose_name_plural = 'Notification Outbox'
+        indexes = [
+            models.Index(fields=['state', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.campaign} to {self.recipient} ({self.state}, {self.attempts} attempts)"
@@ -0,0 +1,170 @@
+# communication/outbox.py
+"""
+Transactional notification outbox.
+
+Request handlers never talk to SMTP. They render their emails and write them
+to the NotificationOutbox table in the same transaction as the change they
+announce, so a notification exists exactly when its change was committed:
+
+    with transaction.atomic():
+        payment.save()
+        enqueue('rent_confirmation', [(f'rent_confirmation:{payment.id}:tenant', message)])
+
+Each row has a dedup key; enqueueing a key that is already in the outbox is a
+no-op, so a retried request or a replayed IPN does not send twice.
+
+drain_outbox(), run by a Celery task that enqueue() kicks on commit and that
+beat repeats every minute (or by `manage.py drain_notification_outbox` from
+cron where there is no Celery), then:
+
+  1. claims a batch of due rows, marking them `processing` with a lease so a
+     crashed worker's rows are sent again when it expires;
+  2. sends them through the bulk mailer, one connection per campaign;
+  3. reschedules failures with exponential backoff and, after
+     NOTIFICATION_OUTBOX_MAX_ATTEMPTS, moves them to the `dead` letter state
+     for an operator to inspect and requeue from the admin.
+
+Delivery is at least once: a worker that dies between sending and marking
+its batch sent will have that batch resent after the lease.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Min
+from django.utils import timezone
+
+from app.metrics import gauge, histogram
+from .mailer import build_message, dispatch
+from .models import NotificationOutbox
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DRAIN_SECONDS = histogram('notification_outbox_drain_seconds')
+
+QUEUED_STATES = ('pending', 'processing')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def enqueue(campaign, messages):
+    """
+    Write `messages` ((dedup_key, EmailMessage) pairs) to the outbox and
+    have a worker send them once the current transaction commits. Keys
+    already in the outbox are skipped.
+    """
+    rows = [
+        NotificationOutbox(
+            dedup_key=dedup_key[:200],
+            campaign=campaign,
+            recipient=', '.join(message.to)[:254],
+            subject=message.subject[:255],
+            body=message.body,
+            from_email=message.from_email or '',
+        )
+        for dedup_key, message in messages
+    ]
+    if not rows:
+        return
+    # A savepoint, so a failed write cannot poison the caller's transaction
+    with transaction.atomic():
+        NotificationOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+    transaction.on_commit(kick_worker)
+
+
+def kick_worker():
+    """Ask a worker to drain now; the beat schedule covers a missing broker"""
+    if not _setting('NOTIFICATION_OUTBOX_KICK_WORKER', True):
+        return
+    try:
+        from app.tasks import drain_notification_outbox_task
+        drain_notification_outbox_task.apply_async(retry=False)
+    except Exception as e:
+        logger.warning(f"Could not queue outbox drain, leaving it to the schedule: {e}")
+
+
+def backoff_delay(attempts):
+    """Seconds before retry number `attempts` (1-based): base * 2^(n-1), capped"""
+    base = _setting('NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS', 60)
+    return min(base * 2 ** (attempts - 1), _setting('NOTIFICATION_OUTBOX_RETRY_MAX_SECONDS', 3600))
+
+
+def claim_batch(limit=None, now=None):
+    """Lease up to `limit` due notifications to this worker"""
+    limit = limit or _setting('NOTIFICATION_OUTBOX_BATCH_SIZE', 100)
+    now = now or timezone.now()
+    lease_until = now + timedelta(seconds=_setting('NOTIFICATION_OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects.select_for_update(skip_locked=True)
+            .filter(state__in=QUEUED_STATES, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        NotificationOutbox.objects.filter(id__in=ids).update(state='processing', next_attempt_at=lease_until)
+    return list(NotificationOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def _fail(row, error, now):
+    row.attempts += 1
+    row.last_error = str(error)[:2000]
+    if row.attempts >= _setting('NOTIFICATION_OUTBOX_MAX_ATTEMPTS', 6):
+        row.state = 'dead'
+        logger.error(f"Notification {row.dedup_key} dead-lettered after {row.attempts} attempts: {error}")
+    else:
+        row.state = 'pending'
+        row.next_attempt_at = now + timedelta(seconds=backoff_delay(row.attempts))
+        logger.warning(f"Notification {row.dedup_key} attempt {row.attempts} failed, retrying: {error}")
+    row.save(update_fields=['attempts', 'last_error', 'state', 'next_attempt_at'])
+
+
+def drain_outbox(limit=None, now=None):
+    """Send one batch of due notifications. Returns counts per outcome."""
+    counts = {'sent': 0, 'retried': 0, 'dead': 0}
+    now = now or timezone.now()
+    by_campaign = {}
+    for row in claim_batch(limit, now):
+        by_campaign.setdefault(row.campaign, []).append(row)
+
+    for campaign, rows in by_campaign.items():
+        messages = [build_message(row.subject, row.body, row.recipient, row.from_email) for row in rows]
+        with OUTBOX_DRAIN_SECONDS.time():
+            report = dispatch(messages, campaign=campaign)
+        sent_ids = []
+        for index, row in enumerate(rows):
+            if index in report['errors']:
+                _fail(row, report['errors'][index], now)
+                counts['dead' if row.state == 'dead' else 'retried'] += 1
+            else:
+                sent_ids.append(row.id)
+        NotificationOutbox.objects.filter(id__in=sent_ids).update(
+            state='sent', attempts=F('attempts') + 1, last_error='', sent_at=timezone.now()
+        )
+        counts['sent'] += len(sent_ids)
+    return counts
+
+
+def requeue(rows):
+    """Put dead-lettered notifications back in the outbox"""
+    return rows.filter(state='dead').update(
+        state='pending', attempts=0, last_error='', next_attempt_at=timezone.now()
+    )
+
+
+def outbox_depth():
+    return NotificationOutbox.objects.filter(state__in=QUEUED_STATES).count()
+
+
+def outbox_oldest_age_seconds():
+    oldest = NotificationOutbox.objects.filter(state__in=QUEUED_STATES).aggregate(
+        oldest=Min('created_at')
+    )['oldest']
+    return round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0
+
+
+gauge('notification_outbox_depth', outbox_depth)
+gauge('notification_outbox_oldest_age_seconds', outbox_oldest_age_seconds)
+gauge('notification_outbox_dead_letters', lambda: NotificationOutbox.objects.filter(state='dead').count())
@@ -1,5 +1,6 @@
 from rest_framework import permissions
 from django.core.cache import cache
+from accounts.cache_utils import user_cache_key
 from accounts.models import CustomUser, Subscription
 
 class IsTenantWithUnit(permissions.BasePermission):
@@ -11,7 +12,7 @@ class IsTenantWithUnit(permissions.BasePermission):
             return False
         
         # Check cache first
-        cache_key = f"tenant_has_unit:{request.user.id}"
+        cache_key = user_cache_key(request.user.id, "has_unit")
         has_unit = cache.get(cache_key)
         
         if has_unit is None:
@@ -34,7 +35,7 @@ class IsLandlordWithActiveSubscription(permissions.BasePermission):
             return False
         
         # Use cache to avoid repeated database queries
-        cache_key = f"subscription_status:{request.user.id}"
+        cache_key = user_cache_key(request.user.id, "subscription_status")
         has_active_sub = cache.get(cache_key)
         
         if has_active_sub is None:
@@ -0,0 +1,97 @@
+# communication/testing.py
+"""
+A local SMTP debugging server for tests and benchmarks.
+
+    with LocalSMTPServer(handshake_latency=0.01) as smtp:
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=smtp.port,
+                               EMAIL_USE_TLS=False, EMAIL_USE_SSL=False):
+            ...
+        smtp.connections, smtp.messages
+
+It accepts every message (keeping the envelope), counts client
+connections, can delay each new connection to stand in for the TCP + TLS +
+AUTH handshake of a real provider (`handshake_latency`), and rejects
+RCPT TO for the addresses in `reject`.
+"""
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        smtp = self.server.smtp
+        with smtp.lock:
+            smtp.connections += 1
+        if smtp.handshake_latency:
+            time.sleep(smtp.handshake_latency)
+        self.reply('220 localhost ESMTP debugging server')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors='replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                sender, recipients = command[10:].strip('<> '), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                address = command[8:].strip('<> ')
+                if address in smtp.reject:
+                    self.reply(f'550 No such user {address}')
+                else:
+                    recipients.append(address)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for body_line in iter(self.rfile.readline, b''):
+                    if body_line in (b'.\r\n', b'.\n'):
+                        break
+                    data.append(body_line)
+                with smtp.lock:
+                    smtp.messages.append({'from': sender, 'to': recipients, 'data': b''.join(data)})
+                self.reply('250 OK queued')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class LocalSMTPServer:
+    def __init__(self, handshake_latency=0.0, reject=()):
+        self.handshake_latency = handshake_latency
+        self.reject = set(reject)
+        self.connections = 0
+        self.messages = []
+        self.lock = threading.Lock()
+        self._server = None
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def __enter__(self):
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._server.smtp = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,119 @@
+"""
+Tests for the grouped, checkpointed landlord summaries
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import CustomUser, Property, Unit
+from app.tasks import landlord_summary_task
+from communication.landlord_summary import queue_landlord_summaries
+from communication.models import NotificationOutbox
+from communication.outbox import drain_outbox, enqueue
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_RATE_LIMITS={'*': 0},
+    NOTIFICATION_OUTBOX_KICK_WORKER=False,
+)
+class LandlordSummaryTests(TestCase):
+    def setUp(self):
+        self.today = timezone.now().date()
+        self.count = 0
+
+    def make_landlord(self, name, overdue=0, paid_up=0, future=0):
+        landlord = CustomUser.objects.create_user(
+            email=f'{name}@test.com', full_name=name.title(), user_type='landlord', password='x'
+        )
+        prop = Property.objects.create(
+            landlord=landlord, name=f'{name} Court', city='Nairobi', state='Nairobi', unit_count=100
+        )
+        for kind, count, due, paid in (
+            ('overdue', overdue, self.today - timedelta(days=3), '0'),
+            ('paid', paid_up, self.today - timedelta(days=3), '4000'),
+            ('future', future, self.today + timedelta(days=3), '0'),
+        ):
+            for _ in range(count):
+                self.count += 1
+                tenant = CustomUser.objects.create_user(
+                    email=f'{name}-{kind}{self.count}@test.com', full_name=f'Tenant {self.count}',
+                    user_type='tenant', password='x'
+                )
+                Unit.objects.create(
+                    property_obj=prop, unit_code=f'SUM-{self.count}', unit_number=str(self.count),
+                    rent=Decimal('4000'), rent_paid=Decimal(paid), rent_due_date=due,
+                    tenant=tenant, is_available=False,
+                )
+        return landlord
+
+    def test_one_query_builds_every_summary(self):
+        alice = self.make_landlord('alice', overdue=2, paid_up=1, future=1)
+        self.make_landlord('bob', paid_up=2)
+        carol = self.make_landlord('carol', overdue=1)
+
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(queue_landlord_summaries(self.today), 2)
+        self.assertEqual(len([q for q in captured if q['sql'].startswith('SELECT')]), 1)
+
+        rows = {row.recipient: row for row in NotificationOutbox.objects.all()}
+        self.assertEqual(set(rows), {alice.email, carol.email})
+        self.assertEqual(rows[alice.email].dedup_key, f'landlord_summary:{self.today.isoformat()}:{alice.id}')
+        body = rows[alice.email].body
+        self.assertIn('Hello Alice', body)
+        self.assertEqual(body.count('Outstanding: KES 4000.00'), 2)
+        self.assertIn('Total Outstanding: KES 8000.0', body)
+        self.assertNotIn('paid', body)
+
+    def test_queries_do_not_grow_with_landlords(self):
+        self.make_landlord('first', overdue=1)
+
+        def selects():
+            NotificationOutbox.objects.all().delete()
+            with CaptureQueriesContext(connection) as captured:
+                queue_landlord_summaries(self.today, batch_size=2)
+            return len([q for q in captured if q['sql'].startswith('SELECT')])
+
+        self.assertEqual(selects(), 1)
+        for i in range(6):
+            self.make_landlord(f'more{i}', overdue=3)
+        self.assertEqual(selects(), 1)
+        self.assertEqual(NotificationOutbox.objects.count(), 7)
+
+    def test_rerun_after_a_crash_does_not_resend(self):
+        for name in ('dora', 'eve', 'fay'):
+            self.make_landlord(name, overdue=1)
+
+        # The first run dies after queuing one batch
+        calls = []
+
+        def crash_after_first_batch(campaign, messages):
+            if calls:
+                raise RuntimeError('worker killed')
+            calls.append(campaign)
+            enqueue(campaign, messages)
+
+        with patch('communication.landlord_summary.enqueue', side_effect=crash_after_first_batch):
+            with self.assertRaises(RuntimeError):
+                queue_landlord_summaries(self.today, batch_size=2)
+        self.assertEqual(NotificationOutbox.objects.count(), 2)
+        drain_outbox()
+        self.assertEqual(len(mail.outbox), 2)
+
+        # The retried task queues the rest; delivered summaries are not sent again
+        landlord_summary_task()
+        drain_outbox()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['dora@test.com', 'eve@test.com', 'fay@test.com'])
+        self.assertEqual(NotificationOutbox.objects.filter(state='sent').count(), 3)
+
+        # Tomorrow is a new summary
+        queue_landlord_summaries(self.today + timedelta(days=1))
+        self.assertEqual(NotificationOutbox.objects.filter(state='pending').count(), 3)
@@ -0,0 +1,144 @@
+"""
+Tests and benchmark for the connection-reusing bulk mailer
+"""
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.mail import send_mail
+from django.test import TestCase, override_settings
+
+from accounts.models import CustomUser, Property, Unit
+from communication.mailer import build_message, dispatch, provider_rate
+from communication.messaging import send_bulk_emails, send_landlord_email
+from communication.models import EmailDelivery
+from communication.testing import LocalSMTPServer
+
+
+def smtp_settings(server):
+    return override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='127.0.0.1', EMAIL_PORT=server.port, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+    )
+
+
+def messages_for(count, domain='tenants.test'):
+    return [build_message('Rent Payment Reminder', f'Hello tenant {i}', f't{i}@{domain}') for i in range(count)]
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_RATE_LIMITS={'*': 0},
+)
+class BulkMailerTests(TestCase):
+    def test_dispatch_batches_and_records_each_recipient(self):
+        report = dispatch(messages_for(25), campaign='rent_reminder', batch_size=10)
+
+        self.assertEqual((report['sent'], report['failed'], report['batches']), (25, 0, 3))
+        self.assertEqual(len(mail.outbox), 25)
+        self.assertEqual(mail.outbox[0].to, ['t0@tenants.test'])
+        self.assertEqual(EmailDelivery.objects.filter(campaign='rent_reminder', status='sent').count(), 25)
+
+    def test_one_smtp_connection_for_the_whole_run(self):
+        with LocalSMTPServer() as smtp, smtp_settings(smtp):
+            report = dispatch(messages_for(30), campaign='rent_reminder', batch_size=8)
+        self.assertEqual(report['sent'], 30)
+        self.assertEqual(smtp.connections, 1)
+        self.assertEqual(len(smtp.messages), 30)
+
+    def test_rejected_recipient_fails_alone(self):
+        with LocalSMTPServer(reject={'t3@tenants.test'}) as smtp, smtp_settings(smtp):
+            report = dispatch(messages_for(6), campaign='rent_reminder')
+
+        self.assertEqual((report['sent'], report['failed']), (5, 1))
+        self.assertEqual(smtp.connections, 1)
+        failed = EmailDelivery.objects.get(status='failed')
+        self.assertEqual(failed.recipient, 't3@tenants.test')
+        self.assertIn('No such user', failed.error)
+
+    def test_unreachable_server_marks_everything_failed(self):
+        with LocalSMTPServer() as smtp:
+            port = smtp.port
+        with override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend', EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=port, EMAIL_USE_TLS=False, EMAIL_USE_SSL=False, EMAIL_TIMEOUT=1,
+        ):
+            report = dispatch(messages_for(4), campaign='rent_reminder')
+        self.assertEqual((report['sent'], report['failed']), (0, 4))
+        self.assertEqual(EmailDelivery.objects.filter(status='failed').count(), 4)
+
+    def test_provider_rate_limits(self):
+        limits = {'smtp.gmail.com': 5, '*': 10}
+        with override_settings(EMAIL_RATE_LIMITS=limits):
+            self.assertEqual(provider_rate(type('Conn', (), {'host': 'smtp.gmail.com'})()), 5)
+            self.assertEqual(provider_rate(type('Conn', (), {'host': 'mail.example.com'})()), 10)
+            self.assertEqual(provider_rate(mail.get_connection()), 0)
+
+        with LocalSMTPServer() as smtp, smtp_settings(smtp), override_settings(EMAIL_RATE_LIMITS={'*': 50}):
+            started = time.monotonic()
+            dispatch(messages_for(6), campaign='rent_reminder')
+            # Six sends spaced 1/50s apart take at least five intervals
+            self.assertGreaterEqual(time.monotonic() - started, 5 / 50)
+
+    def test_notification_helpers_use_the_mailer(self):
+        landlord = CustomUser.objects.create_user(
+            email='mailer-landlord@test.com', full_name='Mailer Landlord', user_type='landlord', password='x'
+        )
+        prop = Property.objects.create(
+            landlord=landlord, name='Mailer Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        tenants = [
+            CustomUser.objects.create_user(
+                email=f'mailer-tenant{i}@test.com', full_name=f'Tenant {i}', user_type='tenant', password='x'
+            )
+            for i in range(3)
+        ]
+        for i, tenant in enumerate(tenants):
+            Unit.objects.create(
+                property_obj=prop, unit_code=f'MAILER-{i}', unit_number=str(i), rent=Decimal('5000'),
+                tenant=tenant, is_available=False
+            )
+
+        with patch('communication.mailer.get_connection', wraps=mail.get_connection) as get_connection:
+            send_bulk_emails(tenants)
+            send_landlord_email('Water outage', 'No water on Sunday', tenants)
+        self.assertEqual(get_connection.call_count, 2)
+        self.assertEqual(len(mail.outbox), 6)
+        # Landlord messages go to each tenant separately
+        self.assertTrue(all(len(message.to) == 1 for message in mail.outbox))
+        self.assertIn('Outstanding balance: KES 5000', mail.outbox[0].body)
+        self.assertEqual(EmailDelivery.objects.filter(campaign='landlord_message').count(), 3)
+
+    def test_benchmark_against_send_mail(self):
+        """Per-message send_mail vs dispatch, on locmem and on a local SMTP server"""
+        count = 200
+        results = {}
+
+        started = time.perf_counter()
+        for message in messages_for(count):
+            send_mail(message.subject, message.body, None, message.to)
+        results['locmem send_mail'] = time.perf_counter() - started
+        started = time.perf_counter()
+        dispatch(messages_for(count), campaign='benchmark', record=False)
+        results['locmem dispatch'] = time.perf_counter() - started
+
+        # 5ms per new connection stands in for a TLS handshake and login
+        with LocalSMTPServer(handshake_latency=0.005) as smtp, smtp_settings(smtp):
+            started = time.perf_counter()
+            for message in messages_for(count):
+                send_mail(message.subject, message.body, None, message.to)
+            results['smtp send_mail'] = time.perf_counter() - started
+            per_message_connections = smtp.connections
+
+            started = time.perf_counter()
+            report = dispatch(messages_for(count), campaign='benchmark', record=False)
+            results['smtp dispatch'] = time.perf_counter() - started
+            dispatch_connections = smtp.connections - per_message_connections
+
+        self.assertEqual(report['sent'], count)
+        self.assertEqual(per_message_connections, count)
+        self.assertEqual(dispatch_connections, 1)
+        self.assertLess(results['smtp dispatch'], results['smtp send_mail'])
@@ -0,0 +1,154 @@
+"""
+Tests for the transactional notification outbox
+"""
+import io
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, TenantProfile, Unit
+from communication.mailer import build_message
+from communication.models import EmailDelivery, NotificationOutbox
+from communication.outbox import drain_outbox, enqueue, requeue
+from communication.testing import LocalSMTPServer
+from communication.tests_mailer import smtp_settings
+from payments.models import Payment
+from payments.views_pesapal import handle_successful_rent_payment
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_RATE_LIMITS={'*': 0},
+    NOTIFICATION_OUTBOX_KICK_WORKER=False,
+    NOTIFICATION_OUTBOX_MAX_ATTEMPTS=3,
+    NOTIFICATION_OUTBOX_RETRY_BASE_SECONDS=60,
+)
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='outbox-landlord@test.com', full_name='Outbox Landlord', user_type='landlord', password='x'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='outbox-tenant@test.com', full_name='Outbox Tenant', user_type='tenant', password='x'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Outbox Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        self.unit = Unit.objects.create(
+            property_obj=self.property, unit_code='OUTBOX-1', unit_number='1', rent=Decimal('10000'),
+            tenant=self.tenant, is_available=False
+        )
+
+    def enqueue_one(self, key, recipient='someone@test.com'):
+        enqueue('test', [(key, build_message('Hello', 'Body', recipient))])
+
+    def test_rows_commit_and_roll_back_with_the_transaction(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.enqueue_one('test:rolled-back')
+                raise RuntimeError('business change failed')
+        self.assertFalse(NotificationOutbox.objects.exists())
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.enqueue_one('test:committed')
+        self.assertEqual(NotificationOutbox.objects.get().state, 'pending')
+        # The worker kick waits for the commit
+        self.assertEqual(len(callbacks), 1)
+
+    def test_dedup_key_enqueues_once(self):
+        self.enqueue_one('test:once')
+        self.enqueue_one('test:once')
+        self.assertEqual(NotificationOutbox.objects.count(), 1)
+        drain_outbox()
+        self.enqueue_one('test:once')
+        self.assertEqual(drain_outbox(), {'sent': 0, 'retried': 0, 'dead': 0})
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_payment_completion_writes_confirmations_without_sending(self):
+        payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('4000')
+        )
+        with patch('communication.mailer.get_connection') as get_connection:
+            self.assertTrue(handle_successful_rent_payment({'payment_id': payment.id}, 'QK4OUTBOX', '4000'))
+            self.assertFalse(handle_successful_rent_payment({'payment_id': payment.id}, 'QK4OUTBOX', '4000'))
+        get_connection.assert_not_called()
+        self.assertEqual(len(mail.outbox), 0)
+
+        rows = NotificationOutbox.objects.order_by('dedup_key')
+        self.assertEqual(
+            [row.dedup_key for row in rows],
+            [f'rent_confirmation:{payment.id}:landlord', f'rent_confirmation:{payment.id}:tenant'],
+        )
+        self.assertIn('Remaining Balance: KES 6,000.00', rows[1].body)
+
+        self.assertEqual(drain_outbox()['sent'], 2)
+        self.assertEqual({message.to[0] for message in mail.outbox}, {self.tenant.email, self.landlord.email})
+        self.assertEqual(EmailDelivery.objects.filter(campaign='rent_confirmation', status='sent').count(), 2)
+
+    def test_report_creation_does_not_wait_on_smtp(self):
+        TenantProfile.objects.create(tenant=self.tenant, landlord=self.landlord, current_unit=self.unit)
+        self.client = APIClient()
+        self.client.force_authenticate(self.tenant)
+        # A provider that takes a second to accept each connection
+        with LocalSMTPServer(handshake_latency=1.0) as smtp, smtp_settings(smtp):
+            response = self.client.post(reverse('create-report'), {
+                'unit': self.unit.id, 'issue_category': 'plumbing', 'priority_level': 'high',
+                'issue_title': 'Burst pipe', 'description': 'Water everywhere',
+            })
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(smtp.connections, 0)
+
+            row = NotificationOutbox.objects.get()
+            self.assertEqual((row.dedup_key, row.recipient), (f"report_created:{response.data['id']}", self.landlord.email))
+            self.assertEqual(drain_outbox()['sent'], 1)
+        self.assertEqual(smtp.connections, 1)
+        self.assertEqual(smtp.messages[0]['to'], [self.landlord.email])
+
+    def test_failures_back_off_then_dead_letter(self):
+        self.enqueue_one('test:good', 'good@test.com')
+        self.enqueue_one('test:bad', 'bad@test.com')
+        now = timezone.now()
+        with LocalSMTPServer(reject={'bad@test.com'}) as smtp, smtp_settings(smtp):
+            self.assertEqual(drain_outbox(now=now), {'sent': 1, 'retried': 1, 'dead': 0})
+            bad = NotificationOutbox.objects.get(dedup_key='test:bad')
+            self.assertEqual((bad.state, bad.attempts), ('pending', 1))
+            self.assertEqual(bad.next_attempt_at, now + timedelta(seconds=60))
+            self.assertIn('No such user', bad.last_error)
+
+            # Not due yet
+            self.assertEqual(drain_outbox(now=now + timedelta(seconds=30))['retried'], 0)
+            drain_outbox(now=now + timedelta(seconds=60))
+            self.assertEqual(drain_outbox(now=now + timedelta(seconds=180)), {'sent': 0, 'retried': 0, 'dead': 1})
+
+        bad.refresh_from_db()
+        self.assertEqual((bad.state, bad.attempts), ('dead', 3))
+        self.assertEqual(NotificationOutbox.objects.get(dedup_key='test:good').state, 'sent')
+
+        self.assertEqual(requeue(NotificationOutbox.objects.all()), 1)
+        self.assertEqual(drain_outbox()['sent'], 1)
+
+    def test_rows_of_a_crashed_worker_are_sent_after_the_lease(self):
+        self.enqueue_one('test:crash')
+        now = timezone.now()
+        # A worker claims the row and dies before sending it
+        NotificationOutbox.objects.update(state='processing', next_attempt_at=now + timedelta(minutes=5))
+        self.assertEqual(drain_outbox(now=now)['sent'], 0)
+        self.assertEqual(drain_outbox(now=now + timedelta(minutes=5))['sent'], 1)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_management_command_drains_everything_due(self):
+        for i in range(5):
+            self.enqueue_one(f'test:command-{i}')
+        call_command('drain_notification_outbox', '--batch-size', '2', '--all', stdout=io.StringIO())
+        self.assertEqual(NotificationOutbox.objects.filter(state='sent').count(), 5)
+        self.assertEqual(len(mail.outbox), 5)
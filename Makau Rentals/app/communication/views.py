@@ -7,10 +7,12 @@ from .serializers import ReportSerializer, UpdateReportStatusSerializer, SendEma
 from .permissions import IsTenantWithUnit, IsLandlordWithActiveSubscription
 from accounts.permissions import CanAccessReport
 from accounts.models import CustomUser, Unit
-from .messaging import send_landlord_email
+from .messaging import queue_report_email, send_landlord_email
 from rest_framework.permissions import IsAuthenticated
 from app.tasks import send_landlord_email_task
+from app.pagination import ReportCursorPagination
 from django.conf import settings
+from django.db import transaction
 
 
 class CreateReportView(generics.CreateAPIView):
@@ -22,47 +24,17 @@ class CreateReportView(generics.CreateAPIView):
         import logging
         logger = logging.getLogger(__name__)
         
-        report = serializer.save()
+        # The landlord's email is written to the outbox with the report and
+        # sent by a worker, so the request never waits on SMTP
+        with transaction.atomic():
+            report = serializer.save()
+            queue_report_email(report)
         logger.info(f"Report {report.id} created successfully by tenant {report.tenant.email}")
-        
-        # Send email notification to landlord
-        email_async = getattr(settings, 'EMAIL_ASYNC_ENABLED', False)
-
-        # If SMTP backend is selected but credentials are missing, skip sending to avoid blocking
-        backend = getattr(settings, 'EMAIL_BACKEND', '')
-        using_smtp = 'smtp' in backend
-        if using_smtp and (not getattr(settings, 'EMAIL_HOST_USER', '') or not getattr(settings, 'EMAIL_HOST_PASSWORD', '')):
-            logger.warning('Email backend is SMTP but credentials are missing; skipping email send for report %s', report.id)
-            return
-        
-        if email_async:
-            # Try async email via Celery
-            try:
-                from app.tasks import send_report_email_task
-                send_report_email_task.apply_async(args=[report.id], countdown=0)
-                logger.info(f"Queued async email for report {report.id}")
-            except Exception as celery_error:
-                # Fallback to synchronous email if Celery is not available
-                logger.warning(f"Celery unavailable, falling back to sync email: {celery_error}")
-                try:
-                    from .messaging import send_report_email
-                    send_report_email(report)
-                    logger.info(f"Sent sync email for report {report.id}")
-                except Exception as email_error:
-                    logger.error(f"Failed to send report email: {email_error}")
-        else:
-            # Send synchronously
-            try:
-                from .messaging import send_report_email
-                send_report_email(report)
-                logger.info(f"Sent sync email for report {report.id}")
-            except Exception as email_error:
-                logger.error(f"Failed to send report email: {email_error}")
-                # Report is still created, just email failed
 
 class ReportListView(generics.ListAPIView):
     serializer_class = ReportSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ReportCursorPagination
     
     def get_queryset(self):
         user = self.request.user
@@ -78,6 +50,7 @@ class ReportListView(generics.ListAPIView):
 class OpenReportsView(generics.ListAPIView):
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ReportCursorPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -91,6 +64,7 @@ class OpenReportsView(generics.ListAPIView):
 class UrgentReportsView(generics.ListAPIView):
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ReportCursorPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -103,6 +77,7 @@ class UrgentReportsView(generics.ListAPIView):
 class InProgressReportsView(generics.ListAPIView):
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ReportCursorPagination
 
     def get_queryset(self):
         user = self.request.user
@@ -115,6 +90,7 @@ class InProgressReportsView(generics.ListAPIView):
 class ResolvedReportsView(generics.ListAPIView):
     serializer_class = ReportSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ReportCursorPagination
 
     def get_queryset(self):
         user = self.request.user
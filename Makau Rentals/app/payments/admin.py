@@ -1,7 +1,68 @@
 from django.contrib import admin
-from .models import Payment, SubscriptionPayment
+from .ipn_inbox import requeue
+from .models import BillingRun, ExportJob, IpnNotification, LedgerEntry, Payment, PaymentIntent, SubscriptionPayment, UnitBalance
 
 admin.site.register(Payment)
 admin.site.register(SubscriptionPayment)
 
+
+@admin.register(PaymentIntent)
+class PaymentIntentAdmin(admin.ModelAdmin):
+    list_display = ('merchant_reference', 'kind', 'tracking_id', 'expected_amount', 'state', 'created_at')
+    list_filter = ('kind', 'state')
+    search_fields = ('merchant_reference', 'tracking_id')
+    raw_id_fields = ('payment', 'subscription_payment')
+
 # Register your models here.
+
+
+@admin.register(IpnNotification)
+class IpnNotificationAdmin(admin.ModelAdmin):
+    list_display = ('tracking_id', 'state', 'attempts', 'next_attempt_at', 'received_at', 'processed_at')
+    list_filter = ('state',)
+    search_fields = ('tracking_id', 'merchant_reference')
+    readonly_fields = ('payload', 'last_error', 'received_at', 'processed_at')
+    actions = ['requeue_dead_letters']
+
+    @admin.action(description="Requeue selected dead letters")
+    def requeue_dead_letters(self, request, queryset):
+        self.message_user(request, f"Requeued {requeue(queryset)} notifications")
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    """Append-only: corrections are posted as adjustment entries"""
+    list_display = ('posted_at', 'unit', 'tenant', 'entry_type', 'amount', 'balance_after', 'description')
+    list_filter = ('entry_type',)
+    search_fields = ('description', 'unit__unit_code')
+    raw_id_fields = ('unit', 'tenant', 'payment', 'reverses')
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(UnitBalance)
+class UnitBalanceAdmin(admin.ModelAdmin):
+    list_display = ('unit', 'balance', 'total_charged', 'total_paid', 'total_adjusted', 'deposit_held', 'updated_at')
+    raw_id_fields = ('unit',)
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(BillingRun)
+class BillingRunAdmin(admin.ModelAdmin):
+    list_display = ('period', 'status', 'units_charged', 'amount_charged', 'last_unit_id', 'started_at', 'finished_at')
+    list_filter = ('status',)
+    readonly_fields = ('chunk_timings', 'error')
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'owner', 'kind', 'status', 'row_count', 'created_at', 'finished_at')
+    list_filter = ('kind', 'status')
+    raw_id_fields = ('owner',)
+    readonly_fields = ('filters', 'error')
@@ -0,0 +1,183 @@
+# payments/billing.py
+"""
+Monthly rent charge generation.
+
+generate_rent_charges() charges every occupied unit its rent for a billing
+period (the first day of a month) as a `charge` LedgerEntry. Units are
+walked in id order, BILLING_CHUNK_SIZE at a time, each chunk in one
+transaction with a constant number of statements:
+
+  1. the chunk's occupied units not yet charged for the period;
+  2. bulk_create of their charge entries (the unique (unit, period)
+     constraint makes a charge impossible to post twice);
+  3. set-based UPDATEs of the UnitBalance snapshots and of the units'
+     rent_remaining, and the landlords' stats deltas;
+  4. the BillingRun checkpoint (last unit id, totals, chunk timing).
+
+A unit whose period is already covered is not billed again: one with an
+opening charge posted in the period (see ledger.derive_entries) is skipped,
+and one assigned in the period gets its charge on the ledger only, since the
+assignment already put that month's rent in rent_remaining. Billing raises
+rent_remaining by the rent and leaves rent_paid alone, so the columns move
+with the ledger balance and the collected figure never drops.
+
+Because the checkpoint commits with the chunk, a run that dies part way
+resumes after the last committed chunk, and re-running a finished period
+does nothing. The run row is locked per chunk, so overlapping workers
+take turns instead of racing.
+
+QuerySet.update()/bulk_create() bypass the model signals, so landlord
+stats and cache generations are maintained here (see accounts/signals.py).
+"""
+import logging
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Subquery
+from django.utils import timezone
+
+from accounts.cache_utils import bump_landlord_generation
+from accounts.models import Unit
+from accounts.stats import apply_delta
+from .models import BillingRun, LedgerEntry, UnitBalance
+
+logger = logging.getLogger(__name__)
+
+
+def billing_period(day=None):
+    """First day of the month `day` (default today) falls in"""
+    day = day or timezone.localdate()
+    return date(day.year, day.month, 1)
+
+
+def _period_start(period):
+    """Aware midnight at which `period` begins"""
+    return timezone.make_aware(datetime(period.year, period.month, period.day))
+
+
+def _charge_subquery(period, field):
+    charge = LedgerEntry.objects.filter(
+        unit_id=OuterRef('unit_id'), period=period, entry_type='charge', reverses__isnull=True
+    )
+    return Subquery(charge.values(field)[:1])
+
+
+def charge_chunk(run, chunk_size):
+    """
+    Charge the next chunk of units after the run's checkpoint. Returns the
+    chunk's timing dict, or None when no units are left.
+    """
+    started = time.perf_counter()
+    period = run.period
+    with transaction.atomic():
+        run = BillingRun.objects.select_for_update().get(pk=run.pk)
+        # Ids in the chunk, occupied or not, so the checkpoint always advances
+        ids = list(
+            Unit.objects.filter(id__gt=run.last_unit_id).order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return None
+
+        starts = _period_start(period)
+        charged = Exists(LedgerEntry.objects.filter(
+            unit_id=OuterRef('pk'), period=period, entry_type='charge', reverses__isnull=True
+        ))
+        opened = Exists(LedgerEntry.objects.filter(
+            unit_id=OuterRef('pk'), period__isnull=True, entry_type='charge', reverses__isnull=True,
+            posted_at__gte=starts,
+        ))
+        units = list(
+            Unit.objects.filter(id__in=ids, tenant__isnull=False, rent__gt=0)
+            .exclude(charged).exclude(opened)
+            .values('id', 'tenant_id', 'rent', 'assigned_date', 'property_obj__landlord_id')
+        )
+        # Assigned this period: the assignment already owes the month on the unit
+        billed = [u for u in units if not (u['assigned_date'] and u['assigned_date'] >= starts)]
+
+        if units:
+            unit_ids = [u['id'] for u in units]
+            UnitBalance.objects.bulk_create(
+                [UnitBalance(unit_id=unit_id) for unit_id in unit_ids], ignore_conflicts=True
+            )
+            balances = dict(
+                UnitBalance.objects.select_for_update().filter(unit_id__in=unit_ids)
+                .values_list('unit_id', 'balance')
+            )
+            posted_at = timezone.now()
+            description = f"Rent for {period:%B %Y}"
+            LedgerEntry.objects.bulk_create([
+                LedgerEntry(
+                    unit_id=u['id'], tenant_id=u['tenant_id'], entry_type='charge', amount=u['rent'],
+                    balance_after=balances[u['id']] + u['rent'], description=description,
+                    posted_at=posted_at, period=period,
+                )
+                for u in units
+            ])
+            UnitBalance.objects.filter(unit_id__in=unit_ids).update(
+                balance=F('balance') + _charge_subquery(period, 'amount'),
+                total_charged=F('total_charged') + _charge_subquery(period, 'amount'),
+                last_entry_id=_charge_subquery(period, 'id'),
+                updated_at=posted_at,
+            )
+
+        if billed:
+            Unit.objects.filter(id__in=[u['id'] for u in billed]).update(
+                rent_remaining=F('rent_remaining') + F('rent'),
+            )
+            per_landlord = defaultdict(Decimal)
+            for u in billed:
+                per_landlord[u['property_obj__landlord_id']] += u['rent']
+            for landlord_id, amount in per_landlord.items():
+                apply_delta(landlord_id, {'rent_outstanding': amount})
+            landlord_ids = list(per_landlord)
+            transaction.on_commit(lambda: [bump_landlord_generation(i) for i in landlord_ids])
+
+        timing = {
+            'last_unit_id': ids[-1],
+            'units': len(units),
+            'seconds': round(time.perf_counter() - started, 4),
+        }
+        run.last_unit_id = ids[-1]
+        run.units_charged += len(units)
+        run.amount_charged += sum((u['rent'] for u in units), Decimal('0'))
+        run.chunk_timings.append(timing)
+        run.save(update_fields=['last_unit_id', 'units_charged', 'amount_charged', 'chunk_timings'])
+    logger.info(
+        f"Billing {period:%Y-%m}: charged {timing['units']} units up to id {timing['last_unit_id']} "
+        f"in {timing['seconds']}s"
+    )
+    return timing
+
+
+def generate_rent_charges(period=None, chunk_size=None, max_chunks=None):
+    """
+    Charge every occupied unit for `period` (default: the current month),
+    resuming the period's run if it was interrupted. `max_chunks` stops
+    early (the run stays `running` and resumes next time). Returns the run.
+    """
+    period = billing_period(period)
+    chunk_size = chunk_size or getattr(settings, 'BILLING_CHUNK_SIZE', 1000)
+    run, _ = BillingRun.objects.get_or_create(period=period)
+    if run.status == 'completed':
+        return run
+    BillingRun.objects.filter(pk=run.pk).exclude(status='completed').update(
+        status='running', error='', started_at=run.started_at or timezone.now()
+    )
+
+    chunks = 0
+    try:
+        while max_chunks is None or chunks < max_chunks:
+            if charge_chunk(run, chunk_size) is None:
+                BillingRun.objects.filter(pk=run.pk).update(status='completed', finished_at=timezone.now())
+                break
+            chunks += 1
+    except Exception as e:
+        logger.error(f"Billing run {period:%Y-%m} failed: {e}", exc_info=True)
+        BillingRun.objects.filter(pk=run.pk).update(status='failed', error=str(e))
+        raise
+    run.refresh_from_db()
+    return run
@@ -1,18 +1,23 @@
 """
 Payment Email Notifications
-Sends confirmation emails to tenants and landlords when payments are completed
+Queues confirmation emails to tenants and landlords when payments are completed.
+Call these inside the transaction that completes the payment: the emails are
+written to the notification outbox with it and sent by a worker
+(communication/outbox.py).
 """
 from django.conf import settings
-from django.core.mail import send_mail
 from django.utils import timezone
 import logging
 
+from communication.mailer import build_message
+from communication.outbox import enqueue
+
 logger = logging.getLogger(__name__)
 
 
-def send_rent_payment_confirmation(payment):
+def queue_rent_payment_confirmation(payment):
     """
-    Send rent payment confirmation email to both tenant and landlord
+    Queue rent payment confirmation email to both tenant and landlord
     
     Args:
         payment: Payment object with completed status
@@ -55,14 +60,8 @@ Makau Rentals Management System
 {settings.EMAIL_HOST_USER}
 """
         
-        send_mail(
-            tenant_subject,
-            tenant_message,
-            settings.EMAIL_HOST_USER,
-            [tenant.email],
-            fail_silently=False
-        )
-        logger.info(f"Rent payment confirmation sent to tenant: {tenant.email}")
+        key = f"rent_confirmation:{payment.id}"
+        messages = [(f"{key}:tenant", build_message(tenant_subject, tenant_message, tenant.email))]
         
         # Email to Landlord
         if landlord and landlord.email:
@@ -98,22 +97,18 @@ Makau Rentals Management System
 {settings.EMAIL_HOST_USER}
 """
             
-            send_mail(
-                landlord_subject,
-                landlord_message,
-                settings.EMAIL_HOST_USER,
-                [landlord.email],
-                fail_silently=False
-            )
-            logger.info(f"Rent payment notification sent to landlord: {landlord.email}")
+            messages.append((f"{key}:landlord", build_message(landlord_subject, landlord_message, landlord.email)))
+
+        enqueue('rent_confirmation', messages)
+        logger.info(f"Queued {len(messages)} rent payment confirmations for payment {payment.id}")
             
     except Exception as e:
-        logger.error(f"Failed to send rent payment confirmation emails: {str(e)}", exc_info=True)
+        logger.error(f"Failed to queue rent payment confirmation emails: {str(e)}", exc_info=True)
 
 
-def send_subscription_payment_confirmation(subscription_payment):
+def queue_subscription_payment_confirmation(subscription_payment):
     """
-    Send subscription payment confirmation email to landlord
+    Queue subscription payment confirmation email to landlord
     
     Args:
         subscription_payment: SubscriptionPayment object with completed status
@@ -157,22 +152,18 @@ Makau Rentals Management System
 {settings.EMAIL_HOST_USER}
 """
         
-        send_mail(
-            subject,
-            message,
-            settings.EMAIL_HOST_USER,
-            [user.email],
-            fail_silently=False
-        )
-        logger.info(f"Subscription payment confirmation sent to: {user.email}")
+        enqueue('subscription_confirmation', [
+            (f"subscription_confirmation:{subscription_payment.id}", build_message(subject, message, user.email))
+        ])
+        logger.info(f"Queued subscription payment confirmation to {user.email}")
         
     except Exception as e:
-        logger.error(f"Failed to send subscription payment confirmation email: {str(e)}", exc_info=True)
+        logger.error(f"Failed to queue subscription payment confirmation email: {str(e)}", exc_info=True)
 
 
-def send_deposit_payment_confirmation(payment, is_registration=False):
+def queue_deposit_payment_confirmation(payment, is_registration=False):
     """
-    Send deposit payment confirmation email to both tenant and landlord
+    Queue deposit payment confirmation email to both tenant and landlord
     
     Args:
         payment: Payment object with completed status
@@ -217,14 +208,8 @@ Makau Rentals Management System
 {settings.EMAIL_HOST_USER}
 """
         
-        send_mail(
-            tenant_subject,
-            tenant_message,
-            settings.EMAIL_HOST_USER,
-            [tenant.email],
-            fail_silently=False
-        )
-        logger.info(f"Deposit payment confirmation sent to tenant: {tenant.email}")
+        key = f"deposit_confirmation:{payment.id}"
+        messages = [(f"{key}:tenant", build_message(tenant_subject, tenant_message, tenant.email))]
         
         # Email to Landlord
         if landlord and landlord.email:
@@ -258,14 +243,10 @@ Makau Rentals Management System
 {settings.EMAIL_HOST_USER}
 """
             
-            send_mail(
-                landlord_subject,
-                landlord_message,
-                settings.EMAIL_HOST_USER,
-                [landlord.email],
-                fail_silently=False
-            )
-            logger.info(f"Deposit payment notification sent to landlord: {landlord.email}")
+            messages.append((f"{key}:landlord", build_message(landlord_subject, landlord_message, landlord.email)))
+
+        enqueue('deposit_confirmation', messages)
+        logger.info(f"Queued {len(messages)} deposit payment confirmations for payment {payment.id}")
             
     except Exception as e:
-        logger.error(f"Failed to send deposit payment confirmation emails: {str(e)}", exc_info=True)
+        logger.error(f"Failed to queue deposit payment confirmation emails: {str(e)}", exc_info=True)
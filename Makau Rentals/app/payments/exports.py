@@ -0,0 +1,222 @@
+# payments/exports.py
+"""
+CSV exports of completed payments.
+
+Rows are read as flat tuples (`values_list(...).iterator(chunk_size=...)`,
+related names joined in the same query) and encoded a buffer at a time, so
+memory stays flat whatever the row count:
+
+  - stream_response() streams the CSV (optionally gzipped) straight into a
+    StreamingHttpResponse;
+  - run_export() writes the same bytes to storage for an ExportJob, for
+    exports too large to hold a request open; the client polls the job and
+    downloads the file once it is ready.
+
+Each export kind has a scope (a property, a unit or a landlord) and takes the
+same filters: a created_at date range and, for landlord-wide exports, one
+property.
+"""
+import csv
+import io
+import logging
+import tempfile
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ExportJob, Payment
+
+logger = logging.getLogger(__name__)
+
+BUFFER_BYTES = 64 * 1024
+
+
+def _date(fmt):
+    return lambda value: value.strftime(fmt) if value else ''
+
+
+def _text(default=''):
+    return lambda value: value if value else default
+
+
+def _plain(value):
+    return value
+
+
+# kind -> header/field/formatter per column, and the scope the rows belong to
+EXPORTS = {
+    'landlord': {
+        'scope': 'unit__property_obj_id',
+        'columns': [
+            ('Unit Number', 'unit__unit_number', _plain),
+            ('Tenant', 'tenant__full_name', _text()),
+            ('Amount', 'amount', _plain),
+            ('Date', 'created_at', _date('%Y-%m-%d')),
+            ('Receipt', 'mpesa_receipt', _text()),
+        ],
+        'order': ('created_at', 'id'),
+    },
+    'tenant': {
+        'scope': 'unit_id',
+        'columns': [
+            ('Amount', 'amount', _plain),
+            ('Date', 'created_at', _date('%Y-%m-%d')),
+            ('Receipt', 'mpesa_receipt', _text()),
+            ('Type', 'payment_type', _plain),
+        ],
+        'order': ('created_at', 'id'),
+    },
+    'rent': {
+        'scope': 'unit__property_obj__landlord_id',
+        'columns': [
+            ('Date', 'created_at', _date('%Y-%m-%d %H:%M:%S')),
+            ('Unit Number', 'unit__unit_number', _plain),
+            ('Tenant', 'tenant__full_name', _text('N/A')),
+            ('Amount', 'amount', _plain),
+            ('Payment Type', 'payment_type', _plain),
+            ('Receipt', 'mpesa_receipt', _text()),
+            ('Property', 'unit__property_obj__name', _text('N/A')),
+        ],
+        'order': ('-created_at', '-id'),
+    },
+}
+
+
+def parse_filters(params):
+    """
+    Export filters from query parameters: `start`/`end` (YYYY-MM-DD, both
+    inclusive) and `property_id`. Raises ValueError on malformed values.
+    """
+    filters = {}
+    for name in ('start', 'end'):
+        value = params.get(name)
+        if value:
+            if parse_date(value) is None:
+                raise ValueError(f"Invalid {name} date, expected YYYY-MM-DD")
+            filters[name] = value
+    property_id = params.get('property_id')
+    if property_id:
+        filters['property_id'] = int(property_id)
+    return filters
+
+
+def export_rows(kind, scope_id, filters):
+    """The export's rows as plain tuples, formatted for the CSV"""
+    spec = EXPORTS[kind]
+    payments = Payment.objects.filter(status='completed', **{spec['scope']: scope_id})
+    if filters.get('start'):
+        start = datetime.combine(parse_date(filters['start']), time.min)
+        payments = payments.filter(created_at__gte=timezone.make_aware(start))
+    if filters.get('end'):
+        end = datetime.combine(parse_date(filters['end']) + timedelta(days=1), time.min)
+        payments = payments.filter(created_at__lt=timezone.make_aware(end))
+    if filters.get('property_id'):
+        payments = payments.filter(unit__property_obj_id=filters['property_id'])
+
+    fields = [field for _, field, _ in spec['columns']]
+    formatters = [formatter for _, _, formatter in spec['columns']]
+    chunk_size = getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+    rows = payments.order_by(*spec['order']).values_list(*fields).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield [formatter(value) for formatter, value in zip(formatters, row)]
+
+
+def csv_chunks(kind, rows):
+    """Encoded CSV (header first) in pieces of about BUFFER_BYTES"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([header for header, _, _ in EXPORTS[kind]['columns']])
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= BUFFER_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(kind, scope_id, filters, gzip=False):
+    chunks = csv_chunks(kind, export_rows(kind, scope_id, filters))
+    return gzip_chunks(chunks) if gzip else chunks
+
+
+def stream_response(kind, scope_id, filters, filename, gzip=False):
+    response = StreamingHttpResponse(
+        export_chunks(kind, scope_id, filters, gzip),
+        content_type='application/gzip' if gzip else 'text/csv',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv{".gz" if gzip else ""}"'
+    return response
+
+
+# ---------------------------------------------------------------------------
+# Background exports
+# ---------------------------------------------------------------------------
+def queue_export(owner, kind, scope_id, filters, filename, gzip=False):
+    """Create an ExportJob and hand it to a worker once this transaction commits"""
+    job = ExportJob.objects.create(
+        owner=owner, kind=kind, scope_id=scope_id, filters=filters, filename=filename, gzip=gzip
+    )
+
+    def enqueue():
+        try:
+            from app.tasks import generate_export_task
+            generate_export_task.apply_async(args=[job.id], retry=False)
+        except Exception as e:
+            logger.error(f"Could not queue export {job.id}: {e}")
+            ExportJob.objects.filter(pk=job.pk, status='pending').update(
+                status='failed', error='Could not queue the export, please retry'
+            )
+
+    transaction.on_commit(enqueue)
+    return job
+
+
+def run_export(job_id):
+    """Write an ExportJob's file to storage. Returns the job."""
+    job = ExportJob.objects.get(pk=job_id)
+    if job.status == 'completed':
+        return job
+    ExportJob.objects.filter(pk=job.pk).update(status='running', error='')
+    try:
+        row_count = 0
+
+        def counted(rows):
+            nonlocal row_count
+            for row in rows:
+                row_count += 1
+                yield row
+
+        chunks = csv_chunks(job.kind, counted(export_rows(job.kind, job.scope_id, job.filters)))
+        if job.gzip:
+            chunks = gzip_chunks(chunks)
+        with tempfile.TemporaryFile() as tmp:
+            for chunk in chunks:
+                tmp.write(chunk)
+            tmp.seek(0)
+            job.file.save(job.download_name, File(tmp), save=False)
+        job.row_count = row_count
+        job.status = 'completed'
+        job.finished_at = timezone.now()
+        job.save(update_fields=['file', 'row_count', 'status', 'finished_at'])
+    except Exception as e:
+        logger.error(f"Export {job.id} failed: {e}", exc_info=True)
+        ExportJob.objects.filter(pk=job.pk).update(status='failed', error=str(e), finished_at=timezone.now())
+        raise
+    logger.info(f"Export {job.id} ({job.kind}) wrote {row_count} rows")
+    return job
@@ -0,0 +1,144 @@
+# payments/intents.py
+"""
+Durable correlation between PesaPal orders and pending payments.
+
+An initiation endpoint creates the pending Payment/SubscriptionPayment and
+its PaymentIntent in one transaction, submits the order and then attaches
+the tracking id PesaPal assigned. The IPN resolves the intent with a single
+lookup on the unique tracking id, so a notification is never lost to an
+expired or evicted cache entry.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Payment, PaymentIntent, SubscriptionPayment
+
+logger = logging.getLogger(__name__)
+
+
+def create_intent(kind, merchant_reference, expected_amount, payment=None,
+                  subscription_payment=None, **metadata):
+    """Record the intent for a pending payment (call inside its transaction)"""
+    return PaymentIntent.objects.create(
+        kind=kind,
+        merchant_reference=merchant_reference,
+        expected_amount=expected_amount,
+        payment=payment,
+        subscription_payment=subscription_payment,
+        metadata=metadata,
+    )
+
+
+def attach_tracking_id(intent, tracking_id):
+    """Store the provider tracking id on the intent and its payment"""
+    with transaction.atomic():
+        intent.tracking_id = tracking_id
+        intent.save(update_fields=['tracking_id', 'updated_at'])
+        if intent.payment_id:
+            Payment.objects.filter(pk=intent.payment_id).update(mpesa_checkout_request_id=tracking_id)
+            if intent.payment is not None:
+                intent.payment.mpesa_checkout_request_id = tracking_id
+        if intent.subscription_payment_id:
+            SubscriptionPayment.objects.filter(pk=intent.subscription_payment_id).update(
+                mpesa_checkout_request_id=tracking_id
+            )
+    return intent
+
+
+def resolve_intent(tracking_id, merchant_reference=None):
+    """
+    The intent for an IPN, or None. One indexed lookup on the tracking id;
+    the merchant reference is only tried when that misses (an order whose
+    tracking id was never attached).
+    """
+    intents = PaymentIntent.objects.select_related('payment', 'subscription_payment')
+    intent = intents.filter(tracking_id=tracking_id).first() if tracking_id else None
+    if intent is None and merchant_reference:
+        intent = intents.filter(merchant_reference=merchant_reference).first()
+    return intent
+
+
+def handler_data(intent):
+    """The payload the IPN completion handlers expect"""
+    data = dict(intent.metadata)
+    data.update({
+        'amount': float(intent.expected_amount),
+        'merchant_reference': intent.merchant_reference,
+    })
+    if intent.kind == 'subscription':
+        data['subscription_payment_id'] = intent.subscription_payment_id
+    else:
+        data['payment_id'] = intent.payment_id
+        data['unit_id'] = intent.payment.unit_id if intent.payment else None
+    return data
+
+
+def set_state(intent, state):
+    """Move an intent to a final state"""
+    intent.state = state
+    fields = ['state', 'updated_at']
+    if state == 'completed':
+        intent.completed_at = timezone.now()
+        fields.append('completed_at')
+    intent.save(update_fields=fields)
+
+
+def backfill_missing_intents():
+    """
+    Intents for pending orders that reached PesaPal without one (initiated
+    before intents existed, or by an old worker during a deploy), dated like
+    their payments so reconciliation picks them up. Returns the number created.
+    """
+    submitted = Q(mpesa_checkout_request_id__isnull=False) & ~Q(mpesa_checkout_request_id='')
+    has_intent = Exists(PaymentIntent.objects.filter(tracking_id=OuterRef('mpesa_checkout_request_id')))
+
+    intents = {}
+    payments = Payment.objects.filter(
+        submitted, ~has_intent, status='pending', payment_type__in=('rent', 'deposit')
+    ).order_by('id')
+    for payment in payments.iterator():
+        if payment.payment_type == 'rent':
+            kind = 'rent'
+        elif payment.reference_number.startswith('DEPOSIT-REG-'):
+            kind = 'deposit_registration'
+        else:
+            kind = 'deposit'
+        intents.setdefault(payment.mpesa_checkout_request_id, PaymentIntent(
+            tracking_id=payment.mpesa_checkout_request_id,
+            merchant_reference=payment.reference_number or f"PAY-{payment.id}-BACKFILL",
+            kind=kind,
+            payment=payment,
+            expected_amount=payment.amount,
+        ))
+    subscription_payments = SubscriptionPayment.objects.filter(submitted, ~has_intent, status='Pending').order_by('id')
+    for subscription_payment in subscription_payments.iterator():
+        intents.setdefault(subscription_payment.mpesa_checkout_request_id, PaymentIntent(
+            tracking_id=subscription_payment.mpesa_checkout_request_id,
+            # The original reference was never stored on the row
+            merchant_reference=f"SUB-{subscription_payment.id}-BACKFILL",
+            kind='subscription',
+            subscription_payment=subscription_payment,
+            expected_amount=subscription_payment.amount,
+            metadata={'user_id': subscription_payment.user_id, 'plan': subscription_payment.subscription_type},
+        ))
+    if not intents:
+        return 0
+
+    with transaction.atomic():
+        # An order whose merchant reference is already taken is skipped (and logged)
+        PaymentIntent.objects.bulk_create(intents.values(), batch_size=500, ignore_conflicts=True)
+        # None of these tracking ids had an intent, so every match is new
+        created = PaymentIntent.objects.filter(tracking_id__in=list(intents)).update(created_at=Coalesce(
+            Subquery(Payment.objects.filter(pk=OuterRef('payment_id')).values('created_at')[:1]),
+            Subquery(
+                SubscriptionPayment.objects.filter(pk=OuterRef('subscription_payment_id')).values('transaction_date')[:1]
+            ),
+            'created_at',
+        ))
+    if created < len(intents):
+        logger.warning(f"{len(intents) - created} pending orders could not be given a payment intent")
+    return created
@@ -0,0 +1,172 @@
+# payments/ipn_inbox.py
+"""
+Ack-fast PesaPal IPN ingestion.
+
+The IPN callback only writes the raw notification to the IpnNotification
+inbox (one INSERT) and answers PesaPal. drain_inbox(), run by a Celery task
+that the callback kicks and the beat schedule repeats every minute, then:
+
+  1. claims a batch of due notifications, marking them `processing` with a
+     lease so a crashed worker's rows are picked up again when it expires;
+  2. looks up the transaction status with PesaPal and applies it through
+     the same idempotent completion handlers the IPN always used;
+  3. on failure reschedules the notification with exponential backoff and,
+     after IPN_INBOX_MAX_ATTEMPTS, moves it to the `dead` letter state for
+     an operator to inspect and requeue from the admin.
+
+Where no worker can be asked (IPN_INBOX_KICK_WORKER off, or the broker is
+unreachable) the callback processes its own notification inline instead,
+and `manage.py drain_ipn_inbox` run from cron retries whatever failed.
+
+Callback latency and inbox depth are published through app/metrics.py.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from app.metrics import gauge, histogram
+from .models import IpnNotification
+
+logger = logging.getLogger(__name__)
+
+IPN_ACK_SECONDS = histogram('pesapal_ipn_ack_seconds')
+IPN_PROCESS_SECONDS = histogram('pesapal_ipn_process_seconds')
+
+QUEUED_STATES = ('pending', 'processing')
+
+
+class RetryableIpnError(Exception):
+    """The notification could not be processed yet; try again later"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def record_notification(params):
+    """Store a raw IPN; `params` is the merged query/body parameters"""
+    return IpnNotification.objects.create(
+        tracking_id=params.get('OrderTrackingId', ''),
+        merchant_reference=params.get('OrderMerchantReference', '') or '',
+        notification_type=params.get('OrderNotificationType', '') or '',
+        payload=params,
+    )
+
+
+def kick_worker():
+    """Ask a worker to drain now. Returns False when no worker could be asked."""
+    if not _setting('IPN_INBOX_KICK_WORKER', True):
+        return False
+    try:
+        from app.tasks import drain_ipn_inbox_task
+        drain_ipn_inbox_task.apply_async(retry=False)
+        return True
+    except Exception as e:
+        logger.warning(f"Could not queue IPN drain: {e}")
+        return False
+
+
+def process_inline(notification):
+    """
+    Process `notification` in the callback itself, for deployments without
+    a Celery worker. Failures are rescheduled as usual for the next drain.
+    """
+    if not _setting('IPN_INBOX_PROCESS_INLINE', True):
+        return None
+    return drain_inbox(ids=[notification.id])
+
+
+def backoff_delay(attempts):
+    """Seconds before retry number `attempts` (1-based): base * 2^(n-1), capped"""
+    base = _setting('IPN_RETRY_BASE_SECONDS', 30)
+    return min(base * 2 ** (attempts - 1), _setting('IPN_RETRY_MAX_SECONDS', 3600))
+
+
+def claim_batch(limit=None, now=None, ids=None):
+    """Lease up to `limit` due notifications (optionally only `ids`) to this worker"""
+    limit = limit or _setting('IPN_INBOX_BATCH_SIZE', 50)
+    now = now or timezone.now()
+    lease_until = now + timedelta(seconds=_setting('IPN_INBOX_LEASE_SECONDS', 300))
+    due = IpnNotification.objects.filter(state__in=QUEUED_STATES, next_attempt_at__lte=now)
+    if ids is not None:
+        due = due.filter(id__in=ids)
+    with transaction.atomic():
+        ids = list(
+            due.select_for_update(skip_locked=True)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        IpnNotification.objects.filter(id__in=ids).update(state='processing', next_attempt_at=lease_until)
+    return list(IpnNotification.objects.filter(id__in=ids).order_by('id'))
+
+
+def process_notification(notification):
+    """Apply one notification; raises when it should be retried"""
+    from .pesapal_service import pesapal_service
+    from .views_pesapal import apply_transaction_status
+
+    transaction_status = pesapal_service.get_transaction_status(notification.tracking_id)
+    if not transaction_status:
+        raise RetryableIpnError("Failed to query transaction status")
+    apply_transaction_status(notification.tracking_id, notification.merchant_reference, transaction_status)
+
+
+def _fail(notification, error, now):
+    notification.attempts += 1
+    notification.last_error = str(error)[:2000]
+    if notification.attempts >= _setting('IPN_INBOX_MAX_ATTEMPTS', 8):
+        notification.state = 'dead'
+        logger.error(f"IPN {notification.tracking_id} dead-lettered after {notification.attempts} attempts: {error}")
+    else:
+        notification.state = 'pending'
+        notification.next_attempt_at = now + timedelta(seconds=backoff_delay(notification.attempts))
+        logger.warning(f"IPN {notification.tracking_id} attempt {notification.attempts} failed, retrying: {error}")
+    notification.save(update_fields=['attempts', 'last_error', 'state', 'next_attempt_at'])
+
+
+def drain_inbox(limit=None, now=None, ids=None):
+    """Process one batch of due notifications. Returns counts per outcome."""
+    counts = {'done': 0, 'retried': 0, 'dead': 0}
+    now = now or timezone.now()
+    for notification in claim_batch(limit, now, ids):
+        try:
+            with IPN_PROCESS_SECONDS.time():
+                process_notification(notification)
+        except Exception as e:
+            _fail(notification, e, now)
+            counts['dead' if notification.state == 'dead' else 'retried'] += 1
+            continue
+        notification.state = 'done'
+        notification.attempts += 1
+        notification.last_error = ''
+        notification.processed_at = timezone.now()
+        notification.save(update_fields=['state', 'attempts', 'last_error', 'processed_at'])
+        counts['done'] += 1
+    return counts
+
+
+def requeue(notifications):
+    """Put dead-lettered notifications back in the inbox"""
+    return notifications.filter(state='dead').update(
+        state='pending', attempts=0, last_error='', next_attempt_at=timezone.now()
+    )
+
+
+def inbox_depth():
+    return IpnNotification.objects.filter(state__in=QUEUED_STATES).count()
+
+
+def inbox_oldest_age_seconds():
+    oldest = IpnNotification.objects.filter(state__in=QUEUED_STATES).aggregate(
+        oldest=Min('received_at')
+    )['oldest']
+    return round((timezone.now() - oldest).total_seconds(), 3) if oldest else 0
+
+
+gauge('pesapal_ipn_inbox_depth', inbox_depth)
+gauge('pesapal_ipn_inbox_oldest_age_seconds', inbox_oldest_age_seconds)
+gauge('pesapal_ipn_dead_letters', lambda: IpnNotification.objects.filter(state='dead').count())
@@ -0,0 +1,253 @@
+# payments/ledger.py
+"""
+Append-only rent ledger.
+
+Every charge, payment, adjustment and deposit on a unit is a LedgerEntry
+keyed by unit and tenant. Entries are never edited: a payment that stops
+being completed is cancelled by a reversal entry. Posting an entry locks
+the unit's UnitBalance row and moves its running totals in the same
+transaction, so:
+
+  - the current balance is a single-row read (unit_balance());
+  - a statement is a range scan of the (unit, posted_at, id) index, with
+    the opening balance taken from the last entry before the period.
+
+Completed rent and deposit payments are posted by the Payment signals in
+payments/signals.py and monthly rent charges by the billing run in
+payments/billing.py. The `rebuild_rent_ledger` management command derives
+the ledger from Payment history and the billed charges (rebuild_ledgers()).
+"""
+import logging
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .billing import billing_period
+from .models import LedgerEntry, Payment, UnitBalance
+
+logger = logging.getLogger(__name__)
+
+ZERO = Decimal('0')
+
+# Entry type -> UnitBalance total it accumulates (payments are negative entries)
+TOTALS = {
+    'charge': ('total_charged', 1),
+    'payment': ('total_paid', -1),
+    'adjustment': ('total_adjusted', 1),
+    'deposit': ('deposit_held', 1),
+}
+# Payment types the ledger tracks, and the entry each posts as
+PAYMENT_ENTRY_TYPES = {'rent': 'payment', 'deposit': 'deposit'}
+
+
+def _apply(snapshot, entry_type, amount):
+    total, sign = TOTALS[entry_type]
+    setattr(snapshot, total, getattr(snapshot, total) + sign * amount)
+    if entry_type != 'deposit':
+        snapshot.balance += amount
+
+
+def _lock_snapshot(unit_id):
+    UnitBalance.objects.get_or_create(unit_id=unit_id)
+    return UnitBalance.objects.select_for_update().get(unit_id=unit_id)
+
+
+def post_entry(unit_id, entry_type, amount, tenant_id=None, payment=None,
+               description='', posted_at=None, reverses=None):
+    """
+    Append an entry to a unit's ledger and move its balance snapshot.
+    `amount` is signed (see LedgerEntry). Returns the new entry.
+    """
+    if entry_type not in TOTALS:
+        raise ValueError(f"Unknown ledger entry type: {entry_type}")
+    amount = Decimal(str(amount))
+    with transaction.atomic():
+        snapshot = _lock_snapshot(unit_id)
+        _apply(snapshot, entry_type, amount)
+        entry = LedgerEntry.objects.create(
+            unit_id=unit_id,
+            tenant_id=tenant_id,
+            entry_type=entry_type,
+            amount=amount,
+            balance_after=snapshot.balance,
+            payment=payment,
+            reverses=reverses,
+            description=description,
+            posted_at=posted_at or timezone.now(),
+        )
+        snapshot.last_entry_id = entry.id
+        snapshot.save()
+    return entry
+
+
+def record_payment(payment):
+    """
+    Post a completed rent or deposit payment. Idempotent: a payment that is
+    already on the ledger is not posted again. Returns the entry or None.
+    """
+    entry_type = PAYMENT_ENTRY_TYPES.get(payment.payment_type)
+    if entry_type is None or not payment.unit_id:
+        return None
+    if LedgerEntry.objects.filter(payment=payment, reverses__isnull=True).exists():
+        return None
+    amount = payment.amount if entry_type == 'deposit' else -payment.amount
+    try:
+        with transaction.atomic():
+            return post_entry(
+                payment.unit_id, entry_type, amount,
+                tenant_id=payment.tenant_id,
+                payment=payment,
+                description=f"{payment.get_payment_type_display()} payment {payment.reference_number}",
+            )
+    except IntegrityError:
+        # Posted concurrently by another save of the same payment
+        return None
+
+
+def reverse_payment(payment, reason=''):
+    """Cancel a payment's ledger entry, e.g. when it is no longer completed"""
+    entry = LedgerEntry.objects.filter(
+        payment=payment, reverses__isnull=True, reversal__isnull=True
+    ).first()
+    if entry is None:
+        return None
+    try:
+        with transaction.atomic():
+            return post_entry(
+                entry.unit_id, entry.entry_type, -entry.amount,
+                tenant_id=entry.tenant_id,
+                reverses=entry,
+                description=f"Reversal of {entry.description}" + (f": {reason}" if reason else ''),
+            )
+    except IntegrityError:
+        return None
+
+
+def unit_balance(unit_id):
+    """The unit's running totals (unsaved zeros when nothing was posted yet)"""
+    return UnitBalance.objects.filter(unit_id=unit_id).first() or UnitBalance(unit_id=unit_id)
+
+
+def statement(unit_id, start=None, end=None):
+    """
+    Ledger entries of a unit posted in [start, end), oldest first, with the
+    balance before and after the period.
+    """
+    entries = LedgerEntry.objects.filter(unit_id=unit_id)
+    opening = ZERO
+    if start is not None:
+        before = entries.filter(posted_at__lt=start).order_by('-posted_at', '-id').values_list(
+            'balance_after', flat=True
+        ).first()
+        opening = before if before is not None else ZERO
+        entries = entries.filter(posted_at__gte=start)
+    if end is not None:
+        entries = entries.filter(posted_at__lt=end)
+    entries = list(entries.order_by('posted_at', 'id'))
+    return {
+        'opening_balance': opening,
+        'closing_balance': entries[-1].balance_after if entries else opening,
+        'entries': entries,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Rebuild from Payment history
+# ---------------------------------------------------------------------------
+def derive_entries(unit, payments, charges=()):
+    """
+    Ledger entries for a unit from its completed rent/deposit payments
+    (oldest first) and the monthly `charges` billing already posted for it,
+    which cannot be derived from anything else and are replayed as they
+    were. Occupied units, and units with rent paid, open with a charge of
+    their current rent unless a billed charge covers the month they opened
+    in (billing charges the assignment month on the ledger only), so the
+    derived balance matches the unit's rent_remaining.
+    """
+    entries = []
+    rent_payments = [p for p in payments if p.payment_type == 'rent']
+    billed = {charge.period for charge in charges}
+    if unit.tenant_id or rent_payments:
+        opened_at = min(
+            [d for d in (unit.assigned_date, payments[0].created_at if payments else None) if d]
+            or [timezone.now()]
+        )
+        if billing_period(timezone.localdate(opened_at)) not in billed:
+            entries.append(LedgerEntry(
+                unit_id=unit.id, tenant_id=unit.tenant_id, entry_type='charge', amount=unit.rent,
+                description='Opening rent charge', posted_at=opened_at,
+            ))
+    for charge in charges:
+        entries.append(LedgerEntry(
+            unit_id=unit.id, tenant_id=charge.tenant_id, entry_type='charge', amount=charge.amount,
+            description=charge.description, posted_at=charge.posted_at, period=charge.period,
+        ))
+    for payment in payments:
+        entry_type = PAYMENT_ENTRY_TYPES[payment.payment_type]
+        entries.append(LedgerEntry(
+            unit_id=unit.id, tenant_id=payment.tenant_id, entry_type=entry_type,
+            amount=payment.amount if entry_type == 'deposit' else -payment.amount,
+            payment_id=payment.id,
+            description=f"{payment.get_payment_type_display()} payment {payment.reference_number}",
+            posted_at=payment.created_at,
+        ))
+
+    # Stable sort: at equal times the opening charge comes first, then charges
+    entries.sort(key=lambda entry: entry.posted_at)
+    balance = ZERO
+    for entry in entries:
+        if entry.entry_type != 'deposit':
+            balance += entry.amount
+        entry.balance_after = balance
+    return entries
+
+
+def snapshot_for(unit_id, entries):
+    snapshot = UnitBalance(unit_id=unit_id)
+    for entry in entries:
+        _apply(snapshot, entry.entry_type, entry.amount)
+    return snapshot
+
+
+def rebuild_ledgers(units, apply=True):
+    """
+    Re-derive the ledger of every unit in the `units` queryset from its
+    payments, keeping the charges of past billing runs. Returns a list of
+    (unit, derived snapshot) for units whose derived balance differs from
+    unit.rent_remaining.
+    """
+    drifted = []
+    payments = Payment.objects.filter(
+        unit__in=units, status='completed', payment_type__in=PAYMENT_ENTRY_TYPES
+    ).only('id', 'unit_id', 'tenant_id', 'payment_type', 'amount', 'reference_number', 'created_at')
+    by_unit = {}
+    for payment in payments.order_by('unit_id', 'created_at', 'id').iterator():
+        by_unit.setdefault(payment.unit_id, []).append(payment)
+
+    fields = ('id', 'tenant_id', 'rent', 'rent_remaining', 'assigned_date')
+    with transaction.atomic():
+        # Read before the purge: billed charges are replayed, not derived
+        billed = {}
+        charges = LedgerEntry.objects.filter(
+            unit__in=units, entry_type='charge', period__isnull=False,
+            reverses__isnull=True, reversal__isnull=True,
+        ).only('unit_id', 'tenant_id', 'amount', 'description', 'posted_at', 'period')
+        for charge in charges.order_by('unit_id', 'posted_at', 'id').iterator():
+            billed.setdefault(charge.unit_id, []).append(charge)
+        if apply:
+            LedgerEntry.objects.filter(unit__in=units).purge()
+            UnitBalance.objects.filter(unit__in=units).delete()
+        for unit in units.only(*fields).order_by('id').iterator():
+            entries = derive_entries(unit, by_unit.get(unit.id, []), billed.get(unit.id, []))
+            if not entries:
+                continue
+            snapshot = snapshot_for(unit.id, entries)
+            if snapshot.balance != unit.rent_remaining:
+                drifted.append((unit, snapshot))
+            if apply:
+                created = LedgerEntry.objects.bulk_create(entries)
+                snapshot.last_entry_id = created[-1].id
+                snapshot.save()
+    logger.info(f"Rebuilt rent ledgers ({len(drifted)} units differ from their rent columns)")
+    return drifted
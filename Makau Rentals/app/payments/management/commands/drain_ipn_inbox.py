@@ -0,0 +1,26 @@
+"""
+Management command to apply queued PesaPal IPNs (for cron where Celery is not running)
+"""
+from django.core.management.base import BaseCommand
+from payments.ipn_inbox import drain_inbox
+
+
+class Command(BaseCommand):
+    help = 'Apply due PesaPal IPNs from the inbox, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Notifications claimed per batch')
+        parser.add_argument('--all', action='store_true', help='Keep draining until nothing is due')
+
+    def handle(self, *args, **options):
+        totals = {'done': 0, 'retried': 0, 'dead': 0}
+        while True:
+            counts = drain_inbox(limit=options['batch_size'])
+            for outcome, count in counts.items():
+                totals[outcome] += count
+            if not options['all'] or not sum(counts.values()):
+                break
+        self.stdout.write(self.style.SUCCESS(
+            f"IPN inbox: {totals['done']} applied, {totals['retried']} retried, "
+            f"{totals['dead']} dead-lettered"
+        ))
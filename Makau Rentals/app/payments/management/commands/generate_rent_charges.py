@@ -0,0 +1,33 @@
+"""
+Management command to run (or resume) a month's rent charge generation
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from payments.billing import generate_rent_charges
+
+
+class Command(BaseCommand):
+    help = 'Charge every occupied unit its rent for a billing period and report per-chunk timings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--period', help='Billing month as YYYY-MM (default: current month)')
+        parser.add_argument('--chunk-size', type=int, help='Units per transaction')
+
+    def handle(self, *args, **options):
+        period = None
+        if options['period']:
+            try:
+                period = datetime.strptime(options['period'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('--period must be YYYY-MM')
+
+        run = generate_rent_charges(period, chunk_size=options['chunk_size'])
+        for timing in run.chunk_timings:
+            self.stdout.write(
+                f"  up to unit {timing['last_unit_id']}: {timing['units']} units in {timing['seconds']}s"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Billing {run.period:%Y-%m} {run.status}: {run.units_charged} units charged '
+            f'KES {run.amount_charged} in {len(run.chunk_timings)} chunks'
+        ))
@@ -0,0 +1,33 @@
+"""
+Management command to derive unit rent ledgers from Payment history
+"""
+from django.core.management.base import BaseCommand
+from accounts.models import Unit
+from payments.ledger import rebuild_ledgers
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the rent ledger and balance snapshot of every unit from its completed payments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--unit', type=int, help='Only rebuild this unit id')
+        parser.add_argument('--landlord', type=int, help="Only rebuild this landlord's units")
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without rewriting ledgers')
+
+    def handle(self, *args, **options):
+        units = Unit.objects.all()
+        if options['unit']:
+            units = units.filter(id=options['unit'])
+        if options['landlord']:
+            units = units.filter(property_obj__landlord_id=options['landlord'])
+
+        drifted = rebuild_ledgers(units, apply=not options['dry_run'])
+        for unit, snapshot in drifted:
+            self.stdout.write(self.style.WARNING(
+                f'Unit {unit.id}: ledger balance {snapshot.balance} != rent_remaining {unit.rent_remaining}'
+            ))
+
+        verb = 'Checked' if options['dry_run'] else 'Rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} ledgers for {units.count()} units ({len(drifted)} differ from their rent columns)'
+        ))
@@ -0,0 +1,33 @@
+"""
+Management command to reconcile pending PesaPal payments against their real status
+"""
+from django.core.management.base import BaseCommand
+from payments.reconciliation import reconcile_pending
+
+
+class Command(BaseCommand):
+    help = 'Query PesaPal for every pending order with a tracking id and apply the result'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, help='Intents loaded per query')
+        parser.add_argument('--workers', type=int, help='Concurrent status lookups')
+        parser.add_argument('--rate', type=float, help='Maximum lookups per second (0 = unlimited)')
+        parser.add_argument('--min-age', type=int, help='Skip orders younger than this many minutes')
+        parser.add_argument('--dry-run', action='store_true', help='Query statuses without applying them')
+
+    def handle(self, *args, **options):
+        report = reconcile_pending(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            rate=options['rate'],
+            min_age_minutes=options['min_age'],
+            apply=not options['dry_run'],
+        )
+        verb = 'Checked' if options['dry_run'] else 'Reconciled'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['scanned']} pending payments in {report['seconds']}s "
+            f"({report['per_second']}/s): {report['completed']} completed, {report['failed']} failed, "
+            f"{report['expired']} expired, {report['still_pending']} still pending, "
+            f"{report['lookup_errors']} lookup errors, {report['apply_errors']} apply errors, "
+            f"{report['backfilled']} intents backfilled"
+        ))
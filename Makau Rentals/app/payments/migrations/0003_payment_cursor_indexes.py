@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0002_alter_payment_tenant'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='subscriptionpayment',
+            name='subscription_type',
+            field=models.CharField(choices=[('free', 'Free (30-day trial)'), ('starter', 'Tier 1 (1-10 units)'), ('basic', 'Tier 2 (11-20 units)'), ('premium', 'Tier 3 (21-50 units)'), ('professional', 'Tier 4 (51-100 units)'), ('onetime', 'One-time (Lifetime, up to 50 units)')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['tenant', '-created_at', '-id'], name='payment_tenant_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['unit', '-created_at', '-id'], name='payment_unit_cursor_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['user', '-transaction_date', '-id'], name='subpay_user_cursor_idx'),
+        ),
+    ]
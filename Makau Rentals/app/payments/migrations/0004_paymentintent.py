@@ -0,0 +1,83 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_pending_intents(apps, schema_editor):
+    """Intents for orders still in flight, which were only correlated through the cache"""
+    Payment = apps.get_model('payments', 'Payment')
+    SubscriptionPayment = apps.get_model('payments', 'SubscriptionPayment')
+    PaymentIntent = apps.get_model('payments', 'PaymentIntent')
+
+    intents = []
+    seen = set()
+    pending = Payment.objects.filter(
+        status='pending', payment_type__in=('rent', 'deposit'), mpesa_checkout_request_id__isnull=False
+    ).exclude(mpesa_checkout_request_id='')
+    for payment in pending.iterator():
+        if payment.mpesa_checkout_request_id in seen:
+            continue
+        seen.add(payment.mpesa_checkout_request_id)
+        if payment.payment_type == 'rent':
+            kind = 'rent'
+        elif payment.reference_number.startswith('DEPOSIT-REG-'):
+            kind = 'deposit_registration'
+        else:
+            kind = 'deposit'
+        intents.append(PaymentIntent(
+            tracking_id=payment.mpesa_checkout_request_id,
+            merchant_reference=payment.reference_number,
+            kind=kind,
+            payment=payment,
+            expected_amount=payment.amount,
+        ))
+
+    pending = SubscriptionPayment.objects.filter(
+        status='Pending', mpesa_checkout_request_id__isnull=False
+    ).exclude(mpesa_checkout_request_id='')
+    for subscription_payment in pending.iterator():
+        if subscription_payment.mpesa_checkout_request_id in seen:
+            continue
+        seen.add(subscription_payment.mpesa_checkout_request_id)
+        intents.append(PaymentIntent(
+            tracking_id=subscription_payment.mpesa_checkout_request_id,
+            # The original reference was never stored on the row
+            merchant_reference=f"SUB-{subscription_payment.id}-BACKFILL",
+            kind='subscription',
+            subscription_payment=subscription_payment,
+            expected_amount=subscription_payment.amount,
+            metadata={'user_id': subscription_payment.user_id, 'plan': subscription_payment.subscription_type},
+        ))
+    PaymentIntent.objects.bulk_create(intents, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_payment_cursor_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentIntent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tracking_id', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('merchant_reference', models.CharField(max_length=50, unique=True)),
+                ('kind', models.CharField(choices=[('rent', 'Rent'), ('subscription', 'Subscription'), ('deposit', 'Deposit'), ('deposit_registration', 'Registration deposit')], max_length=30)),
+                ('expected_amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='intents', to='payments.payment')),
+                ('subscription_payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='intents', to='payments.subscriptionpayment')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'created_at'], name='intent_state_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_pending_intents, migrations.RunPython.noop),
+    ]
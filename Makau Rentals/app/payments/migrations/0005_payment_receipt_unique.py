@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def release_duplicate_receipts(apps, schema_editor):
+    """Keep each receipt on its earliest payment so the constraint can be added"""
+    Payment = apps.get_model('payments', 'Payment')
+    duplicated = (
+        Payment.objects.exclude(mpesa_receipt__isnull=True).exclude(mpesa_receipt='')
+        .values('mpesa_receipt').annotate(n=Count('id')).filter(n__gt=1)
+        .values_list('mpesa_receipt', flat=True)
+    )
+    for receipt in list(duplicated):
+        for payment in Payment.objects.filter(mpesa_receipt=receipt).order_by('id')[1:]:
+            payment.description = f"{payment.description}\nDuplicate receipt {receipt} released".strip()
+            payment.mpesa_receipt = None
+            payment.save(update_fields=['description', 'mpesa_receipt'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0004_paymentintent'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_duplicate_receipts, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='payment',
+            constraint=models.UniqueConstraint(condition=models.Q(('mpesa_receipt', ''), _negated=True), fields=('mpesa_receipt',), name='unique_payment_receipt'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_payment_receipt_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IpnNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tracking_id', models.CharField(max_length=100)),
+                ('merchant_reference', models.CharField(blank=True, max_length=50)),
+                ('notification_type', models.CharField(blank=True, max_length=30)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('state', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('done', 'Done'), ('dead', 'Dead letter')], default='pending', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['state', 'next_attempt_at'], name='ipn_inbox_due_idx'), models.Index(fields=['tracking_id'], name='ipn_inbox_tracking_idx')],
+            },
+        ),
+    ]
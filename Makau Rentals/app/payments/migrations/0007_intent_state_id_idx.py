@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_ipn_inbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='paymentintent',
+            index=models.Index(fields=['state', 'id'], name='intent_state_id_idx'),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from decimal import Decimal
+
+
+def derive_ledgers(apps, schema_editor):
+    """
+    Seed each ledger from Payment history: occupied units (and units with
+    rent paid) open with a charge of their current rent, followed by every
+    completed rent and deposit payment. Mirrors payments.ledger.derive_entries.
+    """
+    Unit = apps.get_model('accounts', 'Unit')
+    Payment = apps.get_model('payments', 'Payment')
+    LedgerEntry = apps.get_model('payments', 'LedgerEntry')
+    UnitBalance = apps.get_model('payments', 'UnitBalance')
+    zero = Decimal('0')
+
+    by_unit = {}
+    payments = Payment.objects.filter(status='completed', payment_type__in=('rent', 'deposit'))
+    for payment in payments.order_by('unit_id', 'created_at', 'id').iterator():
+        by_unit.setdefault(payment.unit_id, []).append(payment)
+
+    for unit in Unit.objects.order_by('id').iterator():
+        unit_payments = by_unit.get(unit.id, [])
+        entries = []
+        totals = {'balance': zero, 'total_charged': zero, 'total_paid': zero, 'deposit_held': zero}
+        if unit.tenant_id or any(p.payment_type == 'rent' for p in unit_payments):
+            opened_at = min(
+                [d for d in (unit.assigned_date, unit_payments[0].created_at if unit_payments else None) if d]
+                or [django.utils.timezone.now()]
+            )
+            totals['balance'] += unit.rent
+            totals['total_charged'] += unit.rent
+            entries.append(LedgerEntry(
+                unit_id=unit.id, tenant_id=unit.tenant_id, entry_type='charge', amount=unit.rent,
+                balance_after=totals['balance'], description='Opening rent charge', posted_at=opened_at,
+            ))
+        for payment in unit_payments:
+            if payment.payment_type == 'deposit':
+                entry_type, amount = 'deposit', payment.amount
+                totals['deposit_held'] += amount
+            else:
+                entry_type, amount = 'payment', -payment.amount
+                totals['balance'] += amount
+                totals['total_paid'] += payment.amount
+            entries.append(LedgerEntry(
+                unit_id=unit.id, tenant_id=payment.tenant_id, entry_type=entry_type, amount=amount,
+                balance_after=totals['balance'], payment_id=payment.id,
+                description=f"{payment.payment_type.capitalize()} payment {payment.reference_number}",
+                posted_at=payment.created_at,
+            ))
+        if entries:
+            created = LedgerEntry.objects.bulk_create(entries)
+            UnitBalance.objects.create(unit_id=unit.id, last_entry_id=created[-1].id, **totals)
+
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('accounts', '0013_tracker_bulk_action'),
+        ('payments', '0007_intent_state_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitBalance',
+            fields=[
+                ('unit', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ledger_balance', serialize=False, to='accounts.unit')),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_charged', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_adjusted', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('deposit_held', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('last_entry_id', models.BigIntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('charge', 'Charge'), ('payment', 'Payment'), ('adjustment', 'Adjustment'), ('deposit', 'Deposit')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('posted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='payments.payment')),
+                ('reverses', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reversal', to='payments.ledgerentry')),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='accounts.unit')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['unit', 'posted_at', 'id'], name='ledger_unit_posted_idx'), models.Index(fields=['tenant', 'posted_at', 'id'], name='ledger_tenant_posted_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('payment__isnull', False), ('reverses__isnull', True)), fields=('payment',), name='unique_ledger_payment_entry'),
+        ),
+        migrations.RunPython(derive_ledgers, migrations.RunPython.noop),
+    ]
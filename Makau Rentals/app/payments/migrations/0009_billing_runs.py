@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 22:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0008_rent_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BillingRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('last_unit_id', models.BigIntegerField(default=0)),
+                ('units_charged', models.IntegerField(default=0)),
+                ('amount_charged', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('chunk_timings', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ledgerentry',
+            name='period',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('entry_type', 'charge'), ('period__isnull', False), ('reverses__isnull', True)), fields=('unit', 'period'), name='unique_ledger_period_charge'),
+        ),
+    ]
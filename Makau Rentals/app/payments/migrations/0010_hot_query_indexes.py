@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0009_billing_runs'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['mpesa_checkout_request_id'], name='payment_checkout_request_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['unit', 'status', 'payment_type'], name='payment_unit_status_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['tenant', 'payment_type', 'status'], name='payment_tenant_type_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subscriptionpayment',
+            index=models.Index(fields=['mpesa_checkout_request_id'], name='subpay_checkout_request_idx'),
+        ),
+    ]
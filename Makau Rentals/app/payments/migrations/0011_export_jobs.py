@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 23:11
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('payments', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('landlord', 'Property payments'), ('tenant', 'Unit payments'), ('rent', 'Landlord rent payments')], max_length=20)),
+                ('scope_id', models.BigIntegerField()),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('filename', models.CharField(max_length=255)),
+                ('gzip', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('file', models.FileField(blank=True, upload_to='exports/')),
+                ('row_count', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-created_at'], name='export_owner_created_idx')],
+            },
+        ),
+    ]
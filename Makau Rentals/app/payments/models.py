@@ -1,10 +1,12 @@
 from django.db import models
 from accounts.models import CustomUser, Unit, Subscription
+from app.dirty_fields import DirtyFieldsMixin
 from datetime import timedelta
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 import uuid
 
-class Payment(models.Model):
+class Payment(DirtyFieldsMixin, models.Model):
     PAYMENT_TYPES = [
         ('rent', 'Rent'),
         ('deposit', 'Deposit'),
@@ -52,6 +54,29 @@ class Payment(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     failure_reason = models.TextField(blank=True, null=True)
 
+    class Meta:
+        # A provider confirmation code settles at most one payment
+        constraints = [
+            models.UniqueConstraint(
+                fields=['mpesa_receipt'],
+                name='unique_payment_receipt',
+                condition=~models.Q(mpesa_receipt='')
+            )
+        ]
+        # Back the (created_at, id) cursor pagination of payment lists
+        indexes = [
+            models.Index(fields=['tenant', '-created_at', '-id'], name='payment_tenant_cursor_idx'),
+            models.Index(fields=['unit', '-created_at', '-id'], name='payment_unit_cursor_idx'),
+            # PesaPal tracking id lookups (mark_payment_as_failed, status checks)
+            models.Index(fields=['mpesa_checkout_request_id'], name='payment_checkout_request_idx'),
+            # Per-unit rent aggregates and per-tenant deposit checks
+            models.Index(fields=['unit', 'status', 'payment_type'], name='payment_unit_status_type_idx'),
+            models.Index(fields=['tenant', 'payment_type', 'status'], name='payment_tenant_type_status_idx'),
+        ]
+
+    # Fields the landlord dashboard revenue is derived from (see accounts/stats.py)
+    STATS_FIELDS = ('status', 'payment_type', 'amount', 'created_at')
+
     def clean(self):
         if self.payment_type == 'rent' and not self.unit:
             raise ValidationError("Rent payments must be associated with a unit")
@@ -103,6 +128,10 @@ class SubscriptionPayment(models.Model):
                 condition=~models.Q(mpesa_receipt_number='')
             )
         ]
+        indexes = [
+            models.Index(fields=['user', '-transaction_date', '-id'], name='subpay_user_cursor_idx'),
+            models.Index(fields=['mpesa_checkout_request_id'], name='subpay_checkout_request_idx'),
+        ]
 
     def __str__(self):
         return f"Subscription Payment {self.id} - {self.subscription_type}"
@@ -119,3 +148,260 @@ class SubscriptionPayment(models.Model):
             # "onetime" will be treated as lifetime (None) by the subscription logic
         }
         return durations.get(self.subscription_type, timedelta(days=30))
+
+
+class PaymentIntent(models.Model):
+    """
+    Correlates a PesaPal order with the pending payment it settles.
+    Written together with the pending Payment/SubscriptionPayment at
+    initiation; the IPN resolves it by the provider's tracking id.
+    """
+    KIND_CHOICES = [
+        ('rent', 'Rent'),
+        ('subscription', 'Subscription'),
+        ('deposit', 'Deposit'),
+        ('deposit_registration', 'Registration deposit'),
+    ]
+    STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+
+    # Assigned by PesaPal when the order is submitted, so empty until then
+    tracking_id = models.CharField(max_length=100, unique=True, null=True, blank=True)
+    merchant_reference = models.CharField(max_length=50, unique=True)
+    kind = models.CharField(max_length=30, choices=KIND_CHOICES)
+    payment = models.ForeignKey(
+        Payment, on_delete=models.CASCADE, null=True, blank=True, related_name='intents'
+    )
+    subscription_payment = models.ForeignKey(
+        SubscriptionPayment, on_delete=models.CASCADE, null=True, blank=True, related_name='intents'
+    )
+    expected_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='pending')
+    # Extra initiation context, e.g. the registration session id
+    metadata = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'created_at'], name='intent_state_created_idx'),
+            # Keyset batches of pending intents for reconciliation
+            models.Index(fields=['state', 'id'], name='intent_state_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"PaymentIntent {self.merchant_reference} ({self.kind}, {self.state})"
+
+
+class IpnNotification(models.Model):
+    """
+    Inbox of raw PesaPal IPNs. The callback only stores the notification
+    and acknowledges it; a worker drains the inbox (see payments/ipn_inbox.py).
+    """
+    STATE_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('done', 'Done'),
+        ('dead', 'Dead letter'),
+    ]
+
+    tracking_id = models.CharField(max_length=100)
+    merchant_reference = models.CharField(max_length=50, blank=True)
+    notification_type = models.CharField(max_length=30, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    state = models.CharField(max_length=20, choices=STATE_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # When the notification may next be picked up (also the lease expiry while processing)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['state', 'next_attempt_at'], name='ipn_inbox_due_idx'),
+            models.Index(fields=['tracking_id'], name='ipn_inbox_tracking_idx'),
+        ]
+
+    def __str__(self):
+        return f"IPN {self.tracking_id} ({self.state}, {self.attempts} attempts)"
+
+
+class LedgerEntryQuerySet(models.QuerySet):
+    """Ledger entries are never edited; corrections are new adjustment entries"""
+
+    def update(self, **kwargs):
+        raise TypeError("Ledger entries are append-only")
+
+    def delete(self):
+        raise TypeError("Ledger entries are append-only; use purge() to rebuild")
+
+    def purge(self):
+        """Remove entries so the ledger can be re-derived (rebuild command only)"""
+        return super().delete()
+
+
+class LedgerEntry(models.Model):
+    """
+    One line of a unit's append-only rent ledger (see payments/ledger.py).
+
+    `amount` is signed: it is what the entry adds to the account it posts
+    to. Charges, payments and adjustments post to the rent balance owed
+    (a payment is negative); deposits post to the deposit held.
+    `balance_after` is the unit's rent balance once the entry is applied.
+    """
+    ENTRY_TYPES = [
+        ('charge', 'Charge'),
+        ('payment', 'Payment'),
+        ('adjustment', 'Adjustment'),
+        ('deposit', 'Deposit'),
+    ]
+
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='ledger_entries')
+    tenant = models.ForeignKey(
+        CustomUser, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries'
+    )
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    # The payment this entry settles or reverses, if any
+    payment = models.ForeignKey(
+        Payment, on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries'
+    )
+    # Set on the entry that cancels an earlier one (same type, negated amount)
+    reverses = models.OneToOneField(
+        'self', on_delete=models.CASCADE, null=True, blank=True, related_name='reversal'
+    )
+    description = models.CharField(max_length=255, blank=True)
+    posted_at = models.DateTimeField(default=timezone.now)
+    # First day of the month a billing-run charge is for (see payments/billing.py)
+    period = models.DateField(null=True, blank=True)
+
+    objects = LedgerEntryQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # A payment is posted at most once (its reversal is a separate entry)
+            models.UniqueConstraint(
+                fields=['payment'],
+                name='unique_ledger_payment_entry',
+                condition=models.Q(payment__isnull=False, reverses__isnull=True),
+            ),
+            # A unit is charged once per billing period
+            models.UniqueConstraint(
+                fields=['unit', 'period'],
+                name='unique_ledger_period_charge',
+                condition=models.Q(entry_type='charge', period__isnull=False, reverses__isnull=True),
+            ),
+        ]
+        # Statements are range scans over these
+        indexes = [
+            models.Index(fields=['unit', 'posted_at', 'id'], name='ledger_unit_posted_idx'),
+            models.Index(fields=['tenant', 'posted_at', 'id'], name='ledger_tenant_posted_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise TypeError("Ledger entries are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise TypeError("Ledger entries are append-only")
+
+    def __str__(self):
+        return f"{self.get_entry_type_display()} {self.amount} on unit {self.unit_id}"
+
+
+class UnitBalance(models.Model):
+    """
+    Running totals of a unit's ledger, updated with every posted entry so
+    the current balance is a single-row read.
+    """
+    unit = models.OneToOneField(Unit, on_delete=models.CASCADE, primary_key=True, related_name='ledger_balance')
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_charged = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_adjusted = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    deposit_held = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_entry_id = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Unit {self.unit_id} balance {self.balance}"
+
+
+class BillingRun(models.Model):
+    """
+    One month's rent charge generation (see payments/billing.py). Units are
+    charged in id-ordered chunks; `last_unit_id` is the checkpoint a
+    crashed or interrupted run resumes from.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    period = models.DateField(unique=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    last_unit_id = models.BigIntegerField(default=0)
+    units_charged = models.IntegerField(default=0)
+    amount_charged = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # One {"last_unit_id", "units", "seconds"} dict per committed chunk
+    chunk_timings = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Billing run {self.period:%Y-%m} ({self.status}, {self.units_charged} units)"
+
+
+class ExportJob(models.Model):
+    """
+    A CSV export written to storage by a worker (see payments/exports.py),
+    for exports too large to stream within a request.
+    """
+    KIND_CHOICES = [
+        ('landlord', 'Property payments'),
+        ('tenant', 'Unit payments'),
+        ('rent', 'Landlord rent payments'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    owner = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='export_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    # Property, unit or landlord id the rows are scoped to (by kind)
+    scope_id = models.BigIntegerField()
+    filters = models.JSONField(default=dict, blank=True)
+    filename = models.CharField(max_length=255)
+    gzip = models.BooleanField(default=False)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    file = models.FileField(upload_to='exports/', blank=True)
+    row_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', '-created_at'], name='export_owner_created_idx'),
+        ]
+
+    @property
+    def download_name(self):
+        return f"{self.filename}.csv{'.gz' if self.gzip else ''}"
+
+    def __str__(self):
+        return f"Export {self.id} {self.kind} ({self.status})"
@@ -5,17 +5,103 @@ This module handles all PesaPal payment operations including:
 - Payment submission
 - IPN (Instant Payment Notification) handling
 - Transaction status queries
+
+All calls go through one pooled requests.Session per process (kept-alive
+connections, bounded retries with backoff) and are timed into per-endpoint
+latency histograms (see app/metrics.py). The OAuth token is held by a
+TokenManager in process memory, refreshed ahead of expiry, and concurrent
+callers share a single refresh.
 """
 
 import requests
 import json
 import logging
+import threading
+import time
 from django.conf import settings
 from django.core.cache import cache
 from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from app.metrics import histogram
 
 logger = logging.getLogger(__name__)
 
+# PesaPal tokens live 5 minutes; refresh a minute early
+TOKEN_LIFETIME_SECONDS = 300
+TOKEN_REFRESH_MARGIN_SECONDS = 60
+
+
+def build_session(pool_size=None, retries=None, backoff=None):
+    """
+    A requests.Session with a keep-alive connection pool and a bounded retry
+    policy. Connection failures are retried for every method (nothing reached
+    PesaPal); read errors and 429/5xx responses only for GETs, so an order is
+    never submitted twice.
+    """
+    pool_size = pool_size or getattr(settings, 'PESAPAL_HTTP_POOL_SIZE', 10)
+    retries = getattr(settings, 'PESAPAL_HTTP_RETRIES', 3) if retries is None else retries
+    backoff = getattr(settings, 'PESAPAL_HTTP_BACKOFF', 0.5) if backoff is None else backoff
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=retries,
+        status=retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset({'GET'}),
+        raise_on_status=False,
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers.update({"Content-Type": "application/json", "Accept": "application/json"})
+    return session
+
+
+class TokenManager:
+    """
+    Holds the PesaPal access token in process memory and refreshes it shortly
+    before it expires. Concurrent callers needing a refresh share one request
+    (single flight): the first takes the lock and fetches, the rest wait on
+    the lock and then reuse its token.
+    """
+
+    def __init__(self, fetch, lifetime=TOKEN_LIFETIME_SECONDS, margin=TOKEN_REFRESH_MARGIN_SECONDS,
+                 clock=time.monotonic):
+        self._fetch = fetch
+        self._lifetime = lifetime
+        self._margin = margin
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._token = None
+        self._refresh_at = 0.0
+
+    def _fresh(self):
+        return self._token if self._token and self._clock() < self._refresh_at else None
+
+    def get(self):
+        token = self._fresh()
+        if token:
+            return token
+        with self._lock:
+            token = self._fresh()  # another thread may have refreshed while we waited
+            if token:
+                return token
+            token = self._fetch()
+            if token:
+                self._token = token
+                self._refresh_at = self._clock() + self._lifetime - self._margin
+            return token
+
+    def invalidate(self):
+        with self._lock:
+            self._token = None
+            self._refresh_at = 0.0
+
 
 class PesaPalService:
     """
@@ -37,6 +123,16 @@ class PesaPalService:
 
         self.ipn_url = settings.PESAPAL_IPN_URL
 
+        connect_timeout = getattr(settings, 'PESAPAL_CONNECT_TIMEOUT', 5)
+        read_timeout = getattr(settings, 'PESAPAL_READ_TIMEOUT', 30)
+        self.timeout = (connect_timeout, read_timeout)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self.tokens = TokenManager(self._request_token)
+        # A pre-registered IPN id can be configured to skip registration entirely
+        self._ipn_id = getattr(settings, 'PESAPAL_IPN_ID', None) or None
+        self._ipn_lock = threading.Lock()
+
         # Log masked diagnostics (never log full secrets)
         try:
             masked_key = self.consumer_key[:4] + "***" + self.consumer_key[-4:] if self.consumer_key else "<missing>"
@@ -44,18 +140,33 @@ class PesaPalService:
         except Exception:
             pass
     
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = build_session()
+        return self._session
+
+    def _request(self, method, endpoint, url, **kwargs):
+        """Send a request on the pooled session, timed per endpoint"""
+        kwargs.setdefault('timeout', self.timeout)
+        with histogram(f'pesapal_{endpoint}_seconds').time():
+            response = self.session.request(method, url, **kwargs)
+        if response.status_code == 401 and endpoint != 'request_token':
+            # Token revoked or expired early; the next call fetches a new one
+            self.tokens.invalidate()
+        return response
+
     def get_access_token(self):
         """
-        Get PesaPal access token (cached for performance)
-        Token is cached for 4 minutes (tokens expire after 5 minutes)
+        Get PesaPal access token.
+        Held in process memory and refreshed a minute before it expires.
         """
-        cache_key = 'pesapal_access_token'
-        token = cache.get(cache_key)
-        
-        if token:
-            logger.info("Using cached PesaPal access token")
-            return token
-        
+        return self.tokens.get()
+
+    def _request_token(self):
+        """Fetch a new access token from PesaPal"""
         try:
             url = f"{self.base_url}/api/Auth/RequestToken"
             
@@ -70,16 +181,14 @@ class PesaPalService:
             }
             
             logger.info(f"Requesting PesaPal token from: {url}")
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = self._request('POST', 'request_token', url, json=payload, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
                 token = data.get('token')
                 
                 if token:
-                    # Cache token for 4 minutes (expires after 5)
-                    cache.set(cache_key, token, timeout=240)
-                    logger.info("PesaPal access token generated and cached")
+                    logger.info("PesaPal access token generated")
                     return token
                 else:
                     logger.error(f"No token in response: {data}")
@@ -110,7 +219,7 @@ class PesaPalService:
                 "consumer_secret": self.consumer_secret
             }
             headers = {"Content-Type": "application/json", "Accept": "application/json"}
-            resp = requests.post(url, json=payload, headers=headers, timeout=30)
+            resp = self._request('POST', 'request_token', url, json=payload, headers=headers)
             data = None
             try:
                 data = resp.json()
@@ -144,13 +253,14 @@ class PesaPalService:
                 "Accept": "application/json"
             }
             
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = self._request('POST', 'register_ipn', url, json=payload, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
                 ipn_id = data.get('ipn_id')
                 logger.info(f"IPN registered successfully: {ipn_id}")
                 # Cache IPN ID
+                self._ipn_id = ipn_id
                 cache.set('pesapal_ipn_id', ipn_id, timeout=None)
                 return ipn_id
             else:
@@ -163,14 +273,15 @@ class PesaPalService:
     
     def get_ipn_id(self):
         """
-        Get registered IPN ID (from cache or register new one)
+        Get registered IPN ID (from memory, the cache or register new one).
+        Registration is single-flight like the token refresh.
         """
-        ipn_id = cache.get('pesapal_ipn_id')
-        
-        if not ipn_id:
-            ipn_id = self.register_ipn()
-        
-        return ipn_id
+        if self._ipn_id:
+            return self._ipn_id
+        with self._ipn_lock:
+            if not self._ipn_id:
+                self._ipn_id = cache.get('pesapal_ipn_id') or self.register_ipn()
+        return self._ipn_id
     
     def submit_order(self, amount, description, phone_number, email, 
                      merchant_reference, callback_url=None):
@@ -240,7 +351,7 @@ class PesaPalService:
             logger.info(f"Submitting PesaPal order: {merchant_reference}, Amount: {amount}")
             logger.info(f"Payload: {json.dumps(payload, indent=2)}")
             
-            response = requests.post(url, json=payload, headers=headers, timeout=30)
+            response = self._request('POST', 'submit_order', url, json=payload, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -288,7 +399,7 @@ class PesaPalService:
                 "Accept": "application/json"
             }
             
-            response = requests.get(url, params=params, headers=headers, timeout=30)
+            response = self._request('GET', 'transaction_status', url, params=params, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
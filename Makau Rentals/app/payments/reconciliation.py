@@ -0,0 +1,116 @@
+# payments/reconciliation.py
+"""
+Reconciliation of pending PesaPal payments.
+
+An order whose IPN never arrived (or was dead-lettered) would otherwise stay
+pending forever. reconcile_pending() walks the pending PaymentIntents that
+have a tracking id in id-keyset batches, asks PesaPal for each order's
+status through a bounded thread pool with a shared rate limit, and applies
+the answers with apply_transaction_status() - the same idempotent handlers
+the IPN uses - in the calling thread. Pending orders that reached PesaPal
+without an intent (initiated before intents existed) get one first. Orders PesaPal still reports as not
+paid after RECONCILE_EXPIRE_HOURS are marked failed ("expired"), never
+deleted.
+
+Worker threads only make HTTP calls; every database write happens in the
+caller, so no extra connections or cross-thread transactions are involved.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from app.ratelimit import RateLimiter
+from .intents import backfill_missing_intents
+from .models import PaymentIntent
+
+logger = logging.getLogger(__name__)
+
+COMPLETED = ('completed', 'success')
+FAILED = ('failed', 'cancelled')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def pending_batches(batch_size, min_age, now=None):
+    """Yield lists of pending intents with a tracking id, oldest id first"""
+    cutoff = (now or timezone.now()) - min_age
+    last_id = 0
+    while True:
+        batch = list(
+            PaymentIntent.objects.filter(
+                state='pending', tracking_id__isnull=False, created_at__lte=cutoff, id__gt=last_id
+            ).order_by('id').only('id', 'tracking_id', 'merchant_reference', 'state', 'created_at')[:batch_size]
+        )
+        if not batch:
+            return
+        last_id = batch[-1].id
+        yield batch
+
+
+def reconcile_pending(service=None, batch_size=None, workers=None, rate=None,
+                      min_age_minutes=None, expire_hours=None, apply=True, now=None):
+    """
+    Reconcile every pending order. Returns a summary report dict; with
+    apply=False PesaPal is queried but nothing is written.
+    """
+    from .pesapal_service import pesapal_service
+    from .views_pesapal import apply_transaction_status, mark_payment_as_failed
+
+    service = service or pesapal_service
+    batch_size = batch_size or _setting('RECONCILE_BATCH_SIZE', 200)
+    workers = workers or _setting('RECONCILE_WORKERS', 8)
+    rate = _setting('RECONCILE_RATE_PER_SECOND', 10) if rate is None else rate
+    min_age = timedelta(minutes=_setting('RECONCILE_MIN_AGE_MINUTES', 15) if min_age_minutes is None else min_age_minutes)
+    expire_after = timedelta(hours=_setting('RECONCILE_EXPIRE_HOURS', 48) if expire_hours is None else expire_hours)
+    now = now or timezone.now()
+    limiter = RateLimiter(rate)
+
+    def lookup(intent):
+        limiter.acquire()
+        return service.get_transaction_status(intent.tracking_id)
+
+    report = {
+        'scanned': 0, 'completed': 0, 'failed': 0, 'expired': 0,
+        'still_pending': 0, 'lookup_errors': 0, 'apply_errors': 0,
+        'backfilled': backfill_missing_intents() if apply else 0,
+    }
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='reconcile') as pool:
+        for batch in pending_batches(batch_size, min_age, now):
+            for intent, status in zip(batch, pool.map(lookup, batch)):
+                report['scanned'] += 1
+                if not status:
+                    report['lookup_errors'] += 1
+                    continue
+                description = (status.get('payment_status_description') or '').lower()
+                if description in COMPLETED:
+                    outcome = 'completed'
+                elif description in FAILED:
+                    outcome = 'failed'
+                elif now - intent.created_at >= expire_after:
+                    outcome = 'expired'
+                else:
+                    report['still_pending'] += 1
+                    continue
+                if apply:
+                    try:
+                        if outcome == 'expired':
+                            mark_payment_as_failed(intent.tracking_id, 'expired', intent=intent)
+                        else:
+                            apply_transaction_status(intent.tracking_id, intent.merchant_reference, status)
+                    except Exception as e:
+                        logger.error(f"Reconciliation of {intent.tracking_id} failed: {e}", exc_info=True)
+                        report['apply_errors'] += 1
+                        continue
+                report[outcome] += 1
+
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    report['per_second'] = round(report['scanned'] / report['seconds'], 1) if report['seconds'] else 0
+    logger.info(f"Pending payment reconciliation: {report}")
+    return report
@@ -0,0 +1,52 @@
+# payments/signals.py
+"""
+Rent ledger and payment status signals.
+
+A Payment that becomes completed is posted to its unit's ledger; one that
+stops being completed gets a reversal entry (see payments/ledger.py).
+Status changes of Payment and SubscriptionPayment rows are published to
+the payment status channel once the transaction commits (see
+payments/status_channel.py).
+Connected from PaymentsConfig.ready().
+
+Note: QuerySet.update() does not send these signals - the
+`rebuild_rent_ledger` command re-derives ledgers after bulk writes.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from accounts import stats
+from . import ledger
+from .models import Payment, SubscriptionPayment
+from .status_channel import publish_status
+
+
+@receiver(post_save, sender=Payment)
+def post_payment_to_ledger(sender, instance, created, **kwargs):
+    new = stats.current_values(instance, kwargs.get('update_fields'))
+    old = stats.loaded_values(instance, created)
+    was_completed = old is False or bool(old) and old['status'] == 'completed'
+    if new['status'] == 'completed':
+        # Unknown previous state (old is False) is fine: posting is idempotent
+        if not (old and old['status'] == 'completed'):
+            ledger.record_payment(instance)
+    elif was_completed:
+        ledger.reverse_payment(instance, reason=new['status'])
+
+
+@receiver(post_save, sender=Payment)
+def publish_payment_status(sender, instance, created, **kwargs):
+    new = stats.current_values(instance, kwargs.get('update_fields'))
+    old = stats.loaded_values(instance, created)
+    if old and old['status'] == new['status']:
+        return
+    pk, status = instance.pk, new['status']
+    transaction.on_commit(lambda: publish_status('payment', pk, status))
+
+
+@receiver(post_save, sender=SubscriptionPayment)
+def publish_subscription_payment_status(sender, instance, created, **kwargs):
+    # No loaded-state tracking on this model; a spurious wake-up is harmless
+    pk, status = instance.pk, instance.status
+    transaction.on_commit(lambda: publish_status('subscription', pk, status))
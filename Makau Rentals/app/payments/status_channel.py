@@ -0,0 +1,230 @@
+# payments/status_channel.py
+"""
+Push channel for payment status.
+
+While a checkout iframe is open the frontend used to poll the status views
+every few seconds. The async payment-status-stream endpoint
+(views_pesapal.payment_status_stream) instead holds the request open and
+wakes when the payment's status changes:
+
+  - long-poll: answers at once if the client's If-None-Match ETag is stale,
+    otherwise waits up to PAYMENT_STATUS_LONGPOLL_SECONDS for a change and
+    answers 200 (changed) or 304 (unchanged);
+  - Server-Sent Events (Accept: text/event-stream): one `status` event now
+    and one per change until the payment settles or the stream times out.
+
+Status changes are published by the Payment/SubscriptionPayment signals in
+payments/signals.py once the transaction commits. The broker is Redis
+pub/sub (PAYMENT_STATUS_BROKER = 'redis') so a change processed by a Celery
+worker wakes waiters in every web process; while Redis is unreachable, and
+with PAYMENT_STATUS_BROKER = 'local', messages are delivered in-process
+only. Waiters that miss a message simply time out and re-check, so a lost
+message costs latency, never correctness.
+
+The plain status views also answer conditional GETs with 304, so clients
+that still poll skip the body when nothing changed.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from app.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = 'payment-status:'
+# URL kind -> channel namespace (rent and deposit payments are both Payment rows)
+CHANNELS = {'rent': 'payment', 'deposit': 'payment', 'subscription': 'subscription'}
+COMPLETE_STATUSES = ('completed', 'failed', 'cancelled', 'Success', 'Failed')
+
+
+def channel_name(namespace, pk):
+    return f"{CHANNEL_PREFIX}{namespace}:{pk}"
+
+
+def payload_etag(payload):
+    """Strong ETag over a status payload"""
+    body = json.dumps(payload, sort_keys=True, default=str).encode()
+    return f'"{hashlib.sha1(body).hexdigest()[:24]}"'
+
+
+def etag_matches(request, etag):
+    header = request.headers.get('If-None-Match', '')
+    return etag in [tag.strip() for tag in header.split(',')] or header.strip() == '*'
+
+
+# ---------------------------------------------------------------------------
+# Brokers
+# ---------------------------------------------------------------------------
+class Subscription:
+    """A waiter on one channel, bound to the event loop that created it"""
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    async def wait(self, timeout):
+        """The next message, or None after `timeout` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalStatusBroker:
+    """In-process pub/sub: fine for a single process (runserver, tests)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            waiters = self._subscribers.get(subscription.channel)
+            if waiters is not None:
+                waiters.discard(subscription)
+                if not waiters:
+                    del self._subscribers[subscription.channel]
+
+    def deliver(self, channel, message):
+        """Hand a message to this process's waiters (safe from any thread)"""
+        with self._lock:
+            waiters = list(self._subscribers.get(channel, ()))
+        for subscription in waiters:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.queue.put_nowait, message)
+            except RuntimeError:
+                # The waiter's loop has closed; it is going away anyway
+                pass
+
+    def publish(self, channel, message):
+        self.deliver(channel, message)
+
+    def waiter_count(self):
+        with self._lock:
+            return sum(len(waiters) for waiters in self._subscribers.values())
+
+
+class RedisStatusBroker(LocalStatusBroker):
+    """
+    Redis pub/sub. A daemon thread per process listens on every status
+    channel and fans messages out to the local waiters. Publishing falls
+    back to local delivery for RETRY_INTERVAL seconds after a Redis error.
+    """
+    RETRY_INTERVAL = 30
+
+    def __init__(self, url):
+        super().__init__()
+        import redis
+
+        self._redis = redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=5)
+        self._down_until = 0.0
+        self._listener = None
+
+    def _available(self):
+        return time.monotonic() >= self._down_until
+
+    def _mark_down(self, error):
+        logger.warning(f"Payment status broker: Redis unavailable, delivering locally: {error}")
+        self._down_until = time.monotonic() + self.RETRY_INTERVAL
+
+    def publish(self, channel, message):
+        if self._available():
+            try:
+                self._redis.publish(channel, message)
+                return
+            except Exception as e:
+                self._mark_down(e)
+        self.deliver(channel, message)
+
+    def subscribe(self, channel):
+        self._ensure_listener()
+        return super().subscribe(channel)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(
+                    target=self._listen, name='payment-status-listener', daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                for message in pubsub.listen():
+                    if message.get('type') == 'pmessage':
+                        channel, data = message['channel'], message['data']
+                        self.deliver(
+                            channel.decode() if isinstance(channel, bytes) else channel,
+                            data.decode() if isinstance(data, bytes) else data,
+                        )
+            except Exception as e:
+                self._mark_down(e)
+                time.sleep(self.RETRY_INTERVAL)
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = getattr(settings, 'PAYMENT_STATUS_BROKER', 'local')
+                if backend == 'redis':
+                    try:
+                        _broker = RedisStatusBroker(settings.REDIS_URL)
+                    except ImportError:
+                        logger.warning("redis is not installed; payment status is delivered in-process only")
+                        _broker = LocalStatusBroker()
+                else:
+                    _broker = LocalStatusBroker()
+    return _broker
+
+
+@receiver(setting_changed)
+def _reset_broker(setting, **kwargs):
+    global _broker
+    if setting in ('PAYMENT_STATUS_BROKER', 'REDIS_URL'):
+        _broker = None
+
+
+def publish_status(namespace, pk, status):
+    """Wake everyone waiting on this payment (call after commit)"""
+    try:
+        get_broker().publish(channel_name(namespace, pk), json.dumps({'id': pk, 'status': status}))
+    except Exception as e:
+        logger.error(f"Failed to publish payment status for {namespace} {pk}: {e}")
+
+
+gauge('payment_status_waiters', lambda: get_broker().waiter_count())
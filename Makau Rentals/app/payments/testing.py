@@ -0,0 +1,116 @@
+# payments/testing.py
+"""
+A local stub of the PesaPal API for tests and benchmarks.
+
+    with StubPesaPal(latency=0.05) as stub:
+        with override_settings(PESAPAL_SANDBOX_URL=stub.url):
+            service = PesaPalService()
+            ...
+        stub.requests['/api/Transactions/GetTransactionStatus']
+
+It speaks HTTP/1.1 keep-alive, counts requests per path and client
+connections, can delay every response (`latency`) and can answer the next
+requests to a path with error statuses (`fail_next`).
+"""
+import json
+import threading
+import time
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TOKEN_PATH = '/api/Auth/RequestToken'
+REGISTER_IPN_PATH = '/api/URLSetup/RegisterIPN'
+SUBMIT_ORDER_PATH = '/api/Transactions/SubmitOrderRequest'
+STATUS_PATH = '/api/Transactions/GetTransactionStatus'
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method):
+        stub = self.server.stub
+        url = urlparse(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+        status, payload = stub.respond(method, url.path, parse_qs(url.query), body, self.client_address)
+        self._reply(status, payload)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+
+class StubPesaPal:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.requests = Counter()
+        self.connections = set()
+        self.fail_next = defaultdict(list)
+        # tracking id -> transaction status dict (defaults to Completed)
+        self.statuses = {}
+        self._lock = threading.Lock()
+        self._tokens = 0
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def respond(self, method, path, query, body, client_address):
+        with self._lock:
+            self.requests[path] += 1
+            self.connections.add(client_address)
+            failures = self.fail_next.get(path)
+            failure = failures.pop(0) if failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure:
+            return failure, {'error': {'code': str(failure)}}
+
+        if path == TOKEN_PATH:
+            with self._lock:
+                self._tokens += 1
+                token = f"token-{self._tokens}"
+            return 200, {'token': token, 'status': '200'}
+        if path == REGISTER_IPN_PATH:
+            return 200, {'ipn_id': 'ipn-stub', 'url': body.get('url'), 'status': '200'}
+        if path == SUBMIT_ORDER_PATH:
+            reference = body.get('id')
+            return 200, {
+                'order_tracking_id': f"TRK-{reference}",
+                'merchant_reference': reference,
+                'redirect_url': f"{self.url}/pay/{reference}",
+                'status': '200',
+            }
+        if path == STATUS_PATH:
+            tracking_id = query.get('orderTrackingId', [''])[0]
+            return 200, self.statuses.get(tracking_id, {
+                'payment_status_description': 'Completed',
+                'payment_method': 'MpesaKE',
+                'confirmation_code': f"CONF-{tracking_id}",
+                'amount': None,
+                'status': '200',
+            })
+        return 404, {'error': {'code': 'not_found'}}
@@ -0,0 +1,214 @@
+"""
+Tests for idempotent, concurrency-safe IPN payment completion
+"""
+import random
+import threading
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, LandlordStats, Property, Subscription, Unit
+from accounts.stats import compute_landlord_stats, rebuild_landlord_stats
+from payments.intents import attach_tracking_id, create_intent
+from payments.models import LedgerEntry, Payment, PaymentIntent, SubscriptionPayment
+from payments.views_pesapal import (
+    apply_transaction_status,
+    handle_successful_rent_payment,
+    handle_successful_subscription_payment,
+    mark_payment_as_failed,
+)
+
+DUPLICATES = 100
+
+
+def fire_concurrently(handler, attempts=50):
+    """
+    Call `handler` from DUPLICATES threads released at the same moment and
+    return the results. A notification that hits a lock error is retried
+    with backoff, the way PesaPal re-sends an IPN that was not acknowledged
+    (SQLite reports lock conflicts instead of waiting on row locks).
+    """
+    barrier = threading.Barrier(DUPLICATES)
+    results = []
+    errors = []
+
+    def deliver():
+        try:
+            barrier.wait()
+            for attempt in range(attempts):
+                try:
+                    results.append(handler())
+                    return
+                except OperationalError:
+                    time.sleep(random.uniform(0, min(0.5, 0.005 * 2 ** attempt)))
+            errors.append('gave up')
+        except Exception as e:
+            errors.append(repr(e))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=deliver) for _ in range(DUPLICATES)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def make_fixture(label):
+    landlord = CustomUser.objects.create_user(
+        email=f'{label}-landlord@test.com', full_name='Completion Landlord',
+        user_type='landlord', password='testpass123'
+    )
+    tenant = CustomUser.objects.create_user(
+        email=f'{label}-tenant@test.com', full_name='Completion Tenant',
+        user_type='tenant', password='testpass123'
+    )
+    prop = Property.objects.create(
+        landlord=landlord, name=f'{label} Court', city='Nairobi', state='Nairobi', unit_count=1
+    )
+    unit = Unit.objects.create(
+        property_obj=prop, unit_code=f'{label}-1', unit_number='1', rent=Decimal('10000'),
+        tenant=tenant, is_available=False
+    )
+    return landlord, tenant, unit
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class ConcurrentCompletionTests(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_duplicate_rent_ipns_credit_once(self):
+        landlord, tenant, unit = make_fixture('stress')
+        rebuild_landlord_stats(landlord.id)
+        payment = Payment.objects.create(tenant=tenant, unit=unit, payment_type='rent', amount=Decimal('4000'))
+
+        results, errors = fire_concurrently(
+            lambda: handle_successful_rent_payment({'payment_id': payment.id}, 'QK4STRESS', '4000')
+        )
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(results.count(False), DUPLICATES - 1)
+        unit.refresh_from_db()
+        self.assertEqual(unit.rent_paid, Decimal('4000'))
+        self.assertEqual(unit.rent_remaining, Decimal('6000'))
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+        # The incrementally maintained stats saw exactly one credit too
+        stats = LandlordStats.objects.get(landlord=landlord)
+        expected = compute_landlord_stats(landlord.id)
+        self.assertEqual(stats.rent_collected, expected['rent_collected'])
+        self.assertEqual(stats.rent_outstanding, expected['rent_outstanding'])
+
+    def test_duplicate_subscription_ipns_apply_once(self):
+        landlord, _, _ = make_fixture('stress-sub')
+        subscription_payment = SubscriptionPayment.objects.create(
+            user=landlord, amount=Decimal('2500'), subscription_type='basic', status='Pending'
+        )
+
+        results, errors = fire_concurrently(
+            lambda: handle_successful_subscription_payment(
+                {'subscription_payment_id': subscription_payment.id}, 'QK4SUB', '2500'
+            )
+        )
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results.count(True), 1)
+        subscription_payment.refresh_from_db()
+        self.assertEqual(subscription_payment.status, 'Success')
+        self.assertEqual(Subscription.objects.get(user=landlord).plan, 'basic')
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class CompletionIdempotencyTests(TestCase):
+    def setUp(self):
+        self.landlord, self.tenant, self.unit = make_fixture('idem')
+
+    def test_retried_ipn_is_a_no_op(self):
+        payment = Payment.objects.create(tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('3000'))
+        self.assertTrue(handle_successful_rent_payment({'payment_id': payment.id}, 'QK4ONE', '3000'))
+        self.assertFalse(handle_successful_rent_payment({'payment_id': payment.id}, 'QK4ONE', '3000'))
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('3000'))
+
+    def test_confirmation_code_settles_one_payment(self):
+        first = Payment.objects.create(tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('1000'))
+        second = Payment.objects.create(tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('1000'))
+        self.assertTrue(handle_successful_rent_payment({'payment_id': first.id}, 'QK4SAME', '1000'))
+        self.assertFalse(handle_successful_rent_payment({'payment_id': second.id}, 'QK4SAME', '1000'))
+
+        second.refresh_from_db()
+        self.assertEqual(second.status, 'pending')
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('1000'))
+
+    def test_subscription_is_not_extended_twice(self):
+        subscription_payment = SubscriptionPayment.objects.create(
+            user=self.landlord, amount=Decimal('2500'), subscription_type='basic', status='Pending'
+        )
+        data = {'subscription_payment_id': subscription_payment.id}
+        self.assertTrue(handle_successful_subscription_payment(data, 'QK4SUB', '2500'))
+        expiry = Subscription.objects.get(user=self.landlord).expiry_date
+        self.assertFalse(handle_successful_subscription_payment(data, 'QK4SUB', '2500'))
+        self.assertEqual(Subscription.objects.get(user=self.landlord).expiry_date, expiry)
+
+    def test_late_failure_does_not_undo_completion(self):
+        payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('2000'),
+            mpesa_checkout_request_id='TRK-LATE'
+        )
+        handle_successful_rent_payment({'payment_id': payment.id}, 'QK4LATE', '2000')
+        mark_payment_as_failed('TRK-LATE', 'failed')
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class StatusPollCompletionTests(TestCase):
+    STATUS = {'payment_status_description': 'Completed', 'confirmation_code': 'QK4POLL', 'amount': '3000'}
+
+    def setUp(self):
+        self.landlord, self.tenant, self.unit = make_fixture('poll')
+        self.payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('3000'),
+            reference_number='RENT-POLL-1'
+        )
+        self.intent = create_intent('rent', 'RENT-POLL-1', Decimal('3000'), payment=self.payment)
+        attach_tracking_id(self.intent, 'TRK-POLL')
+
+    def assert_credited_once(self):
+        self.payment.refresh_from_db()
+        self.unit.refresh_from_db()
+        self.assertEqual(self.payment.status, 'completed')
+        self.assertEqual((self.unit.rent_paid, self.unit.rent_remaining), (Decimal('3000'), Decimal('7000')))
+        self.assertEqual(LedgerEntry.objects.filter(payment=self.payment).count(), 1)
+        self.assertEqual(PaymentIntent.objects.get(pk=self.intent.pk).state, 'completed')
+        stats = LandlordStats.objects.get(landlord=self.landlord)
+        self.assertEqual(stats.rent_collected, compute_landlord_stats(self.landlord.id)['rent_collected'])
+
+    def test_poll_before_ipn_credits_the_unit_once(self):
+        rebuild_landlord_stats(self.landlord.id)
+        client = APIClient()
+        client.force_authenticate(self.tenant)
+        with patch('payments.views_pesapal.pesapal_service.get_transaction_status', return_value=self.STATUS):
+            response = client.get(f'/api/payments/rent-status/{self.payment.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(response.data['mpesa_receipt'], 'QK4POLL')
+
+        # The IPN arrives afterwards and finds nothing left to do
+        apply_transaction_status('TRK-POLL', 'RENT-POLL-1', self.STATUS)
+        self.assert_credited_once()
+
+    def test_already_completed_payment_completes_its_intent(self):
+        rebuild_landlord_stats(self.landlord.id)
+        handle_successful_rent_payment({'payment_id': self.payment.id}, 'QK4POLL', '3000')
+        self.assertEqual(PaymentIntent.objects.get(pk=self.intent.pk).state, 'pending')
+
+        apply_transaction_status('TRK-POLL', 'RENT-POLL-1', self.STATUS)
+        self.assert_credited_once()
@@ -0,0 +1,188 @@
+"""
+Tests for the streaming and background CSV exports
+"""
+import csv
+import gzip
+import io
+import shutil
+import tempfile
+import tracemalloc
+from datetime import datetime
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, Unit
+from payments.exports import run_export
+from payments.models import ExportJob, Payment
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def streamed(response):
+    return b''.join(response.streaming_content)
+
+
+def parse(body):
+    return list(csv.reader(io.StringIO(body.decode())))
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    MEDIA_ROOT=MEDIA_ROOT,
+    EXPORT_CHUNK_SIZE=100,
+)
+class PaymentExportTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='export-landlord@test.com', full_name='Export Landlord',
+            user_type='landlord', password='testpass123'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='export-tenant@test.com', full_name='Export Tenant',
+            user_type='tenant', password='testpass123'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Export Court', city='Nairobi', state='Nairobi', unit_count=10
+        )
+        self.other_property = Property.objects.create(
+            landlord=self.landlord, name='Other Court', city='Nairobi', state='Nairobi', unit_count=10
+        )
+        self.unit = Unit.objects.create(
+            property_obj=self.property, unit_code='EXPORT-1', unit_number='A1', rent=Decimal('10000'),
+            tenant=self.tenant, is_available=False
+        )
+        self.other_unit = Unit.objects.create(
+            property_obj=self.other_property, unit_code='EXPORT-2', unit_number='B1', rent=Decimal('8000')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.landlord)
+
+    def make_payments(self, count, unit=None, tenant=None, day=None, status='completed', prefix='EXP'):
+        payments = Payment.objects.bulk_create([
+            Payment(
+                tenant=tenant, unit=unit or self.unit, payment_type='rent', amount=Decimal('100'),
+                status=status, reference_number=f'{prefix}-{i}', mpesa_receipt=f'{prefix}R{i}'
+            )
+            for i in range(count)
+        ])
+        if day:
+            Payment.objects.filter(reference_number__startswith=f'{prefix}-').update(
+                created_at=timezone.make_aware(datetime.combine(day, datetime.min.time()))
+            )
+        return payments
+
+    def test_landlord_export_streams_projected_rows(self):
+        self.make_payments(3, tenant=self.tenant)
+        self.make_payments(1, status='pending', prefix='PEND')
+
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('landlord-csv', args=[self.property.id]))
+            rows = parse(streamed(response))
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('landlord_payments_Export Court.csv', response['Content-Disposition'])
+        self.assertEqual(rows[0], ['Unit Number', 'Tenant', 'Amount', 'Date', 'Receipt'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][:3], ['A1', 'Export Tenant', '100.00'])
+        # One query for the rows, however many there are (no per-row tenant loads)
+        self.assertEqual(len([q for q in captured if 'payments_payment' in q['sql']]), 1)
+
+    def test_date_range_and_property_filters(self):
+        self.make_payments(2, day=datetime(2026, 9, 15).date(), prefix='SEP')
+        self.make_payments(3, day=datetime(2026, 10, 2).date(), prefix='OCT')
+        self.make_payments(4, unit=self.other_unit, day=datetime(2026, 10, 3).date(), prefix='OTH')
+
+        url = reverse('rent-payments-csv')
+        rows = parse(streamed(self.client.get(url, {'start': '2026-10-01', 'end': '2026-10-31'})))
+        self.assertEqual(len(rows) - 1, 7)
+        rows = parse(streamed(self.client.get(
+            url, {'start': '2026-10-01', 'property_id': self.other_property.id}
+        )))
+        self.assertEqual({row[-1] for row in rows[1:]}, {'Other Court'})
+        self.assertEqual(len(rows) - 1, 4)
+        rows = parse(streamed(self.client.get(url, {'end': '2026-09-15'})))
+        self.assertEqual(len(rows) - 1, 2)
+
+        self.assertEqual(self.client.get(url, {'start': '15/10/2026'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'property_id': 999999}).status_code, 404)
+
+    def test_gzip_export(self):
+        self.make_payments(5)
+        response = self.client.get(reverse('tenant-csv', args=[self.unit.id]), {'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+        rows = parse(gzip.decompress(streamed(response)))
+        self.assertEqual(rows[0], ['Amount', 'Date', 'Receipt', 'Type'])
+        self.assertEqual(len(rows), 6)
+
+    def test_tenant_export_permissions(self):
+        stranger = CustomUser.objects.create_user(
+            email='export-stranger@test.com', full_name='Stranger', user_type='tenant', password='testpass123'
+        )
+        self.client.force_authenticate(stranger)
+        self.assertEqual(self.client.get(reverse('tenant-csv', args=[self.unit.id])).status_code, 403)
+        self.client.force_authenticate(self.tenant)
+        self.assertEqual(self.client.get(reverse('tenant-csv', args=[self.unit.id])).status_code, 200)
+
+    def test_memory_stays_flat_as_rows_grow(self):
+        def peak_for(count, prefix):
+            Payment.objects.all().delete()
+            self.make_payments(count, tenant=self.tenant, prefix=prefix)
+            response = self.client.get(reverse('rent-payments-csv'))
+            tracemalloc.start()
+            size = sum(len(chunk) for chunk in response.streaming_content)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return size, peak
+
+        small_size, small_peak = peak_for(2000, 'SMALL')
+        large_size, large_peak = peak_for(10000, 'LARGE')
+        self.assertGreater(large_size, 4 * small_size)
+        # Five times the rows, about the same peak (one fetch chunk and one
+        # output buffer), and less than the export itself
+        self.assertLess(large_peak, 1.25 * small_peak)
+        self.assertLess(large_peak, large_size)
+
+    def test_background_export(self):
+        self.make_payments(3, tenant=self.tenant)
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.get(reverse('rent-payments-csv'), {'background': '1', 'gzip': '1'})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(callbacks), 1)
+        job_id = response.data['job_id']
+
+        status_response = self.client.get(response.data['status_url'])
+        self.assertEqual(status_response.data['status'], 'pending')
+        self.assertEqual(self.client.get(reverse('export-job-download', args=[job_id])).status_code, 409)
+
+        job = run_export(job_id)
+        self.assertEqual((job.status, job.row_count), ('completed', 3))
+        status_response = self.client.get(reverse('export-job', args=[job_id]))
+        download = self.client.get(status_response.data['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertIn('rent_payments.csv.gz', download['Content-Disposition'])
+        rows = parse(gzip.decompress(b''.join(download.streaming_content)))
+        self.assertEqual(len(rows), 4)
+
+        # Only the owner sees the job
+        self.client.force_authenticate(self.tenant)
+        self.assertEqual(self.client.get(reverse('export-job', args=[job_id])).status_code, 404)
+
+    def test_unqueueable_export_is_marked_failed(self):
+        with patch('app.tasks.generate_export_task.apply_async', side_effect=ConnectionError('down')):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.get(reverse('rent-payments-csv'), {'background': '1'})
+        job = ExportJob.objects.get(pk=response.data['job_id'])
+        self.assertEqual(job.status, 'failed')
@@ -0,0 +1,206 @@
+"""
+Tests for the PaymentIntent correlation between PesaPal orders and payments
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, Subscription, Unit
+from payments.intents import resolve_intent
+from payments.ipn_inbox import drain_inbox
+from payments.models import Payment, PaymentIntent, SubscriptionPayment
+
+
+def order(tracking_id):
+    return {'order_tracking_id': tracking_id, 'redirect_url': f'https://pay.test/{tracking_id}'}
+
+
+def transaction_status(description, amount):
+    return {
+        'payment_status_description': description,
+        'payment_method': 'MpesaKE',
+        'confirmation_code': 'CONF123',
+        'amount': amount,
+    }
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    IPN_INBOX_KICK_WORKER=False,
+)
+class PaymentIntentTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='intent-landlord@test.com',
+            full_name='Intent Landlord',
+            user_type='landlord',
+            password='testpass123',
+            phone_number='0712345678'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='intent-tenant@test.com',
+            full_name='Intent Tenant',
+            user_type='tenant',
+            password='testpass123',
+            phone_number='0722345678'
+        )
+        prop = Property.objects.create(
+            landlord=self.landlord, name='Intent Court', city='Nairobi', state='Nairobi', unit_count=2
+        )
+        self.unit = Unit.objects.create(
+            property_obj=prop, unit_code='INTENT-1', unit_number='1', rent=Decimal('10000'),
+            deposit=Decimal('10000'), tenant=self.tenant, is_available=False
+        )
+        self.vacant = Unit.objects.create(
+            property_obj=prop, unit_code='INTENT-2', unit_number='2', rent=Decimal('8000'),
+            deposit=Decimal('8000')
+        )
+        self.client = APIClient()
+
+    def ipn(self, tracking_id, status_description, amount, merchant_reference=None):
+        params = {'OrderTrackingId': tracking_id}
+        if merchant_reference:
+            params['OrderMerchantReference'] = merchant_reference
+        with patch('payments.pesapal_service.pesapal_service.get_transaction_status',
+                   return_value=transaction_status(status_description, amount)):
+            # With no worker to kick the callback applies it; the drain is then a no-op
+            response = self.client.get(reverse('pesapal-ipn-callback'), params)
+            drain_inbox()
+        return response
+
+    @patch('payments.views_pesapal.pesapal_service.submit_order', return_value=order('TRK-RENT'))
+    def test_rent_initiation_writes_intent(self, submit_order):
+        self.client.force_authenticate(user=self.tenant)
+        response = self.client.post(
+            reverse('initiate-rent-payment', args=[self.unit.id]), {'amount': '4000'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+
+        intent = PaymentIntent.objects.get(tracking_id='TRK-RENT')
+        payment = Payment.objects.get(pk=response.data['payment_id'])
+        self.assertEqual(intent.kind, 'rent')
+        self.assertEqual(intent.payment, payment)
+        self.assertEqual(intent.expected_amount, Decimal('4000'))
+        self.assertEqual(intent.state, 'pending')
+        self.assertEqual(intent.merchant_reference, payment.reference_number)
+        self.assertEqual(payment.mpesa_checkout_request_id, 'TRK-RENT')
+
+    @patch('payments.views_pesapal.pesapal_service.submit_order', return_value=None)
+    def test_failed_submission_fails_intent(self, submit_order):
+        self.client.force_authenticate(user=self.tenant)
+        response = self.client.post(
+            reverse('initiate-rent-payment', args=[self.unit.id]), {'amount': '4000'}, format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        intent = PaymentIntent.objects.get()
+        self.assertIsNone(intent.tracking_id)
+        self.assertEqual(intent.state, 'failed')
+
+    @patch('payments.views_pesapal.pesapal_service.submit_order', return_value=order('TRK-RENT'))
+    def test_ipn_completes_rent_without_cache(self, submit_order):
+        self.client.force_authenticate(user=self.tenant)
+        self.client.post(reverse('initiate-rent-payment', args=[self.unit.id]), {'amount': '4000'}, format='json')
+        # Nothing about the order may live only in the cache
+        cache.clear()
+
+        self.ipn('TRK-RENT', 'Completed', '4000')
+
+        intent = PaymentIntent.objects.get(tracking_id='TRK-RENT')
+        self.assertEqual(intent.state, 'completed')
+        self.assertIsNotNone(intent.completed_at)
+        self.assertEqual(intent.payment.status, 'completed')
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('4000'))
+
+    @patch('payments.views_pesapal.pesapal_service.submit_order', return_value=order('TRK-SUB'))
+    def test_ipn_completes_subscription(self, submit_order):
+        self.client.force_authenticate(user=self.landlord)
+        response = self.client.post(
+            reverse('initiate-subscription-payment'), {'subscription_type': 'basic'}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        intent = PaymentIntent.objects.get(tracking_id='TRK-SUB')
+        self.assertEqual(intent.kind, 'subscription')
+        self.assertEqual(intent.metadata['plan'], 'basic')
+
+        self.ipn('TRK-SUB', 'Completed', '2500')
+
+        self.assertEqual(SubscriptionPayment.objects.get(pk=intent.subscription_payment_id).status, 'Success')
+        self.assertEqual(Subscription.objects.get(user=self.landlord).plan, 'basic')
+
+    @patch('payments.views_pesapal.pesapal_service.submit_order', return_value=order('TRK-DEP'))
+    def test_ipn_completes_deposit(self, submit_order):
+        newcomer = CustomUser.objects.create_user(
+            email='intent-newcomer@test.com',
+            full_name='Intent Newcomer',
+            user_type='tenant',
+            password='testpass123',
+            phone_number='0744345678'
+        )
+        self.client.force_authenticate(user=newcomer)
+        response = self.client.post(reverse('initiate-deposit'), {'unit_id': self.vacant.id}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(PaymentIntent.objects.get(tracking_id='TRK-DEP').kind, 'deposit')
+
+        self.ipn('TRK-DEP', 'Completed', '8000')
+
+        self.vacant.refresh_from_db()
+        self.assertEqual(self.vacant.tenant, newcomer)
+        self.assertFalse(self.vacant.is_available)
+
+    @patch('payments.views_pesapal.pesapal_service.submit_order', return_value=order('TRK-REG'))
+    def test_registration_deposit_keeps_session(self, submit_order):
+        response = self.client.post(reverse('initiate-deposit-registration'), {
+            'unit_id': self.vacant.id, 'phone_number': '0733345678', 'session_id': 'sess-1',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        intent = PaymentIntent.objects.get(tracking_id='TRK-REG')
+        self.assertEqual(intent.kind, 'deposit_registration')
+        self.assertEqual(intent.metadata['session_id'], 'sess-1')
+
+        self.ipn('TRK-REG', 'Completed', '8000')
+
+        self.vacant.refresh_from_db()
+        self.assertFalse(self.vacant.is_available)
+        self.assertIsNone(self.vacant.tenant)
+
+    @patch('payments.views_pesapal.pesapal_service.submit_order', return_value=order('TRK-RENT'))
+    def test_ipn_failure_marks_intent(self, submit_order):
+        self.client.force_authenticate(user=self.tenant)
+        self.client.post(reverse('initiate-rent-payment', args=[self.unit.id]), {'amount': '4000'}, format='json')
+
+        self.ipn('TRK-RENT', 'Cancelled', '4000')
+
+        intent = PaymentIntent.objects.get(tracking_id='TRK-RENT')
+        self.assertEqual(intent.state, 'cancelled')
+        self.assertEqual(intent.payment.status, 'failed')
+
+    def test_resolve_is_one_lookup(self):
+        payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, amount=Decimal('100'), reference_number='RENT-X'
+        )
+        PaymentIntent.objects.create(
+            tracking_id='TRK-ONE', merchant_reference='RENT-X', kind='rent',
+            payment=payment, expected_amount=Decimal('100')
+        )
+        with CaptureQueriesContext(connection) as captured:
+            intent = resolve_intent('TRK-ONE', 'RENT-X')
+            self.assertEqual(intent.payment.unit_id, self.unit.id)
+        self.assertEqual(len(captured), 1)
+        self.assertIn('tracking_id', captured[0]['sql'])
+
+    def test_resolve_falls_back_to_merchant_reference(self):
+        payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, amount=Decimal('100'), reference_number='RENT-Y'
+        )
+        PaymentIntent.objects.create(
+            merchant_reference='RENT-Y', kind='rent', payment=payment, expected_amount=Decimal('100')
+        )
+        self.assertEqual(resolve_intent('TRK-UNKNOWN', 'RENT-Y').payment, payment)
+        self.assertIsNone(resolve_intent('TRK-UNKNOWN'))
@@ -0,0 +1,187 @@
+"""
+Tests for the ack-fast PesaPal IPN inbox and its drain worker
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, Unit
+from app import metrics
+from payments.ipn_inbox import IPN_ACK_SECONDS, backoff_delay, drain_inbox, requeue
+from payments.models import IpnNotification, Payment, PaymentIntent
+
+STATUS_LOOKUP = 'payments.pesapal_service.pesapal_service.get_transaction_status'
+COMPLETED = {
+    'payment_status_description': 'Completed',
+    'payment_method': 'MpesaKE',
+    'confirmation_code': 'QK4INBOX',
+    'amount': '3000',
+}
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    IPN_INBOX_KICK_WORKER=False,
+    IPN_INBOX_PROCESS_INLINE=False,
+    IPN_INBOX_MAX_ATTEMPTS=3,
+    IPN_RETRY_BASE_SECONDS=30,
+)
+class IpnInboxTests(TestCase):
+    def setUp(self):
+        landlord = CustomUser.objects.create_user(
+            email='inbox-landlord@test.com', full_name='Inbox Landlord',
+            user_type='landlord', password='testpass123'
+        )
+        tenant = CustomUser.objects.create_user(
+            email='inbox-tenant@test.com', full_name='Inbox Tenant',
+            user_type='tenant', password='testpass123'
+        )
+        prop = Property.objects.create(
+            landlord=landlord, name='Inbox Court', city='Nairobi', state='Nairobi', unit_count=1
+        )
+        self.unit = Unit.objects.create(
+            property_obj=prop, unit_code='INBOX-1', unit_number='1', rent=Decimal('10000'),
+            tenant=tenant, is_available=False
+        )
+        self.payment = Payment.objects.create(
+            tenant=tenant, unit=self.unit, payment_type='rent', amount=Decimal('3000'),
+            reference_number='RENT-INBOX', mpesa_checkout_request_id='TRK-INBOX'
+        )
+        PaymentIntent.objects.create(
+            tracking_id='TRK-INBOX', merchant_reference='RENT-INBOX', kind='rent',
+            payment=self.payment, expected_amount=Decimal('3000')
+        )
+        self.client = APIClient()
+
+    def notify(self, tracking_id='TRK-INBOX'):
+        return self.client.get(reverse('pesapal-ipn-callback'), {
+            'OrderTrackingId': tracking_id,
+            'OrderMerchantReference': 'RENT-INBOX',
+            'OrderNotificationType': 'IPNCHANGE',
+        })
+
+    def test_callback_only_records_the_notification(self):
+        IPN_ACK_SECONDS.reset()
+        with patch(STATUS_LOOKUP) as status_lookup, CaptureQueriesContext(connection) as captured:
+            response = self.notify()
+
+        self.assertEqual(response.json()['status'], 'success')
+        status_lookup.assert_not_called()
+        self.assertEqual(len(captured), 1)
+        self.assertTrue(captured[0]['sql'].startswith('INSERT INTO "payments_ipnnotification"'))
+        notification = IpnNotification.objects.get()
+        self.assertEqual(notification.state, 'pending')
+        self.assertEqual(notification.payload['OrderNotificationType'], 'IPNCHANGE')
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, 'pending')
+        self.assertEqual(IPN_ACK_SECONDS.count, 1)
+
+    @override_settings(IPN_INBOX_PROCESS_INLINE=True)
+    def test_without_a_worker_the_callback_applies_it(self):
+        with patch(STATUS_LOOKUP, return_value=COMPLETED):
+            self.assertEqual(self.notify().json()['status'], 'success')
+        self.assertEqual(IpnNotification.objects.get().state, 'done')
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('3000'))
+
+    @override_settings(IPN_INBOX_KICK_WORKER=True, IPN_INBOX_PROCESS_INLINE=True)
+    def test_unreachable_broker_falls_back_to_inline(self):
+        with patch('app.tasks.drain_ipn_inbox_task.apply_async', side_effect=OSError('no broker')) as kick, \
+                patch(STATUS_LOOKUP, return_value=None):
+            self.assertEqual(self.notify().json()['status'], 'success')
+        kick.assert_called_once()
+        # The lookup failed inline; the notification waits for the next drain
+        notification = IpnNotification.objects.get()
+        self.assertEqual((notification.state, notification.attempts), ('pending', 1))
+
+    def test_cron_command_drains_the_inbox(self):
+        self.notify()
+        self.notify('TRK-OTHER')
+        out = StringIO()
+        with patch(STATUS_LOOKUP, return_value=COMPLETED):
+            call_command('drain_ipn_inbox', '--batch-size', '1', '--all', stdout=out)
+        self.assertIn('IPN inbox: 2 applied', out.getvalue())
+        self.assertFalse(IpnNotification.objects.exclude(state='done').exists())
+
+    def test_missing_tracking_id_is_rejected(self):
+        response = self.client.get(reverse('pesapal-ipn-callback'))
+        self.assertEqual(response.json()['status'], 'error')
+        self.assertFalse(IpnNotification.objects.exists())
+
+    def test_drain_applies_notification(self):
+        self.notify()
+        with patch(STATUS_LOOKUP, return_value=COMPLETED):
+            counts = drain_inbox()
+
+        self.assertEqual(counts, {'done': 1, 'retried': 0, 'dead': 0})
+        notification = IpnNotification.objects.get()
+        self.assertEqual(notification.state, 'done')
+        self.assertIsNotNone(notification.processed_at)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('3000'))
+
+    def test_duplicate_notifications_credit_once(self):
+        self.notify()
+        self.notify()
+        with patch(STATUS_LOOKUP, return_value=COMPLETED):
+            self.assertEqual(drain_inbox()['done'], 2)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('3000'))
+
+    def test_failures_back_off_then_dead_letter(self):
+        self.notify()
+        now = timezone.now()
+        with patch(STATUS_LOOKUP, return_value=None):
+            self.assertEqual(drain_inbox(now=now)['retried'], 1)
+            notification = IpnNotification.objects.get()
+            self.assertEqual(notification.state, 'pending')
+            self.assertEqual(notification.attempts, 1)
+            self.assertGreaterEqual(notification.next_attempt_at, now + timedelta(seconds=30))
+
+            # Not due yet
+            self.assertEqual(drain_inbox(now=now)['retried'], 0)
+
+            later = notification.next_attempt_at
+            self.assertEqual(drain_inbox(now=later)['retried'], 1)
+            notification.refresh_from_db()
+            self.assertGreaterEqual(notification.next_attempt_at - later, timedelta(seconds=60))
+
+            self.assertEqual(drain_inbox(now=notification.next_attempt_at)['dead'], 1)
+        notification.refresh_from_db()
+        self.assertEqual(notification.state, 'dead')
+        self.assertIn('transaction status', notification.last_error)
+        self.assertEqual(metrics.snapshot()['gauges']['pesapal_ipn_dead_letters'], 1)
+
+        self.assertEqual(requeue(IpnNotification.objects.all()), 1)
+        with patch(STATUS_LOOKUP, return_value=COMPLETED):
+            self.assertEqual(drain_inbox()['done'], 1)
+
+    def test_expired_lease_is_reclaimed(self):
+        self.notify()
+        IpnNotification.objects.update(state='processing', next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with patch(STATUS_LOOKUP, return_value=COMPLETED):
+            self.assertEqual(drain_inbox()['done'], 1)
+
+    def test_backoff_is_exponential_and_capped(self):
+        self.assertEqual([backoff_delay(n) for n in (1, 2, 3)], [30, 60, 120])
+        self.assertEqual(backoff_delay(20), 3600)
+
+    def test_metrics_report_latency_and_depth(self):
+        IPN_ACK_SECONDS.reset()
+        for _ in range(3):
+            self.notify()
+        snapshot = metrics.snapshot()
+        ack = snapshot['histograms']['pesapal_ipn_ack_seconds']
+        self.assertEqual(ack['count'], 3)
+        self.assertIsNotNone(ack['p50'])
+        self.assertLessEqual(ack['p50'], ack['p99'])
+        self.assertEqual(snapshot['gauges']['pesapal_ipn_inbox_depth'], 3)
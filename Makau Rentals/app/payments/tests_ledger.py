@@ -0,0 +1,201 @@
+"""
+Tests for the append-only rent ledger and its balance snapshots
+"""
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, Unit
+from payments.ledger import post_entry, rebuild_ledgers, statement, unit_balance
+from payments.models import LedgerEntry, Payment, UnitBalance
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class RentLedgerTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='ledger-landlord@test.com', full_name='Ledger Landlord',
+            user_type='landlord', password='testpass123'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='ledger-tenant@test.com', full_name='Ledger Tenant',
+            user_type='tenant', password='testpass123'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Ledger Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        self.unit = Unit.objects.create(
+            property_obj=self.property, unit_code='LEDGER-1', unit_number='1', rent=Decimal('10000'),
+            tenant=self.tenant, is_available=False
+        )
+
+    def pay(self, amount, status='completed', payment_type='rent'):
+        return Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type=payment_type,
+            amount=Decimal(amount), status=status
+        )
+
+    def test_completed_payments_are_posted(self):
+        post_entry(self.unit.id, 'charge', Decimal('10000'), tenant_id=self.tenant.id, description='Rent')
+        payment = self.pay('4000')
+
+        entry = LedgerEntry.objects.get(payment=payment)
+        self.assertEqual(entry.entry_type, 'payment')
+        self.assertEqual(entry.amount, Decimal('-4000'))
+        self.assertEqual(entry.balance_after, Decimal('6000'))
+        balance = unit_balance(self.unit.id)
+        self.assertEqual(balance.balance, Decimal('6000'))
+        self.assertEqual(balance.total_charged, Decimal('10000'))
+        self.assertEqual(balance.total_paid, Decimal('4000'))
+        self.assertEqual(balance.last_entry_id, entry.id)
+
+    def test_payment_is_posted_once_when_it_completes(self):
+        payment = self.pay('2500', status='pending')
+        self.assertFalse(LedgerEntry.objects.exists())
+
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.status = 'completed'
+        payment.save()
+        payment.description = 'Confirmed'
+        payment.save()
+        Payment.objects.get(pk=payment.pk).save(update_fields=['status'])
+
+        self.assertEqual(LedgerEntry.objects.filter(payment=payment).count(), 1)
+        self.assertEqual(unit_balance(self.unit.id).total_paid, Decimal('2500'))
+
+    def test_payment_leaving_completed_is_reversed(self):
+        payment = self.pay('3000')
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.status = 'failed'
+        payment.save()
+        payment.save(update_fields=['status'])
+
+        original = LedgerEntry.objects.get(payment=payment)
+        reversal = original.reversal
+        self.assertEqual(reversal.amount, Decimal('3000'))
+        self.assertEqual(LedgerEntry.objects.count(), 2)
+        balance = unit_balance(self.unit.id)
+        self.assertEqual(balance.balance, Decimal('0'))
+        self.assertEqual(balance.total_paid, Decimal('0'))
+
+    def test_deposits_are_held_apart_from_rent(self):
+        self.pay('8000', payment_type='deposit')
+        self.pay('500', payment_type='maintenance')
+
+        balance = unit_balance(self.unit.id)
+        self.assertEqual(balance.deposit_held, Decimal('8000'))
+        self.assertEqual(balance.balance, Decimal('0'))
+        self.assertEqual(LedgerEntry.objects.count(), 1)
+
+    def test_entries_are_append_only(self):
+        entry = post_entry(self.unit.id, 'adjustment', Decimal('-100'), description='Goodwill')
+        entry.amount = Decimal('-200')
+        with self.assertRaises(TypeError):
+            entry.save()
+        with self.assertRaises(TypeError):
+            entry.delete()
+        with self.assertRaises(TypeError):
+            LedgerEntry.objects.update(amount=0)
+        with self.assertRaises(TypeError):
+            LedgerEntry.objects.all().delete()
+
+    def test_balance_is_a_single_row_read(self):
+        for _ in range(20):
+            self.pay('100')
+        with CaptureQueriesContext(connection) as captured:
+            balance = unit_balance(self.unit.id)
+        self.assertEqual(len(captured), 1)
+        self.assertEqual(balance.balance, Decimal('-2000'))
+
+    def test_statement_for_a_period(self):
+        start = timezone.now()
+        post_entry(self.unit.id, 'charge', Decimal('10000'), posted_at=start - timedelta(days=40))
+        post_entry(self.unit.id, 'payment', Decimal('-10000'), posted_at=start - timedelta(days=35))
+        post_entry(self.unit.id, 'charge', Decimal('10000'), posted_at=start - timedelta(days=10))
+        post_entry(self.unit.id, 'payment', Decimal('-4000'), posted_at=start - timedelta(days=5))
+        post_entry(self.unit.id, 'charge', Decimal('10000'), posted_at=start + timedelta(days=20))
+
+        result = statement(self.unit.id, start - timedelta(days=15), start)
+        self.assertEqual(result['opening_balance'], Decimal('0'))
+        self.assertEqual([e.amount for e in result['entries']], [Decimal('10000'), Decimal('-4000')])
+        self.assertEqual(result['closing_balance'], Decimal('6000'))
+
+        with CaptureQueriesContext(connection) as captured:
+            statement(self.unit.id, start - timedelta(days=15), start)
+        sql = captured[-1]['sql']
+        self.assertIn('"payments_ledgerentry"."unit_id"', sql)
+        self.assertIn('ORDER BY "payments_ledgerentry"."posted_at" ASC, "payments_ledgerentry"."id" ASC', sql)
+
+    def test_rebuild_derives_ledger_from_payment_history(self):
+        Payment.objects.bulk_create([
+            Payment(tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('3000'),
+                    status='completed', reference_number='LEDGER-R1'),
+            Payment(tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('999'),
+                    status='pending', reference_number='LEDGER-R2'),
+            Payment(tenant=self.tenant, unit=self.unit, payment_type='deposit', amount=Decimal('10000'),
+                    status='completed', reference_number='LEDGER-D1'),
+        ])
+        Unit.objects.filter(pk=self.unit.pk).update(rent_paid=Decimal('3000'), rent_remaining=Decimal('7000'))
+        vacant = Unit.objects.create(
+            property_obj=self.property, unit_code='LEDGER-2', unit_number='2', rent=Decimal('9000')
+        )
+        self.assertFalse(LedgerEntry.objects.exists())
+
+        drifted = rebuild_ledgers(Unit.objects.all())
+
+        self.assertEqual(drifted, [])
+        balance = unit_balance(self.unit.id)
+        self.assertEqual(balance.balance, Decimal('7000'))
+        self.assertEqual(balance.total_paid, Decimal('3000'))
+        self.assertEqual(balance.deposit_held, Decimal('10000'))
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(unit=self.unit).order_by('id').values_list('entry_type', flat=True)),
+            ['charge', 'payment', 'deposit'],
+        )
+        self.assertFalse(UnitBalance.objects.filter(unit=vacant).exists())
+
+        # Rebuilding again replaces rather than duplicates
+        rebuild_ledgers(Unit.objects.all())
+        self.assertEqual(LedgerEntry.objects.filter(unit=self.unit).count(), 3)
+
+    def test_rebuild_command_reports_drift(self):
+        self.pay('3000')  # posted by the signal, but rent_paid left untouched
+        out = StringIO()
+        call_command('rebuild_rent_ledger', '--dry-run', stdout=out)
+        self.assertIn(f'Unit {self.unit.id}: ledger balance 7000.00 != rent_remaining 10000.00', out.getvalue())
+        # A dry run leaves the signal-posted ledger alone
+        self.assertEqual(LedgerEntry.objects.count(), 1)
+
+    def test_ledger_endpoint(self):
+        post_entry(self.unit.id, 'charge', Decimal('10000'), tenant_id=self.tenant.id)
+        self.pay('4000')
+        client = APIClient()
+
+        client.force_authenticate(self.tenant)
+        response = client.get(reverse('unit-ledger', args=[self.unit.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['balance'], 6000.0)
+        self.assertEqual([e['entry_type'] for e in response.data['entries']], ['charge', 'payment'])
+
+        stranger = CustomUser.objects.create_user(
+            email='ledger-stranger@test.com', full_name='Stranger', user_type='tenant', password='testpass123'
+        )
+        client.force_authenticate(stranger)
+        self.assertEqual(client.get(reverse('unit-ledger', args=[self.unit.id])).status_code, 403)
+
+    def test_rent_summary_reads_the_snapshot(self):
+        self.pay('4000')
+        self.pay('1000', payment_type='deposit')
+        client = APIClient()
+        client.force_authenticate(self.tenant)
+        self.assertEqual(client.get(reverse('rent-summary')).data['rent_paid'], 4000.0)
+        client.force_authenticate(self.landlord)
+        self.assertEqual(client.get(reverse('rent-summary')).data['total_collected'], Decimal('5000'))
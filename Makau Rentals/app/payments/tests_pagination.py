@@ -0,0 +1,79 @@
+"""
+Tests for opt-in cursor pagination of the rent payment list
+"""
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, Unit
+from app.pagination import CompatCursorPagination
+from payments.models import Payment
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class PaymentCursorPaginationTests(TestCase):
+    def setUp(self):
+        self.tenant = CustomUser.objects.create_user(
+            email='pages-tenant@test.com',
+            full_name='Pages Tenant',
+            user_type='tenant',
+            password='testpass123'
+        )
+        landlord = CustomUser.objects.create_user(
+            email='pages-landlord@test.com',
+            full_name='Pages Landlord',
+            user_type='landlord',
+            password='testpass123'
+        )
+        prop = Property.objects.create(
+            landlord=landlord, name='Pages Court', city='Nairobi', state='Nairobi', unit_count=1
+        )
+        unit = Unit.objects.create(
+            property_obj=prop, unit_code='PAGES-1', unit_number='1', rent=Decimal('10000')
+        )
+        payments = Payment.objects.bulk_create([
+            Payment(
+                tenant=self.tenant, unit=unit, payment_type='rent',
+                amount=Decimal('100'), reference_number=f'PAGES-{i}'
+            )
+            for i in range(25)
+        ])
+        # Every row shares one timestamp so the id tie-breaker has to do the work
+        Payment.objects.filter(pk__in=[p.pk for p in payments]).update(created_at=timezone.now())
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.tenant)
+        self.url = reverse('rent-payment-list-create')
+
+    def test_plain_list_by_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 25)
+
+    @override_settings(CURSOR_PAGINATION_DEFAULT=True)
+    def test_setting_paginates_by_default(self):
+        response = self.client.get(self.url)
+        self.assertIn('next', response.data)
+        self.assertEqual(len(response.data['results']), 25)
+
+    def test_walk_pages_without_duplicates(self):
+        seen = []
+        response = self.client.get(self.url, {'page_size': 10})
+        self.assertIsNone(response.data['previous'])
+        while True:
+            seen.extend(row['id'] for row in response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(seen, sorted(seen, reverse=True))
+
+    def test_page_size_is_capped(self):
+        with patch.object(CompatCursorPagination, 'max_page_size', 5):
+            response = self.client.get(self.url, {'page_size': 10000})
+        self.assertEqual(len(response.data['results']), 5)
@@ -0,0 +1,132 @@
+"""
+Tests for the pooled PesaPal HTTP client and token manager, against a local stub
+"""
+import threading
+
+from django.test import SimpleTestCase, override_settings
+
+from app import metrics
+from payments.pesapal_service import PesaPalService, TokenManager
+from payments.testing import (
+    REGISTER_IPN_PATH, STATUS_PATH, SUBMIT_ORDER_PATH, TOKEN_PATH, StubPesaPal,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    PESAPAL_ENV='sandbox',
+    PESAPAL_IPN_ID='',
+    PESAPAL_HTTP_BACKOFF=0,
+)
+class PesaPalClientTests(SimpleTestCase):
+    def setUp(self):
+        self.stub = StubPesaPal().__enter__()
+        self.addCleanup(self.stub.__exit__)
+        with override_settings(PESAPAL_SANDBOX_URL=self.stub.url):
+            self.service = PesaPalService()
+
+    def submit(self, reference):
+        return self.service.submit_order(
+            amount=1000, description='Rent', phone_number='0712345678',
+            email='tenant@test.com', merchant_reference=reference,
+        )
+
+    def test_connections_and_token_are_reused(self):
+        for i in range(10):
+            self.assertEqual(
+                self.service.get_transaction_status(f'TRK-{i}')['payment_status_description'], 'Completed'
+            )
+        self.assertEqual(self.stub.requests[TOKEN_PATH], 1)
+        self.assertEqual(self.stub.requests[STATUS_PATH], 10)
+        # Eleven requests over one kept-alive connection
+        self.assertEqual(len(self.stub.connections), 1)
+
+    def test_ipn_is_registered_once(self):
+        for i in range(3):
+            self.assertEqual(self.submit(f'RENT-{i}')['order_tracking_id'], f'TRK-RENT-{i}')
+        self.assertEqual(self.stub.requests[REGISTER_IPN_PATH], 1)
+        self.assertEqual(self.stub.requests[SUBMIT_ORDER_PATH], 3)
+
+    def test_concurrent_callers_share_one_refresh(self):
+        self.stub.latency = 0.2
+        barrier = threading.Barrier(20)
+        tokens = []
+
+        def fetch():
+            barrier.wait()
+            tokens.append(self.service.get_access_token())
+
+        threads = [threading.Thread(target=fetch) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.stub.requests[TOKEN_PATH], 1)
+        self.assertEqual(set(tokens), {'token-1'})
+
+    def test_status_lookups_retry_server_errors(self):
+        self.service.get_access_token()
+        self.stub.fail_next[STATUS_PATH] = [503, 502]
+        self.assertIsNotNone(self.service.get_transaction_status('TRK-RETRY'))
+        self.assertEqual(self.stub.requests[STATUS_PATH], 3)
+
+    def test_retries_are_bounded(self):
+        self.service.get_access_token()
+        self.stub.fail_next[STATUS_PATH] = [503] * 10
+        self.assertIsNone(self.service.get_transaction_status('TRK-DOWN'))
+        self.assertEqual(self.stub.requests[STATUS_PATH], 4)  # first try + 3 retries
+
+    def test_order_submission_is_not_retried(self):
+        self.service.get_ipn_id()
+        self.stub.fail_next[SUBMIT_ORDER_PATH] = [503]
+        self.assertIsNone(self.submit('RENT-ONCE'))
+        self.assertEqual(self.stub.requests[SUBMIT_ORDER_PATH], 1)
+
+    def test_unauthorized_response_drops_token(self):
+        self.service.get_access_token()
+        self.stub.fail_next[STATUS_PATH] = [401]
+        self.assertIsNone(self.service.get_transaction_status('TRK-401'))
+        self.service.get_transaction_status('TRK-401')
+        self.assertEqual(self.stub.requests[TOKEN_PATH], 2)
+
+    def test_latency_histograms_per_endpoint(self):
+        status_histogram = metrics.histogram('pesapal_transaction_status_seconds')
+        status_histogram.reset()
+        for i in range(5):
+            self.service.get_transaction_status(f'TRK-H{i}')
+        snapshot = status_histogram.snapshot()
+        self.assertEqual(snapshot['count'], 5)
+        self.assertIsNotNone(snapshot['p99'])
+        self.assertGreater(metrics.histogram('pesapal_request_token_seconds').count, 0)
+
+
+class TokenManagerTests(SimpleTestCase):
+    def test_refreshes_before_expiry(self):
+        clock = FakeClock()
+        fetched = []
+
+        def fetch():
+            fetched.append(clock.now)
+            return f'token-{len(fetched)}'
+
+        tokens = TokenManager(fetch, lifetime=300, margin=60, clock=clock)
+        self.assertEqual(tokens.get(), 'token-1')
+        clock.now = 239
+        self.assertEqual(tokens.get(), 'token-1')
+        clock.now = 240
+        self.assertEqual(tokens.get(), 'token-2')
+        self.assertEqual(fetched, [0, 240])
+
+    def test_failed_fetch_is_not_cached(self):
+        results = iter([None, 'token'])
+        tokens = TokenManager(lambda: next(results))
+        self.assertIsNone(tokens.get())
+        self.assertEqual(tokens.get(), 'token')
@@ -0,0 +1,120 @@
+"""
+Query-plan regression suite: EXPLAIN the hottest ORM queries and fail if any
+of them falls back to a full table scan.
+
+Runs on whichever backend the settings select (SQLite locally, Postgres in
+CI/production). On Postgres the tables here are tiny, so sequential scans
+are disabled for the check: the planner then only picks a Seq Scan when no
+index can answer the query, which is exactly the regression to catch.
+"""
+import re
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from accounts.models import CustomUser, LandlordStats, Property, Unit
+from communication.models import Report
+from payments.models import IpnNotification, LedgerEntry, Payment, PaymentIntent, SubscriptionPayment
+
+
+def full_scans(plan, vendor):
+    """Tables the plan reads in full (without an index)"""
+    if vendor == 'postgresql':
+        return re.findall(r'Seq Scan on (\w+)', plan)
+    # SQLite: "SCAN t" and "SCAN t USING INDEX i" both visit every row of t;
+    # only a covering-index scan stays out of the table itself
+    return [
+        match.group(1) for match in re.finditer(r'\bSCAN (\w+)(?! USING COVERING INDEX)', plan)
+        if not match.group(1).startswith('sqlite_')
+    ]
+
+
+@override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+class HotQueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.landlord = CustomUser.objects.create_user(
+            email='plans-landlord@test.com', full_name='Plans Landlord', user_type='landlord', password='x'
+        )
+        cls.tenant = CustomUser.objects.create_user(
+            email='plans-tenant@test.com', full_name='Plans Tenant', user_type='tenant', password='x'
+        )
+        cls.property = Property.objects.create(
+            landlord=cls.landlord, name='Plans Court', city='Nairobi', state='Nairobi', unit_count=10
+        )
+        cls.unit = Unit.objects.create(
+            property_obj=cls.property, unit_code='PLANS-1', unit_number='1', rent=Decimal('10000'),
+            tenant=cls.tenant, is_available=False, rent_due_date=timezone.localdate()
+        )
+        Payment.objects.create(
+            tenant=cls.tenant, unit=cls.unit, payment_type='rent', amount=Decimal('10000'),
+            status='completed', mpesa_checkout_request_id='TRK-PLANS'
+        )
+
+    def hot_queries(self):
+        today = timezone.localdate()
+        landlord, tenant, unit, prop = self.landlord, self.tenant, self.unit, self.property
+        month_start = timezone.now() - timedelta(days=30)
+        return {
+            # payments
+            'payment by tracking id': Payment.objects.filter(
+                mpesa_checkout_request_id='TRK-PLANS', status='pending'),
+            'subscription payment by tracking id': SubscriptionPayment.objects.filter(
+                mpesa_checkout_request_id='TRK-PLANS', status='Pending'),
+            'payment by reference': Payment.objects.filter(reference_number='PAY-PLANS'),
+            'unit rent total': Payment.objects.filter(
+                unit=unit, status='completed', payment_type='rent').values('unit').annotate(total=Sum('amount')),
+            'tenant deposit check': Payment.objects.filter(
+                tenant=tenant, payment_type='deposit', status='completed'),
+            'tenant payment page': Payment.objects.filter(tenant=tenant).order_by('-created_at', '-id')[:20],
+            'unit payment page': Payment.objects.filter(unit=unit).order_by('-created_at', '-id')[:20],
+            'landlord month revenue': Payment.objects.filter(
+                unit__property_obj__landlord=landlord, payment_type='rent', status='completed',
+                created_at__gte=month_start),
+            'subscription payment page': SubscriptionPayment.objects.filter(
+                user=landlord).order_by('-transaction_date', '-id')[:20],
+            'intent by tracking id': PaymentIntent.objects.filter(tracking_id='TRK-PLANS'),
+            'pending intents batch': PaymentIntent.objects.filter(
+                state='pending', id__gt=0).order_by('id')[:100],
+            'due ipn notifications': IpnNotification.objects.filter(
+                state='received', next_attempt_at__lte=timezone.now()).order_by('next_attempt_at')[:50],
+            'unit statement': LedgerEntry.objects.filter(
+                unit=unit, posted_at__gte=month_start).order_by('posted_at', 'id'),
+            # units
+            'available units of property': Unit.objects.filter(property_obj=prop, is_available=True),
+            'available units of landlord': Unit.objects.filter(
+                property_obj__landlord=landlord, is_available=True),
+            'unit of tenant': Unit.objects.filter(tenant=tenant),
+            'units due today': Unit.objects.filter(
+                tenant__isnull=False, rent_due_date__lte=today, rent_remaining__gt=0),
+            'landlord stats': LandlordStats.objects.filter(landlord=landlord),
+            # reports
+            'open reports of unit': Report.objects.filter(unit=unit, status='open'),
+            'open reports of landlord': Report.objects.filter(
+                unit__property_obj__landlord=landlord, status='open'),
+        }
+
+    def explain(self, queryset):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_hot_queries_use_indexes(self):
+        queries = self.hot_queries()
+        self.assertEqual(len(queries), 20)
+        regressions = {}
+        for name, queryset in queries.items():
+            plan = self.explain(queryset)
+            scans = full_scans(plan, connection.vendor)
+            if scans:
+                regressions[name] = f"full scan of {', '.join(scans)}:\n{plan}"
+        self.assertEqual(regressions, {}, '\n\n'.join(f"{k}: {v}" for k, v in regressions.items()))
+
+    def test_detects_a_full_scan(self):
+        plan = self.explain(Payment.objects.filter(description='unindexed'))
+        self.assertIn('payments_payment', full_scans(plan, connection.vendor))
@@ -0,0 +1,232 @@
+"""
+Tests for the pending payment reconciliation job, against a local PesaPal stub
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Property, Unit
+from payments.models import Payment, PaymentIntent
+from payments.pesapal_service import PesaPalService
+from payments.reconciliation import RateLimiter, reconcile_pending
+from payments.testing import STATUS_PATH, StubPesaPal
+
+
+def status(description):
+    return {
+        'payment_status_description': description,
+        'payment_method': 'MpesaKE',
+        'confirmation_code': '',
+        'amount': None,
+        'status': '200',
+    }
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    PESAPAL_ENV='sandbox',
+    PESAPAL_IPN_ID='',
+    PESAPAL_HTTP_BACKOFF=0,
+    IPN_INBOX_KICK_WORKER=False,
+)
+class ReconcilePendingTests(TestCase):
+    def setUp(self):
+        self.stub = StubPesaPal().__enter__()
+        self.addCleanup(self.stub.__exit__)
+        with override_settings(PESAPAL_SANDBOX_URL=self.stub.url):
+            self.service = PesaPalService()
+
+        landlord = CustomUser.objects.create_user(
+            email='recon-landlord@test.com', full_name='Recon Landlord',
+            user_type='landlord', password='testpass123'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='recon-tenant@test.com', full_name='Recon Tenant',
+            user_type='tenant', password='testpass123'
+        )
+        prop = Property.objects.create(
+            landlord=landlord, name='Recon Court', city='Nairobi', state='Nairobi', unit_count=1
+        )
+        self.unit = Unit.objects.create(
+            property_obj=prop, unit_code='RECON-1', unit_number='1', rent=Decimal('100000'),
+            tenant=self.tenant, is_available=False
+        )
+
+    def pending(self, reference, age=timedelta(hours=1), amount=Decimal('1000')):
+        tracking_id = f'TRK-{reference}'
+        payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=amount,
+            reference_number=reference, mpesa_checkout_request_id=tracking_id
+        )
+        intent = PaymentIntent.objects.create(
+            tracking_id=tracking_id, merchant_reference=reference, kind='rent',
+            payment=payment, expected_amount=amount
+        )
+        PaymentIntent.objects.filter(pk=intent.pk).update(created_at=timezone.now() - age)
+        return payment
+
+    def reconcile(self, **kwargs):
+        kwargs.setdefault('rate', 0)
+        return reconcile_pending(service=self.service, **kwargs)
+
+    def test_applies_completions_and_failures(self):
+        paid = self.pending('RECON-PAID')
+        cancelled = self.pending('RECON-CANCELLED')
+        waiting = self.pending('RECON-WAITING')
+        self.stub.statuses['TRK-RECON-CANCELLED'] = status('Cancelled')
+        self.stub.statuses['TRK-RECON-WAITING'] = status('Pending')
+
+        report = self.reconcile()
+
+        self.assertEqual(
+            {k: report[k] for k in ('scanned', 'completed', 'failed', 'expired', 'still_pending')},
+            {'scanned': 3, 'completed': 1, 'failed': 1, 'expired': 0, 'still_pending': 1},
+        )
+        for payment, expected in ((paid, 'completed'), (cancelled, 'failed'), (waiting, 'pending')):
+            payment.refresh_from_db()
+            self.assertEqual(payment.status, expected)
+        self.assertEqual(PaymentIntent.objects.get(payment=paid).state, 'completed')
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('1000'))
+
+    def test_rerun_is_idempotent(self):
+        self.pending('RECON-ONCE')
+        self.assertEqual(self.reconcile()['completed'], 1)
+        # Completed intents are no longer pending, so nothing is looked up again
+        self.assertEqual(self.reconcile()['scanned'], 0)
+        self.assertEqual(self.stub.requests[STATUS_PATH], 1)
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.rent_paid, Decimal('1000'))
+
+    def test_old_unpaid_orders_expire(self):
+        stale = self.pending('RECON-STALE', age=timedelta(hours=72))
+        self.stub.statuses['TRK-RECON-STALE'] = status('Pending')
+
+        self.assertEqual(self.reconcile(expire_hours=48)['expired'], 1)
+        stale.refresh_from_db()
+        self.assertEqual(stale.status, 'failed')
+        self.assertEqual(stale.failure_reason, 'expired')
+        self.assertEqual(PaymentIntent.objects.get(payment=stale).state, 'failed')
+
+    def test_skips_recent_and_untracked_orders(self):
+        self.pending('RECON-FRESH', age=timedelta(minutes=1))
+        payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('1000'),
+            reference_number='RECON-UNSENT'
+        )
+        PaymentIntent.objects.create(
+            merchant_reference='RECON-UNSENT', kind='rent', payment=payment, expected_amount=Decimal('1000')
+        )
+
+        self.assertEqual(self.reconcile(min_age_minutes=15)['scanned'], 0)
+        self.assertEqual(self.stub.requests[STATUS_PATH], 0)
+
+    def test_lookup_errors_leave_orders_pending(self):
+        payment = self.pending('RECON-DOWN')
+        self.service.get_access_token()
+        self.stub.fail_next[STATUS_PATH] = [503] * 10
+
+        report = self.reconcile()
+        self.assertEqual(report['lookup_errors'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_dry_run_writes_nothing(self):
+        payment = self.pending('RECON-DRY')
+        self.assertEqual(self.reconcile(apply=False)['completed'], 1)
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'pending')
+
+    def test_batches_cover_every_order(self):
+        for i in range(7):
+            self.pending(f'RECON-B{i}')
+        report = self.reconcile(batch_size=3, workers=2)
+        self.assertEqual(report['scanned'], 7)
+        self.assertEqual(report['completed'], 7)
+
+    def test_concurrent_lookups_beat_serial_latency(self):
+        orders = 40
+        for i in range(orders):
+            self.pending(f'RECON-T{i}', amount=Decimal('100'))
+        self.service.get_access_token()
+        self.stub.latency = 0.05
+
+        report = self.reconcile(workers=8)
+
+        self.assertEqual(report['completed'], orders)
+        serial_seconds = orders * self.stub.latency
+        self.assertLess(report['seconds'], serial_seconds / 2)
+
+    def test_management_command(self):
+        self.pending('RECON-CMD')
+        out = StringIO()
+        with patch('payments.pesapal_service.pesapal_service', self.service):
+            call_command('reconcile_pending_payments', '--rate', '0', '--dry-run', stdout=out)
+        self.assertIn('Checked 1 pending payments', out.getvalue())
+        self.assertEqual(Payment.objects.get(reference_number='RECON-CMD').status, 'pending')
+
+    def test_pending_orders_without_an_intent_are_backfilled(self):
+        legacy = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('1000'),
+            reference_number='RECON-LEGACY', mpesa_checkout_request_id='TRK-RECON-LEGACY'
+        )
+        Payment.objects.filter(pk=legacy.pk).update(created_at=timezone.now() - timedelta(hours=2))
+
+        report = self.reconcile()
+        self.assertEqual((report['backfilled'], report['completed']), (1, 1))
+        legacy.refresh_from_db()
+        self.assertEqual(legacy.status, 'completed')
+        intent = PaymentIntent.objects.get(payment=legacy)
+        self.assertEqual((intent.tracking_id, intent.kind, intent.state), ('TRK-RECON-LEGACY', 'rent', 'completed'))
+        self.assertEqual(self.reconcile()['backfilled'], 0)
+
+    def test_cleanup_view_queues_reconciliation_for_superusers(self):
+        submitted = self.pending('RECON-LATE-IPN', age=timedelta(hours=3))
+        unsent = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('1000'),
+            reference_number='RECON-NEVER-SENT'
+        )
+        Payment.objects.filter(pk=unsent.pk).update(created_at=timezone.now() - timedelta(hours=3))
+        url = reverse('cleanup-pending-payments')
+
+        client = APIClient()
+        client.force_authenticate(self.tenant)
+        self.assertEqual(client.post(url).status_code, 403)
+
+        admin = CustomUser.objects.create_superuser(
+            email='recon-admin@test.com', full_name='Recon Admin', password='testpass123'
+        )
+        client.force_authenticate(admin)
+        with patch('app.tasks.reconcile_pending_payments_task.apply_async') as queued:
+            queued.return_value.id = 'task-1'
+            response = client.post(url)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['reconciliation_task_id'], 'task-1')
+        queued.assert_called_once()
+        self.assertEqual(self.stub.requests.get(STATUS_PATH, 0), 0)
+        self.assertFalse(Payment.objects.filter(pk=unsent.pk).exists())
+        self.assertTrue(Payment.objects.filter(pk=submitted.pk, status='pending').exists())
+
+class RateLimiterTests(SimpleTestCase):
+    def test_spaces_calls(self):
+        limiter = RateLimiter(100)
+        started = time.monotonic()
+        for _ in range(11):
+            limiter.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def test_zero_rate_is_unlimited(self):
+        limiter = RateLimiter(0)
+        started = time.monotonic()
+        for _ in range(100):
+            limiter.acquire()
+        self.assertLess(time.monotonic() - started, 0.05)
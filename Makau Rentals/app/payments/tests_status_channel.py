@@ -0,0 +1,191 @@
+"""
+Tests for the payment status push channel (long-poll, SSE and conditional GETs)
+"""
+import asyncio
+import json
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import CustomUser, Property, Unit
+from payments.models import Payment
+from payments.status_channel import LocalStatusBroker, channel_name, get_broker, publish_status
+
+
+class LocalStatusBrokerTests(SimpleTestCase):
+    def test_publish_wakes_subscribers_of_the_channel_only(self):
+        async def scenario():
+            broker = LocalStatusBroker()
+            with broker.subscribe('a') as a, broker.subscribe('b') as b:
+                self.assertEqual(broker.waiter_count(), 2)
+                broker.publish('a', 'done')
+                self.assertEqual(await a.wait(1), 'done')
+                self.assertIsNone(await b.wait(0.05))
+            self.assertEqual(broker.waiter_count(), 0)
+
+        asyncio.run(scenario())
+
+    def test_wait_times_out(self):
+        async def scenario():
+            with LocalStatusBroker().subscribe('a') as subscription:
+                started = time.monotonic()
+                self.assertIsNone(await subscription.wait(0.05))
+                return time.monotonic() - started
+
+        self.assertGreaterEqual(asyncio.run(scenario()), 0.04)
+
+
+@override_settings(
+    CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}},
+    PAYMENT_STATUS_BROKER='local',
+    PAYMENT_STATUS_LONGPOLL_SECONDS=0.2,
+    PAYMENT_STATUS_STREAM_SECONDS=2,
+    PAYMENT_STATUS_HEARTBEAT_SECONDS=0.1,
+)
+class PaymentStatusStreamTests(TestCase):
+    def setUp(self):
+        self.landlord = CustomUser.objects.create_user(
+            email='stream-landlord@test.com', full_name='Stream Landlord',
+            user_type='landlord', password='testpass123'
+        )
+        self.tenant = CustomUser.objects.create_user(
+            email='stream-tenant@test.com', full_name='Stream Tenant',
+            user_type='tenant', password='testpass123'
+        )
+        self.property = Property.objects.create(
+            landlord=self.landlord, name='Stream Court', city='Nairobi', state='Nairobi', unit_count=5
+        )
+        self.unit = Unit.objects.create(
+            property_obj=self.property, unit_code='STREAM-1', unit_number='1', rent=Decimal('10000'),
+            tenant=self.tenant, is_available=False
+        )
+        self.payment = Payment.objects.create(
+            tenant=self.tenant, unit=self.unit, payment_type='rent', amount=Decimal('10000'), status='pending'
+        )
+        self.url = reverse('payment-status-stream', args=['rent', self.payment.id])
+
+    def auth(self, user=None):
+        token = RefreshToken.for_user(user or self.tenant).access_token
+        return {'Authorization': f'Bearer {token}'}
+
+    def complete_later(self, delay=0.05):
+        async def complete():
+            await asyncio.sleep(delay)
+            await sync_to_async(Payment.objects.filter(pk=self.payment.pk).update)(status='completed')
+            publish_status('payment', self.payment.pk, 'completed')
+
+        return asyncio.ensure_future(complete())
+
+    async def test_long_poll_answers_at_once_without_a_current_etag(self):
+        response = await self.async_client.get(self.url, headers=self.auth())
+        self.assertEqual(response.status_code, 200)
+        body = json.loads(response.content)
+        self.assertEqual((body['status'], body['is_complete']), ('pending', False))
+        self.assertTrue(response['ETag'])
+
+    async def test_long_poll_times_out_with_304(self):
+        first = await self.async_client.get(self.url, headers=self.auth())
+        started = time.monotonic()
+        response = await self.async_client.get(
+            self.url, headers={**self.auth(), 'If-None-Match': first['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+        self.assertEqual(get_broker().waiter_count(), 0)
+
+    async def test_long_poll_wakes_when_the_payment_completes(self):
+        first = await self.async_client.get(self.url, headers=self.auth())
+        self.complete_later()
+        with self.settings(PAYMENT_STATUS_LONGPOLL_SECONDS=5):
+            started = time.monotonic()
+            response = await self.async_client.get(
+                self.url, headers={**self.auth(), 'If-None-Match': first['ETag']}
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(json.loads(response.content)['status'], 'completed')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    async def test_server_sent_events_until_complete(self):
+        self.complete_later(0.15)
+        response = await self.async_client.get(
+            self.url, headers={**self.auth(), 'Accept': 'text/event-stream'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = ''.join([chunk.decode() if isinstance(chunk, bytes) else chunk
+                        async for chunk in response.streaming_content])
+
+        events = [json.loads(line[len('data: '):]) for line in body.splitlines() if line.startswith('data: ')]
+        self.assertEqual([e['status'] for e in events], ['pending', 'completed'])
+        self.assertIn(': keep-alive', body)
+        self.assertEqual(get_broker().waiter_count(), 0)
+
+    async def test_authentication_and_permissions(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 401)
+        stranger = await sync_to_async(CustomUser.objects.create_user)(
+            email='stream-stranger@test.com', full_name='Stranger', user_type='tenant', password='testpass123'
+        )
+        self.assertEqual((await self.async_client.get(self.url, headers=self.auth(stranger))).status_code, 403)
+        landlord = await self.async_client.get(self.url, headers=self.auth(self.landlord))
+        self.assertEqual(landlord.status_code, 200)
+        missing = reverse('payment-status-stream', args=['subscription', self.payment.id])
+        self.assertEqual((await self.async_client.get(missing, headers=self.auth())).status_code, 404)
+
+    async def test_token_query_parameter_for_event_source(self):
+        token = RefreshToken.for_user(self.tenant).access_token
+        self.assertEqual((await self.async_client.get(f'{self.url}?token={token}')).status_code, 200)
+        self.assertEqual((await self.async_client.get(f'{self.url}?token=garbage')).status_code, 401)
+
+    def test_wsgi_refuses_sse_and_does_not_hold_the_worker(self):
+        headers = {'HTTP_AUTHORIZATION': self.auth()['Authorization']}
+        response = self.client.get(self.url, HTTP_ACCEPT='text/event-stream', **headers)
+        self.assertEqual(response.status_code, 406)
+        self.assertIn('long-poll', response.json()['fallback'])
+
+        first = self.client.get(self.url, **headers)
+        self.assertEqual(first.status_code, 200)
+        with self.settings(PAYMENT_STATUS_LONGPOLL_SECONDS=5):
+            started = time.monotonic()
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'], **headers)
+        self.assertEqual(response.status_code, 304)
+        self.assertLess(time.monotonic() - started, 1)
+
+        Payment.objects.filter(pk=self.payment.pk).update(status='completed')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'], **headers)
+        self.assertEqual(response.json()['status'], 'completed')
+        self.assertEqual(get_broker().waiter_count(), 0)
+
+    def test_status_changes_are_published_on_commit(self):
+        with patch('payments.signals.publish_status') as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                payment = Payment.objects.get(pk=self.payment.pk)
+                payment.description = 'Unchanged status'
+                payment.save()
+            publish.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                payment.status = 'completed'
+                payment.save()
+                publish.assert_not_called()
+            self.assertEqual(len(callbacks), 1)
+        publish.assert_called_once_with('payment', self.payment.pk, 'completed')
+
+    def test_polling_view_answers_conditional_get(self):
+        client = APIClient()
+        client.force_authenticate(self.tenant)
+        url = reverse('rent-payment-status', args=[self.payment.id])
+        first = client.get(url)
+        self.assertEqual(first.status_code, 200)
+
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+        Payment.objects.filter(pk=self.payment.pk).update(status='completed')
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 200)
+
+    def test_channel_name(self):
+        self.assertEqual(channel_name('payment', 7), 'payment-status:payment:7')
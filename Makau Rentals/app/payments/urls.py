@@ -4,6 +4,7 @@ from .views_pesapal import (
     initiate_rent_payment,
     initiate_subscription_payment,
     pesapal_ipn_callback,
+    payment_status_stream,
 
     # DRF views
     PaymentListCreateView,
@@ -11,6 +12,7 @@ from .views_pesapal import (
     SubscriptionPaymentListCreateView,
     SubscriptionPaymentDetailView,
     RentSummaryView,
+    UnitLedgerView,
     UnitTypeListView,
     BulkRentUpdateView, 
     UnitRentUpdateView,
@@ -25,6 +27,8 @@ from .views_pesapal import (
     LandLordCSVView as landlord_csv,
     TenantCSVView as tenant_csv,
     RentPaymentsCSVView as rent_payments_csv,
+    ExportJobView,
+    ExportJobDownloadView,
 )
 from django.views.decorators.csrf import csrf_exempt
 
@@ -49,6 +53,7 @@ urlpatterns = [
     path("subscription-payments/", SubscriptionPaymentListCreateView.as_view(), name="subscription-payment-list-create"),
     path("subscription-payments/<int:pk>/", SubscriptionPaymentDetailView.as_view(), name="subscription-payment-detail"),
     path("rent-payments/summary/", RentSummaryView.as_view(), name="rent-summary"),
+    path("unit-ledger/<int:unit_id>/", UnitLedgerView.as_view(), name="unit-ledger"),
 
     # ------------------------------
     # UNIT TYPES
@@ -61,6 +66,11 @@ urlpatterns = [
     path("initiate-deposit/", InitiateDepositPaymentView.as_view(), name="initiate-deposit"),
     path("initiate-deposit-registration/", InitiateDepositPaymentRegistrationView.as_view(), name="initiate-deposit-registration"),
     path('deposit-status/<int:payment_id>/', DepositPaymentStatusView.as_view(), name='deposit-status'),
+
+    # ------------------------------
+    # PAYMENT STATUS PUSH CHANNEL (long-poll / SSE, async)
+    # ------------------------------
+    path("status-stream/<str:kind>/<int:payment_id>/", payment_status_stream, name="payment-status-stream"),
     
     # ------------------------------
     # CSV REPORTS
@@ -68,6 +78,9 @@ urlpatterns = [
     path("landlord-csv/<int:property_id>/", landlord_csv.as_view(), name="landlord-csv"),
     path("tenant-csv/<int:unit_id>/", tenant_csv.as_view(), name="tenant-csv"),
     path("rent-payments/csv/", rent_payments_csv.as_view(), name="rent-payments-csv"),
+    # Background exports (?background=1 on the CSV endpoints)
+    path("exports/<int:job_id>/", ExportJobView.as_view(), name="export-job"),
+    path("exports/<int:job_id>/download/", ExportJobDownloadView.as_view(), name="export-job-download"),
 
     # ------------------------------
     # CLEANUP AND SIMULATION ENDPOINTS
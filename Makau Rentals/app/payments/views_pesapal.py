@@ -3,35 +3,52 @@ PesaPal Payment Views
 All payment operations now use PesaPal payment gateway
 """
 
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import AuthenticationFailed
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.core.cache import cache
+from django.urls import reverse
 from django.utils import timezone
-from django.db.models import Sum, Q
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum, Q
+import asyncio
 import json
-import csv
 import uuid
 import logging
 from decimal import Decimal
 from datetime import datetime, timedelta
 
 from accounts.models import Unit, UnitType, Property, Subscription, CustomUser
-from .models import Payment, SubscriptionPayment
+from accounts.permissions import IsSuperuser
+from .models import ExportJob, Payment, SubscriptionPayment, UnitBalance
 from .pesapal_service import pesapal_service, validate_payment
+from .exports import parse_filters, queue_export, stream_response
+from .ledger import statement, unit_balance
+from .intents import attach_tracking_id, create_intent, handler_data, resolve_intent, set_state
+from .ipn_inbox import IPN_ACK_SECONDS, kick_worker, process_inline, record_notification
+from .status_channel import (
+    CHANNELS, COMPLETE_STATUSES, channel_name, etag_matches, get_broker, payload_etag,
+)
 from .serializers import PaymentSerializer, SubscriptionPaymentSerializer
 from .email_notifications import (
-    send_rent_payment_confirmation,
-    send_subscription_payment_confirmation,
-    send_deposit_payment_confirmation
+    queue_rent_payment_confirmation,
+    queue_subscription_payment_confirmation,
+    queue_deposit_payment_confirmation
 )
 from .payment_utils import calculate_total_with_fee
+from app.pagination import CompatCursorPagination, SubscriptionPaymentCursorPagination
+from accounts.authentication import RoleClaimJWTAuthentication
+from accounts.cache_utils import bump_landlord_generation
+from accounts.rent_engine import reprice_units
+from accounts.stats import apply_delta
 
 logger = logging.getLogger(__name__)
 
@@ -95,19 +112,21 @@ def initiate_rent_payment(request, unit_id):
         
         phone_number = validation_result  # Use cleaned phone number
 
-        # Create pending payment record with base amount (what goes to landlord)
-        payment = Payment.objects.create(
-            tenant=tenant,
-            unit=unit,
-            amount=base_amount,
-            status="pending",
-            payment_type="rent"
-        )
+        with transaction.atomic():
+            # Create pending payment record with base amount (what goes to landlord)
+            payment = Payment.objects.create(
+                tenant=tenant,
+                unit=unit,
+                amount=base_amount,
+                status="pending",
+                payment_type="rent"
+            )
 
-        # Generate unique merchant reference
-        merchant_reference = f"RENT-{payment.id}-{uuid.uuid4().hex[:8].upper()}"
-        payment.reference_number = merchant_reference
-        payment.save()
+            # Generate unique merchant reference
+            merchant_reference = f"RENT-{payment.id}-{uuid.uuid4().hex[:8].upper()}"
+            payment.reference_number = merchant_reference
+            payment.save()
+            intent = create_intent('rent', merchant_reference, base_amount, payment=payment, tenant_id=tenant.id)
 
         # Initiate PesaPal payment with TOTAL amount (including fee)
         description = f"Rent payment for {unit.unit_number}"
@@ -123,19 +142,8 @@ def initiate_rent_payment(request, unit_id):
         )
 
         if pesapal_response:
-            # Store tracking ID in payment record
-            payment.mpesa_checkout_request_id = pesapal_response['order_tracking_id']
-            payment.save()
-
-            # Cache payment data for callback
-            cache_key = f"pesapal_rent_{pesapal_response['order_tracking_id']}"
-            cache.set(cache_key, {
-                "payment_id": payment.id,
-                "unit_id": unit.id,
-                "amount": float(base_amount),  # Store base amount for records
-                "tenant_id": tenant.id,
-                "merchant_reference": merchant_reference
-            }, timeout=1800)  # 30 minutes
+            # Store tracking ID on the intent and payment record for the IPN
+            attach_tracking_id(intent, pesapal_response['order_tracking_id'])
 
             logger.info(f"PesaPal rent payment initiated: payment_id={payment.id}, tracking_id={pesapal_response['order_tracking_id']}")
 
@@ -151,6 +159,7 @@ def initiate_rent_payment(request, unit_id):
             payment.status = "failed"
             payment.failure_reason = "Failed to initiate PesaPal payment"
             payment.save()
+            set_state(intent, 'failed')
             
             return Response({
                 "error": "Failed to initiate payment",
@@ -210,16 +219,21 @@ def initiate_subscription_payment(request):
         # Calculate total amount including PesaPal fee (3.5%)
         total_amount, processing_fee = calculate_total_with_fee(base_amount)
 
-        # Create pending subscription payment record with base amount
-        subscription_payment = SubscriptionPayment.objects.create(
-            user=user,
-            amount=Decimal(base_amount),
-            subscription_type=plan or 'custom',
-            status="Pending"
-        )
+        with transaction.atomic():
+            # Create pending subscription payment record with base amount
+            subscription_payment = SubscriptionPayment.objects.create(
+                user=user,
+                amount=Decimal(base_amount),
+                subscription_type=plan or 'custom',
+                status="Pending"
+            )
 
-        # Generate unique merchant reference
-        merchant_reference = f"SUB-{subscription_payment.id}-{uuid.uuid4().hex[:8].upper()}"
+            # Generate unique merchant reference
+            merchant_reference = f"SUB-{subscription_payment.id}-{uuid.uuid4().hex[:8].upper()}"
+            intent = create_intent(
+                'subscription', merchant_reference, Decimal(base_amount),
+                subscription_payment=subscription_payment, user_id=user.id, plan=plan
+            )
 
         # Initiate PesaPal payment with TOTAL amount (including fee)
         description = f"Subscription payment for {plan} plan"
@@ -236,18 +250,7 @@ def initiate_subscription_payment(request):
 
         if pesapal_response:
             # Store tracking ID
-            subscription_payment.mpesa_checkout_request_id = pesapal_response['order_tracking_id']
-            subscription_payment.save()
-
-            # Cache payment data
-            cache_key = f"pesapal_sub_{pesapal_response['order_tracking_id']}"
-            cache.set(cache_key, {
-                "subscription_payment_id": subscription_payment.id,
-                "user_id": user.id,
-                "plan": plan,
-                "amount": float(base_amount),  # Store base amount for records
-                "merchant_reference": merchant_reference
-            }, timeout=1800)
+            attach_tracking_id(intent, pesapal_response['order_tracking_id'])
 
             logger.info(f"PesaPal subscription payment initiated: id={subscription_payment.id}, tracking_id={pesapal_response['order_tracking_id']}")
 
@@ -264,6 +267,7 @@ def initiate_subscription_payment(request):
         else:
             subscription_payment.status = "Failed"
             subscription_payment.save()
+            set_state(intent, 'failed')
             
             return Response({
                 "error": "Failed to initiate subscription payment",
@@ -307,18 +311,22 @@ class InitiateDepositPaymentView(APIView):
 
             phone_number = validation_result
 
-            # Create pending payment with base amount
-            payment = Payment.objects.create(
-                tenant=tenant,
-                unit=unit,
-                amount=base_amount,
-                status="pending",
-                payment_type="deposit"
-            )
+            with transaction.atomic():
+                # Create pending payment with base amount
+                payment = Payment.objects.create(
+                    tenant=tenant,
+                    unit=unit,
+                    amount=base_amount,
+                    status="pending",
+                    payment_type="deposit"
+                )
 
-            merchant_reference = f"DEPOSIT-{payment.id}-{uuid.uuid4().hex[:8].upper()}"
-            payment.reference_number = merchant_reference
-            payment.save()
+                merchant_reference = f"DEPOSIT-{payment.id}-{uuid.uuid4().hex[:8].upper()}"
+                payment.reference_number = merchant_reference
+                payment.save()
+                intent = create_intent(
+                    'deposit', merchant_reference, base_amount, payment=payment, tenant_id=tenant.id
+                )
 
             # Initiate PesaPal payment with TOTAL amount (including fee)
             description = f"Deposit payment for {unit.unit_number}"
@@ -334,16 +342,7 @@ class InitiateDepositPaymentView(APIView):
             )
 
             if pesapal_response:
-                payment.mpesa_checkout_request_id = pesapal_response['order_tracking_id']
-                payment.save()
-
-                cache.set(f"pesapal_deposit_{pesapal_response['order_tracking_id']}", {
-                    "payment_id": payment.id,
-                    "unit_id": unit.id,
-                    "amount": float(base_amount),  # Store base amount for records
-                    "tenant_id": tenant.id,
-                    "merchant_reference": merchant_reference
-                }, timeout=1800)
+                attach_tracking_id(intent, pesapal_response['order_tracking_id'])
 
                 logger.info(f"Deposit payment initiated: id={payment.id}")
 
@@ -357,6 +356,7 @@ class InitiateDepositPaymentView(APIView):
             else:
                 payment.status = "failed"
                 payment.save()
+                set_state(intent, 'failed')
                 return Response({
                     "error": "Failed to initiate deposit payment"
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -421,17 +421,22 @@ class InitiateDepositPaymentRegistrationView(APIView):
 
             # Create payment without tenant (will be linked during registration)
             # Store session_id and email in description for tracking even if cache expires
-            payment = Payment.objects.create(
-                unit=unit,
-                amount=base_amount,
-                status="pending",
-                payment_type="deposit",
-                description=f"Registration deposit - Session: {session_id} - Email: {email}"  # ✅ Store session_id AND email for reliable tracking
-            )
-
-            merchant_reference = f"DEPOSIT-REG-{payment.id}-{uuid.uuid4().hex[:8].upper()}"
-            payment.reference_number = merchant_reference
-            payment.save()
+            with transaction.atomic():
+                payment = Payment.objects.create(
+                    unit=unit,
+                    amount=base_amount,
+                    status="pending",
+                    payment_type="deposit",
+                    description=f"Registration deposit - Session: {session_id} - Email: {email}"  # ✅ Store session_id AND email for reliable tracking
+                )
+
+                merchant_reference = f"DEPOSIT-REG-{payment.id}-{uuid.uuid4().hex[:8].upper()}"
+                payment.reference_number = merchant_reference
+                payment.save()
+                intent = create_intent(
+                    'deposit_registration', merchant_reference, base_amount, payment=payment,
+                    phone_number=phone_number, session_id=session_id
+                )
 
             # Initiate PesaPal payment with TOTAL amount (including fee)
             description = f"Deposit payment for {unit.unit_number} (Registration)"
@@ -447,17 +452,7 @@ class InitiateDepositPaymentRegistrationView(APIView):
             )
 
             if pesapal_response:
-                payment.mpesa_checkout_request_id = pesapal_response['order_tracking_id']
-                payment.save()
-
-                cache.set(f"pesapal_deposit_reg_{pesapal_response['order_tracking_id']}", {
-                    "payment_id": payment.id,
-                    "unit_id": unit.id,
-                    "amount": float(base_amount),  # Store base amount for records
-                    "phone_number": phone_number,
-                    "session_id": session_id,
-                    "merchant_reference": merchant_reference
-                }, timeout=1800)
+                attach_tracking_id(intent, pesapal_response['order_tracking_id'])
 
                 logger.info(f"Registration deposit payment initiated: id={payment.id}, tracking_id={pesapal_response['order_tracking_id']}")
 
@@ -471,6 +466,7 @@ class InitiateDepositPaymentRegistrationView(APIView):
             else:
                 payment.status = "failed"
                 payment.save()
+                set_state(intent, 'failed')
                 logger.error("PesaPal order submission failed")
                 return Response({
                     "error": "Failed to initiate deposit payment",
@@ -490,182 +486,236 @@ class InitiateDepositPaymentRegistrationView(APIView):
 def pesapal_ipn_callback(request):
     """
     Handle PesaPal IPN (Instant Payment Notification)
-    This is called by PesaPal when payment status changes
+    This is called by PesaPal when payment status changes. The notification
+    is stored in the inbox and acknowledged straight away; a worker looks up
+    the transaction status and applies it (see payments/ipn_inbox.py), or
+    the callback does so itself when there is no worker to ask.
     """
-    try:
-        # PesaPal sends order_tracking_id and merchant_reference as query parameters
-        order_tracking_id = request.GET.get('OrderTrackingId')
-        merchant_reference = request.GET.get('OrderMerchantReference')
-
-        logger.info(f"📥 PesaPal IPN received: tracking_id={order_tracking_id}, ref={merchant_reference}")
-
-        if not order_tracking_id:
-            logger.error("No OrderTrackingId in IPN callback")
-            return JsonResponse({"status": "error", "message": "Missing OrderTrackingId"})
-
-        # Query transaction status from PesaPal
-        transaction_status = pesapal_service.get_transaction_status(order_tracking_id)
-
-        if not transaction_status:
-            logger.error(f"Failed to get transaction status for {order_tracking_id}")
-            return JsonResponse({"status": "error", "message": "Failed to query transaction status"})
-
-        payment_status = transaction_status.get('payment_status_description', '').lower()
-        payment_method = transaction_status.get('payment_method')
-        confirmation_code = transaction_status.get('confirmation_code')
-        amount = transaction_status.get('amount')
-
-        logger.info(f"Transaction status: {payment_status}, method: {payment_method}, code: {confirmation_code}")
-
-        # Determine if payment was successful
-        if payment_status in ['completed', 'success']:
-            # Check cache for payment type
-            cached_rent = cache.get(f"pesapal_rent_{order_tracking_id}")
-            cached_sub = cache.get(f"pesapal_sub_{order_tracking_id}")
-            cached_deposit = cache.get(f"pesapal_deposit_{order_tracking_id}")
-            cached_deposit_reg = cache.get(f"pesapal_deposit_reg_{order_tracking_id}")
-
-            if cached_rent:
-                # Process rent payment
-                handle_successful_rent_payment(cached_rent, confirmation_code, amount)
-                cache.delete(f"pesapal_rent_{order_tracking_id}")
-                
-            elif cached_sub:
-                # Process subscription payment
-                handle_successful_subscription_payment(cached_sub, confirmation_code, amount)
-                cache.delete(f"pesapal_sub_{order_tracking_id}")
-                
-            elif cached_deposit or cached_deposit_reg:
-                # Process deposit payment
-                cached_data = cached_deposit or cached_deposit_reg
-                is_registration = bool(cached_deposit_reg)
-                handle_successful_deposit_payment(cached_data, confirmation_code, amount, is_registration)
-                cache.delete(f"pesapal_deposit_{order_tracking_id}")
-                cache.delete(f"pesapal_deposit_reg_{order_tracking_id}")
+    with IPN_ACK_SECONDS.time():
+        try:
+            # PesaPal sends order_tracking_id and merchant_reference as query parameters
+            params = {**request.POST.dict(), **request.GET.dict()}
+            order_tracking_id = params.get('OrderTrackingId')
+
+            if not order_tracking_id:
+                logger.error("No OrderTrackingId in IPN callback")
+                return JsonResponse({"status": "error", "message": "Missing OrderTrackingId"})
+
+            notification = record_notification(params)
+            logger.info(f"📥 PesaPal IPN queued: tracking_id={order_tracking_id}, inbox_id={notification.id}")
+            if not kick_worker():
+                process_inline(notification)
+
+            return JsonResponse({"status": "success", "message": "IPN received"})
+
+        except Exception as e:
+            logger.error(f"IPN callback error: {str(e)}", exc_info=True)
+            return JsonResponse({"status": "error", "message": "Internal error"})
+
+
+def apply_transaction_status(order_tracking_id, merchant_reference, transaction_status):
+    """Apply a PesaPal transaction status to the order's payment (idempotent)"""
+    payment_status = transaction_status.get('payment_status_description', '').lower()
+    payment_method = transaction_status.get('payment_method')
+    confirmation_code = transaction_status.get('confirmation_code')
+    amount = transaction_status.get('amount')
+
+    logger.info(f"Transaction status: {payment_status}, method: {payment_method}, code: {confirmation_code}")
+
+    # The intent recorded at initiation says what this order pays for
+    intent = resolve_intent(order_tracking_id, merchant_reference)
+
+    # Determine if payment was successful
+    if payment_status in ['completed', 'success']:
+        if intent is None:
+            logger.warning(f"No payment intent found for {order_tracking_id}")
+        else:
+            if intent.kind == 'rent':
+                completed = handle_successful_rent_payment(handler_data(intent), confirmation_code, amount)
+            elif intent.kind == 'subscription':
+                completed = handle_successful_subscription_payment(handler_data(intent), confirmation_code, amount)
             else:
-                logger.warning(f"No cached data found for {order_tracking_id}")
+                is_registration = intent.kind == 'deposit_registration'
+                completed = handle_successful_deposit_payment(
+                    handler_data(intent), confirmation_code, amount, is_registration
+                )
+            # Retried notifications find the payment already completed
+            if (completed or _intent_payment_completed(intent)) and intent.state != 'completed':
+                set_state(intent, 'completed')
 
-        elif payment_status in ['failed', 'cancelled']:
-            # Mark payment as failed
-            mark_payment_as_failed(order_tracking_id, payment_status)
+    elif payment_status in ['failed', 'cancelled']:
+        # Mark payment as failed
+        mark_payment_as_failed(order_tracking_id, payment_status, intent=intent)
 
-        return JsonResponse({"status": "success", "message": "IPN processed"})
 
-    except Exception as e:
-        logger.error(f"IPN callback error: {str(e)}", exc_info=True)
-        return JsonResponse({"status": "error", "message": "Internal error"})
+def _intent_payment_completed(intent):
+    """Whether the intent's payment is already completed (e.g. by an earlier notification)"""
+    if intent.kind == 'subscription':
+        return SubscriptionPayment.objects.filter(pk=intent.subscription_payment_id, status='Success').exists()
+    return Payment.objects.filter(pk=intent.payment_id, status='completed').exists()
+
+
+def _lock_pending(model, pk, pending_status):
+    """
+    Lock a payment row for completion. Returns None when it does not exist
+    or is no longer pending (a retried or duplicate notification).
+    """
+    payment = model.objects.select_for_update().filter(pk=pk).first()
+    if payment is None or payment.status != pending_status:
+        return None
+    return payment
 
 
 def handle_successful_rent_payment(cached_data, confirmation_code, amount):
-    """Helper function to process successful rent payment"""
+    """
+    Helper function to process successful rent payment.
+    Idempotent: returns True only for the notification that credited the unit.
+    """
     try:
-        payment = Payment.objects.get(id=cached_data["payment_id"])
-        unit = payment.unit
-
-        payment.status = "completed"
-        payment.mpesa_receipt = confirmation_code or f"PESAPAL-{payment.id}"
-        if amount:
-            payment.amount = Decimal(amount)
-        payment.save()
+        with transaction.atomic():
+            payment = _lock_pending(Payment, cached_data["payment_id"], "pending")
+            if payment is None:
+                logger.info(f"Rent payment {cached_data['payment_id']} already processed or missing")
+                return False
+            unit = Unit.objects.select_for_update().select_related('property_obj').get(pk=payment.unit_id)
+            payment.unit = unit
+
+            payment.status = "completed"
+            payment.mpesa_receipt = confirmation_code or f"PESAPAL-{payment.id}"
+            if amount:
+                payment.amount = Decimal(amount)
+            payment.save()
 
-        # Update unit rent_paid
-        paid_amount = Decimal(amount) if amount else payment.amount
-        unit.rent_paid += paid_amount
-        unit.rent_remaining = unit.rent - unit.rent_paid
-        unit.save()
+            # Credit the unit in SQL so concurrent completions cannot lose an update
+            paid_amount = Decimal(amount) if amount else payment.amount
+            Unit.objects.filter(pk=unit.pk).update(
+                rent_paid=F('rent_paid') + paid_amount,
+                rent_remaining=F('rent_remaining') - paid_amount,
+            )
+            landlord_id = unit.property_obj.landlord_id
+            apply_delta(landlord_id, {
+                'rent_collected': paid_amount,
+                'rent_outstanding': -paid_amount,
+            })
+            transaction.on_commit(lambda: bump_landlord_generation(landlord_id))
 
-        logger.info(f"Rent payment {payment.id} completed successfully")
-        logger.info(f"Unit {unit.unit_number} - paid: {unit.rent_paid}, remaining: {unit.rent_remaining}")
+            logger.info(f"Rent payment {payment.id} completed successfully")
+            logger.info(f"Unit {unit.unit_number} - paid: {unit.rent_paid + paid_amount}")
 
-        # Send confirmation emails to tenant and landlord
-        send_rent_payment_confirmation(payment)
+            # Confirmation emails to tenant and landlord commit with the payment;
+            # they quote the balances the SQL credit above left on the locked unit
+            unit.rent_paid += paid_amount
+            unit.rent_remaining -= paid_amount
+            queue_rent_payment_confirmation(payment)
+        return True
 
-    except Payment.DoesNotExist:
-        logger.error(f"Payment not found: {cached_data['payment_id']}")
-    except Exception as e:
-        logger.error(f"Error processing rent payment: {str(e)}")
+    except IntegrityError:
+        logger.warning(f"Confirmation code {confirmation_code} already used; payment {cached_data['payment_id']} not credited")
+        return False
 
 
 def handle_successful_subscription_payment(cached_data, confirmation_code, amount):
-    """Helper function to process successful subscription payment"""
+    """
+    Helper function to process successful subscription payment.
+    Idempotent: returns True only for the notification that extended the subscription.
+    """
     try:
-        subscription_payment = SubscriptionPayment.objects.get(id=cached_data["subscription_payment_id"])
-        user = subscription_payment.user
-
-        subscription_payment.status = "Success"
-        subscription_payment.mpesa_receipt_number = confirmation_code or f"PESAPAL-SUB-{subscription_payment.id}"
-        if amount:
-            subscription_payment.amount = Decimal(amount)
-        subscription_payment.save()
-
-        # Update or create user subscription
-        subscription, created = Subscription.objects.get_or_create(
-            user=user,
-            defaults={
-                'plan': subscription_payment.subscription_type,
-                'expiry_date': timezone.now() + timedelta(days=30)
-            }
-        )
+        with transaction.atomic():
+            subscription_payment = _lock_pending(
+                SubscriptionPayment, cached_data["subscription_payment_id"], "Pending"
+            )
+            if subscription_payment is None:
+                logger.info(f"Subscription payment {cached_data['subscription_payment_id']} already processed or missing")
+                return False
+            user = subscription_payment.user
 
-        if not created:
-            subscription.plan = subscription_payment.subscription_type
-            subscription.expiry_date = timezone.now() + timedelta(days=30)
-            subscription.save()
+            subscription_payment.status = "Success"
+            subscription_payment.mpesa_receipt_number = confirmation_code or f"PESAPAL-SUB-{subscription_payment.id}"
+            if amount:
+                subscription_payment.amount = Decimal(amount)
+            subscription_payment.save()
 
-        logger.info(f"Subscription payment {subscription_payment.id} completed")
-        logger.info(f"User {user.email} subscription updated to {subscription_payment.subscription_type}")
+            # Update or create user subscription
+            subscription = Subscription.objects.select_for_update().filter(user=user).first()
+            if subscription is None:
+                Subscription.objects.create(
+                    user=user,
+                    plan=subscription_payment.subscription_type,
+                    expiry_date=timezone.now() + timedelta(days=30)
+                )
+            else:
+                subscription.plan = subscription_payment.subscription_type
+                subscription.expiry_date = timezone.now() + timedelta(days=30)
+                subscription.save()
 
-        # Send confirmation email to landlord
-        send_subscription_payment_confirmation(subscription_payment)
+            logger.info(f"Subscription payment {subscription_payment.id} completed")
+            logger.info(f"User {user.email} subscription updated to {subscription_payment.subscription_type}")
 
-    except SubscriptionPayment.DoesNotExist:
-        logger.error(f"Subscription payment not found: {cached_data['subscription_payment_id']}")
-    except Exception as e:
-        logger.error(f"Error processing subscription payment: {str(e)}")
+            # Confirmation email to the landlord commits with the payment
+            queue_subscription_payment_confirmation(subscription_payment)
+        return True
+
+    except IntegrityError:
+        logger.warning(
+            f"Confirmation code {confirmation_code} already used; "
+            f"subscription payment {cached_data['subscription_payment_id']} not applied"
+        )
+        return False
 
 
 def handle_successful_deposit_payment(cached_data, confirmation_code, amount, is_registration=False):
-    """Helper function to process successful deposit payment"""
+    """
+    Helper function to process successful deposit payment.
+    Idempotent: returns True only for the notification that completed it.
+    """
     try:
-        payment = Payment.objects.get(id=cached_data["payment_id"])
-        unit = payment.unit
-
-        payment.status = "completed"
-        payment.mpesa_receipt = confirmation_code or f"PESAPAL-DEP-{payment.id}"
-        if amount:
-            payment.amount = Decimal(amount)
-        payment.save()
-
-        # For registration, just reserve the unit
-        if is_registration:
-            unit.is_available = False
-            unit.save()
-            logger.info(f"Unit {unit.unit_number} reserved via registration deposit")
-        else:
-            # Regular deposit - assign tenant
-            if payment.tenant:
+        with transaction.atomic():
+            payment = _lock_pending(Payment, cached_data["payment_id"], "pending")
+            if payment is None:
+                logger.info(f"Deposit payment {cached_data['payment_id']} already processed or missing")
+                return False
+            unit = Unit.objects.select_for_update().get(pk=payment.unit_id)
+            payment.unit = unit
+
+            payment.status = "completed"
+            payment.mpesa_receipt = confirmation_code or f"PESAPAL-DEP-{payment.id}"
+            if amount:
+                payment.amount = Decimal(amount)
+            payment.save()
+
+            # For registration, just reserve the unit
+            if is_registration:
                 unit.is_available = False
-                unit.tenant = payment.tenant
-                unit.assigned_date = timezone.now()
                 unit.save()
-                logger.info(f"Unit {unit.unit_number} assigned to tenant {payment.tenant.email}")
+                logger.info(f"Unit {unit.unit_number} reserved via registration deposit")
+            else:
+                # Regular deposit - assign tenant
+                if payment.tenant:
+                    unit.is_available = False
+                    unit.tenant = payment.tenant
+                    unit.assigned_date = timezone.now()
+                    unit.save()
+                    logger.info(f"Unit {unit.unit_number} assigned to tenant {payment.tenant.email}")
 
-        logger.info(f"Deposit payment {payment.id} completed successfully")
+            logger.info(f"Deposit payment {payment.id} completed successfully")
 
-        # Send confirmation emails to tenant and landlord
-        send_deposit_payment_confirmation(payment, is_registration)
+            # Confirmation emails to tenant and landlord commit with the payment
+            queue_deposit_payment_confirmation(payment, is_registration)
+        return True
 
-    except Payment.DoesNotExist:
-        logger.error(f"Deposit payment not found: {cached_data['payment_id']}")
-    except Exception as e:
-        logger.error(f"Error processing deposit payment: {str(e)}")
+    except IntegrityError:
+        logger.warning(f"Confirmation code {confirmation_code} already used; deposit {cached_data['payment_id']} not applied")
+        return False
 
 
-def mark_payment_as_failed(order_tracking_id, reason):
+def mark_payment_as_failed(order_tracking_id, reason, intent=None):
     """Mark payment as failed based on order tracking ID"""
     try:
-        # Try to find payment by tracking ID
-        payment = Payment.objects.filter(mpesa_checkout_request_id=order_tracking_id).first()
+        if intent is not None and intent.state == 'pending':
+            set_state(intent, 'cancelled' if reason == 'cancelled' else 'failed')
+
+        # Try to find payment by tracking ID; a completed payment stays completed
+        payment = Payment.objects.filter(mpesa_checkout_request_id=order_tracking_id, status='pending').first()
         if payment:
             payment.status = "failed"
             payment.failure_reason = reason
@@ -674,7 +724,9 @@ def mark_payment_as_failed(order_tracking_id, reason):
             return
 
         # Try subscription payment
-        sub_payment = SubscriptionPayment.objects.filter(mpesa_checkout_request_id=order_tracking_id).first()
+        sub_payment = SubscriptionPayment.objects.filter(
+            mpesa_checkout_request_id=order_tracking_id, status='Pending'
+        ).first()
         if sub_payment:
             sub_payment.status = "Failed"
             sub_payment.save()
@@ -688,6 +740,18 @@ def mark_payment_as_failed(order_tracking_id, reason):
 # PAYMENT STATUS CHECK VIEWS
 # ====================================================================================
 
+def conditional_status_response(request, data):
+    """Status response with an ETag; 304 when the client's copy is current"""
+    etag = payload_etag(data)
+    if etag_matches(request, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 class RentPaymentStatusView(APIView):
     """Check rent payment status"""
     permission_classes = [IsAuthenticated]
@@ -707,13 +771,13 @@ class RentPaymentStatusView(APIView):
             if payment.status == 'pending' and payment.mpesa_checkout_request_id:
                 transaction_status = pesapal_service.get_transaction_status(payment.mpesa_checkout_request_id)
                 if transaction_status:
-                    status_desc = transaction_status.get('payment_status_description', '').lower()
-                    if status_desc in ['completed', 'success']:
-                        payment.status = 'completed'
-                        payment.mpesa_receipt = transaction_status.get('confirmation_code')
-                        payment.save()
+                    # Same completion path as the IPN, so the unit is credited once
+                    apply_transaction_status(
+                        payment.mpesa_checkout_request_id, payment.reference_number, transaction_status
+                    )
+                    payment.refresh_from_db()
 
-            return Response({
+            return conditional_status_response(request, {
                 "id": payment.id,
                 "payment_id": payment.id,
                 "status": payment.status,
@@ -747,13 +811,13 @@ class DepositPaymentStatusView(APIView):
             if payment.status == 'pending' and payment.mpesa_checkout_request_id:
                 transaction_status = pesapal_service.get_transaction_status(payment.mpesa_checkout_request_id)
                 if transaction_status:
-                    status_desc = transaction_status.get('payment_status_description', '').lower()
-                    if status_desc in ['completed', 'success']:
-                        payment.status = 'completed'
-                        payment.mpesa_receipt = transaction_status.get('confirmation_code')
-                        payment.save()
+                    # Same completion path as the IPN, so the unit is credited once
+                    apply_transaction_status(
+                        payment.mpesa_checkout_request_id, payment.reference_number, transaction_status
+                    )
+                    payment.refresh_from_db()
 
-            return Response({
+            return conditional_status_response(request, {
                 "payment_id": payment.id,
                 "status": payment.status,
                 "amount": float(payment.amount),
@@ -763,6 +827,159 @@ class DepositPaymentStatusView(APIView):
             return Response({"error": "Payment not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+def _stream_user(request):
+    """JWT user of a status stream request (EventSource cannot set headers, so ?token= also works)"""
+    authenticator = RoleClaimJWTAuthentication()
+    try:
+        result = authenticator.authenticate(request)
+        if result is None and request.GET.get('token'):
+            return authenticator.get_user(authenticator.get_validated_token(request.GET['token']))
+        return result[0] if result else None
+    except AuthenticationFailed:
+        return None
+
+
+def _status_payload(kind, payment_id, user):
+    """(payload, None) for a payment the user may see, else (None, HTTP status)"""
+    if kind == 'subscription':
+        payment = SubscriptionPayment.objects.filter(id=payment_id, user=user).first()
+        if payment is None:
+            return None, status.HTTP_404_NOT_FOUND
+        receipt = payment.mpesa_receipt_number
+    else:
+        payments = Payment.objects.select_related('unit__property_obj')
+        if kind == 'rent':
+            payments = payments.filter(payment_type='rent')
+        payment = payments.filter(id=payment_id).first()
+        if payment is None:
+            return None, status.HTTP_404_NOT_FOUND
+        if payment.tenant_id != user.id and payment.unit.property_obj.landlord_id != user.id:
+            return None, status.HTTP_403_FORBIDDEN
+        receipt = payment.mpesa_receipt
+    return {
+        "kind": kind,
+        "payment_id": payment.id,
+        "status": payment.status,
+        "amount": float(payment.amount),
+        "mpesa_receipt": receipt,
+        "is_complete": payment.status in COMPLETE_STATUSES,
+    }, None
+
+
+def _status_json(payload, etag):
+    response = JsonResponse(payload)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _not_modified(etag):
+    response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+    response['ETag'] = etag
+    return response
+
+
+def _sse_event(payload, etag):
+    return f"id: {etag.strip(chr(34))}\nevent: status\ndata: {json.dumps(payload)}\n\n"
+
+
+async def _status_events(subscription, load, kind, payment_id, user, payload):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, 'PAYMENT_STATUS_STREAM_SECONDS', 120)
+    heartbeat = getattr(settings, 'PAYMENT_STATUS_HEARTBEAT_SECONDS', 15)
+    etag = payload_etag(payload)
+    try:
+        yield "retry: 3000\n" + _sse_event(payload, etag)
+        while not payload['is_complete']:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            if await subscription.wait(min(heartbeat, remaining)) is None:
+                yield ": keep-alive\n\n"
+                continue
+            fresh, error = await load(kind, payment_id, user)
+            if error:
+                break
+            fresh_etag = payload_etag(fresh)
+            if fresh_etag != etag:
+                payload, etag = fresh, fresh_etag
+                yield _sse_event(payload, etag)
+    finally:
+        subscription.close()
+
+
+async def payment_status_stream(request, kind, payment_id):
+    """
+    Wait for a payment's status to change instead of polling (see
+    payments/status_channel.py). `kind` is rent, deposit or subscription.
+    Long-poll by default (send If-None-Match with the last ETag); send
+    Accept: text/event-stream for Server-Sent Events.
+
+    Waiting only pays off when served from app/asgi.py. Under WSGI every
+    request holds a worker thread and a streamed response is buffered until
+    it ends, so SSE is refused (406) and the long-poll waits at most
+    PAYMENT_STATUS_WSGI_LONGPOLL_SECONDS (by default it answers at once,
+    like a conditional GET).
+    """
+    if kind not in CHANNELS:
+        return JsonResponse({"error": "Unknown payment kind"}, status=status.HTTP_404_NOT_FOUND)
+    user = await sync_to_async(_stream_user)(request)
+    if user is None:
+        return JsonResponse({"error": "Authentication required"}, status=status.HTTP_401_UNAUTHORIZED)
+
+    over_asgi = isinstance(request, ASGIRequest)
+    if 'text/event-stream' in request.headers.get('Accept', '') and not over_asgi:
+        return JsonResponse({
+            "error": "Server-Sent Events are not available on this deployment",
+            "fallback": "long-poll: GET this URL with If-None-Match set to the last ETag",
+        }, status=status.HTTP_406_NOT_ACCEPTABLE)
+
+    load = sync_to_async(_status_payload)
+    # Subscribe before reading so a change between the read and the wait is not missed
+    subscription = get_broker().subscribe(channel_name(CHANNELS[kind], payment_id))
+    streaming = False
+    try:
+        payload, error = await load(kind, payment_id, user)
+        if error:
+            return JsonResponse({"error": "Payment not found" if error == 404 else "Permission denied"}, status=error)
+
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            streaming = True
+            response = StreamingHttpResponse(
+                _status_events(subscription, load, kind, payment_id, user, payload),
+                content_type='text/event-stream',
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+
+        etag = payload_etag(payload)
+        if not etag_matches(request, etag):
+            return _status_json(payload, etag)
+        if payload['is_complete']:
+            return _not_modified(etag)
+
+        loop = asyncio.get_running_loop()
+        if over_asgi:
+            wait_seconds = getattr(settings, 'PAYMENT_STATUS_LONGPOLL_SECONDS', 25)
+        else:
+            wait_seconds = getattr(settings, 'PAYMENT_STATUS_WSGI_LONGPOLL_SECONDS', 0)
+        deadline = loop.time() + wait_seconds
+        while (remaining := deadline - loop.time()) > 0:
+            if await subscription.wait(remaining) is None:
+                break
+            payload, error = await load(kind, payment_id, user)
+            if error:
+                return JsonResponse({"error": "Payment not found"}, status=error)
+            fresh_etag = payload_etag(payload)
+            if fresh_etag != etag:
+                return _status_json(payload, fresh_etag)
+        return _not_modified(etag)
+    finally:
+        if not streaming:
+            subscription.close()
+
+
 # ====================================================================================
 # EXISTING DRF VIEWS (unchanged from original)
 # ====================================================================================
@@ -771,13 +988,15 @@ class PaymentListCreateView(generics.ListCreateAPIView):
     """List and create rent payments"""
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CompatCursorPagination
 
     def get_queryset(self):
         user = self.request.user
+        payments = Payment.objects.select_related('tenant', 'unit__property_obj')
         if getattr(user, 'is_tenant', False):
-            return Payment.objects.filter(tenant=user)
+            return payments.filter(tenant=user)
         elif getattr(user, 'is_landlord', False):
-            return Payment.objects.filter(unit__property_obj__landlord=user)
+            return payments.filter(unit__property_obj__landlord=user)
         return Payment.objects.none()
 
     def perform_create(self, serializer):
@@ -802,6 +1021,7 @@ class SubscriptionPaymentListCreateView(generics.ListCreateAPIView):
     """List and create subscription payments"""
     serializer_class = SubscriptionPaymentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SubscriptionPaymentCursorPagination
 
     def get_queryset(self):
         return SubscriptionPayment.objects.filter(user=self.request.user)
@@ -828,7 +1048,7 @@ class SubscriptionPaymentDetailView(generics.RetrieveUpdateDestroyAPIView):
             response_data['status'] = instance.status
             response_data['is_complete'] = instance.status in ['Success', 'Failed']
 
-            return Response(response_data)
+            return conditional_status_response(request, response_data)
         except Exception as e:
             logger.error(f"Error retrieving subscription payment: {str(e)}")
             return Response(
@@ -837,6 +1057,48 @@ class SubscriptionPaymentDetailView(generics.RetrieveUpdateDestroyAPIView):
             )
 
 
+class UnitLedgerView(APIView):
+    """Rent ledger statement of a unit, optionally for a ?start=&end= date range"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, unit_id):
+        unit = get_object_or_404(Unit.objects.select_related('property_obj'), id=unit_id)
+        user = request.user
+        if unit.tenant_id != user.id and unit.property_obj.landlord_id != user.id:
+            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            start, end = (
+                timezone.make_aware(datetime.strptime(request.query_params[key], '%Y-%m-%d'))
+                if request.query_params.get(key) else None
+                for key in ('start', 'end')
+            )
+        except ValueError:
+            return Response({"error": "Dates must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = statement(unit.id, start, end)
+        balance = unit_balance(unit.id)
+        return Response({
+            "unit_id": unit.id,
+            "balance": float(balance.balance),
+            "deposit_held": float(balance.deposit_held),
+            "opening_balance": float(result['opening_balance']),
+            "closing_balance": float(result['closing_balance']),
+            "entries": [
+                {
+                    "id": entry.id,
+                    "posted_at": entry.posted_at,
+                    "entry_type": entry.entry_type,
+                    "amount": float(entry.amount),
+                    "balance_after": float(entry.balance_after),
+                    "description": entry.description,
+                    "payment_id": entry.payment_id,
+                }
+                for entry in result['entries']
+            ],
+        })
+
+
 class RentSummaryView(APIView):
     """Get rent summary - for both landlords and tenants"""
     permission_classes = [IsAuthenticated]
@@ -857,15 +1119,12 @@ class RentSummaryView(APIView):
                         "rent_status": "not_assigned"
                     })
 
-                rent_paid = Payment.objects.filter(
-                    unit=unit,
-                    status__in=['completed', 'Success']
-                ).aggregate(total=Sum('amount'))['total'] or 0
+                balance = unit_balance(unit.id)
 
                 return Response({
                     "monthly_rent": float(unit.rent or 0),
                     "rent_due": float(unit.rent_remaining or 0),
-                    "rent_paid": float(rent_paid),
+                    "rent_paid": float(balance.total_paid),
                     "prepaid_months": 0,
                     "rent_status": "due" if unit.rent_remaining > 0 else "paid"
                 })
@@ -880,10 +1139,10 @@ class RentSummaryView(APIView):
             properties = Property.objects.filter(landlord=user)
             units = Unit.objects.filter(property_obj__in=properties)
 
-            total_collected = Payment.objects.filter(
-                unit__in=units,
-                status__in=['completed', 'Success']
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            collected = UnitBalance.objects.filter(unit__in=units).aggregate(
+                rent=Sum('total_paid'), deposits=Sum('deposit_held')
+            )
+            total_collected = (collected['rent'] or 0) + (collected['deposits'] or 0)
 
             total_outstanding = units.aggregate(
                 outstanding=Sum('rent_remaining')
@@ -909,31 +1168,69 @@ class UnitTypeListView(generics.ListAPIView):
 
 
 class CleanupPendingPaymentsView(APIView):
-    """Clean up old pending payments"""
-    permission_classes = [IsAuthenticated]
+    """
+    Clean up old pending payments (superusers only).
+    Orders that reached PesaPal are reconciled against their real status by
+    a queued reconciliation run; only pending rows that were never submitted
+    are deleted here.
+    """
+    permission_classes = [IsAuthenticated, IsSuperuser]
 
     def post(self, request):
+        try:
+            from app.tasks import reconcile_pending_payments_task
+            reconciliation_task_id = reconcile_pending_payments_task.apply_async(retry=False).id
+        except Exception as e:
+            logger.error(f"Could not queue pending payment reconciliation: {e}")
+            reconciliation_task_id = None
         cutoff_time = timezone.now() - timedelta(hours=1)
 
+        never_submitted = Q(mpesa_checkout_request_id__isnull=True) | Q(mpesa_checkout_request_id='')
         rent_deleted_count = Payment.objects.filter(
+            never_submitted,
             status='pending',
             created_at__lt=cutoff_time
         ).delete()
 
         subscription_deleted_count = SubscriptionPayment.objects.filter(
+            never_submitted,
             status='Pending',
             transaction_date__lt=cutoff_time
         ).delete()
 
         total_deleted = rent_deleted_count[0] + subscription_deleted_count[0]
 
-        return Response({"message": f"Cleaned up {total_deleted} pending payments"})
+        return Response({
+            "message": f"Cleaned up {total_deleted} pending payments",
+            "reconciliation_queued": reconciliation_task_id is not None,
+            "reconciliation_task_id": reconciliation_task_id,
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 # ====================================================================================
 # CSV EXPORT VIEWS (unchanged)
 # ====================================================================================
 
+def export_response(request, kind, scope_id, filename):
+    """
+    Stream an export, or with ?background=1 queue it as an ExportJob (202).
+    ?start=/?end= (YYYY-MM-DD) limit the date range, ?gzip=1 compresses.
+    """
+    try:
+        filters = parse_filters(request.query_params)
+    except (ValueError, TypeError) as e:
+        return Response({"error": str(e) or "Invalid filter"}, status=status.HTTP_400_BAD_REQUEST)
+    gzip = request.query_params.get('gzip') in ('1', 'true')
+
+    if request.query_params.get('background') in ('1', 'true'):
+        job = queue_export(request.user, kind, scope_id, filters, filename, gzip=gzip)
+        return Response(
+            {"job_id": job.id, "status": job.status, "status_url": reverse('export-job', args=[job.id])},
+            status=status.HTTP_202_ACCEPTED,
+        )
+    return stream_response(kind, scope_id, filters, filename, gzip=gzip)
+
+
 class LandLordCSVView(APIView):
     """Export landlord payment data as CSV"""
     permission_classes = [IsAuthenticated]
@@ -944,25 +1241,7 @@ class LandLordCSVView(APIView):
             return Response({"error": "Only landlords can access this endpoint"}, status=status.HTTP_403_FORBIDDEN)
 
         property_obj = get_object_or_404(Property, id=property_id, landlord=user)
-        units = Unit.objects.filter(property_obj=property_obj)
-        payments = Payment.objects.filter(unit__in=units, status='completed')
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="landlord_payments_{property_obj.name}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Unit Number', 'Tenant', 'Amount', 'Date', 'Receipt'])
-
-        for payment in payments:
-            writer.writerow([
-                payment.unit.unit_number,
-                payment.tenant.full_name if payment.tenant else '',
-                payment.amount,
-                payment.created_at.strftime('%Y-%m-%d'),
-                payment.mpesa_receipt or ''
-            ])
-
-        return response
+        return export_response(request, 'landlord', property_obj.id, f"landlord_payments_{property_obj.name}")
 
 
 class TenantCSVView(APIView):
@@ -971,30 +1250,14 @@ class TenantCSVView(APIView):
 
     def get(self, request, unit_id):
         user = request.user
-        unit = get_object_or_404(Unit, id=unit_id)
+        unit = get_object_or_404(Unit.objects.select_related('property_obj'), id=unit_id)
 
-        if getattr(user, 'is_tenant', False) and unit.tenant != user:
+        if getattr(user, 'is_tenant', False) and unit.tenant_id != user.id:
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        if getattr(user, 'is_landlord', False) and unit.property_obj.landlord != user:
+        if getattr(user, 'is_landlord', False) and unit.property_obj.landlord_id != user.id:
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
 
-        payments = Payment.objects.filter(unit=unit, status='completed')
-
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="tenant_payments_unit_{unit.unit_number}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Amount', 'Date', 'Receipt', 'Type'])
-
-        for payment in payments:
-            writer.writerow([
-                payment.amount,
-                payment.created_at.strftime('%Y-%m-%d'),
-                payment.mpesa_receipt or '',
-                payment.payment_type
-            ])
-
-        return response
+        return export_response(request, 'tenant', unit.id, f"tenant_payments_unit_{unit.unit_number}")
 
 
 class RentPaymentsCSVView(APIView):
@@ -1007,41 +1270,51 @@ class RentPaymentsCSVView(APIView):
             return Response({"error": "Only landlords can access this endpoint"}, status=status.HTTP_403_FORBIDDEN)
 
         property_id = request.query_params.get('property_id', None)
-
-        properties = Property.objects.filter(landlord=user)
-
+        filename = 'rent_payments'
         if property_id:
             try:
-                properties = properties.filter(id=property_id)
-                if not properties.exists():
-                    return Response({"error": "Property not found"}, status=status.HTTP_404_NOT_FOUND)
+                property_obj = Property.objects.filter(landlord=user, id=property_id).first()
             except (ValueError, TypeError):
                 return Response({"error": "Invalid property ID"}, status=status.HTTP_400_BAD_REQUEST)
+            if property_obj is None:
+                return Response({"error": "Property not found"}, status=status.HTTP_404_NOT_FOUND)
+            filename = f"rent_payments_{property_obj.name}"
 
-        units = Unit.objects.filter(property_obj__in=properties)
-        payments = Payment.objects.filter(unit__in=units, status='completed').select_related('unit', 'tenant').order_by('-created_at')
+        return export_response(request, 'rent', user.id, filename)
 
-        property_name = properties.first().name if property_id and properties.exists() else "all_properties"
 
-        response = HttpResponse(content_type='text/csv')
-        filename = f'rent_payments_{property_name}.csv' if property_id else 'rent_payments.csv'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+class ExportJobView(APIView):
+    """Status of a background export"""
+    permission_classes = [IsAuthenticated]
 
-        writer = csv.writer(response)
-        writer.writerow(['Date', 'Unit Number', 'Tenant', 'Amount', 'Payment Type', 'Receipt', 'Property'])
+    def get(self, request, job_id):
+        job = get_object_or_404(ExportJob, id=job_id, owner=request.user)
+        data = {
+            "job_id": job.id,
+            "kind": job.kind,
+            "status": job.status,
+            "row_count": job.row_count,
+            "created_at": job.created_at,
+            "finished_at": job.finished_at,
+            "error": job.error,
+        }
+        if job.status == 'completed':
+            data["download_url"] = reverse('export-job-download', args=[job.id])
+        return Response(data)
 
-        for payment in payments:
-            writer.writerow([
-                payment.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                payment.unit.unit_number,
-                payment.tenant.full_name if payment.tenant else 'N/A',
-                payment.amount,
-                payment.payment_type,
-                payment.mpesa_receipt or '',
-                payment.unit.property_obj.name if payment.unit.property_obj else 'N/A'
-            ])
 
-        return response
+class ExportJobDownloadView(APIView):
+    """Download a finished background export"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, job_id):
+        job = get_object_or_404(ExportJob, id=job_id, owner=request.user)
+        if job.status != 'completed' or not job.file:
+            return Response({"error": "Export is not ready", "status": job.status}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            job.file.open('rb'), as_attachment=True, filename=job.download_name,
+            content_type='application/gzip' if job.gzip else 'text/csv',
+        )
 
 
 # ====================================================================================
@@ -1073,81 +1346,58 @@ class BulkRentUpdateView(APIView):
             except (ValueError, TypeError):
                 return Response({"error": "Amount must be a valid number"}, status=status.HTTP_400_BAD_REQUEST)
 
-            landlord_units = Unit.objects.filter(property_obj__landlord=user).select_related('unit_type')
+            landlord_units = Unit.objects.filter(property_obj__landlord=user)
 
             if unit_type_filter != 'all':
                 landlord_units = landlord_units.filter(unit_type__name=unit_type_filter)
 
-            updates = []
-            preview_data = []
-
-            for unit in landlord_units:
-                old_rent = float(unit.rent)
-                new_rent = old_rent
-
-                if update_type == 'percentage':
-                    new_rent = round(old_rent * (1 + amount / 100))
-                elif update_type == 'fixed':
-                    new_rent = round(old_rent + amount)
-
-                preview_data.append({
-                    'unit_id': unit.id,
-                    'unit_number': unit.unit_number,
-                    'unit_type': unit.unit_type.name if unit.unit_type else 'N/A',
-                    'old_rent': old_rent,
-                    'new_rent': new_rent,
-                    'increase': new_rent - old_rent
-                })
-
-                if new_rent != old_rent:
-                    updates.append({
-                        'unit_id': unit.id,
-                        'new_rent': new_rent
-                    })
-
-            if request.data.get('preview_only'):
-                total_increase = sum(item['increase'] for item in preview_data)
-                total_new_revenue = sum(item['new_rent'] for item in preview_data)
-
+            preview_only = bool(request.data.get('preview_only'))
+            try:
+                result = reprice_units(
+                    landlord_units, update_type, amount, landlord_id=user.id, apply=not preview_only
+                )
+            except ValueError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            summary = result['summary']
+            if preview_only:
                 return Response({
-                    'preview_data': preview_data,
+                    'preview_data': [
+                        {
+                            'unit_id': item['unit_id'],
+                            'unit_number': item['unit_number'],
+                            'unit_type': item['unit_type'],
+                            'old_rent': float(item['old_rent']),
+                            'new_rent': float(item['new_rent']),
+                            'increase': float(item['increase']),
+                        }
+                        for item in result['units']
+                    ],
                     'summary': {
-                        'units_affected': len(preview_data),
-                        'total_increase': total_increase,
-                        'total_new_revenue': total_new_revenue
+                        'units_affected': summary['units_affected'],
+                        'total_increase': float(summary['total_increase']),
+                        'total_new_revenue': float(summary['total_new_revenue'])
                     }
                 })
 
-            # Apply updates
-            updated_count = 0
-            for update in updates:
-                try:
-                    unit = Unit.objects.get(id=update['unit_id'])
-                    unit.rent = update['new_rent']
-
-                    total_paid = Payment.objects.filter(
-                        unit=unit,
-                        status__in=['completed', 'Success'],
-                        payment_type='rent'
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-
-                    unit.rent_paid = total_paid
-                    unit.rent_remaining = unit.rent - unit.rent_paid
-                    unit.save()
-                    updated_count += 1
-
-                except Unit.DoesNotExist:
-                    continue
-                except Exception as e:
-                    logger.error(f"Error updating unit {update['unit_id']}: {str(e)}")
-                    continue
-
+            updated_count = summary['units_updated']
             logger.info(f"Bulk rent update completed by {user.email}. Units updated: {updated_count}")
 
             return Response({
                 'success': True,
                 'message': f'Successfully updated rent for {updated_count} units',
-                'units_updated': updated_count
+                'units_updated': updated_count,
+                'changes': [
+                    {
+                        'unit_id': item['unit_id'],
+                        'old_rent': float(item['old_rent']),
+                        'new_rent': float(item['new_rent']),
+                        'increase': float(item['increase']),
+                        'rent_paid': float(item['rent_paid']),
+                        'rent_remaining': float(item['rent_remaining']),
+                    }
+                    for item in result['changes']
+                ]
             })
 
         except Exception as e:
@@ -1179,16 +1429,11 @@ class UnitRentUpdateView(APIView):
                 return Response({"error": "Rent must be a valid number"}, status=status.HTTP_400_BAD_REQUEST)
 
             old_rent = float(unit.rent)
-            unit.rent = new_rent
-
-            total_paid = Payment.objects.filter(
-                unit=unit,
-                status__in=['completed', 'Success'],
-                payment_type='rent'
-            ).aggregate(total=Sum('amount'))['total'] or 0
+            unit.rent = Decimal(str(new_rent))
 
-            unit.rent_paid = total_paid
-            unit.rent_remaining = unit.rent - unit.rent_paid
+            # save() moves rent_remaining by the rent change and by the ledger
+            # payments not yet on the unit, so billed arrears are kept
+            unit.rent_paid = unit_balance(unit.id).total_paid
             unit.save()
 
             logger.info(f"Unit {unit.unit_number} rent updated from {old_rent} to {new_rent} by {user.email}")